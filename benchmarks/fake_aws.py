@@ -0,0 +1,497 @@
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+#######################################################################################################################
+#################################################### Fake AWS #########################################################
+#######################################################################################################################
+
+# SELECT <attributes> FROM "<table>" WHERE <condition> [AND <condition>]
+SELECT_PATTERN = re.compile(
+    r'^\s*SELECT\s+(?P<attributes>.+?)\s+FROM\s+"(?P<table>[^"]+)"\s*(?:WHERE\s+(?P<where>.+))?$',
+    re.IGNORECASE | re.DOTALL,
+)
+EQUALS_PATTERN = re.compile(r'^"?(\w+)"?\s*=\s*\'([^\']*)\'$')
+IN_PATTERN = re.compile(r'^"?(\w+)"?\s+IN\s+\[(.*)\]$', re.IGNORECASE | re.DOTALL)
+UPDATE_CLAUSE_PATTERN = re.compile(r"\b(SET|ADD|REMOVE)\s+", re.IGNORECASE)
+IF_NOT_EXISTS_PATTERN = re.compile(r"^if_not_exists\((\w+),\s*(:\w+)\)$")
+COMPARISON_PATTERN = re.compile(r"^([:\w]+)\s*(<=|>=|<>|=|<|>)\s*([:\w]+)$")
+
+
+class FakeAws:
+    """In process stand-in for the AWS services used by the framework"""
+
+    def __init__(self, latency_ms: float = 0) -> None:
+        self.latency = latency_ms / 1000
+        self.calls = Counter()
+        self._lock = threading.RLock()
+
+        self.tables = {}
+        self.commands = []
+        self.queues = defaultdict(list)
+        self.executions = {}
+        self.task_results = {}
+        self.log_streams = defaultdict(list)
+        self.secrets = {}
+        self.objects = {}
+        self.functions = {}
+
+        # called with the instance ids and the commands of every SSM send_command
+        self.on_send_command = None
+
+    def client(self, service_name: str, region: str = None) -> "FakeClient":
+        return FakeClient(self, service_name)
+
+    def resource(self, service_name: str, region: str = None) -> "FakeDynamodbResource":
+        if service_name != "dynamodb":
+            raise NotImplementedError(f"No fake resource for {service_name}")
+        return FakeDynamodbResource(self)
+
+    def call(self, service_name: str, operation: str, **kwargs) -> dict:
+        handler = getattr(self, f"{service_name}_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"No fake for {service_name}.{operation}")
+
+        with self._lock:
+            self.calls[(service_name, operation)] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            return handler(**kwargs)
+
+    def api_call_count(self) -> int:
+        return sum(self.calls.values())
+
+    # DynamoDB
+
+    def create_table(self, table: str, partition_key: str, sort_key: str = None) -> None:
+        key_schema = [{"AttributeName": partition_key, "KeyType": "HASH"}]
+        if sort_key:
+            key_schema.append({"AttributeName": sort_key, "KeyType": "RANGE"})
+        self.tables[table] = {"key_schema": key_schema, "items": {}}
+
+    def scan_table(self, table: str) -> list:
+        return [
+            _deserialize(item) for item in self._get_table(table)["items"].values()
+        ]
+
+    def _get_table(self, table: str) -> dict:
+        if table not in self.tables:
+            raise _client_error(
+                "ResourceNotFoundException", f"Requested resource not found: {table}"
+            )
+        return self.tables[table]
+
+    def _item_key(self, table: str, item: dict) -> tuple:
+        return tuple(
+            json.dumps(item[key["AttributeName"]], sort_keys=True)
+            for key in self._get_table(table)["key_schema"]
+        )
+
+    def _check_condition(
+        self, item: dict, condition: str, expression_values: dict
+    ) -> None:
+        # conditions joined by AND, then by OR
+        if not condition:
+            return
+        item = item or {}
+
+        def operand(name: str):
+            value = expression_values[name] if name.startswith(":") else item.get(name)
+            return None if value is None else _deserialize({"v": value})["v"]
+
+        def term_passed(term: str) -> bool:
+            exists = re.match(r"^attribute_(not_)?exists\((\w+)\)$", term.strip())
+            if exists:
+                return (exists.group(2) in item) != bool(exists.group(1))
+            left, operator, right = COMPARISON_PATTERN.match(term.strip()).groups()
+            left, right = operand(left), operand(right)
+            return left is not None and right is not None and {
+                "=": left == right,
+                "<>": left != right,
+                "<": left < right,
+                ">": left > right,
+                "<=": left <= right,
+                ">=": left >= right,
+            }[operator]
+
+        if not any(
+            all(
+                term_passed(term)
+                for term in re.split(r"\s+AND\s+", alternative, flags=re.IGNORECASE)
+            )
+            for alternative in re.split(
+                r"\s+OR\s+", condition.strip(), flags=re.IGNORECASE
+            )
+        ):
+            raise _client_error(
+                "ConditionalCheckFailedException", "The conditional request failed"
+            )
+
+    def dynamodb_describe_table(self, TableName: str) -> dict:
+        return {
+            "Table": {
+                "TableName": TableName,
+                "KeySchema": self._get_table(TableName)["key_schema"],
+                "TableStatus": "ACTIVE",
+            }
+        }
+
+    def dynamodb_put_item(
+        self,
+        TableName: str,
+        Item: dict,
+        ConditionExpression: str = None,
+        ExpressionAttributeValues: dict = None,
+    ) -> dict:
+        items = self._get_table(TableName)["items"]
+        key = self._item_key(TableName, Item)
+        self._check_condition(items.get(key), ConditionExpression, ExpressionAttributeValues)
+        items[key] = dict(Item)
+        return {}
+
+    def dynamodb_get_item(self, TableName: str, Key: dict, **kwargs) -> dict:
+        item = self._get_table(TableName)["items"].get(self._item_key(TableName, Key))
+        return {"Item": dict(item)} if item else {}
+
+    def dynamodb_update_item(
+        self,
+        TableName: str,
+        Key: dict,
+        UpdateExpression: str,
+        ExpressionAttributeValues: dict = None,
+        ExpressionAttributeNames: dict = None,
+        ConditionExpression: str = None,
+        **kwargs,
+    ) -> dict:
+        items = self._get_table(TableName)["items"]
+        key = self._item_key(TableName, Key)
+        values = ExpressionAttributeValues or {}
+        self._check_condition(items.get(key), ConditionExpression, values)
+
+        item = items.setdefault(key, dict(Key))
+        clauses = UPDATE_CLAUSE_PATTERN.split(UpdateExpression)[1:]
+        for action, actions in zip(clauses[::2], clauses[1::2]):
+            # commas inside if_not_exists(...) do not separate updates
+            for update in re.split(r",(?![^(]*\))", actions):
+                if action.upper() == "REMOVE":
+                    item.pop(update.strip(), None)
+                    continue
+                if action.upper() == "ADD":
+                    attribute, value = update.split()
+                    value = _deserialize({"v": values[value]})["v"]
+                    current = _deserialize({"v": item.get(attribute, {"N": "0"})})["v"]
+                    item[attribute] = serializer.serialize(current + value)
+                    continue
+                attribute, value = [part.strip() for part in update.split("=")]
+                attribute = (ExpressionAttributeNames or {}).get(attribute, attribute)
+                if_not_exists = IF_NOT_EXISTS_PATTERN.match(value)
+                if if_not_exists:
+                    item[attribute] = item.get(
+                        if_not_exists.group(1), values[if_not_exists.group(2)]
+                    )
+                else:
+                    item[attribute] = values[value]
+        return {}
+
+    def dynamodb_scan(self, TableName: str, **kwargs) -> dict:
+        return {"Items": [dict(item) for item in self._get_table(TableName)["items"].values()]}
+
+    def dynamodb_batch_write_item(self, RequestItems: dict) -> dict:
+        for table, requests in RequestItems.items():
+            for request in requests:
+                if "PutRequest" in request:
+                    self.dynamodb_put_item(table, request["PutRequest"]["Item"])
+                else:
+                    key = self._item_key(table, request["DeleteRequest"]["Key"])
+                    self._get_table(table)["items"].pop(key, None)
+        return {"UnprocessedItems": {}}
+
+    def dynamodb_transact_write_items(self, TransactItems: list) -> dict:
+        # every item is validated before any write, like a transaction
+        for transact_item in TransactItems:
+            for operation in transact_item.values():
+                self._get_table(operation["TableName"])
+        for transact_item in TransactItems:
+            if "Update" in transact_item:
+                self.dynamodb_update_item(**transact_item["Update"])
+            elif "Put" in transact_item:
+                self.dynamodb_put_item(**transact_item["Put"])
+        return {}
+
+    def dynamodb_batch_get_item(self, RequestItems: dict) -> dict:
+        responses = {}
+        for table, request in RequestItems.items():
+            responses[table] = [
+                response["Item"]
+                for response in (
+                    self.dynamodb_get_item(table, key) for key in request["Keys"]
+                )
+                if response
+            ]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def dynamodb_execute_statement(self, Statement: str, **kwargs) -> dict:
+        match = SELECT_PATTERN.match(Statement)
+        if not match:
+            raise NotImplementedError(f"No fake for the statement {Statement}")
+
+        conditions = []
+        for condition in re.split(r"\s+AND\s+", match.group("where") or "", flags=re.I):
+            if not condition:
+                continue
+            equals = EQUALS_PATTERN.match(condition.strip())
+            if equals:
+                conditions.append((equals.group(1), {equals.group(2)}))
+                continue
+            values = IN_PATTERN.match(condition.strip())
+            if not values:
+                raise NotImplementedError(f"No fake for the condition {condition}")
+            conditions.append(
+                (values.group(1), set(re.findall(r"'([^']*)'", values.group(2))))
+            )
+
+        attributes = [
+            attribute.strip().strip('"') for attribute in match.group("attributes").split(",")
+        ]
+
+        result = []
+        for item in self._get_table(match.group("table"))["items"].values():
+            if all(
+                item.get(attribute, {}).get("S") in values
+                for attribute, values in conditions
+            ):
+                if attributes == ["*"]:
+                    result.append(dict(item))
+                else:
+                    result.append({a: item[a] for a in attributes if a in item})
+
+        return {"Items": result}
+
+    # SSM
+
+    def ssm_send_command(self, InstanceIds: list, Parameters: dict, **kwargs) -> dict:
+        command_id = str(uuid.uuid4())
+        self.commands.append((command_id, InstanceIds, Parameters["commands"]))
+        if self.on_send_command:
+            self.on_send_command(InstanceIds, Parameters["commands"])
+        return {"Command": {"CommandId": command_id}}
+
+    def ssm_get_command_invocation(self, CommandId: str, InstanceId: str) -> dict:
+        # the commands only start the jobs in the background, they succeed once sent
+        if not any(
+            command_id == CommandId and InstanceId in instance_ids
+            for command_id, instance_ids, _ in self.commands
+        ):
+            raise _client_error(
+                "InvocationDoesNotExist", f"No invocation of {CommandId} on {InstanceId}"
+            )
+        return {"CommandId": CommandId, "InstanceId": InstanceId, "Status": "Success"}
+
+    # SQS
+
+    def sqs_send_message(self, QueueUrl: str, MessageBody: str, **kwargs) -> dict:
+        message_id = str(uuid.uuid4())
+        self.queues[QueueUrl].append({"MessageId": message_id, "Body": MessageBody})
+        return {"MessageId": message_id}
+
+    def sqs_send_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        successful = []
+        for entry in Entries:
+            response = self.sqs_send_message(QueueUrl, entry["MessageBody"])
+            successful.append({"Id": entry["Id"], "MessageId": response["MessageId"]})
+        return {"Successful": successful, "Failed": []}
+
+    def sqs_receive_message(
+        self, QueueUrl: str, MaxNumberOfMessages: int = 1, **kwargs
+    ) -> dict:
+        messages = self.queues[QueueUrl][:MaxNumberOfMessages]
+        del self.queues[QueueUrl][:MaxNumberOfMessages]
+        return {
+            "Messages": [
+                {**message, "ReceiptHandle": message["MessageId"]} for message in messages
+            ]
+        }
+
+    def sqs_delete_message_batch(self, QueueUrl: str, Entries: list) -> dict:
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    def sqs_delete_message(self, QueueUrl: str, ReceiptHandle: str) -> dict:
+        return {}
+
+    def sqs_change_message_visibility_batch(self, QueueUrl: str, Entries: list) -> dict:
+        return {"Successful": [{"Id": entry["Id"]} for entry in Entries], "Failed": []}
+
+    # Step Functions
+
+    def stepfunctions_start_execution(
+        self, stateMachineArn: str, name: str, input: str
+    ) -> dict:
+        execution_arn = f"{stateMachineArn}:{name}"
+        self.executions[execution_arn] = json.loads(input)
+        return {
+            "executionArn": execution_arn,
+            "ResponseMetadata": {"HTTPStatusCode": 200},
+        }
+
+    def stepfunctions_send_task_success(self, taskToken: str, output: str) -> dict:
+        self.task_results[taskToken] = ("success", json.loads(output))
+        return {}
+
+    def stepfunctions_send_task_failure(
+        self, taskToken: str, error: str = None, cause: str = None
+    ) -> dict:
+        self.task_results[taskToken] = ("failure", {"error": error, "cause": cause})
+        return {}
+
+    def stepfunctions_send_task_heartbeat(self, taskToken: str) -> dict:
+        return {}
+
+    # CloudWatch Logs
+
+    def logs_create_log_stream(self, logGroupName: str, logStreamName: str) -> dict:
+        if (logGroupName, logStreamName) in self.log_streams:
+            raise _client_error(
+                "ResourceAlreadyExistsException", "The specified log stream already exists"
+            )
+        self.log_streams[(logGroupName, logStreamName)] = []
+        return {}
+
+    def logs_put_log_events(
+        self, logGroupName: str, logStreamName: str, logEvents: list, **kwargs
+    ) -> dict:
+        if (logGroupName, logStreamName) not in self.log_streams:
+            raise _client_error(
+                "ResourceNotFoundException", "The specified log stream does not exist"
+            )
+        self.log_streams[(logGroupName, logStreamName)].extend(logEvents)
+        return {"nextSequenceToken": str(uuid.uuid4())}
+
+    # Secrets Manager
+
+    def secretsmanager_describe_secret(self, SecretId: str) -> dict:
+        return {"VersionIdsToStages": {self.secrets[SecretId]["VersionId"]: ["AWSCURRENT"]}}
+
+    def secretsmanager_get_secret_value(self, SecretId: str, **kwargs) -> dict:
+        return dict(self.secrets[SecretId])
+
+    # S3
+
+    def s3_upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs) -> None:
+        with open(Filename, "rb") as f:
+            self.objects[(Bucket, Key)] = f.read()
+
+    def s3_put_object(self, Bucket: str, Key: str, Body, **kwargs) -> dict:
+        self.objects[(Bucket, Key)] = Body.encode("utf-8") if isinstance(Body, str) else Body
+        return {}
+
+    # Lambda
+
+    def register_function(self, function_name: str, handler) -> None:
+        self.functions[function_name] = handler
+
+    def lambda_invoke(
+        self, FunctionName: str, Payload=b"{}", InvocationType: str = None, **kwargs
+    ) -> dict:
+        payload = json.loads(Payload)
+        # invocations run synchronously, outside the lock of the fake
+        self._lock.release()
+        try:
+            result = self.functions[FunctionName](payload, None)
+        finally:
+            self._lock.acquire()
+        return {"StatusCode": 202 if InvocationType == "Event" else 200, "Payload": result}
+
+
+class FakeClient:
+    """boto3 like client of one service of a FakeAws backend"""
+
+    def __init__(self, backend: FakeAws, service_name: str) -> None:
+        self._backend = backend
+        self._service_name = service_name
+        self.exceptions = _ExceptionsNamespace()
+        self.meta = _FakeClientMeta()
+
+    def __getattr__(self, operation: str):
+        if operation.startswith("_"):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            return self._backend.call(self._service_name, operation, **kwargs)
+
+        return call
+
+
+class _FakeClientMeta:
+    # client.meta.events, handlers are accepted and never called
+    def __init__(self) -> None:
+        self.events = self
+
+    def register(self, event_name: str, handler, unique_id: str = None) -> None:
+        pass
+
+
+class FakeDynamodbResource:
+    """boto3 like DynamoDB service resource, only Table is provided"""
+
+    def __init__(self, backend: FakeAws) -> None:
+        self._client = FakeClient(backend, "dynamodb")
+
+    def Table(self, table: str) -> "FakeTable":
+        return FakeTable(self._client, table)
+
+
+class FakeTable:
+    def __init__(self, client: FakeClient, table: str) -> None:
+        self._client = client
+        self.name = table
+
+    def put_item(self, Item: dict, ExpressionAttributeValues: dict = None, **kwargs) -> dict:
+        if ExpressionAttributeValues:
+            kwargs["ExpressionAttributeValues"] = _serialize(ExpressionAttributeValues)
+        return self._client.put_item(TableName=self.name, Item=_serialize(Item), **kwargs)
+
+    def get_item(self, Key: dict, **kwargs) -> dict:
+        response = self._client.get_item(TableName=self.name, Key=_serialize(Key))
+        if "Item" in response:
+            response["Item"] = _deserialize(response["Item"])
+        return response
+
+
+class _ExceptionsNamespace:
+    # client.exceptions.<Code> classes, raised by the fake for the same error codes
+    def __getattr__(self, code: str):
+        if code.startswith("_"):
+            raise AttributeError(code)
+        return _exception_class(code)
+
+
+_exception_classes = {}
+
+
+def _exception_class(code: str) -> type:
+    if code not in _exception_classes:
+        _exception_classes[code] = type(code, (ClientError,), {})
+    return _exception_classes[code]
+
+
+def _client_error(code: str, message: str) -> ClientError:
+    return _exception_class(code)({"Error": {"Code": code, "Message": message}}, code)
+
+
+def _serialize(item: dict) -> dict:
+    return {k: serializer.serialize(v) for k, v in item.items()}
+
+
+def _deserialize(item: dict) -> dict:
+    return {k: deserializer.deserialize(v) for k, v in item.items()}
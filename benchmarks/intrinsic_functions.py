@@ -0,0 +1,141 @@
+"""Evaluates the Pass state parameters of infra/cdk/state_logic.py"""
+
+import json
+import re
+
+#######################################################################################################################
+############################################# Intrinsic Function Evaluator ############################################
+#######################################################################################################################
+
+PATH_TOKEN = re.compile(
+    r"\.([A-Za-z0-9_]+)|\[(\*|-?\d+)\]|\[\?\(@\.([A-Za-z0-9_]+) (==|!=) '([^']*)'\)\]"
+)
+
+
+def resolve_path(path: str, data):
+    """Reads a path with the fields, [n], [*] and [?(@.field == 'value')] selectors of JSONPath"""
+
+    if not path.startswith("$"):
+        raise ValueError(f"Not a path : {path}")
+
+    values, many = [data], False
+    position = 1
+    while position < len(path):
+        match = PATH_TOKEN.match(path, position)
+        if not match:
+            raise ValueError(f"Unsupported path : {path}")
+        field, selector, filter_field, operator, filter_value = match.groups()
+
+        if filter_field is not None:
+            # the items without the field are not selected
+            values, many = [
+                item
+                for value in values
+                for item in value
+                if filter_field in item
+                and (item[filter_field] == filter_value) == (operator == "==")
+            ], True
+        elif field is not None:
+            # a missing field fails the state with States.Runtime
+            values = [value[field] for value in values]
+        elif selector == "*":
+            values, many = [item for value in values for item in value], True
+        else:
+            values = [value[int(selector)] for value in values]
+
+        position = match.end()
+
+    return values if many else values[0]
+
+
+def split_arguments(arguments: str) -> list:
+
+    parts, depth, quoted, current = [], 0, False, ""
+    for char in arguments:
+        if char == "'" and not current.endswith("\\"):
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and char == ",":
+            parts.append(current.strip())
+            current = ""
+            continue
+        current += char
+
+    if current.strip():
+        parts.append(current.strip())
+
+    return parts
+
+
+def array_unique(values: list) -> list:
+
+    unique = []
+    for value in values:
+        if value not in unique:
+            unique.append(value)
+    return unique
+
+
+INTRINSIC_FUNCTIONS = {
+    "States.MathAdd": lambda a, b: int(a) + int(b),
+    "States.ArrayGetItem": lambda array, index: array[int(index)],
+    "States.ArrayLength": len,
+    "States.ArrayUnique": array_unique,
+    "States.JsonToString": lambda value: json.dumps(value, separators=(",", ":")),
+}
+
+
+def evaluate(expression: str, data):
+    """Evaluates a path or a States.* call of a Parameters field ending with .$"""
+
+    expression = expression.strip()
+
+    if expression.startswith("$"):
+        return resolve_path(expression, data)
+    if expression.startswith("'"):
+        return expression[1:-1]
+    if re.fullmatch(r"-?\d+", expression):
+        return int(expression)
+
+    name, _, arguments = expression.partition("(")
+    if name not in INTRINSIC_FUNCTIONS or not arguments.endswith(")"):
+        raise ValueError(f"Unsupported intrinsic function : {expression}")
+
+    return INTRINSIC_FUNCTIONS[name](
+        *[evaluate(argument, data) for argument in split_arguments(arguments[:-1])]
+    )
+
+
+def render_parameters(template, data):
+
+    if not isinstance(template, dict):
+        return template
+
+    rendered = {}
+    for key, value in template.items():
+        if key.endswith(".$"):
+            rendered[key[:-2]] = evaluate(value, data)
+        else:
+            rendered[key] = render_parameters(value, data)
+
+    return rendered
+
+
+def run_pass(parameters: dict, data: dict, result_path: str = None) -> dict:
+    """Output of a Pass state, the result replaces the input without result path"""
+
+    result = render_parameters(parameters, data)
+    if result_path is None:
+        return result
+
+    output = json.loads(json.dumps(data))
+    target = output
+    fields = result_path[2:].split(".")
+    for field in fields[:-1]:
+        target = target.setdefault(field, {})
+    target[fields[-1]] = result
+
+    return output
@@ -0,0 +1,828 @@
+"""Runs a synthetic RSQL workflow end to end on the in process fake of fake_aws.py"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import shlex
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "lambdas", "lambda-layer", "python"),
+    os.path.join(ROOT_DIR, "instance_code"),
+    os.path.join(ROOT_DIR, "infra"),
+    os.path.dirname(os.path.abspath(__file__)),
+]
+
+import aws_clients  # noqa: E402  lambda layer copy
+from admission_control import AdmissionController, WlmCapacityExceeded  # noqa: E402
+import framework.aws_clients  # noqa: E402  instance copy
+from cdk import state_logic  # noqa: E402
+from fake_aws import FakeAws  # noqa: E402
+from intrinsic_functions import run_pass  # noqa: E402
+
+REGION = "us-east-1"
+CONFIG_TBL = "rsql-blog-rsql-config-table"
+WORKFLOW_AUDIT_TBL = "rsql-blog-rsql-workflow-audit-table"
+JOB_AUDIT_TBL = "rsql-blog-rsql-job-audit-table"
+JOB_STATS_TBL = "rsql-blog-rsql-job-stats-table"
+FLEET_TBL = "rsql-blog-rsql-fleet-table"
+LOG_GROUP = "/ops/rsql-logs/"
+STAGE_PAYLOAD_BUCKET = "rsql-blog-stage-payloads-000000000000-us-east-1"
+AGENT_QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/000000000000/rsql-blog-rsql-agent-queue"
+DISPATCH_QUEUE_URL = "https://sqs.us-east-1.amazonaws.com/000000000000/rsql-blog-rsql-dispatch-queue"
+
+# the parallel map task of the state machine runs 40 iterations at a time
+MAP_MAX_CONCURRENCY = 40
+# SQS batch size of the rsql dispatch queue event source
+BATCH_DISPATCH_SIZE = 40
+
+
+class Timer:
+    """Sums the time spent in the framework code per side"""
+
+    def __init__(self) -> None:
+        self.seconds = defaultdict(float)
+
+    def run(self, side: str, function, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            self.seconds[side] += time.perf_counter() - start
+
+
+def load_lambda(name: str):
+    path = os.path.join(ROOT_DIR, "lambdas", name, "lambda_function.py")
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_workflow(
+    fake: FakeAws,
+    workflow_id: str,
+    scripts: int,
+    stage_size: int,
+    execution_type: str,
+    concurrency_control: str,
+) -> None:
+
+    fake.create_table(CONFIG_TBL, "workflow_id")
+    fake.create_table(WORKFLOW_AUDIT_TBL, "workflow_execution_id", "workflow_id")
+    fake.create_table(JOB_AUDIT_TBL, "job_name", "workflow_execution_id")
+    fake.create_table(JOB_STATS_TBL, "job_name")
+
+    script_names = [f"rsql_bench_script_{i}.sh" for i in range(scripts)]
+    workflow_stages = [
+        {
+            "execution_type": execution_type,
+            "execution_flag": "y",
+            "scripts": script_names[i : i + stage_size],
+            "concurrency_control": concurrency_control,
+            "timeout_seconds": 3600,
+        }
+        for i in range(0, scripts, stage_size)
+    ]
+
+    aws_clients.get_resource("dynamodb").Table(CONFIG_TBL).put_item(
+        Item={"workflow_id": workflow_id, "workflow_stages": workflow_stages}
+    )
+
+
+def seed_job_statistics(scripts: int) -> None:
+
+    # half of the scripts have the history of short runs, they run in express executions
+    job_stats_tbl = aws_clients.get_resource("dynamodb").Table(JOB_STATS_TBL)
+    for i in range(0, scripts, 2):
+        job_stats_tbl.put_item(
+            Item={
+                "job_name": f"rsql_bench_script_{i}.sh",
+                "p50_duration": Decimal("5"),
+                "p95_duration": Decimal("12"),
+            }
+        )
+
+
+class Instance:
+    """Plays the EC2 instance : runs the commands sent through SSM or queued for the agent"""
+
+    def __init__(self, fake: FakeAws, timer: Timer, log_dir: str) -> None:
+        from framework.audit_operations import add_record_in_file_audit_tbl
+        from framework.job_phases import parse_phase_marks
+        from framework.worker_fleet import release_slot
+        from rsql_sequence import create_job_audit_details, parse_args, run_sequence
+        from send_sfn_token import send_token
+
+        self.fake = fake
+        self.timer = timer
+        self.log_dir = log_dir
+        self.send_token = send_token
+        self.parse_phase_marks = parse_phase_marks
+        self.release_slot = release_slot
+        self.add_audit_record = add_record_in_file_audit_tbl
+        self.create_job_audit_details = create_job_audit_details
+        self.parse_sequence_args = parse_args
+        self.run_sequence = run_sequence
+        self.pending_jobs = []
+        fake.on_send_command = self.receive_commands
+
+    def receive_commands(self, instance_ids: list, commands: list) -> None:
+        for command in commands:
+            tokens = shlex.split(command)
+            nohup = tokens.index("nohup")
+            env = dict(token.split("=", 1) for token in tokens[:nohup])
+            if tokens[nohup + 2].endswith("rsql_sequence.py"):
+                self.receive_sequence(tokens[nohup + 3 : tokens.index(">")], env)
+                continue
+            # nohup sh +x rsql_trigger.sh <11 arguments>
+            args = tokens[nohup + 4 : nohup + 15]
+            self.pending_jobs.append(
+                {
+                    "token": args[0],
+                    "workflow_execution_id": args[2],
+                    "script": os.path.basename(args[3]),
+                    "log_file": os.path.join(self.log_dir, os.path.basename(args[6])),
+                    "job_audit_table": args[7],
+                    "log_group": args[8],
+                    "job_stats_table": env.get("RSQL_JOB_STATS_TABLE"),
+                    "instance_id": args[4],
+                    "fleet_table": env.get("RSQL_FLEET_TABLE"),
+                    "expected_runtime": env.get("RSQL_EXPECTED_RUNTIME"),
+                    "phase_marks": self.parse_phase_marks(
+                        env.get("RSQL_PHASE_MARKS", "")
+                    ),
+                }
+            )
+
+    def receive_sequence(self, argv: list, env: dict) -> None:
+        # the jobs rsql_sequence.py runs with rsql_trigger.sh, in the format of the agent jobs
+        args = self.parse_sequence_args(argv)
+        jobs = [
+            {
+                "token": "NA",
+                "workflow_id": args.workflow_id,
+                "workflow_execution_id": args.workflow_execution_id,
+                "script": script,
+                "log_file": os.path.join(self.log_dir, f"{script}.log"),
+                "job_audit_table": args.audit_table,
+                "log_group": args.log_group,
+                "job_stats_table": env.get("RSQL_JOB_STATS_TABLE"),
+                "phase_marks": self.parse_phase_marks(env.get("RSQL_PHASE_MARKS", ""))
+                if position == 0
+                else {},
+            }
+            for position, script in enumerate(args.scripts)
+        ]
+        self.pending_jobs.append(
+            {
+                "token": args.token,
+                "instance_id": args.instance_id,
+                "fleet_table": env.get("RSQL_FLEET_TABLE"),
+                "expected_runtime": env.get("RSQL_EXPECTED_RUNTIME"),
+                "jobs": jobs,
+            }
+        )
+
+    def receive_agent_jobs(self) -> None:
+        for message in self.fake.queues.pop(AGENT_QUEUE_URL, []):
+            job = json.loads(message["Body"])
+            for sub_job in job.get("jobs", [job]):
+                sub_job["log_file"] = os.path.join(
+                    self.log_dir, os.path.basename(sub_job["log_file"])
+                )
+            self.pending_jobs.append(job)
+
+    def run_sequence_job(self, sequence_job: dict) -> None:
+        def run_script(position: int, job_name: str):
+            job = sequence_job["jobs"][position]
+            self.timer.run(
+                "instance",
+                self.add_audit_record,
+                self.create_job_audit_details(
+                    job_name,
+                    job["workflow_id"],
+                    job["workflow_execution_id"],
+                    sequence_job["instance_id"],
+                ),
+                job["job_audit_table"],
+                REGION,
+            )
+            self.run_job(job)
+            return 0, job["log_file"]
+
+        self.run_sequence(
+            sequence_job["token"],
+            [job["script"] for job in sequence_job["jobs"]],
+            run_script,
+            framework.aws_clients.get_client("stepfunctions", REGION),
+        )
+
+        # rsql_sequence.py gives back the slot of the whole sequence
+        if sequence_job.get("fleet_table") and sequence_job.get("expected_runtime"):
+            self.release_slot(
+                sequence_job["fleet_table"],
+                sequence_job["instance_id"],
+                sequence_job["expected_runtime"],
+                REGION,
+            )
+
+    def run_job(self, job: dict) -> None:
+        job_start_epoch = time.time()
+        phase_marks = dict(job.get("phase_marks", {}))
+        phase_marks["trigger_start"] = phase_marks["rsql_start"] = int(
+            job_start_epoch * 1000
+        )
+        with open(job["log_file"], "w") as f:
+            f.write(time.strftime("%a %b %d %H:%M:%S UTC %Y", time.gmtime()) + "\n")
+            f.write(f"{job['script']} job started\n1\n")
+            f.write("**** Statement Executed Successfully ****\n")
+        phase_marks["rsql_end"] = int(time.time() * 1000)
+
+        self.timer.run(
+            "instance",
+            self.send_token,
+            job["token"],
+            job["script"],
+            "0",
+            job["log_file"],
+            job["workflow_execution_id"],
+            job["job_audit_table"],
+            job["log_group"],
+            REGION,
+            job_stats_tbl=job.get("job_stats_table"),
+            job_start_epoch=job_start_epoch,
+            phase_marks=phase_marks,
+        )
+
+        # rsql_trigger.sh exports these for send_sfn_token.py, which reads them from its environment
+        if job.get("fleet_table") and job.get("expected_runtime"):
+            self.timer.run(
+                "instance",
+                self.release_slot,
+                job["fleet_table"],
+                job["instance_id"],
+                job["expected_runtime"],
+                REGION,
+            )
+
+    def run_pending_jobs(self, executor: ThreadPoolExecutor) -> None:
+        self.receive_agent_jobs()
+        jobs, self.pending_jobs = self.pending_jobs, []
+        list(
+            executor.map(
+                lambda job: self.run_sequence_job(job) if "jobs" in job else self.run_job(job),
+                jobs,
+            )
+        )
+
+
+class InstanceWlmSource:
+    """WLM state of the admission controller, the dispatched scripts waiting on the instance run"""
+
+    def __init__(self, instance: Instance, slots: int) -> None:
+        self.instance = instance
+        self.slots = slots
+
+    def get_wlm_state(self) -> dict:
+        running = len(self.instance.pending_jobs) + len(
+            self.instance.fake.queues.get(AGENT_QUEUE_URL, [])
+        )
+        return {"slots": self.slots, "running": running, "queued": 0}
+
+
+def poll_job_status(script: str, workflow_execution_id: str, dispatch_stats: Counter) -> dict:
+
+    # the scripts of the benchmark end before the first poll of the express execution
+    response = aws_clients.get_client("dynamodb").get_item(
+        TableName=JOB_AUDIT_TBL,
+        Key={
+            "job_name": {"S": script},
+            "workflow_execution_id": {"S": workflow_execution_id},
+        },
+        ConsistentRead=True,
+    )
+    dispatch_stats["express_polls"] += 1
+
+    status = response["Item"]["execution_status"]["S"]
+    return {"job_name": script, "status": "completed" if status == "successful" else status}
+
+
+def run_parallel_stage(
+    lambdas: dict,
+    instance: Instance,
+    fake: FakeAws,
+    timer: Timer,
+    executor: ThreadPoolExecutor,
+    stage_payload: dict,
+    batch_dispatch: bool,
+    express_workflows: bool,
+    dispatch_stats: Counter,
+) -> dict:
+
+    if "parallel_items" in stage_payload:
+        # the distributed map task reads the items written by the payload generator
+        parallel_items = stage_payload["parallel_items"]
+        parallel_details = json.loads(
+            fake.objects[(parallel_items["bucket"], parallel_items["key"])]
+        )
+        dispatch_stats["distributed_stages"] += 1
+    else:
+        parallel_details = stage_payload["parallel_details"]
+
+    # the payload generator marks the scripts short enough for an express child
+    express_completion = {"token": "NA", "poll_completion": True}
+    map_items = [
+        {
+            **item,
+            "token": str(uuid.uuid4()),
+            **(express_completion if express_workflows and item["express"] else {}),
+            "state_entered_time": datetime.now(timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.%f"
+            )[:-3]
+            + "Z",
+        }
+        for item in parallel_details
+    ]
+
+    def invoke(item: dict) -> dict:
+        try:
+            timer.run("lambda", lambdas["invoke"].lambda_handler, item, None)
+        except WlmCapacityExceeded:
+            # retried by the map iteration, here once the admitted scripts ran
+            return item
+
+    pending_items = map_items
+    receive_count = 0
+    while pending_items:
+        receive_count += 1
+        if batch_dispatch:
+            # the map task sends a message per script, SQS delivers them in batches
+            held_back_items = []
+            for i in range(0, len(pending_items), BATCH_DISPATCH_SIZE):
+                messages = {
+                    str(uuid.uuid4()): item
+                    for item in pending_items[i : i + BATCH_DISPATCH_SIZE]
+                }
+                event = {
+                    "Records": [
+                        {
+                            "messageId": message_id,
+                            "receiptHandle": message_id,
+                            "body": json.dumps(item),
+                            "attributes": {"ApproximateReceiveCount": str(receive_count)},
+                        }
+                        for message_id, item in messages.items()
+                    ]
+                }
+                response = timer.run("lambda", lambdas["invoke"].lambda_handler, event, None)
+                held_back_items.extend(
+                    messages[failure["itemIdentifier"]]
+                    for failure in response["batchItemFailures"]
+                )
+        else:
+            held_back_items = [item for item in executor.map(invoke, pending_items) if item]
+
+        dispatch_stats["held_back"] += len(held_back_items)
+        instance.run_pending_jobs(executor)
+        pending_items = held_back_items
+
+    # the load check is a Pass state of the parallel state machine
+    parallel_output = [
+        poll_job_status(item["script"], item["workflow_execution_id"], dispatch_stats)
+        if item["token"] == "NA"
+        else fake.task_results[item["token"]][1]
+        for item in map_items
+    ]
+    if "parallel_items" in stage_payload:
+        # the batches of the distributed map task only give back their failed scripts
+        batch_size = stage_payload["parallel_items"]["batch_size"]
+        check = {
+            "parallel_check": run_pass(
+                state_logic.DISTRIBUTED_LOAD_CHECK,
+                [
+                    run_pass(
+                        state_logic.DISTRIBUTED_BATCH_FAILURES,
+                        parallel_output[i : i + batch_size],
+                    )
+                    for i in range(0, len(parallel_output), batch_size)
+                ],
+            )
+        }
+    else:
+        check = run_pass(
+            state_logic.PARALLEL_LOAD_CHECK,
+            {"parallel_output": parallel_output},
+            "$.parallel_check",
+        )
+    check = run_pass(
+        state_logic.PARALLEL_LOAD_FAILURES, check, "$.parallel_check.failures"
+    )
+    succeeded = check["parallel_check"]["failures"]["count"] <= stage_payload.get(
+        "tolerated_failures", 0
+    )
+    return {"parallel_load_status": "successful" if succeeded else "failed"}
+
+
+def run_adaptive_stage(
+    lambdas: dict,
+    instance: Instance,
+    timer: Timer,
+    executor: ThreadPoolExecutor,
+    stage_payload: dict,
+    dispatch_stats: Counter,
+) -> dict:
+
+    # the scheduler loop of the parallel state machine, a pass per poll interval
+    state = stage_payload["adaptive_dispatch"]
+    while True:
+        state = timer.run("lambda", lambdas["dag-scheduler"].lambda_handler, state, None)
+        dispatch_stats["scheduler_passes"] += 1
+        dispatch_stats["held_back"] += state["concurrency"]["throttles"]
+        dispatch_stats["max_window"] = max(
+            dispatch_stats["max_window"], state["concurrency"]["window"]
+        )
+        if state["dag_status"] != "running":
+            break
+        instance.run_pending_jobs(executor)
+
+    return {"parallel_load_status": state["dag_status"]}
+
+
+def run_sequential_stage(
+    lambdas: dict,
+    instance: Instance,
+    fake: FakeAws,
+    timer: Timer,
+    executor: ThreadPoolExecutor,
+    current_stage: dict,
+    sequential_runner: bool,
+    express_workflows: bool,
+    dispatch_stats: Counter,
+) -> dict:
+
+    workflow_id = current_stage["workflow_id"]
+    workflow_execution_id = current_stage["workflow_execution_id"]
+
+    # the input of the stage, with the express flags and the timeouts of its scripts
+    stage_payload = timer.run(
+        "lambda",
+        lambdas["payload-generator"].lambda_handler,
+        {
+            "execution_mode": "sequential",
+            "workflow_id": workflow_id,
+            "workflow_execution_id": workflow_execution_id,
+            "execution_details": current_stage["execution_details"],
+        },
+        None,
+    )
+
+    if sequential_runner:
+        # a single task of the master state machine hands the stage to the instance
+        token = str(uuid.uuid4())
+        item = {
+            "token": token,
+            "workflow_id": workflow_id,
+            "workflow_execution_id": workflow_execution_id,
+            "scripts": stage_payload["sequential"],
+            "script_timeouts": stage_payload["sequential_timeouts"],
+        }
+        timer.run("lambda", lambdas["invoke"].lambda_handler, item, None)
+        dispatch_stats["sequential_state_transitions"] += 1
+        instance.run_pending_jobs(executor)
+        succeeded = fake.task_results[token][0] == "success"
+        return {"parallel_load_status": "successful" if succeeded else "failed"}
+
+    # the child sequential state machine
+    state = {
+        "sequential": stage_payload["sequential"],
+        "sequential_express": stage_payload["sequential_express"],
+        "sequential_timeouts": stage_payload["sequential_timeouts"],
+        "workflow_id": workflow_id,
+        "workflow_execution_id": workflow_execution_id,
+        "index": -1,
+    }
+    while True:
+        state = run_pass(state_logic.SEQUENTIAL_ITERATOR, state)
+        dispatch_stats["sequential_state_transitions"] += 2
+        if state["index"] >= state["count"]:
+            break
+
+        state = run_pass(state_logic.SEQUENTIAL_SCRIPT, state)
+        dispatch_stats["sequential_state_transitions"] += 1
+        token = str(uuid.uuid4())
+        execution_details = dict(state["execution_details"])
+        express = execution_details.pop("express")
+        item = {"token": token, **execution_details}
+        if express_workflows:
+            # the choice between the express and the standard invoke task
+            dispatch_stats["sequential_state_transitions"] += 1
+            if express:
+                item.update({"token": "NA", "poll_completion": True})
+        timer.run("lambda", lambdas["invoke"].lambda_handler, item, None)
+        dispatch_stats["sequential_state_transitions"] += 1
+        instance.run_pending_jobs(executor)
+
+        if item["token"] == "NA":
+            result = poll_job_status(
+                item["script"], item["workflow_execution_id"], dispatch_stats
+            )
+            succeeded = result["status"] == "completed"
+        else:
+            succeeded = fake.task_results[token][0] == "success"
+        if not succeeded:
+            return {"parallel_load_status": "failed"}
+
+    return {"parallel_load_status": "successful"}
+
+
+def run_workflow(args: argparse.Namespace) -> dict:
+
+    fake = FakeAws(args.api_latency_ms)
+    aws_clients.set_backend(fake)
+    framework.aws_clients.set_backend(fake)
+
+    workflow_id = "rsql_bench_workflow"
+    workflow_execution_id = f"{workflow_id}-{uuid.uuid4()}"
+    create_workflow(
+        fake,
+        workflow_id,
+        args.scripts,
+        args.stage_size,
+        args.execution_type,
+        "adaptive" if args.adaptive_concurrency else "fixed",
+    )
+    if args.fleet_size:
+        from framework.worker_fleet import register_instance
+
+        fake.create_table(FLEET_TBL, "instance_id")
+        for i in range(args.fleet_size):
+            register_instance(FLEET_TBL, f"i-bench{i:012d}", args.fleet_slots, REGION)
+    if args.express_workflows:
+        seed_job_statistics(args.scripts)
+    setup_calls = fake.api_call_count()
+
+    os.environ.update(
+        {
+            "AWS_REGION": REGION,
+            "config_table": CONFIG_TBL,
+            "workflow_audit_table": WORKFLOW_AUDIT_TBL,
+            "job_audit_table": JOB_AUDIT_TBL,
+            "job_stats_table": JOB_STATS_TBL,
+            "rsql_master_step_function": f"arn:aws:states:{REGION}:000000000000:stateMachine:rsql-master",
+            "secret_id": "rsql-bench-secret",
+            "rsql_path": "/home/ec2-user/blog_test/rsql_scripts/",
+            "log_path": "/home/ec2-user/blog_test/logs/",
+            "instance_id": "i-0123456789abcdef0",
+            "rsql_log_group": LOG_GROUP,
+            "rsql_trigger": "/home/ec2-user/blog_test/instance_code/rsql_trigger.sh",
+            "dispatch_mode": args.dispatch_mode,
+            "agent_queue_url": AGENT_QUEUE_URL,
+            "dispatch_queue_url": DISPATCH_QUEUE_URL,
+            "fleet_table": FLEET_TBL if args.fleet_size else "",
+            "placement_policy": args.placement_policy,
+            "rsql_invoke_function": "rsql-blog-rsql-invoke-lambda",
+            "stage_payload_bucket": STAGE_PAYLOAD_BUCKET,
+            "large_stage_threshold": str(args.large_stage_threshold),
+            "express_max_runtime_seconds": "60" if args.express_workflows else "0",
+        }
+    )
+
+    lambdas = {
+        name: load_lambda(f"blog-{name}")
+        for name in [
+            "rsql-config-parser",
+            "payload-generator",
+            "rsql-invoke",
+            "update-audit-ddb-table",
+            "dag-scheduler",
+        ]
+    }
+    lambdas["invoke"] = lambdas["rsql-invoke"]
+    # the dag scheduler starts the scripts through the rsql invoke lambda
+    fake.register_function(
+        os.environ["rsql_invoke_function"], lambdas["invoke"].lambda_handler
+    )
+
+    timer = Timer()
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as log_dir, ThreadPoolExecutor(
+        MAP_MAX_CONCURRENCY
+    ) as executor:
+        instance = Instance(fake, timer, log_dir)
+        dispatch_stats = Counter()
+        if args.wlm_slots:
+            # the scripts dispatched and not run yet hold the WLM slots of the cluster
+            admission_controller = AdmissionController(
+                InstanceWlmSource(instance, args.wlm_slots), state_ttl=0
+            )
+            lambdas["invoke"].admission_controller = admission_controller
+            lambdas["dag-scheduler"].admission_controller = admission_controller
+
+        timer.run(
+            "lambda",
+            lambdas["rsql-config-parser"].lambda_handler,
+            {"workflow_id": workflow_id, "workflow_execution_id": workflow_execution_id},
+            None,
+        )
+        state = next(iter(fake.executions.values()))
+
+        workflow_status = "successful"
+        while state["index"] < state["count"]:
+            # the master state machine keeps its input, the iterator result is stored aside
+            current_stage = run_pass(
+                state_logic.MASTER_STAGE_SELECTOR, state, "$.current_stage_details"
+            )
+            current_stage = run_pass(
+                state_logic.MASTER_ITERATOR, current_stage, "$.current_stage_details"
+            )["current_stage_details"]["Payload"]
+            state = {**state, "index": current_stage["index"]}
+            if current_stage["execution_details"]["execution_mode"] == "sequential":
+                check = run_sequential_stage(
+                    lambdas,
+                    instance,
+                    fake,
+                    timer,
+                    executor,
+                    current_stage,
+                    args.sequential_runner,
+                    args.express_workflows,
+                    dispatch_stats,
+                )
+                if check["parallel_load_status"] != "successful":
+                    workflow_status = "failed"
+                    break
+                continue
+
+            stage_payload = timer.run(
+                "lambda",
+                lambdas["payload-generator"].lambda_handler,
+                {
+                    "execution_mode": current_stage["execution_details"]["execution_mode"],
+                    "workflow_id": workflow_id,
+                    "workflow_execution_id": workflow_execution_id,
+                    "execution_details": current_stage["execution_details"],
+                },
+                None,
+            )
+            if "adaptive_dispatch" in stage_payload:
+                check = run_adaptive_stage(
+                    lambdas, instance, timer, executor, stage_payload, dispatch_stats
+                )
+            else:
+                check = run_parallel_stage(
+                    lambdas,
+                    instance,
+                    fake,
+                    timer,
+                    executor,
+                    stage_payload,
+                    args.batch_dispatch,
+                    args.express_workflows,
+                    dispatch_stats,
+                )
+            if check["parallel_load_status"] != "successful":
+                workflow_status = "failed"
+                break
+
+        timer.run(
+            "lambda",
+            lambdas["update-audit-ddb-table"].lambda_handler,
+            {
+                "workflow_id": workflow_id,
+                "workflow_execution_id": workflow_execution_id,
+                "status": workflow_status,
+            },
+            None,
+        )
+
+    elapsed = time.perf_counter() - start
+
+    job_audit_records = [
+        record
+        for record in fake.scan_table(JOB_AUDIT_TBL)
+        if record["workflow_execution_id"] == workflow_execution_id
+    ]
+    successful_jobs = sum(
+        record["execution_status"] == "successful" for record in job_audit_records
+    )
+    jobs_per_instance = Counter(record["instance_id"] for record in job_audit_records)
+
+    aws_clients.set_backend(None)
+    framework.aws_clients.set_backend(None)
+
+    return {
+        "scripts": args.scripts,
+        "successful_jobs": successful_jobs,
+        "workflow_status": workflow_status,
+        "held_back_dispatches": dispatch_stats["held_back"],
+        "scheduler_passes": dispatch_stats["scheduler_passes"],
+        "distributed_stages": dispatch_stats["distributed_stages"],
+        "sequential_state_transitions": dispatch_stats["sequential_state_transitions"],
+        "express_polls": dispatch_stats["express_polls"],
+        "max_concurrency_window": dispatch_stats["max_window"],
+        "instances_used": len(jobs_per_instance),
+        "max_jobs_per_instance": max(jobs_per_instance.values(), default=0),
+        "end_to_end_seconds": round(elapsed, 3),
+        "lambda_ms_per_job": round(1000 * timer.seconds["lambda"] / args.scripts, 3),
+        "instance_ms_per_job": round(1000 * timer.seconds["instance"] / args.scripts, 3),
+        "api_calls": fake.api_call_count() - setup_calls,
+        "api_calls_per_job": round((fake.api_call_count() - setup_calls) / args.scripts, 2),
+        "api_calls_by_operation": {
+            f"{service}.{operation}": count
+            for (service, operation), count in sorted(fake.calls.items())
+        },
+    }
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scripts", type=int, default=500)
+    parser.add_argument("--stage-size", type=int, default=50)
+    parser.add_argument(
+        "--api-latency-ms", type=float, default=0, help="latency added to every fake API call"
+    )
+    parser.add_argument(
+        "--batch-dispatch",
+        action="store_true",
+        help="deliver the parallel stages to the invoke lambda in SQS batches",
+    )
+    parser.add_argument("--dispatch-mode", choices=["ssm", "agent"], default="ssm")
+    parser.add_argument(
+        "--fleet-size",
+        type=int,
+        default=0,
+        help="place the SSM jobs on a registered fleet of this many instances",
+    )
+    parser.add_argument("--fleet-slots", type=int, default=8, help="slots per fleet instance")
+    parser.add_argument(
+        "--placement-policy", choices=["least_loaded", "bin_packing"], default="least_loaded"
+    )
+    parser.add_argument(
+        "--wlm-slots",
+        type=int,
+        default=0,
+        help="admit the parallel scripts against a simulated WLM with this many slots",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        help="run the parallel stages through the dag scheduler with an adaptive window",
+    )
+    parser.add_argument(
+        "--large-stage-threshold",
+        type=int,
+        default=500,
+        help="stages with more scripts go through S3 and the distributed map task",
+    )
+    parser.add_argument(
+        "--execution-type", choices=["parallel", "sequential"], default="parallel"
+    )
+    parser.add_argument(
+        "--sequential-runner",
+        action="store_true",
+        help="hand every sequential stage to the instance in one dispatch",
+    )
+    parser.add_argument(
+        "--express-workflows",
+        action="store_true",
+        help="run the short scripts in express child executions polling the job audit table",
+    )
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--verbose", action="store_true", help="keep the output of the framework code"
+    )
+    args = parser.parse_args()
+
+    if args.verbose:
+        report = run_workflow(args)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report = run_workflow(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    for name, value in report.items():
+        if name != "api_calls_by_operation":
+            print(f"{name:<28}{value}")
+    print("api calls by operation")
+    for operation, count in report["api_calls_by_operation"].items():
+        print(f"    {operation:<40}{count}")
+
+
+if __name__ == "__main__":
+    main()
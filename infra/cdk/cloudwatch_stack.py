@@ -2,9 +2,11 @@
 # SPDX-License-Identifier: MIT-0
 
 from aws_cdk import Stack
+from aws_cdk import aws_cloudwatch as cloudwatch
 from aws_cdk import aws_logs as logs
+from aws_cdk import aws_s3 as s3
 from aws_cdk import aws_ssm as ssm
-from aws_cdk import RemovalPolicy
+from aws_cdk import Duration, RemovalPolicy
 from constructs import Construct
 
 
@@ -17,7 +19,9 @@ class CloudWatchStack(Stack):
         log_group = "/ops/rsql-logs/"
 
         self._create_log_group(log_group)
-        self._create_ssm_parameters(log_group)
+        log_archive_bucket = self._create_log_archive_bucket()
+        self._create_ssm_parameters(log_group, log_archive_bucket)
+        self._create_dashboard()
 
     def _create_log_group(self, log_group: str) -> None:
 
@@ -30,7 +34,128 @@ class CloudWatchStack(Stack):
         )
 
 
-    def _create_ssm_parameters(self, log_group) -> None:
+    def _create_log_archive_bucket(self) -> s3.IBucket:
+
+        # compressed rsql logs offloaded from the EC2 instance, see framework/log_archive.py
+        log_archive_bucket: s3.Bucket = s3.Bucket(
+            self,
+            "rsql_log_archive_bucket",
+            bucket_name=f"rsql-blog-log-archive-{self.account}-{self.region}",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            lifecycle_rules=[
+                s3.LifecycleRule(
+                    transitions=[
+                        s3.Transition(
+                            storage_class=s3.StorageClass.INFREQUENT_ACCESS,
+                            transition_after=Duration.days(30),
+                        )
+                    ]
+                )
+            ],
+            removal_policy=RemovalPolicy.RETAIN,
+        )
+
+        return log_archive_bucket
+
+    def _create_dashboard(self) -> None:
+
+        # metrics emitted in Embedded Metric Format by the lambdas and send_sfn_token.py
+        namespace = "RSQLOrchestration"
+        period = Duration.minutes(1)
+
+        def total(metric_name: str, statistic: str) -> cloudwatch.Metric:
+            return cloudwatch.Metric(
+                namespace=namespace,
+                metric_name=metric_name,
+                statistic=statistic,
+                period=period,
+                label=f"{metric_name} {statistic}",
+            )
+
+        def per_workflow(metric_name: str, statistic: str) -> cloudwatch.MathExpression:
+            return cloudwatch.MathExpression(
+                expression=f"SEARCH('{{{namespace},workflow_id}} MetricName=\"{metric_name}\"', '{statistic}', 60)",
+                using_metrics={},
+                label=metric_name,
+                period=period,
+            )
+
+        dashboard: cloudwatch.Dashboard = cloudwatch.Dashboard(
+            self, "rsql_orchestration_dashboard", dashboard_name="rsql-orchestration"
+        )
+
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Jobs",
+                left=[
+                    total("JobsStarted", "Sum"),
+                    total("JobsCompleted", "Sum"),
+                    total("JobsFailed", "Sum"),
+                    total("JobsTimedOut", "Sum"),
+                ],
+                width=12,
+            ),
+            cloudwatch.GraphWidget(
+                title="Workflows",
+                left=[total("WorkflowsCompleted", "Sum"), total("WorkflowsFailed", "Sum")],
+                width=12,
+            ),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Jobs completed per workflow",
+                left=[per_workflow("JobsCompleted", "Sum")],
+                width=12,
+            ),
+            cloudwatch.GraphWidget(
+                title="Jobs failed per workflow",
+                left=[per_workflow("JobsFailed", "Sum")],
+                width=12,
+            ),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Queue wait (ms)",
+                left=[total("QueueWait", "p50"), total("QueueWait", "p99")],
+                width=8,
+            ),
+            cloudwatch.GraphWidget(
+                title="Runtime (ms)",
+                left=[total("Runtime", "p50"), total("Runtime", "p99")],
+                width=8,
+            ),
+            cloudwatch.GraphWidget(
+                title="Audit write latency (ms)",
+                left=[
+                    total("AuditWriteLatency", "p50"),
+                    total("AuditWriteLatency", "p99"),
+                ],
+                width=8,
+            ),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Log shipped bytes",
+                left=[total("LogShipBytes", "Sum")],
+                width=12,
+            ),
+            cloudwatch.GraphWidget(
+                title="Runtime per workflow (ms)",
+                left=[per_workflow("Runtime", "Average")],
+                width=12,
+            ),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Concurrency window per workflow",
+                left=[per_workflow("ConcurrencyWindow", "Average")],
+                width=12,
+            ),
+        )
+
+    def _create_ssm_parameters(self, log_group, log_archive_bucket: s3.IBucket) -> None:
 
         log_group_ssm_param: ssm.StringListParameter = ssm.StringParameter(
             self,
@@ -41,3 +166,13 @@ class CloudWatchStack(Stack):
             string_value=log_group,
             tier=ssm.ParameterTier.ADVANCED,
         )
+
+        log_archive_bucket_ssm_param: ssm.StringParameter = ssm.StringParameter(
+            self,
+            "LogArchiveBucketParameter",
+            parameter_name="/blog/rsql/LogArchiveBucketParameter",
+            allowed_pattern=".*",
+            description="RSQL Log Archive Bucket",
+            string_value=log_archive_bucket.bucket_name,
+            tier=ssm.ParameterTier.ADVANCED,
+        )
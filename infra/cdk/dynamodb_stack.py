@@ -14,10 +14,23 @@ class DynamodbStack(Stack):
         config_tbl = "rsql-blog-rsql-config-table"
         workflow_audit_tbl = "rsql-blog-rsql-workflow-audit-table"
         job_audit_tbl = "rsql-blog-rsql-job-audit-table"
+        job_stats_tbl = "rsql-blog-rsql-job-stats-table"
+        fleet_tbl = "rsql-blog-rsql-fleet-table"
+        admission_tbl = "rsql-blog-rsql-admission-table"
 
         self._create_config_table(config_tbl)
         self._create_audit_tables(workflow_audit_tbl, job_audit_tbl)
-        self._create_ssm_parameters(config_tbl, workflow_audit_tbl, job_audit_tbl)
+        self._create_job_stats_table(job_stats_tbl)
+        self._create_fleet_table(fleet_tbl)
+        self._create_admission_table(admission_tbl)
+        self._create_ssm_parameters(
+            config_tbl,
+            workflow_audit_tbl,
+            job_audit_tbl,
+            job_stats_tbl,
+            fleet_tbl,
+            admission_tbl,
+        )
 
     def _create_config_table(self, config_tbl: str) -> None:
 
@@ -61,8 +74,53 @@ class DynamodbStack(Stack):
             billing_mode=dynamodb.BillingMode.PROVISIONED,
         )
 
+    def _create_job_stats_table(self, job_stats_tbl: str) -> None:
+
+        rsql_job_stats_table: dynamodb.Table = dynamodb.Table(
+            self,
+            "rsql_job_stats_table",
+            table_name=job_stats_tbl,
+            partition_key=dynamodb.Attribute(
+                name="job_name", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PROVISIONED,
+        )
+
+    def _create_fleet_table(self, fleet_tbl: str) -> None:
+
+        # worker instances and their slots, see lambdas/lambda-layer/python/worker_fleet.py
+        rsql_fleet_table: dynamodb.Table = dynamodb.Table(
+            self,
+            "rsql_fleet_table",
+            table_name=fleet_tbl,
+            partition_key=dynamodb.Attribute(
+                name="instance_id", type=dynamodb.AttributeType.STRING
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        )
+
+    def _create_admission_table(self, admission_tbl: str) -> None:
+
+        # scripts admitted per WLM state window by all the lambda containers
+        rsql_admission_table: dynamodb.Table = dynamodb.Table(
+            self,
+            "rsql_admission_table",
+            table_name=admission_tbl,
+            partition_key=dynamodb.Attribute(
+                name="admission_window", type=dynamodb.AttributeType.NUMBER
+            ),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at",
+        )
+
     def _create_ssm_parameters(
-        self, config_tbl, workflow_audit_tbl, job_audit_tbl
+        self,
+        config_tbl,
+        workflow_audit_tbl,
+        job_audit_tbl,
+        job_stats_tbl,
+        fleet_tbl,
+        admission_tbl,
     ) -> None:
 
         config_tbl_ssm_param: ssm.StringListParameter = ssm.StringParameter(
@@ -94,3 +152,33 @@ class DynamodbStack(Stack):
             string_value=job_audit_tbl,
             tier=ssm.ParameterTier.ADVANCED,
         )
+
+        job_stats_tbl_ssm_param: ssm.StringListParameter = ssm.StringParameter(
+            self,
+            "JobStatsTableParameter",
+            parameter_name="/blog/rsql/JobStatsTableParameter",
+            allowed_pattern=".*",
+            description="RSQL DDB Job Statistics Table",
+            string_value=job_stats_tbl,
+            tier=ssm.ParameterTier.ADVANCED,
+        )
+
+        fleet_tbl_ssm_param: ssm.StringParameter = ssm.StringParameter(
+            self,
+            "FleetTableParameter",
+            parameter_name="/blog/rsql/FleetTableParameter",
+            allowed_pattern=".*",
+            description="RSQL DDB Worker Fleet Table",
+            string_value=fleet_tbl,
+            tier=ssm.ParameterTier.ADVANCED,
+        )
+
+        admission_tbl_ssm_param: ssm.StringParameter = ssm.StringParameter(
+            self,
+            "AdmissionTableParameter",
+            parameter_name="/blog/rsql/AdmissionTableParameter",
+            allowed_pattern=".*",
+            description="RSQL DDB WLM Admission Table",
+            string_value=admission_tbl,
+            tier=ssm.ParameterTier.ADVANCED,
+        )
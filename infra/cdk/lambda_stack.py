@@ -3,9 +3,12 @@
 
 from typing import Any
 
-from aws_cdk import Duration, Stack
+from aws_cdk import CfnOutput, Duration, RemovalPolicy, Stack
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_lambda_event_sources as event_sources
+from aws_cdk import aws_s3 as s3
+from aws_cdk import aws_sqs as sqs
 from aws_cdk import aws_ssm as ssm
 from constructs import Construct
 
@@ -19,6 +22,16 @@ class LambdaStack(Stack):
         self.blog_rsql_invoke_lambda: _lambda.IFunction = (
             self._create_blog_rsql_invoke_function(self.lambda_layer)
         )
+        environment_params = self.node.try_get_context("environment")
+        if environment_params.get("dispatch_mode", "ssm") == "agent":
+            self.rsql_agent_queue: sqs.IQueue = self._create_rsql_agent_queue(
+                self.blog_rsql_invoke_lambda
+            )
+
+        # parallel stages reach the invoke lambda in batches through this queue
+        self.rsql_dispatch_queue: sqs.IQueue = self._create_rsql_dispatch_queue(
+            self.blog_rsql_invoke_lambda
+        )
         # self.blog_rsql_config_parser_lambda : _lambda.IFunction = self._create_blog_rsql_config_parser_function(lambda_layer)
         self.blog_update_ddb_function: _lambda.IFunction = (
             self._create_blog_update_audit_ddb_function(self.lambda_layer)
@@ -30,12 +43,97 @@ class LambdaStack(Stack):
         self.blog_parallel_load_check_lambda: _lambda.IFunction = (
             self._create_blog_parallel_load_check_function()
         )
+        # script lists of the large parallel stages, read by the distributed map task
+        self.stage_payload_bucket: s3.IBucket = self._create_stage_payload_bucket()
         self.blog_payload_generator_lambda: _lambda.IFunction = (
-            self._create_blog_payload_generator_function()
+            self._create_blog_payload_generator_function(
+                self.lambda_layer, self.stage_payload_bucket
+            )
         )
         self.blog_sequential_iterator_lambda: _lambda.IFunction = (
             self._create_blog_sequential_iterator_function()
         )
+        # terminates the running scripts of a parallel stage which failed fast
+        self.blog_rsql_cancel_lambda: _lambda.IFunction = (
+            self._create_blog_rsql_cancel_function(
+                self.lambda_layer, self.stage_payload_bucket
+            )
+        )
+        self.blog_dag_scheduler_lambda: _lambda.IFunction = (
+            self._create_blog_dag_scheduler_function(
+                self.lambda_layer,
+                self.blog_rsql_invoke_lambda,
+                self.blog_rsql_cancel_lambda,
+            )
+        )
+
+        if environment_params.get("admission_control", False):
+            admission_tbl = ssm.StringParameter.from_string_parameter_attributes(
+                self,
+                "AdmissionTableParameter",
+                parameter_name="/blog/rsql/AdmissionTableParameter",
+            ).string_value
+            for dispatching_lambda in [
+                self.blog_rsql_invoke_lambda,
+                self.blog_dag_scheduler_lambda,
+            ]:
+                self._add_admission_control(dispatching_lambda, admission_tbl)
+
+    def _add_admission_control(
+        self, dispatching_lambda: _lambda.Function, admission_tbl: str
+    ) -> None:
+
+        # the lambda reads the WLM queue state of the cluster before starting scripts
+        environment_params = self.node.try_get_context("environment")
+        cluster_id = environment_params["redshift_cluster_id"]
+        secret_name = environment_params["redshift_secret_id"]
+
+        for name, value in {
+            "admission_control": "true",
+            "admission_table": admission_tbl,
+            "redshift_cluster_id": cluster_id,
+            "redshift_database": environment_params.get("redshift_database", "dev"),
+            "redshift_secret_id": secret_name,
+            "wlm_target_concurrency": str(
+                environment_params.get("wlm_target_concurrency", 0)
+            ),
+            "wlm_max_queued": str(environment_params.get("wlm_max_queued", 0)),
+        }.items():
+            dispatching_lambda.add_environment(name, value)
+
+        if dispatching_lambda.role:
+            dispatching_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:redshift:{self.region}:{self.account}:cluster:{cluster_id}"
+                    ],
+                    actions=["redshift-data:ExecuteStatement"],
+                )
+            )
+            dispatching_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=["*"],
+                    actions=[
+                        "redshift-data:CancelStatement",
+                        "redshift-data:DescribeStatement",
+                        "redshift-data:GetStatementResult",
+                    ],
+                )
+            )
+            dispatching_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:secretsmanager:{self.region}:{self.account}:secret:{secret_name}*"
+                    ],
+                    actions=[
+                        "secretsmanager:DescribeSecret",
+                        "secretsmanager:GetSecretValue",
+                    ],
+                )
+            )
 
     def _create_lambda_layer(self) -> _lambda.ILayerVersion:
 
@@ -48,6 +146,103 @@ class LambdaStack(Stack):
         )
         return lambda_layer
 
+    def _create_stage_payload_bucket(self) -> s3.IBucket:
+
+        stage_payload_bucket: s3.Bucket = s3.Bucket(
+            self,
+            "rsql_stage_payload_bucket",
+            bucket_name=f"rsql-blog-stage-payloads-{self.account}-{self.region}",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            enforce_ssl=True,
+            # a stage payload is only read while its workflow runs
+            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(7))],
+            removal_policy=RemovalPolicy.DESTROY,
+        )
+
+        return stage_payload_bucket
+
+    def _create_rsql_dispatch_queue(
+        self, blog_rsql_invoke_lambda: _lambda.Function
+    ) -> sqs.IQueue:
+
+        environment_params = self.node.try_get_context("environment")
+
+        # scripts which kept failing to dispatch
+        rsql_dispatch_dead_letter_queue: sqs.Queue = sqs.Queue(
+            self,
+            "rsql_dispatch_dead_letter_queue",
+            queue_name="rsql-blog-rsql-dispatch-dlq",
+            encryption=sqs.QueueEncryption.KMS_MANAGED,
+            retention_period=Duration.days(14),
+        )
+
+        rsql_dispatch_queue: sqs.Queue = sqs.Queue(
+            self,
+            "rsql_dispatch_queue",
+            queue_name="rsql-blog-rsql-dispatch-queue",
+            # at least six times the invoke lambda timeout, as advised for event sources
+            visibility_timeout=Duration.seconds(1800),
+            encryption=sqs.QueueEncryption.KMS_MANAGED,
+            # every admission hold back is a receive
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=int(
+                    environment_params.get("batch_dispatch_max_receive_count", 50)
+                ),
+                queue=rsql_dispatch_dead_letter_queue,
+            ),
+        )
+
+        blog_rsql_invoke_lambda.add_event_source(
+            event_sources.SqsEventSource(
+                rsql_dispatch_queue,
+                batch_size=int(environment_params.get("batch_dispatch_size", 40)),
+                max_batching_window=Duration.seconds(
+                    int(environment_params.get("batch_dispatch_window_seconds", 2))
+                ),
+                report_batch_item_failures=True,
+            )
+        )
+        # the messages held back by admission control are retried after a short backoff
+        blog_rsql_invoke_lambda.add_environment(
+            "dispatch_queue_url", rsql_dispatch_queue.queue_url
+        )
+
+        return rsql_dispatch_queue
+
+    def _create_rsql_agent_queue(
+        self, blog_rsql_invoke_lambda: _lambda.Function
+    ) -> sqs.IQueue:
+
+        # jobs which keep stopping their agent are set aside in the dead letter queue
+        rsql_agent_dead_letter_queue: sqs.Queue = sqs.Queue(
+            self,
+            "rsql_agent_dead_letter_queue",
+            queue_name="rsql-blog-rsql-agent-dlq",
+            encryption=sqs.QueueEncryption.KMS_MANAGED,
+            retention_period=Duration.days(14),
+        )
+
+        rsql_agent_queue: sqs.Queue = sqs.Queue(
+            self,
+            "rsql_agent_queue",
+            queue_name="rsql-blog-rsql-agent-queue",
+            encryption=sqs.QueueEncryption.KMS_MANAGED,
+            dead_letter_queue=sqs.DeadLetterQueue(
+                max_receive_count=3, queue=rsql_agent_dead_letter_queue
+            ),
+        )
+
+        rsql_agent_queue.grant_send_messages(blog_rsql_invoke_lambda)
+        blog_rsql_invoke_lambda.add_environment("dispatch_mode", "agent")
+        blog_rsql_invoke_lambda.add_environment(
+            "agent_queue_url", rsql_agent_queue.queue_url
+        )
+
+        CfnOutput(self, "rsql_agent_queue_url", value=rsql_agent_queue.queue_url)
+
+        return rsql_agent_queue
+
     def _create_blog_master_iterator_function(self) -> _lambda.IFunction:
 
         blog_master_iterator_lambda: _lambda.Function = _lambda.Function(
@@ -76,7 +271,17 @@ class LambdaStack(Stack):
 
         return blog_parallel_load_check_lambda
 
-    def _create_blog_payload_generator_function(self) -> _lambda.IFunction:
+    def _create_blog_payload_generator_function(
+        self, lambda_layer: _lambda.ILayerVersion, stage_payload_bucket: s3.IBucket
+    ) -> _lambda.IFunction:
+
+        environment_params = self.node.try_get_context("environment")
+
+        job_stats_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobStatsTableParameter3",
+            parameter_name="/blog/rsql/JobStatsTableParameter",
+        ).string_value
 
         blog_payload_generator_lambda: _lambda.Function = _lambda.Function(
             self,
@@ -86,8 +291,41 @@ class LambdaStack(Stack):
             timeout=Duration.seconds(60),
             handler="lambda_function.lambda_handler",
             code=_lambda.Code.from_asset("../lambdas/blog-payload-generator"),
+            layers=[lambda_layer],
+            environment={
+                "job_stats_table": job_stats_tbl,
+                "stage_payload_bucket": stage_payload_bucket.bucket_name,
+                "large_stage_threshold": str(
+                    environment_params.get("large_stage_threshold", 500)
+                ),
+                "large_stage_batch_size": str(
+                    environment_params.get("large_stage_batch_size", 10)
+                ),
+                # an express execution lasts at most 5 minutes
+                "express_max_runtime_seconds": str(
+                    environment_params.get("express_max_runtime_seconds", 60)
+                    if environment_params.get("express_workflows", False)
+                    else 0
+                ),
+            },
         )
 
+        stage_payload_bucket.grant_put(blog_payload_generator_lambda)
+
+        if blog_payload_generator_lambda.role:
+            blog_payload_generator_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:dynamodb:{self.region}:{self.account}:table/rsql*"
+                    ],
+                    actions=[
+                        "dynamodb:BatchGetItem",
+                        "dynamodb:GetItem",
+                    ],
+                )
+            )
+
         return blog_payload_generator_lambda
 
     def _create_blog_sequential_iterator_function(self) -> _lambda.IFunction:
@@ -104,6 +342,149 @@ class LambdaStack(Stack):
 
         return blog_sequential_iterator_lambda
 
+    def _create_blog_dag_scheduler_function(
+        self,
+        lambda_layer: _lambda.ILayerVersion,
+        blog_rsql_invoke_lambda: _lambda.IFunction,
+        blog_rsql_cancel_lambda: _lambda.IFunction,
+    ) -> _lambda.IFunction:
+
+        environment_params = self.node.try_get_context("environment")
+
+        job_audit_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobAuditTableParameter2",
+            parameter_name="/blog/rsql/JobAuditTableParameter",
+        ).string_value
+
+        job_stats_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobStatsTableParameter2",
+            parameter_name="/blog/rsql/JobStatsTableParameter",
+        ).string_value
+
+        blog_dag_scheduler_lambda: _lambda.Function = _lambda.Function(
+            self,
+            "blog_dag_scheduler_lambda",
+            function_name="rsql-blog-dag-scheduler-lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            timeout=Duration.seconds(300),
+            handler="lambda_function.lambda_handler",
+            code=_lambda.Code.from_asset("../lambdas/blog-dag-scheduler"),
+            layers=[lambda_layer],
+            environment={
+                "job_audit_table": job_audit_tbl,
+                "job_stats_table": job_stats_tbl,
+                "rsql_invoke_function": blog_rsql_invoke_lambda.function_name,
+                # the scripts still triggered after this long are cancelled and failed
+                "rsql_cancel_function": blog_rsql_cancel_lambda.function_name,
+                "job_deadline_seconds": str(
+                    environment_params.get("dag_job_deadline_seconds", 21600)
+                ),
+            },
+        )
+
+        blog_rsql_invoke_lambda.grant_invoke(blog_dag_scheduler_lambda)
+        blog_rsql_cancel_lambda.grant_invoke(blog_dag_scheduler_lambda)
+
+        if blog_dag_scheduler_lambda.role:
+            blog_dag_scheduler_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:dynamodb:{self.region}:{self.account}:table/rsql*"
+                    ],
+                    actions=[
+                        "dynamodb:BatchGetItem",
+                        "dynamodb:DescribeTable",
+                        "dynamodb:GetItem",
+                        "dynamodb:PartiQLSelect",
+                        "dynamodb:Query",
+                        "dynamodb:UpdateItem",
+                    ],
+                )
+            )
+            # the SSM command of a script tells whether it reached its instance
+            blog_dag_scheduler_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=["*"],
+                    actions=["ssm:GetCommandInvocation"],
+                )
+            )
+
+        return blog_dag_scheduler_lambda
+
+    def _create_blog_rsql_cancel_function(
+        self, lambda_layer: _lambda.ILayerVersion, stage_payload_bucket: s3.IBucket
+    ) -> _lambda.IFunction:
+
+        environment_params = self.node.try_get_context("environment")
+
+        job_audit_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobAuditTableParameter4",
+            parameter_name="/blog/rsql/JobAuditTableParameter",
+        ).string_value
+
+        blog_rsql_cancel_lambda: _lambda.Function = _lambda.Function(
+            self,
+            "blog_rsql_cancel_lambda",
+            function_name="rsql-blog-rsql-cancel-lambda",
+            runtime=_lambda.Runtime.PYTHON_3_9,
+            timeout=Duration.seconds(300),
+            handler="lambda_function.lambda_handler",
+            code=_lambda.Code.from_asset("../lambdas/blog-rsql-cancel"),
+            layers=[lambda_layer],
+            environment={
+                "job_audit_table": job_audit_tbl,
+                "rsql_trigger": environment_params["rsql_script_wrapper"],
+            },
+        )
+
+        stage_payload_bucket.grant_read(blog_rsql_cancel_lambda)
+
+        if blog_rsql_cancel_lambda.role:
+            blog_rsql_cancel_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:dynamodb:{self.region}:{self.account}:table/rsql*"
+                    ],
+                    actions=[
+                        "dynamodb:BatchGetItem",
+                        "dynamodb:DescribeTable",
+                        "dynamodb:UpdateItem",
+                    ],
+                )
+            )
+            blog_rsql_cancel_lambda.role.add_to_principal_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    resources=[
+                        f"arn:{self.partition}:ec2:{self.region}:{self.account}:instance/{environment_params['ec2_instance_id']}",
+                        f"arn:{self.partition}:ssm:{self.region}::document/AWS-RunShellScript",
+                    ],
+                    actions=["ssm:SendCommand"],
+                )
+            )
+            if environment_params.get("worker_fleet", False):
+                # the fleet instances are tagged rsql-worker-fleet=true
+                blog_rsql_cancel_lambda.role.add_to_principal_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        resources=[
+                            f"arn:{self.partition}:ec2:{self.region}:{self.account}:instance/*"
+                        ],
+                        actions=["ssm:SendCommand"],
+                        conditions={
+                            "StringEquals": {"ssm:resourceTag/rsql-worker-fleet": "true"}
+                        },
+                    )
+                )
+
+        return blog_rsql_cancel_lambda
+
     def _create_blog_rsql_invoke_function(
         self, lambda_layer: _lambda.ILayerVersion
     ) -> None:
@@ -122,6 +503,31 @@ class LambdaStack(Stack):
             parameter_name="/blog/rsql/LogGroupParameter",
         ).string_value
 
+        job_stats_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobStatsTableParameter",
+            parameter_name="/blog/rsql/JobStatsTableParameter",
+        ).string_value
+
+        # the jobs archive their logs under s3://<bucket>/rsql-logs/ when enabled
+        log_archive_uri = ""
+        if environment_params.get("archive_logs", False):
+            log_archive_bucket = ssm.StringParameter.from_string_parameter_attributes(
+                self,
+                "LogArchiveBucketParameter",
+                parameter_name="/blog/rsql/LogArchiveBucketParameter",
+            ).string_value
+            log_archive_uri = f"s3://{log_archive_bucket}/rsql-logs"
+
+        # the scripts are placed on the instances registered in the fleet table when enabled
+        fleet_tbl = ""
+        if environment_params.get("worker_fleet", False):
+            fleet_tbl = ssm.StringParameter.from_string_parameter_attributes(
+                self,
+                "FleetTableParameter",
+                parameter_name="/blog/rsql/FleetTableParameter",
+            ).string_value
+
         blog_rsql_invoke_lambda: _lambda.Function = _lambda.Function(
             self,
             "blog_rsql_invoke_lambda",
@@ -137,8 +543,17 @@ class LambdaStack(Stack):
                 "log_path": environment_params["rsql_log_path"],
                 "instance_id": environment_params["ec2_instance_id"],
                 "job_audit_table": job_audit_tbl,
+                "job_stats_table": job_stats_tbl,
                 "rsql_log_group": rsql_log_group,
                 "rsql_trigger": environment_params["rsql_script_wrapper"],
+                "stream_logs": str(
+                    environment_params.get("stream_logs", False)
+                ).lower(),
+                "log_archive_uri": log_archive_uri,
+                "fleet_table": fleet_tbl,
+                "placement_policy": environment_params.get(
+                    "placement_policy", "least_loaded"
+                ),
             },
         )
 
@@ -200,6 +615,21 @@ class LambdaStack(Stack):
                 )
             )
 
+            if fleet_tbl:
+                # the fleet instances are tagged rsql-worker-fleet=true
+                blog_rsql_invoke_lambda.role.add_to_principal_policy(
+                    iam.PolicyStatement(
+                        effect=iam.Effect.ALLOW,
+                        resources=[
+                            f"arn:{self.partition}:ec2:{self.region}:{self.account}:instance/*"
+                        ],
+                        actions=["ssm:SendCommand"],
+                        conditions={
+                            "StringEquals": {"ssm:resourceTag/rsql-worker-fleet": "true"}
+                        },
+                    )
+                )
+
         return blog_rsql_invoke_lambda
 
     # def _create_blog_rsql_config_parser_function(self, lambda_layer : _lambda.ILayerVersion) -> _lambda.IFunction :
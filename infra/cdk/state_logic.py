@@ -0,0 +1,112 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Parameters of the Pass states which replace the iterator lambdas, checked against the
+# lambdas by tests/test_state_logic.py
+
+#######################################################################################################################
+################################################ Master State Machine #################################################
+#######################################################################################################################
+
+# blog-master-iterator, the first state selects the next stage
+MASTER_STAGE_SELECTOR = {
+    "index.$": "States.MathAdd($.index, 1)",
+    "stage.$": "States.ArrayGetItem($.stage_details, States.MathAdd($.index, 1))",
+}
+
+MASTER_ITERATOR = {
+    "Payload": {
+        "count.$": "$.count",
+        "index.$": "$.current_stage_details.index",
+        "execution_details": {
+            "execution_mode.$": "$.current_stage_details.stage.execution_type",
+            "scripts.$": "$.current_stage_details.stage.scripts",
+            "concurrency_control.$": "$.current_stage_details.stage.concurrency_control",
+            "max_concurrency.$": "$.current_stage_details.stage.max_concurrency",
+            "failure_policy.$": "$.current_stage_details.stage.failure_policy",
+            "tolerated_failures.$": "$.current_stage_details.stage.tolerated_failures",
+            "timeout_seconds.$": "$.current_stage_details.stage.timeout_seconds",
+            "heartbeat_seconds.$": "$.current_stage_details.stage.heartbeat_seconds",
+            "script_timeouts.$": "$.current_stage_details.stage.script_timeouts",
+        },
+        "workflow_id.$": "$.workflow_id",
+        "workflow_execution_id.$": "$.workflow_execution_id",
+    }
+}
+
+#######################################################################################################################
+############################################## Sequential State Machine ###############################################
+#######################################################################################################################
+
+# blog-sequential-iterator, a choice on index < count picks the next script
+SEQUENTIAL_ITERATOR = {
+    "sequential.$": "$.sequential",
+    "sequential_express.$": "$.sequential_express",
+    "sequential_timeouts.$": "$.sequential_timeouts",
+    "count.$": "States.ArrayLength($.sequential)",
+    "index.$": "States.MathAdd($.index, 1)",
+    "workflow_id.$": "$.workflow_id",
+    "workflow_execution_id.$": "$.workflow_execution_id",
+}
+
+SEQUENTIAL_POSITION = {
+    "sequential.$": "$.sequential",
+    "sequential_express.$": "$.sequential_express",
+    "sequential_timeouts.$": "$.sequential_timeouts",
+    "count.$": "$.count",
+    "index.$": "$.index",
+    "workflow_id.$": "$.workflow_id",
+    "workflow_execution_id.$": "$.workflow_execution_id",
+}
+
+SEQUENTIAL_SCRIPT = {
+    **SEQUENTIAL_POSITION,
+    "execution_details": {
+        "script.$": "States.ArrayGetItem($.sequential, $.index)",
+        "express.$": "States.ArrayGetItem($.sequential_express, $.index)",
+        "timeouts.$": "States.ArrayGetItem($.sequential_timeouts, $.index)",
+        "workflow_id.$": "$.workflow_id",
+        "workflow_execution_id.$": "$.workflow_execution_id",
+    },
+}
+
+SEQUENTIAL_COMPLETED = {
+    **SEQUENTIAL_POSITION,
+    "execution_details": {
+        "script": "NA",
+        "express": False,
+        "timeouts": {},
+        "workflow_id.$": "$.workflow_id",
+        "workflow_execution_id.$": "$.workflow_execution_id",
+    },
+}
+
+#######################################################################################################################
+############################################### Parallel State Machine ################################################
+#######################################################################################################################
+
+# blog-parallel-load-check
+PARALLEL_LOAD_CHECK = {
+    "Payload": {
+        "statusCode": 200,
+        "parallel_script_list.$": "$.parallel_output[*].job_name",
+        "failed_script_list.$": "$.parallel_output[?(@.status != 'completed')].job_name",
+    }
+}
+
+PARALLEL_LOAD_FAILURES = {
+    "count.$": "States.ArrayLength($.parallel_check.Payload.failed_script_list)",
+}
+
+# result selector of the batches of the distributed map task
+DISTRIBUTED_BATCH_FAILURES = {
+    "failed.$": "$[?(@.status != 'completed')]",
+}
+
+# result selector of the distributed map task
+DISTRIBUTED_LOAD_CHECK = {
+    "Payload": {
+        "statusCode": 200,
+        "failed_script_list.$": "$[*].failed[*].job_name",
+    }
+}
@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: MIT-0
 
 from aws_cdk import Aspects, Duration, Stack
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
 from aws_cdk import aws_ssm as ssm
@@ -9,6 +10,46 @@ from aws_cdk import aws_stepfunctions as sfn
 from aws_cdk import aws_stepfunctions_tasks as tasks
 from constructs import Construct
 
+from cdk import state_logic
+
+
+class HeartbeatSecondsPathMixin:
+    """Adds HeartbeatSecondsPath to a task, unknown to the CDK version of this project"""
+
+    def __init__(
+        self, scope: Construct, id: str, *, heartbeat_seconds_path=None, **kwargs
+    ):
+        super().__init__(scope, id, **kwargs)
+        self.heartbeat_seconds_path = heartbeat_seconds_path
+
+    def to_state_json(self):
+        state_json = dict(super().to_state_json())
+        if self.heartbeat_seconds_path:
+            state_json["HeartbeatSecondsPath"] = self.heartbeat_seconds_path
+        return state_json
+
+
+class ScriptLambdaInvoke(HeartbeatSecondsPathMixin, tasks.LambdaInvoke):
+    pass
+
+
+class ScriptSqsSendMessage(HeartbeatSecondsPathMixin, tasks.SqsSendMessage):
+    pass
+
+
+class MaxConcurrencyPathMap(sfn.Map):
+    """Map task with MaxConcurrencyPath, unknown to the CDK version of this project"""
+
+    def __init__(self, scope: Construct, id: str, *, max_concurrency_path, **kwargs):
+        super().__init__(scope, id, **kwargs)
+        self.max_concurrency_path = max_concurrency_path
+
+    def to_state_json(self):
+        state_json = dict(super().to_state_json())
+        state_json.pop("MaxConcurrency", None)
+        state_json["MaxConcurrencyPath"] = self.max_concurrency_path
+        return state_json
+
 
 class StepFunctionStack(Stack):
     def __init__(
@@ -16,8 +57,21 @@ class StepFunctionStack(Stack):
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        rsql_parallel_load = self._create_rsql_parallel_load(lambda_stack)
-        rsql_sequential_load = self._create_rsql_sequential_load(lambda_stack)
+        environment_params = self.node.try_get_context("environment")
+
+        # short scripts run in an express child execution, polling the job audit table
+        rsql_script_express_load = (
+            self._create_rsql_script_express_load(lambda_stack)
+            if environment_params.get("express_workflows", False)
+            else None
+        )
+
+        rsql_parallel_load = self._create_rsql_parallel_load(
+            lambda_stack, rsql_script_express_load
+        )
+        rsql_sequential_load = self._create_rsql_sequential_load(
+            lambda_stack, rsql_script_express_load
+        )
 
         rsql_master_state_machine_arn = self._create_rsql_master_load(
             lambda_stack, rsql_sequential_load, rsql_parallel_load
@@ -27,47 +81,442 @@ class StepFunctionStack(Stack):
             lambda_stack, rsql_master_state_machine_arn
         )
 
-    def _create_rsql_parallel_load(self, lambda_stack) -> sfn.IStateMachine:
+    def _create_rsql_script_express_load(self, lambda_stack) -> sfn.IStateMachine:
+
+        environment_params = self.node.try_get_context("environment")
+        poll_interval = int(environment_params.get("express_poll_interval_seconds", 2))
+
+        job_audit_tbl = ssm.StringParameter.from_string_parameter_attributes(
+            self,
+            "JobAuditTableParameter",
+            parameter_name="/blog/rsql/JobAuditTableParameter",
+        ).string_value
+
+        rsql_job_audit_table = dynamodb.Table.from_table_name(
+            self, "rsql_job_audit_table", job_audit_tbl
+        )
 
-        rsql_invoke_lambda_task = tasks.LambdaInvoke(
+        # express workflows support no callback, the job runs without task token
+        rsql_express_invoke_task = tasks.LambdaInvoke(
             self,
-            "rsql_invoke_lambda_task",
+            "rsql_express_invoke_task",
             lambda_function=lambda_stack.blog_rsql_invoke_lambda,
             payload=sfn.TaskInput.from_object(
                 {
-                    "token": sfn.JsonPath.task_token,
+                    "token": "NA",
+                    "poll_completion": True,
                     "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
                     "script": sfn.JsonPath.string_at("$.script"),
                     "workflow_execution_id": sfn.JsonPath.string_at(
                         "$.workflow_execution_id"
                     ),
+                    "state_entered_time": sfn.JsonPath.string_at("$.state_entered_time"),
+                    # the hard timeout of the job still applies
+                    "timeouts": sfn.JsonPath.object_at("$.timeouts"),
                 }
             ),
-            integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
-            output_path="$",
+            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            result_path=sfn.JsonPath.DISCARD,
         )
 
-        rsql_parallel_invoke_map_task = sfn.Map(
+        # an express execution lasts 5 minutes at most
+        rsql_express_invoke_task.add_retry(
+            errors=["WlmCapacityExceeded"],
+            interval=Duration.seconds(10),
+            backoff_rate=1.2,
+            max_attempts=8,
+        )
+
+        rsql_express_poll_wait = sfn.Wait(
             self,
-            "rsql_invoke_map_task",
-            max_concurrency=40,
-            items_path=sfn.JsonPath.string_at("$.Payload.parallel_details"),
-            result_path="$.parallel_output",
+            "rsql_express_poll_wait",
+            time=sfn.WaitTime.duration(Duration.seconds(poll_interval)),
+        )
+
+        rsql_express_job_audit_task = tasks.DynamoGetItem(
+            self,
+            "rsql_express_job_audit_task",
+            table=rsql_job_audit_table,
+            key={
+                "job_name": tasks.DynamoAttributeValue.from_string(
+                    sfn.JsonPath.string_at("$.script")
+                ),
+                "workflow_execution_id": tasks.DynamoAttributeValue.from_string(
+                    sfn.JsonPath.string_at("$.workflow_execution_id")
+                ),
+            },
+            consistent_read=True,
+            result_path="$.job_audit",
+        )
+
+        # same output as the callback of send_sfn_token.py
+        rsql_express_completed_task = sfn.Pass(
+            self,
+            "rsql_express_completed_task",
+            parameters={
+                "job_name": sfn.JsonPath.string_at("$.script"),
+                "status": "completed",
+            },
         )
 
-        rsql_parallel_invoke_map_task.iterator(rsql_invoke_lambda_task)
+        rsql_express_failed_task = sfn.Fail(
+            self,
+            "rsql_express_failed_task",
+            error="RsqlJobFailed",
+            cause="The RSQL script failed, see the error message of the job audit table",
+        )
+
+        rsql_express_timed_out_task = sfn.Fail(
+            self,
+            "rsql_express_timed_out_task",
+            error="RsqlJobTimedOut",
+            cause="The RSQL script was killed after its timeout",
+        )
+
+        rsql_express_load_definition = rsql_express_invoke_task.next(
+            rsql_express_poll_wait
+        ).next(rsql_express_job_audit_task).next(
+            sfn.Choice(self, "rsql_express_job_status_check")
+            # the job audit record is added once the job is dispatched
+            .when(
+                sfn.Condition.not_(sfn.Condition.is_present("$.job_audit.Item")),
+                rsql_express_poll_wait,
+            )
+            .when(
+                sfn.Condition.string_equals(
+                    "$.job_audit.Item.execution_status.S", "successful"
+                ),
+                rsql_express_completed_task,
+            )
+            .when(
+                sfn.Condition.string_equals(
+                    "$.job_audit.Item.execution_status.S", "failed"
+                ),
+                rsql_express_failed_task,
+            )
+            .when(
+                sfn.Condition.string_equals(
+                    "$.job_audit.Item.execution_status.S", "timed_out"
+                ),
+                rsql_express_timed_out_task,
+            )
+            .otherwise(rsql_express_poll_wait)
+        )
+
+        rsql_script_express_state_machine = sfn.StateMachine(
+            self,
+            "rsql_script_express_state_machine",
+            state_machine_name="rsql-script-express-state-machine",
+            definition=rsql_express_load_definition,
+            state_machine_type=sfn.StateMachineType.EXPRESS,
+            timeout=Duration.minutes(5),
+        )
+
+        return rsql_script_express_state_machine
+
+    def _create_rsql_express_script_task(
+        self,
+        construct_id: str,
+        rsql_script_express_load,
+        script_path: str,
+        workflow_execution_id_path: str,
+        timeouts_path: str,
+        result_path: str = "$",
+    ) -> tasks.StepFunctionsStartExecution:
+
+        # the standard parent waits for the express child
+        return tasks.StepFunctionsStartExecution(
+            self,
+            construct_id,
+            state_machine=rsql_script_express_load,
+            integration_pattern=sfn.IntegrationPattern.RUN_JOB,
+            associate_with_parent=True,
+            input=sfn.TaskInput.from_object(
+                {
+                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                    "script": sfn.JsonPath.string_at(script_path),
+                    "workflow_execution_id": sfn.JsonPath.string_at(
+                        workflow_execution_id_path
+                    ),
+                    "timeouts": sfn.JsonPath.object_at(timeouts_path),
+                    "state_entered_time": sfn.JsonPath.string_at("$$.State.EnteredTime"),
+                }
+            ),
+            result_selector={
+                "job_name": sfn.JsonPath.string_at("$.Output.job_name"),
+                "status": sfn.JsonPath.string_at("$.Output.status"),
+            },
+            result_path=result_path,
+        )
+
+    def _create_rsql_timed_out_task(
+        self,
+        construct_id: str,
+        lambda_stack,
+        scripts_path: str,
+        cancel_jobs: bool = False,
+    ) -> tasks.LambdaInvoke:
 
-        rsql_parallel_load_check_task = tasks.LambdaInvoke(
+        # the job audit records of the scripts still triggered are marked timed_out
+        return tasks.LambdaInvoke(
             self,
-            "rsql_parallel_load_check_task",
-            lambda_function=lambda_stack.blog_parallel_load_check_lambda,
+            construct_id,
+            lambda_function=lambda_stack.blog_rsql_cancel_lambda,
             payload=sfn.TaskInput.from_object(
-                {"parallel_output": sfn.JsonPath.string_at("$.parallel_output")}
+                {
+                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                    "workflow_execution_id": sfn.JsonPath.string_at(
+                        "$.workflow_execution_id"
+                    ),
+                    "timed_out_scripts": sfn.JsonPath.string_at(scripts_path),
+                    "cancel_jobs": cancel_jobs,
+                }
             ),
             invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            result_path=sfn.JsonPath.DISCARD,
+        )
+
+    def _create_rsql_heartbeat_check(
+        self, construct_id: str, heartbeat_seconds_path: str, create_task
+    ) -> tuple:
+
+        # only the scripts whose stage sets heartbeat_seconds send heartbeats
+        rsql_task = create_task(f"{construct_id}_task")
+        rsql_heartbeat_task = create_task(
+            f"{construct_id}_heartbeat_task", heartbeat_seconds_path
+        )
+
+        rsql_heartbeat_check = (
+            sfn.Choice(self, f"{construct_id}_heartbeat_check")
+            .when(
+                sfn.Condition.is_present(heartbeat_seconds_path),
+                rsql_heartbeat_task,
+            )
+            .otherwise(rsql_task)
+        )
+
+        return rsql_heartbeat_check, rsql_task, rsql_heartbeat_task
+
+    def _create_rsql_express_invoke_states(
+        self,
+        lambda_stack,
+        rsql_script_express_load,
+        rsql_invoke_standard_state,
+        rsql_invoke_failure_policy_check,
+    ) -> list:
+
+        # the short scripts run in an express child execution
+        rsql_invoke_express_task = self._create_rsql_express_script_task(
+            "rsql_invoke_express_task",
+            rsql_script_express_load,
+            "$.script",
+            "$.workflow_execution_id",
+            "$.timeouts",
+        )
+
+        # a child execution stopped after its 5 minutes leaves its job running
+        rsql_invoke_express_cancel_task = self._create_rsql_timed_out_task(
+            "rsql_invoke_express_cancel_task",
+            lambda_stack,
+            "$.script",
+            cancel_jobs=True,
+        )
+        rsql_invoke_express_cancel_task.add_catch(
+            rsql_invoke_failure_policy_check,
+            errors=["States.ALL"],
+            result_path="$.timed_out_error",
+        )
+        rsql_invoke_express_cancel_task.next(rsql_invoke_failure_policy_check)
+        rsql_invoke_express_task.add_catch(
+            rsql_invoke_express_cancel_task,
+            errors=["States.ALL"],
+            result_path="$.error",
+        )
+
+        rsql_invoke_express_check = (
+            sfn.Choice(self, "rsql_invoke_express_check")
+            .when(
+                sfn.Condition.boolean_equals("$.express", True),
+                rsql_invoke_express_task,
+            )
+            .otherwise(rsql_invoke_standard_state)
+        )
+
+        return [
+            rsql_invoke_express_check,
+            rsql_invoke_express_task,
+            rsql_invoke_express_cancel_task,
+        ]
+
+    def _create_rsql_parallel_load(
+        self, lambda_stack, rsql_script_express_load=None
+    ) -> sfn.IStateMachine:
+
+        environment_params = self.node.try_get_context("environment")
+
+        rsql_invoke_payload = {
+            "token": sfn.JsonPath.task_token,
+            "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+            "script": sfn.JsonPath.string_at("$.script"),
+            "workflow_execution_id": sfn.JsonPath.string_at("$.workflow_execution_id"),
+            # first phase mark of the job, see instance_code/framework/job_phases.py
+            "state_entered_time": sfn.JsonPath.string_at("$$.State.EnteredTime"),
+            "timeouts": sfn.JsonPath.object_at("$.timeouts"),
+        }
+
+        def create_rsql_invoke_task(construct_id, heartbeat_seconds_path=None):
+            if environment_params.get("batch_dispatch", False):
+                # the invoke lambda starts a whole batch with one command
+                return ScriptSqsSendMessage(
+                    self,
+                    construct_id,
+                    queue=lambda_stack.rsql_dispatch_queue,
+                    message_body=sfn.TaskInput.from_object(rsql_invoke_payload),
+                    integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                    heartbeat_seconds_path=heartbeat_seconds_path,
+                    output_path="$",
+                )
+            return ScriptLambdaInvoke(
+                self,
+                construct_id,
+                lambda_function=lambda_stack.blog_rsql_invoke_lambda,
+                payload=sfn.TaskInput.from_object(rsql_invoke_payload),
+                integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                heartbeat_seconds_path=heartbeat_seconds_path,
+                output_path="$",
+            )
+
+        (
+            rsql_invoke_heartbeat_check,
+            rsql_invoke_lambda_task,
+            rsql_invoke_heartbeat_task,
+        ) = self._create_rsql_heartbeat_check(
+            "rsql_invoke_lambda",
+            "$.timeouts.heartbeat_timeout_seconds",
+            create_rsql_invoke_task,
+        )
+
+        # scripts held back by the WLM admission control are retried for three hours
+        for rsql_task in [rsql_invoke_lambda_task, rsql_invoke_heartbeat_task]:
+            rsql_task.add_retry(
+                errors=["WlmCapacityExceeded"],
+                interval=Duration.seconds(10),
+                backoff_rate=1.2,
+                max_attempts=30,
+            )
+
+        # every iteration carries the failure policy of the stage
+        rsql_invoke_map_parameters = {
+            "workflow_id": sfn.JsonPath.string_at("$$.Map.Item.Value.workflow_id"),
+            "script": sfn.JsonPath.string_at("$$.Map.Item.Value.script"),
+            "workflow_execution_id": sfn.JsonPath.string_at(
+                "$$.Map.Item.Value.workflow_execution_id"
+            ),
+            "failure_policy": sfn.JsonPath.string_at("$.Payload.failure_policy"),
+            "timeouts": sfn.JsonPath.object_at("$$.Map.Item.Value.timeouts"),
+        }
+        if rsql_script_express_load:
+            # set by the payload generator from the runtimes of the job statistics
+            rsql_invoke_map_parameters["express"] = sfn.JsonPath.string_at(
+                "$$.Map.Item.Value.express"
+            )
+
+        # max_concurrency of the stage, set by the payload generator
+        rsql_parallel_invoke_map_task = MaxConcurrencyPathMap(
+            self,
+            "rsql_invoke_map_task",
+            max_concurrency_path="$.Payload.max_concurrency",
+            items_path=sfn.JsonPath.string_at("$.Payload.parallel_details"),
+            parameters=rsql_invoke_map_parameters,
+            result_path="$.parallel_output",
+        )
+
+        # a failed script fails the map task with "fail_fast"
+        rsql_invoke_failed_task = sfn.Fail(
+            self,
+            "rsql_invoke_failed_task",
+            error="RsqlJobFailed",
+            cause="A script of the stage failed, its running scripts are cancelled",
+        )
+
+        rsql_invoke_failure_tolerated_task = sfn.Pass(
+            self,
+            "rsql_invoke_failure_tolerated_task",
+            parameters={
+                "job_name": sfn.JsonPath.string_at("$.script"),
+                "status": "failed",
+                "error": sfn.JsonPath.string_at("$.error.Error"),
+            },
+        )
+
+        rsql_invoke_failure_policy_check = (
+            sfn.Choice(self, "rsql_invoke_failure_policy_check")
+            .when(
+                sfn.Condition.string_equals("$.failure_policy", "fail_fast"),
+                rsql_invoke_failed_task,
+            )
+            .otherwise(rsql_invoke_failure_tolerated_task)
+        )
+
+        # a job without heartbeat is marked timed out, then handled as a failed script
+        rsql_invoke_timed_out_task = self._create_rsql_timed_out_task(
+            "rsql_invoke_timed_out_task", lambda_stack, "$.script"
+        )
+        rsql_invoke_timed_out_task.add_catch(
+            rsql_invoke_failure_policy_check,
+            errors=["States.ALL"],
+            result_path="$.timed_out_error",
+        )
+        rsql_invoke_timed_out_task.next(rsql_invoke_failure_policy_check)
+        rsql_invoke_heartbeat_task.add_catch(
+            rsql_invoke_timed_out_task,
+            errors=["States.HeartbeatTimeout"],
+            result_path="$.error",
+        )
+
+        for rsql_task in [rsql_invoke_lambda_task, rsql_invoke_heartbeat_task]:
+            rsql_task.add_catch(
+                rsql_invoke_failure_policy_check,
+                errors=["States.ALL"],
+                result_path="$.error",
+            )
+
+        # the states of an iteration, copied into the batches of the distributed map
+        rsql_invoke_item_states = [
+            rsql_invoke_heartbeat_check,
+            rsql_invoke_lambda_task,
+            rsql_invoke_heartbeat_task,
+            rsql_invoke_failure_policy_check,
+            rsql_invoke_failed_task,
+            rsql_invoke_failure_tolerated_task,
+            rsql_invoke_timed_out_task,
+        ]
+
+        if rsql_script_express_load:
+            rsql_invoke_item_states[:0] = self._create_rsql_express_invoke_states(
+                lambda_stack,
+                rsql_script_express_load,
+                rsql_invoke_heartbeat_check,
+                rsql_invoke_failure_policy_check,
+            )
+
+        rsql_parallel_invoke_map_task.iterator(rsql_invoke_item_states[0])
+
+        # blog-parallel-load-check computed with intrinsic functions
+        rsql_parallel_load_check_task = sfn.Pass(
+            self,
+            "rsql_parallel_load_check_pass",
+            parameters=state_logic.PARALLEL_LOAD_CHECK,
             result_path="$.parallel_check",
         )
 
+        rsql_parallel_load_failures_task = sfn.Pass(
+            self,
+            "rsql_parallel_load_failures_pass",
+            parameters=state_logic.PARALLEL_LOAD_FAILURES,
+            result_path="$.parallel_check.failures",
+        )
+
         rsql_worklow_audit_table_update_task = tasks.LambdaInvoke(
             self,
             "rsql_worklow_audit_table_update_task",
@@ -87,18 +536,74 @@ class StepFunctionStack(Stack):
 
         rsql_worklow_audit_table_update_task.next(parallel_fail_task)
 
-        parallel_load_definition = rsql_parallel_invoke_map_task.next(
-            rsql_parallel_load_check_task
-        ).next(
-            sfn.Choice(self, "parallel_load_check_status")
+        # the scripts still running when the stage failed fast are terminated
+        rsql_cancel_stage_task = tasks.LambdaInvoke(
+            self,
+            "rsql_cancel_stage_task",
+            lambda_function=lambda_stack.blog_rsql_cancel_lambda,
+            payload=sfn.TaskInput.from_object(
+                {
+                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                    "workflow_execution_id": sfn.JsonPath.string_at(
+                        "$.workflow_execution_id"
+                    ),
+                    "Payload": sfn.JsonPath.string_at("$.Payload"),
+                }
+            ),
+            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            result_path="$.cancellation",
+        )
+        rsql_cancel_stage_task.add_catch(
+            rsql_worklow_audit_table_update_task,
+            errors=["States.ALL"],
+            result_path="$.cancellation_error",
+        )
+        rsql_cancel_stage_task.next(rsql_worklow_audit_table_update_task)
+
+        rsql_parallel_invoke_map_task.add_catch(
+            rsql_cancel_stage_task,
+            errors=["States.ALL"],
+            result_path="$.parallel_error",
+        )
+
+        rsql_parallel_map_definition = (
+            rsql_parallel_invoke_map_task.next(rsql_parallel_load_check_task)
+            .next(rsql_parallel_load_failures_task)
+            .next(
+                sfn.Choice(self, "parallel_load_check_status")
+                .when(
+                    sfn.Condition.number_less_than_equals_json_path(
+                        "$.parallel_check.failures.count",
+                        "$.Payload.tolerated_failures",
+                    ),
+                    parallel_success_task,
+                )
+                .otherwise(rsql_worklow_audit_table_update_task)
+            )
+        )
+
+        # stages with "concurrency_control": "adaptive" run through the dag scheduler loop
+        parallel_load_definition = (
+            sfn.Choice(self, "parallel_concurrency_control_check")
             .when(
-                sfn.Condition.string_equals(
-                    "$.parallel_check.Payload.parallel_load_status",
-                    "successful",
+                sfn.Condition.is_present("$.Payload.adaptive_dispatch"),
+                self._create_rsql_adaptive_parallel_load(
+                    lambda_stack,
+                    parallel_success_task,
+                    rsql_worklow_audit_table_update_task,
+                ),
+            )
+            # stages above large_stage_threshold scripts have their items in S3
+            .when(
+                sfn.Condition.is_present("$.Payload.parallel_items"),
+                self._create_rsql_distributed_parallel_load(
+                    rsql_invoke_item_states,
+                    rsql_parallel_load_failures_task,
+                    rsql_cancel_stage_task,
+                    express_workflows=rsql_script_express_load is not None,
                 ),
-                parallel_success_task,
             )
-            .otherwise(rsql_worklow_audit_table_update_task)
+            .otherwise(rsql_parallel_map_definition)
         )
 
         rsql_parallel_state_machine = sfn.StateMachine(
@@ -109,47 +614,307 @@ class StepFunctionStack(Stack):
             timeout=Duration.minutes(1440),
         )
 
+        # the distributed map task reads the stage items
+        lambda_stack.stage_payload_bucket.grant_read(rsql_parallel_state_machine)
+        rsql_parallel_state_machine.add_to_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                resources=[
+                    f"arn:{self.partition}:states:{self.region}:{self.account}:stateMachine:rsql-parallel-state-machine"
+                ],
+                actions=["states:StartExecution"],
+            )
+        )
+        rsql_parallel_state_machine.add_to_role_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                resources=[
+                    f"arn:{self.partition}:states:{self.region}:{self.account}:execution:rsql-parallel-state-machine/*"
+                ],
+                actions=["states:DescribeExecution", "states:StopExecution"],
+            )
+        )
+
         return rsql_parallel_state_machine
 
-    def _create_rsql_sequential_load(self, lambda_stack) -> sfn.IStateMachine:
+    def _create_rsql_distributed_parallel_load(
+        self,
+        rsql_invoke_item_states: list,
+        rsql_parallel_load_failures_task,
+        parallel_failure_task,
+        express_workflows: bool = False,
+    ) -> sfn.IChainable:
+
+        # the CDK version of this project has no distributed map construct
+        batch_state_ids = {
+            state.state_id: state.state_id.replace("rsql_invoke_", "rsql_invoke_batch_")
+            for state in rsql_invoke_item_states
+        }
 
-        rsql_sequential_iterator_lambda_task = tasks.LambdaInvoke(
+        # the choice between the express and the standard invoke task reads the item
+        rsql_invoke_item_fields = (
+            {"express.$": "$$.Map.Item.Value.express"} if express_workflows else {}
+        )
+
+        def copy_state_json(state_json):
+            if isinstance(state_json, list):
+                return [copy_state_json(value) for value in state_json]
+            if not isinstance(state_json, dict):
+                return state_json
+            return {
+                key: batch_state_ids.get(value, value)
+                if key in ("Next", "Default")
+                else copy_state_json(value)
+                for key, value in state_json.items()
+            }
+
+        rsql_distributed_map_task = sfn.CustomState(
+            self,
+            "rsql_invoke_distributed_map_task",
+            state_json={
+                "Type": "Map",
+                "ItemReader": {
+                    "Resource": f"arn:{self.partition}:states:::s3:getObject",
+                    "ReaderConfig": {"InputType": "JSON"},
+                    "Parameters": {
+                        "Bucket.$": "$.Payload.parallel_items.bucket",
+                        "Key.$": "$.Payload.parallel_items.key",
+                    },
+                },
+                "ItemBatcher": {
+                    "MaxItemsPerBatchPath": "$.Payload.parallel_items.batch_size",
+                    "BatchInput": {"failure_policy.$": "$.Payload.failure_policy"},
+                },
+                "MaxConcurrencyPath": "$.Payload.parallel_items.max_batches",
+                "ItemProcessor": {
+                    "ProcessorConfig": {"Mode": "DISTRIBUTED", "ExecutionType": "STANDARD"},
+                    "StartAt": "rsql_invoke_batch_map_task",
+                    "States": {
+                        "rsql_invoke_batch_map_task": {
+                            "Type": "Map",
+                            "ItemsPath": "$.Items",
+                            # every iteration carries the failure policy of the stage
+                            "ItemSelector": {
+                                "workflow_id.$": "$$.Map.Item.Value.workflow_id",
+                                "script.$": "$$.Map.Item.Value.script",
+                                "workflow_execution_id.$": (
+                                    "$$.Map.Item.Value.workflow_execution_id"
+                                ),
+                                "failure_policy.$": "$.BatchInput.failure_policy",
+                                "timeouts.$": "$$.Map.Item.Value.timeouts",
+                                **rsql_invoke_item_fields,
+                            },
+                            "ItemProcessor": {
+                                "ProcessorConfig": {"Mode": "INLINE"},
+                                "StartAt": batch_state_ids[
+                                    rsql_invoke_item_states[0].state_id
+                                ],
+                                "States": {
+                                    batch_state_ids[state.state_id]: copy_state_json(
+                                        state.to_state_json()
+                                    )
+                                    for state in rsql_invoke_item_states
+                                },
+                            },
+                            "ResultSelector": state_logic.DISTRIBUTED_BATCH_FAILURES,
+                            "End": True,
+                        }
+                    },
+                },
+                # only the failed scripts of the batches are collected
+                "ResultSelector": state_logic.DISTRIBUTED_LOAD_CHECK,
+                "ResultPath": "$.parallel_check",
+                "Catch": [
+                    {
+                        "ErrorEquals": ["States.ALL"],
+                        "ResultPath": "$.parallel_error",
+                        "Next": parallel_failure_task.state_id,
+                    }
+                ],
+            },
+        )
+
+        return rsql_distributed_map_task.next(rsql_parallel_load_failures_task)
+
+    def _create_rsql_adaptive_parallel_load(
+        self, lambda_stack, parallel_success_task, parallel_failure_task
+    ) -> sfn.IChainable:
+
+        environment_params = self.node.try_get_context("environment")
+        dag_poll_interval = int(environment_params.get("dag_poll_interval_seconds", 30))
+
+        # the scheduler state is built by the payload generator lambda
+        rsql_adaptive_dispatch_pass = sfn.Pass(
+            self,
+            "rsql_adaptive_dispatch_pass",
+            output_path="$.Payload.adaptive_dispatch",
+        )
+
+        # every pass adapts the concurrency window
+        rsql_adaptive_scheduler_task = tasks.LambdaInvoke(
             self,
-            "rsql_sequential_iterator_lambda_task",
-            lambda_function=lambda_stack.blog_sequential_iterator_lambda,
+            "rsql_adaptive_scheduler_task",
+            lambda_function=lambda_stack.blog_dag_scheduler_lambda,
             invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
             output_path="$.Payload",
         )
 
-        rsql_sequential_lambda_invoke_task = tasks.LambdaInvoke(
+        rsql_adaptive_wait_task = sfn.Wait(
             self,
-            "rsql_sequential_lambda_invoke_task",
-            lambda_function=lambda_stack.blog_rsql_invoke_lambda,
-            payload=sfn.TaskInput.from_object(
-                {
-                    "token": sfn.JsonPath.task_token,
-                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
-                    "script": sfn.JsonPath.string_at("$.execution_details.script"),
-                    "workflow_execution_id": sfn.JsonPath.string_at(
-                        "$.execution_details.workflow_execution_id"
-                    ),
-                }
+            "rsql_adaptive_wait_task",
+            time=sfn.WaitTime.duration(Duration.seconds(dag_poll_interval)),
+        )
+        rsql_adaptive_wait_task.next(rsql_adaptive_scheduler_task)
+
+        return rsql_adaptive_dispatch_pass.next(rsql_adaptive_scheduler_task).next(
+            sfn.Choice(self, "rsql_adaptive_status_check")
+            .when(
+                sfn.Condition.string_equals("$.dag_status", "running"),
+                rsql_adaptive_wait_task,
+            )
+            .when(
+                sfn.Condition.string_equals("$.dag_status", "successful"),
+                parallel_success_task,
+            )
+            .otherwise(parallel_failure_task)
+        )
+
+    def _create_rsql_sequential_load(
+        self, lambda_stack, rsql_script_express_load=None
+    ) -> sfn.IStateMachine:
+
+        # blog-sequential-iterator computed with intrinsic functions
+        rsql_sequential_iterator_pass = sfn.Pass(
+            self,
+            "rsql_sequential_iterator_pass",
+            parameters=state_logic.SEQUENTIAL_ITERATOR,
+        )
+
+        rsql_sequential_script_pass = sfn.Pass(
+            self,
+            "rsql_sequential_script_pass",
+            parameters=state_logic.SEQUENTIAL_SCRIPT,
+        )
+
+        def create_rsql_sequential_invoke_task(
+            construct_id, heartbeat_seconds_path=None
+        ):
+            return ScriptLambdaInvoke(
+                self,
+                construct_id,
+                lambda_function=lambda_stack.blog_rsql_invoke_lambda,
+                payload=sfn.TaskInput.from_object(
+                    {
+                        "token": sfn.JsonPath.task_token,
+                        "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                        "script": sfn.JsonPath.string_at("$.execution_details.script"),
+                        "workflow_execution_id": sfn.JsonPath.string_at(
+                            "$.execution_details.workflow_execution_id"
+                        ),
+                        "timeouts": sfn.JsonPath.object_at(
+                            "$.execution_details.timeouts"
+                        ),
+                    }
+                ),
+                result_path="$.result",
+                integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                heartbeat_seconds_path=heartbeat_seconds_path,
+            )
+
+        (
+            rsql_sequential_heartbeat_check,
+            rsql_sequential_lambda_invoke_task,
+            rsql_sequential_heartbeat_task,
+        ) = self._create_rsql_heartbeat_check(
+            "rsql_sequential_lambda_invoke",
+            "$.execution_details.timeouts.heartbeat_timeout_seconds",
+            create_rsql_sequential_invoke_task,
+        )
+
+        for rsql_task in [
+            rsql_sequential_lambda_invoke_task,
+            rsql_sequential_heartbeat_task,
+        ]:
+            rsql_task.add_retry(
+                errors=["WlmCapacityExceeded"],
+                interval=Duration.seconds(10),
+                backoff_rate=1.2,
+                max_attempts=30,
+            )
+            rsql_task.next(rsql_sequential_iterator_pass)
+
+        rsql_sequential_heartbeat_task.add_catch(
+            self._create_rsql_timed_out_task(
+                "rsql_sequential_timed_out_task",
+                lambda_stack,
+                "$.execution_details.script",
+            ).next(
+                sfn.Fail(
+                    self,
+                    "rsql_sequential_timed_out_failure",
+                    error="RsqlJobTimedOut",
+                    cause="No heartbeat received from the script",
+                )
             ),
-            result_path="$.result",
-            integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+            errors=["States.HeartbeatTimeout"],
+            result_path="$.error",
         )
 
-        rsql_sequential_lambda_invoke_task.next(rsql_sequential_iterator_lambda_task)
+        if rsql_script_express_load:
+            # the short scripts run in an express child execution
+            rsql_sequential_express_task = self._create_rsql_express_script_task(
+                "rsql_sequential_express_task",
+                rsql_script_express_load,
+                "$.execution_details.script",
+                "$.execution_details.workflow_execution_id",
+                "$.execution_details.timeouts",
+                result_path="$.result",
+            )
+
+            # a child execution stopped after its 5 minutes leaves its job running
+            rsql_sequential_express_task.add_catch(
+                self._create_rsql_timed_out_task(
+                    "rsql_sequential_express_cancel_task",
+                    lambda_stack,
+                    "$.execution_details.script",
+                    cancel_jobs=True,
+                ).next(
+                    sfn.Fail(
+                        self,
+                        "rsql_sequential_express_failure",
+                        error="RsqlJobFailed",
+                        cause="The script failed or its express child execution "
+                        "timed out, see the job audit table",
+                    )
+                ),
+                errors=["States.ALL"],
+                result_path="$.error",
+            )
+
+            rsql_sequential_express_task.next(rsql_sequential_iterator_pass)
+
+            rsql_sequential_invoke_state = (
+                sfn.Choice(self, "rsql_sequential_express_check")
+                .when(
+                    sfn.Condition.boolean_equals("$.execution_details.express", True),
+                    rsql_sequential_express_task,
+                )
+                .otherwise(rsql_sequential_heartbeat_check)
+            )
+        else:
+            rsql_sequential_invoke_state = rsql_sequential_heartbeat_check
 
         rsql_sequential_completed_task = sfn.Pass(
-            self, "rsql_sequential_completed_task"
+            self,
+            "rsql_sequential_completed_task",
+            parameters=state_logic.SEQUENTIAL_COMPLETED,
         )
 
-        rsql_sequential_load_definition = rsql_sequential_iterator_lambda_task.next(
+        rsql_sequential_load_definition = rsql_sequential_iterator_pass.next(
             sfn.Choice(self, "sequential_payload_count_check")
             .when(
                 sfn.Condition.number_less_than_json_path("$.index", "$.count"),
-                rsql_sequential_lambda_invoke_task,
+                rsql_sequential_script_pass.next(rsql_sequential_invoke_state),
             )
             .otherwise(rsql_sequential_completed_task)
         )
@@ -176,50 +941,24 @@ class StepFunctionStack(Stack):
         #         invocation_type = tasks.LambdaInvocationType.REQUEST_RESPONSE,
         #         output_path = '$.Payload')
 
-        rsql_master_iterator_task = tasks.LambdaInvoke(
+        # blog-master-iterator computed with intrinsic functions
+        rsql_master_stage_selector_pass = sfn.Pass(
             self,
-            "rsql_master_iterator_task",
-            lambda_function=lambda_stack.blog_master_iterator_lambda,
-            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
-            payload=sfn.TaskInput.from_object(
-                {
-                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
-                    "stage_details": sfn.JsonPath.string_at("$.stage_details"),
-                    "count": sfn.JsonPath.string_at("$.count"),
-                    "index": sfn.JsonPath.string_at("$.index"),
-                    "workflow_execution_id": sfn.JsonPath.string_at(
-                        "$.workflow_execution_id"
-                    ),
-                }
-            ),
+            "rsql_master_stage_selector_pass",
+            parameters=state_logic.MASTER_STAGE_SELECTOR,
             result_path="$.current_stage_details",
         )
 
-        rsql_generate_payload_parallel_task = tasks.LambdaInvoke(
+        rsql_master_iterator_pass = sfn.Pass(
             self,
-            "rsql_generate_payload_parallel_task",
-            lambda_function=lambda_stack.blog_payload_generator_lambda,
-            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
-            payload=sfn.TaskInput.from_object(
-                {
-                    "execution_mode": sfn.JsonPath.string_at(
-                        "$.current_stage_details.Payload.execution_details.execution_mode"
-                    ),
-                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
-                    "workflow_execution_id": sfn.JsonPath.string_at(
-                        "$.workflow_execution_id"
-                    ),
-                    "execution_details": sfn.JsonPath.string_at(
-                        "$.current_stage_details.Payload.execution_details"
-                    ),
-                }
-            ),
-            result_path="$.parallel_stage_details",
+            "rsql_master_iterator_pass",
+            parameters=state_logic.MASTER_ITERATOR,
+            result_path="$.current_stage_details",
         )
 
-        rsql_generate_payload_sequence_task = tasks.LambdaInvoke(
+        rsql_generate_payload_parallel_task = tasks.LambdaInvoke(
             self,
-            "rsql_generate_payload_sequence_task",
+            "rsql_generate_payload_parallel_task",
             lambda_function=lambda_stack.blog_payload_generator_lambda,
             invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
             payload=sfn.TaskInput.from_object(
@@ -236,7 +975,7 @@ class StepFunctionStack(Stack):
                     ),
                 }
             ),
-            result_path=sfn.JsonPath.DISCARD,
+            result_path="$.parallel_stage_details",
         )
 
         rsql_parallel_load_task = tasks.StepFunctionsStartExecution(
@@ -261,6 +1000,27 @@ class StepFunctionStack(Stack):
 
         rsql_generate_payload_parallel_task.next(rsql_parallel_load_task)
 
+        # the payload generator picks the express scripts and resolves the timeouts
+        rsql_generate_payload_sequential_task = tasks.LambdaInvoke(
+            self,
+            "rsql_generate_payload_sequential_task",
+            lambda_function=lambda_stack.blog_payload_generator_lambda,
+            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            payload=sfn.TaskInput.from_object(
+                {
+                    "execution_mode": "sequential",
+                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                    "workflow_execution_id": sfn.JsonPath.string_at(
+                        "$.workflow_execution_id"
+                    ),
+                    "execution_details": sfn.JsonPath.string_at(
+                        "$.current_stage_details.Payload.execution_details"
+                    ),
+                }
+            ),
+            result_path="$.sequential_stage_details",
+        )
+
         rsql_sequential_load_task = tasks.StepFunctionsStartExecution(
             self,
             "rsql_sequential_load_task",
@@ -270,7 +1030,13 @@ class StepFunctionStack(Stack):
             input=sfn.TaskInput.from_object(
                 {
                     "sequential": sfn.JsonPath.string_at(
-                        "$.current_stage_details.Payload.execution_details.scripts"
+                        "$.sequential_stage_details.Payload.sequential"
+                    ),
+                    "sequential_express": sfn.JsonPath.string_at(
+                        "$.sequential_stage_details.Payload.sequential_express"
+                    ),
+                    "sequential_timeouts": sfn.JsonPath.string_at(
+                        "$.sequential_stage_details.Payload.sequential_timeouts"
                     ),
                     "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
                     "workflow_execution_id": sfn.JsonPath.string_at(
@@ -282,8 +1048,6 @@ class StepFunctionStack(Stack):
             result_path=sfn.JsonPath.DISCARD,
         )
 
-        rsql_generate_payload_sequence_task.next(rsql_sequential_load_task)
-
         rsql_transform_payload_pass_state = sfn.Pass(
             self,
             "rsql_transform_payload_pass_state",
@@ -307,6 +1071,81 @@ class StepFunctionStack(Stack):
         rsql_parallel_load_task.next(rsql_transform_payload_pass_state)
         rsql_sequential_load_task.next(rsql_transform_payload_pass_state)
 
+        environment_params = self.node.try_get_context("environment")
+        if environment_params.get("sequential_runner", False):
+            # the instance runs the whole stage in order and calls back once
+            def create_rsql_sequential_runner_task(
+                construct_id, heartbeat_seconds_path=None
+            ):
+                return ScriptLambdaInvoke(
+                    self,
+                    construct_id,
+                    lambda_function=lambda_stack.blog_rsql_invoke_lambda,
+                    payload=sfn.TaskInput.from_object(
+                        {
+                            "token": sfn.JsonPath.task_token,
+                            "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                            "workflow_execution_id": sfn.JsonPath.string_at(
+                                "$.workflow_execution_id"
+                            ),
+                            "scripts": sfn.JsonPath.string_at(
+                                "$.sequential_stage_details.Payload.sequential"
+                            ),
+                            # same positions as the scripts
+                            "script_timeouts": sfn.JsonPath.string_at(
+                                "$.sequential_stage_details.Payload.sequential_timeouts"
+                            ),
+                            "state_entered_time": sfn.JsonPath.string_at(
+                                "$$.State.EnteredTime"
+                            ),
+                        }
+                    ),
+                    integration_pattern=sfn.IntegrationPattern.WAIT_FOR_TASK_TOKEN,
+                    heartbeat_seconds_path=heartbeat_seconds_path,
+                    result_path=sfn.JsonPath.DISCARD,
+                )
+
+            (
+                rsql_sequential_runner_check,
+                rsql_sequential_runner_task,
+                rsql_sequential_runner_heartbeat_task,
+            ) = self._create_rsql_heartbeat_check(
+                "rsql_sequential_runner",
+                "$.sequential_stage_details.Payload.heartbeat_timeout_seconds",
+                create_rsql_sequential_runner_task,
+            )
+            for rsql_task in [
+                rsql_sequential_runner_task,
+                rsql_sequential_runner_heartbeat_task,
+            ]:
+                rsql_task.add_retry(
+                    errors=["WlmCapacityExceeded"],
+                    interval=Duration.seconds(10),
+                    backoff_rate=1.2,
+                    max_attempts=30,
+                )
+                rsql_task.next(rsql_transform_payload_pass_state)
+            # only the script running when the heartbeats stopped is still triggered
+            rsql_sequential_runner_heartbeat_task.add_catch(
+                self._create_rsql_timed_out_task(
+                    "rsql_sequential_runner_timed_out_task",
+                    lambda_stack,
+                    "$.sequential_stage_details.Payload.sequential",
+                ).next(
+                    sfn.Fail(
+                        self,
+                        "rsql_sequential_runner_timed_out_failure",
+                        error="RsqlJobTimedOut",
+                        cause="No heartbeat received from the sequence",
+                    )
+                ),
+                errors=["States.HeartbeatTimeout"],
+                result_path="$.error",
+            )
+            rsql_generate_payload_sequential_task.next(rsql_sequential_runner_check)
+        else:
+            rsql_generate_payload_sequential_task.next(rsql_sequential_load_task)
+
         rsql_worklow_audit_table_success_task = tasks.LambdaInvoke(
             self,
             "rsql_worklow_audit_table_success_task",
@@ -333,14 +1172,16 @@ class StepFunctionStack(Stack):
             sfn.Choice(self, "rsql_master_check-count")
             .when(
                 sfn.Condition.number_less_than_json_path("$.index", "$.count"),
-                rsql_master_iterator_task,
+                rsql_master_stage_selector_pass,
             )
             .otherwise(rsql_worklow_audit_table_success_task)
         )
 
         # rsql_master_load_definition = rsql_ddb_config_parser_task\
 
-        rsql_master_load_definition = rsql_master_iterator_task.next(
+        rsql_master_load_definition = rsql_master_stage_selector_pass.next(
+            rsql_master_iterator_pass
+        ).next(
             sfn.Choice(self, "rsql_load_type_check")
             .when(
                 sfn.Condition.string_equals(
@@ -354,21 +1195,90 @@ class StepFunctionStack(Stack):
                     "$.current_stage_details.Payload.execution_details.execution_mode",
                     "sequential",
                 ),
-                rsql_generate_payload_sequence_task,
+                rsql_generate_payload_sequential_task,
             )
             .otherwise(rsql_master_load_failure)
         )
 
+        rsql_dag_definition = self._create_rsql_dag_load(
+            lambda_stack, rsql_worklow_audit_table_success_task
+        )
+
+        rsql_workflow_mode_definition = (
+            sfn.Choice(self, "rsql_workflow_mode_check")
+            .when(
+                sfn.Condition.and_(
+                    sfn.Condition.is_present("$.workflow_mode"),
+                    sfn.Condition.string_equals("$.workflow_mode", "dag"),
+                ),
+                rsql_dag_definition,
+            )
+            .otherwise(rsql_master_load_definition)
+        )
+
         rsql_master_state_machine = sfn.StateMachine(
             self,
             "rsql_master_state_machine",
             state_machine_name="rsql-master-state-machine",
-            definition=rsql_master_load_definition,
+            definition=rsql_workflow_mode_definition,
             timeout=Duration.minutes(1440),
         )
 
         return rsql_master_state_machine.state_machine_arn
 
+    def _create_rsql_dag_load(
+        self, lambda_stack, rsql_worklow_audit_table_success_task
+    ) -> sfn.IChainable:
+
+        environment_params = self.node.try_get_context("environment")
+        dag_poll_interval = int(environment_params.get("dag_poll_interval_seconds", 30))
+
+        rsql_dag_scheduler_task = tasks.LambdaInvoke(
+            self,
+            "rsql_dag_scheduler_task",
+            lambda_function=lambda_stack.blog_dag_scheduler_lambda,
+            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            output_path="$.Payload",
+        )
+
+        rsql_dag_wait_task = sfn.Wait(
+            self,
+            "rsql_dag_wait_task",
+            time=sfn.WaitTime.duration(Duration.seconds(dag_poll_interval)),
+        )
+        rsql_dag_wait_task.next(rsql_dag_scheduler_task)
+
+        rsql_dag_audit_table_failure_task = tasks.LambdaInvoke(
+            self,
+            "rsql_dag_audit_table_failure_task",
+            lambda_function=lambda_stack.blog_update_ddb_function,
+            payload=sfn.TaskInput.from_object(
+                {
+                    "status": "failed",
+                    "workflow_id": sfn.JsonPath.string_at("$.workflow_id"),
+                    "workflow_execution_id": sfn.JsonPath.string_at(
+                        "$.workflow_execution_id"
+                    ),
+                }
+            ),
+            invocation_type=tasks.LambdaInvocationType.REQUEST_RESPONSE,
+            output_path="$.Payload",
+        )
+        rsql_dag_audit_table_failure_task.next(sfn.Fail(self, "rsql_dag_failure"))
+
+        return rsql_dag_scheduler_task.next(
+            sfn.Choice(self, "rsql_dag_status_check")
+            .when(
+                sfn.Condition.string_equals("$.dag_status", "running"),
+                rsql_dag_wait_task,
+            )
+            .when(
+                sfn.Condition.string_equals("$.dag_status", "successful"),
+                rsql_worklow_audit_table_success_task,
+            )
+            .otherwise(rsql_dag_audit_table_failure_task)
+        )
+
     def _create_blog_rsql_workflow_trigger_function(
         self, lambda_stack, rsql_master_state_machine_arn
     ) -> None:
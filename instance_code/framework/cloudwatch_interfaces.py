@@ -1,10 +1,115 @@
-import json
-import sys
+import calendar
+import os
+import re
+import threading
 import time
-from datetime import datetime
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
+from .aws_clients import get_client
+
+# PutLogEvents limits
+# https://docs.aws.amazon.com/AmazonCloudWatchLogs/latest/APIReference/API_PutLogEvents.html
+MAX_BATCH_BYTES = 1048576
+MAX_BATCH_EVENTS = 10000
+MAX_BATCH_SPAN_MS = 24 * 3600 * 1000 - 1
+EVENT_OVERHEAD_BYTES = 26
+MAX_EVENT_BYTES = 256 * 1024 - EVENT_OVERHEAD_BYTES
+MAX_EVENT_AGE_MS = 14 * 24 * 3600 * 1000
+MAX_EVENT_FUTURE_MS = 2 * 3600 * 1000
+
+# batches uploaded at the same time by a shipper
+MAX_INFLIGHT_BATCHES = 4
+
+# tail mode : seconds between two uploads of the new lines, and between two reads
+FOLLOW_FLUSH_INTERVAL_SECONDS = 5
+FOLLOW_POLL_SECONDS = 0.5
+
+MONTHS = {
+    month: number
+    for number, month in enumerate(
+        ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"],
+        start=1,
+    )
+}
+
+# timestamps printed by the rsql scripts, the instances run in UTC
+DATE_CMD_PATTERN = re.compile(
+    r"\b(?:Mon|Tue|Wed|Thu|Fri|Sat|Sun) ([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2})"
+    r"(?: [A-Z]{2,5})? (\d{4})\b"
+)
+ISO_TS_PATTERN = re.compile(
+    r"\b(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?"
+)
+TIME_ONLY_PATTERN = re.compile(r"\b(\d{2}):(\d{2}):(\d{2})\.(\d{3,9})\b")
+
+
+def parse_log_timestamp(line: str, previous_ts: int) -> int:
+    """Returns the timestamp printed on a log line, in milliseconds since the epoch
+
+    :param str line: line of the rsql log
+    :param int previous_ts: timestamp of the previous line, in milliseconds
+    :return: the timestamp, None when the line has none
+    :rtype: int
+    """
+
+    try:
+        match = DATE_CMD_PATTERN.search(line)
+        if match and match.group(1) in MONTHS:
+            month, day, hour, minute, second, year = match.groups()
+            return 1000 * calendar.timegm(
+                (int(year), MONTHS[month], int(day), int(hour), int(minute), int(second))
+            )
+
+        match = ISO_TS_PATTERN.search(line)
+        if match:
+            year, month, day, hour, minute, second, fraction = match.groups()
+            return 1000 * calendar.timegm(
+                (int(year), int(month), int(day), int(hour), int(minute), int(second))
+            ) + int((fraction or "0")[:3].ljust(3, "0"))
+
+        match = TIME_ONLY_PATTERN.search(line)
+        if match and previous_ts:
+            hour, minute, second, fraction = match.groups()
+            day_start = previous_ts - previous_ts % (24 * 3600 * 1000)
+            return (
+                day_start
+                + 1000 * (int(hour) * 3600 + int(minute) * 60 + int(second))
+                + int(fraction[:3])
+            )
+    except ValueError:
+        # out of range fields, the line is not a timestamp after all
+        pass
+
+    return None
+
+
+def split_message(message: str, max_bytes: int = MAX_EVENT_BYTES) -> list:
+    """Splits a message in parts of at most max_bytes UTF-8 bytes
+
+    :param str message:
+    :param int max_bytes:
+    :return: the parts of the message, never cutting a multi-byte character
+    :rtype: list
+    """
+
+    encoded = message.encode("utf-8")
+    parts = []
+
+    while len(encoded) > max_bytes:
+        cut = max_bytes
+        # 0b10xxxxxx bytes continue a character
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+
+    parts.append(encoded.decode("utf-8"))
+
+    return parts
+
+
+def get_log_stream_name(workflow_execution_id: str, log_path: str) -> str:
+    return workflow_execution_id + "-" + log_path.split("/")[-1]
 
 
 def create_logstream(log_group: str, log_stream: str, cwlog_client: object) -> None:
@@ -22,61 +127,253 @@ def create_logstream(log_group: str, log_stream: str, cwlog_client: object) -> N
 
 
 def put_logs(
-    log_group: str, log_stream: str, log_message: str, seq_token, cwlog_client: object
-) -> None:
-
-    log_event = {
-        "logGroupName": log_group,
-        "logStreamName": log_stream,
-        "logEvents": [
-            {
-                "timestamp": int(round(time.time() * 1000)),
-                "message": log_message,
-            }
-        ],
-    }
-    if seq_token:
-        log_event["sequenceToken"] = seq_token
-
-    response = cwlog_client.put_log_events(**log_event)
-
-    seq_token = response["nextSequenceToken"]
-
-    print(seq_token)
+    log_group: str, log_stream: str, log_events: list, cwlog_client: object
+) -> dict:
+
+    """
+    Sends one batch of log events
+
+    :param str log_group cloudwatch log group name
+    :param str log_stream
+    :param list log_events chronological events, within the PutLogEvents limits
+    """
+
+    response = cwlog_client.put_log_events(
+        logGroupName=log_group, logStreamName=log_stream, logEvents=log_events
+    )
+
+    if response.get("rejectedLogEventsInfo"):
+        print(f"Log events rejected by CloudWatch : {response['rejectedLogEventsInfo']}")
+
     return response
 
 
+class LogShipper:
+    """Packs log lines into PutLogEvents batches and uploads them in the background"""
+
+    def __init__(
+        self,
+        log_group: str,
+        log_stream: str,
+        region: str,
+        start_ts: int = None,
+        max_inflight: int = MAX_INFLIGHT_BATCHES,
+    ) -> None:
+        """
+        :param str log_group:
+        :param str log_stream: existing log stream
+        :param str region
+        :param int start_ts: timestamp of the lines before the first printed one, in milliseconds
+        :param int max_inflight: batches uploaded at the same time
+        """
+        self.log_group = log_group
+        self.log_stream = log_stream
+        self.cwlog_client = get_client("logs", region)
+
+        self.last_ts = start_ts or int(time.time() * 1000)
+        self.events = []
+        self.batch_bytes = 0
+        self.sent_events = 0
+        self.sent_bytes = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight)
+        self._free_uploads = threading.BoundedSemaphore(max_inflight)
+        self._errors = []
+
+    def add_line(self, line: str) -> None:
+        """Adds a line of the log, empty lines are skipped
+
+        :param str line:
+        :return: None
+        :rtype: None
+        """
+
+        line = line.rstrip("\r\n")
+        if not line:
+            return
+
+        now = int(time.time() * 1000)
+        line_ts = parse_log_timestamp(line, self.last_ts)
+        # events must be chronological and in the time window accepted by CloudWatch
+        if line_ts and now - MAX_EVENT_AGE_MS < line_ts < now + MAX_EVENT_FUTURE_MS:
+            self.last_ts = max(self.last_ts, line_ts)
+
+        for message in split_message(line):
+            self._add_event(message)
+
+    def _add_event(self, message: str) -> None:
+
+        event_bytes = len(message.encode("utf-8")) + EVENT_OVERHEAD_BYTES
+
+        if self.events and (
+            len(self.events) == MAX_BATCH_EVENTS
+            or self.batch_bytes + event_bytes > MAX_BATCH_BYTES
+            or self.last_ts - self.events[0]["timestamp"] > MAX_BATCH_SPAN_MS
+        ):
+            self.flush()
+
+        self.events.append({"timestamp": self.last_ts, "message": message})
+        self.batch_bytes += event_bytes
+
+    def flush(self) -> None:
+        """Starts the upload of the current batch
+
+        :return: None
+        :rtype: None
+        """
+
+        if not self.events:
+            return
+
+        events, self.events = self.events, []
+        self.sent_events += len(events)
+        self.sent_bytes += self.batch_bytes
+        self.batch_bytes = 0
+
+        self._free_uploads.acquire()
+        future = self._executor.submit(
+            put_logs, self.log_group, self.log_stream, events, self.cwlog_client
+        )
+        future.add_done_callback(self._upload_done)
+
+    def _upload_done(self, future) -> None:
+        self._free_uploads.release()
+        if future.exception():
+            self._errors.append(future.exception())
+
+    def close(self) -> None:
+        """Uploads the remaining lines and waits for all the uploads
+
+        :return: None
+        :rtype: None
+        :raises: Exception raised by the first failed upload
+        """
+
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+        if self._errors:
+            raise self._errors[0]
+
+
+def read_log_lines(f, max_line_chars: int = MAX_EVENT_BYTES):
+    # a line longer than max_line_chars is returned in several parts
+    while True:
+        line = f.readline(max_line_chars)
+        if not line:
+            return
+        yield line
+
+
+def _get_start_ts(job_start_epoch: float) -> int:
+    # lines before the first printed timestamp are stamped with the job start
+    job_start_epoch = job_start_epoch or os.environ.get("RSQL_JOB_START_EPOCH")
+    return int(float(job_start_epoch) * 1000) if job_start_epoch else None
+
+
+def follow_logs(
+    log_group_name: str,
+    log_path: str,
+    workflow_execution_id: str,
+    region: str,
+    stop_event: threading.Event,
+    job_start_epoch: float = None,
+    flush_interval: float = FOLLOW_FLUSH_INTERVAL_SECONDS,
+) -> int:
+    """Streams the lines appended to a log file while the job writing it runs
+
+    :param str log_group_name:
+    :param str log_path: log file of the running job, it may not exist yet
+    :param str workflow_execution_id:
+    :param str region
+    :param Event stop_event: set when the job has exited
+    :param float job_start_epoch:
+    :param float flush_interval: seconds between two uploads
+    :return: number of events sent
+    :rtype: int
+    :raises: Exception
+    """
+
+    cwlog_client = get_client("logs", region)
+    log_stream_name = get_log_stream_name(workflow_execution_id, log_path)
+    create_logstream(log_group_name, log_stream_name, cwlog_client)
+
+    log_shipper = LogShipper(
+        log_group_name, log_stream_name, region, _get_start_ts(job_start_epoch)
+    )
+
+    # the job may not have created its log file yet
+    while not os.path.exists(log_path):
+        if stop_event.wait(FOLLOW_POLL_SECONDS):
+            break
+
+    if os.path.exists(log_path):
+        # the last line is only shipped once complete, a job may be writing it
+        partial_line = ""
+        last_flush = time.monotonic()
+
+        with open(log_path, errors="replace") as f:
+            while True:
+                is_stopping = stop_event.is_set()
+
+                for line in read_log_lines(f):
+                    partial_line += line
+                    if partial_line.endswith("\n") or len(partial_line) >= MAX_EVENT_BYTES:
+                        log_shipper.add_line(partial_line)
+                        partial_line = ""
+
+                if is_stopping:
+                    break
+
+                if time.monotonic() - last_flush >= flush_interval:
+                    log_shipper.flush()
+                    last_flush = time.monotonic()
+
+                stop_event.wait(FOLLOW_POLL_SECONDS)
+
+        log_shipper.add_line(partial_line)
+
+    log_shipper.close()
+
+    return log_shipper.sent_events
+
+
 # code execution starts here
 
 
 def send_logs(
-    log_group_name: str, log_path: str, workflow_execution_id: str, region: str
-) -> None:
-
-    cwlog_client = boto3.client("logs", region_name=region)
+    log_group_name: str,
+    log_path: str,
+    workflow_execution_id: str,
+    region: str,
+    job_start_epoch: float = None,
+) -> int:
 
-    seq_token = None
+    cwlog_client = get_client("logs", region)
 
     try:
-        log_stream_name = workflow_execution_id + "-" + log_path.split("/")[-1]
+        log_stream_name = get_log_stream_name(workflow_execution_id, log_path)
         create_logstream(log_group_name, log_stream_name, cwlog_client)
+    except cwlog_client.exceptions.ResourceAlreadyExistsException:
+        # left by a log follower which failed, its lines are sent again
+        print(f"Log stream {log_stream_name} already exists")
     except Exception as e:
         print(e)
         raise
 
     try:
-        with open(log_path) as f:
-            while True:
-                # Added this there is a threshold for  PutLogEvents API Call
-                # https://docs.aws.amazon.com/AmazonCloudWatchLogs/latest/APIReference/API_PutLogEvents.html
-                log_file = f.read(252144)
-                if not log_file:
-                    break
-                response = put_logs(
-                    log_group_name, log_stream_name, log_file, seq_token, cwlog_client
-                )
-                seq_token = response["nextSequenceToken"]
-            print("RSQL Logs Published Successfully to CloudWatch")
+        log_shipper = LogShipper(
+            log_group_name, log_stream_name, region, _get_start_ts(job_start_epoch)
+        )
+        with open(log_path, errors="replace") as f:
+            for line in read_log_lines(f):
+                log_shipper.add_line(line)
+        log_shipper.close()
+        print(
+            f"RSQL Logs Published Successfully to CloudWatch, {log_shipper.sent_events} events"
+        )
     except Exception as e:
         print("RSQL Logs not published: ", e)
         raise
+
+    return log_shipper.sent_bytes
@@ -1,5 +1,6 @@
 import logging
 import os
+import random
 import time
 from datetime import datetime
 from decimal import Decimal
@@ -10,6 +11,8 @@ from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore import client
 from botocore.exceptions import ClientError
 
+from .aws_clients import get_client, get_resource
+
 logger = logging.getLogger()
 serializer = TypeSerializer()
 deserializer = TypeDeserializer()
@@ -18,6 +21,45 @@ deserializer = TypeDeserializer()
 #################################################### DynamoDB Interfaces ##############################################
 #######################################################################################################################
 
+# existence and key schema of the tables, described once per TABLE_METADATA_TTL seconds
+TABLE_METADATA_TTL = 300
+_table_metadata = {}
+
+
+def get_table_metadata(table: str, ddb_client: object, region: str) -> dict:
+    """Returns the key schema of a table, from the cache when it is fresh
+
+    :param str table:
+    :param obj ddb_client:
+    :param str region
+    :return: attribute name mapped to key type for the keys of the table
+    :rtype: dict
+    :raises: ClientError
+    """
+    cached_metadata = _table_metadata.get((table, region))
+    if cached_metadata and cached_metadata[0] > time.monotonic():
+        return cached_metadata[1]
+
+    table_key = get_dynamodb_table_key_dict(table, ddb_client, region)
+    _table_metadata[(table, region)] = (time.monotonic() + TABLE_METADATA_TTL, table_key)
+
+    return table_key
+
+
+def invalidate_table_metadata(table: str, region: str) -> None:
+    """Drops the cached metadata of a table, the next write describes it again
+
+    :param str table:
+    :param str region
+    :return: None
+    :rtype: None
+    """
+    _table_metadata.pop((table, region), None)
+
+
+def _is_table_not_found(error: ClientError) -> bool:
+    return error.response["Error"]["Code"] == "ResourceNotFoundException"
+
 
 def check_if_tbl_exists_dynamodb(ddb_tbl: str, ddb_client: object) -> bool:
     """Checks for the existence of a Dynamodb table
@@ -37,31 +79,120 @@ def check_if_tbl_exists_dynamodb(ddb_tbl: str, ddb_client: object) -> bool:
         raise
 
 
-def put_item_into_dynamodb(ddb_tbl: str, item: dict, region: str) -> None:
+def put_item_into_dynamodb(
+    ddb_tbl: str,
+    item: dict,
+    region: str,
+    condition_expression: str = None,
+    expression_attribute_values: dict = None,
+) -> None:
     """Puts item into DynamoDB table
 
     :param str ddb_tbl:
     :param dict item:
     :param str region
+    :param str condition_expression: optional condition for the put to succeed
+    :param dict expression_attribute_values: values used by the condition
     :return: None
     :rtype: None
-    :raises: AssertionError
+    :raises: ClientError
     """
-    ddb_client = boto3.client("dynamodb", region_name=region)
-    ddb_resource = boto3.resource("dynamodb", region_name=region)
+    ddb_client = get_client("dynamodb", region)
+    ddb_resource = get_resource("dynamodb", region)
+
+    put_params = {"Item": item}
+    if condition_expression:
+        put_params["ConditionExpression"] = condition_expression
+    if expression_attribute_values:
+        put_params["ExpressionAttributeValues"] = expression_attribute_values
 
     try:
-        assert check_if_tbl_exists_dynamodb(ddb_tbl, ddb_client) is True
+        get_table_metadata(ddb_tbl, ddb_client, region)
         table = ddb_resource.Table(ddb_tbl)
-        table.put_item(Item=item)
+        table.put_item(**put_params)
     except ClientError as e:
         logger.error(e.response["Error"]["Message"])
+        if _is_table_not_found(e):
+            invalidate_table_metadata(ddb_tbl, region)
         raise
-    except AssertionError as a:
-        logger.error("Table doesn't exist")
+
+
+def get_item_from_dynamodb(ddb_tbl: str, key: dict, region: str) -> dict:
+    """Gets a single item from a DynamoDB table
+
+    :param str ddb_tbl:
+    :param dict key: primary key of the item
+    :param str region
+    :return: the item, None if it doesn't exist
+    :rtype: dict
+    :raises: ClientError
+    """
+    ddb_resource = get_resource("dynamodb", region)
+
+    try:
+        response = ddb_resource.Table(ddb_tbl).get_item(Key=key)
+        return response.get("Item")
+    except ClientError as e:
+        logger.error(e.response["Error"]["Message"])
         raise
 
 
+def _build_update_params(table: str, item: dict, table_key: dict) -> dict:
+    """Builds the UpdateItem parameters setting every non key attribute of the item
+
+    :param str table:
+    :param dict item:
+    :param dict table_key: attribute name mapped to key type for the keys of the table
+    :return: TableName, Key, UpdateExpression and ExpressionAttributeValues of the update
+    :rtype: dict
+    """
+    ddb_item = _serialize(item)
+    key = _serialize({k: item[k] for k in table_key.keys()})
+    expression_attribute_values = {}
+    for k, v in ddb_item.items():
+        if k not in table_key:
+            expression_attribute_values[":" + k] = v
+    more_params = {}
+    expression_attribute_names = {}
+    attributes = []
+    for k in item.keys():
+        if k in table_key:
+            continue
+        # if k in reserved_words:
+        #     p = ('#'+k, k)
+        #     expression_attribute_names[p[0]] = p[1]
+        else:
+            p = (k, k)
+        attributes.append(p)
+    if len(expression_attribute_names) > 0:
+        more_params["ExpressionAttributeNames"] = expression_attribute_names
+    update_expression = "set " + ",".join(
+        map(lambda x: f"{x[0]} = :{x[1]}", attributes)
+    )
+
+    return {
+        "TableName": table,
+        "Key": key,
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeValues": expression_attribute_values,
+        **more_params,
+    }
+
+
+def _merge_items_by_key(items: list, table_key: dict) -> list:
+    """Merges the items sharing a primary key, later attributes win"""
+    merged_items = {}
+    for item in items:
+        key = tuple(item[k] for k in table_key.keys())
+        merged_items.setdefault(key, {}).update(item)
+    return list(merged_items.values())
+
+
+def _backoff(attempt: int) -> None:
+    # exponential backoff with full jitter, capped at two seconds
+    time.sleep(random.uniform(0, min(0.05 * 2**attempt, 2)))
+
+
 def update_dynamodb_items(
     table: str,
     items: list,
@@ -69,51 +200,115 @@ def update_dynamodb_items(
     table_key: dict = None,
 ):
 
-    ddb_client = boto3.client("dynamodb", region_name=region)
+    ddb_client = get_client("dynamodb", region)
 
     if table_key is None:
-        table_key = get_dynamodb_table_key_dict(table, ddb_client, region)
+        table_key = get_table_metadata(table, ddb_client, region)
     item: dict
     for item in items:
-        ddb_item = _serialize(item)
-        key = _serialize({k: item[k] for k in table_key.keys()})
-        expression_attribute_values = {}
-        for k, v in ddb_item.items():
-            if k not in table_key:
-                expression_attribute_values[":" + k] = v
-        more_params = {}
-        expression_attribute_names = {}
-        attributes = []
-        for k in item.keys():
-            if k in table_key:
-                continue
-            # if k in reserved_words:
-            #     p = ('#'+k, k)
-            #     expression_attribute_names[p[0]] = p[1]
-            else:
-                p = (k, k)
-            attributes.append(p)
-        if len(expression_attribute_names) > 0:
-            more_params["ExpressionAttributeNames"] = expression_attribute_names
-        update_expression = "set " + ",".join(
-            map(lambda x: f"{x[0]} = :{x[1]}", attributes)
-        )
-        print(
-            f"""update_item(
-            TableName={table},
-            Key={key},
-            UpdateExpression={update_expression},
-            ExpressionAttributeValues={expression_attribute_values},
-            {more_params}
-        )"""
-        )
-        response = ddb_client.update_item(
-            TableName=table,
-            Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            **more_params,
-        )
+        update_params = _build_update_params(table, item, table_key)
+        print(f"update_item({update_params})")
+        try:
+            response = ddb_client.update_item(**update_params)
+        except ClientError as e:
+            if _is_table_not_found(e):
+                invalidate_table_metadata(table, region)
+            raise
+
+
+def batch_put_items_into_dynamodb(
+    table: str,
+    items: list,
+    region: str,
+    max_attempts: int = 8,
+) -> None:
+    """Puts items into a DynamoDB table with BatchWriteItem, 25 items per call
+
+    :param str table:
+    :param list items:
+    :param str region
+    :param int max_attempts: calls made for a chunk before giving up
+    :return: None
+    :rtype: None
+    :raises: ClientError, RuntimeError
+    """
+    ddb_client = get_client("dynamodb", region)
+
+    table_key = get_table_metadata(table, ddb_client, region)
+    items = _merge_items_by_key(items, table_key)
+
+    for i in range(0, len(items), 25):
+        request_items = {
+            table: [
+                {"PutRequest": {"Item": _serialize(item)}}
+                for item in items[i : i + 25]
+            ]
+        }
+
+        for attempt in range(max_attempts):
+            if attempt:
+                _backoff(attempt)
+            try:
+                response = ddb_client.batch_write_item(RequestItems=request_items)
+            except ClientError as e:
+                if _is_table_not_found(e):
+                    invalidate_table_metadata(table, region)
+                raise
+            request_items = response.get("UnprocessedItems")
+            if not request_items:
+                break
+        else:
+            raise RuntimeError(
+                f"{len(request_items[table])} items not written to {table}"
+            )
+
+
+def transact_update_dynamodb_items(
+    table: str,
+    items: list,
+    region: str,
+    max_attempts: int = 8,
+) -> None:
+    """Updates items of a DynamoDB table with TransactWriteItems, 100 items per call
+
+    :param str table:
+    :param list items:
+    :param str region
+    :param int max_attempts: calls made for a chunk before giving up
+    :return: None
+    :rtype: None
+    :raises: ClientError
+    """
+    ddb_client = get_client("dynamodb", region)
+
+    table_key = get_table_metadata(table, ddb_client, region)
+    items = _merge_items_by_key(items, table_key)
+
+    for i in range(0, len(items), 100):
+        transact_items = [
+            {"Update": _build_update_params(table, item, table_key)}
+            for item in items[i : i + 100]
+        ]
+
+        for attempt in range(max_attempts):
+            if attempt:
+                _backoff(attempt)
+            try:
+                ddb_client.transact_write_items(TransactItems=transact_items)
+                break
+            except ClientError as e:
+                if _is_table_not_found(e):
+                    invalidate_table_metadata(table, region)
+                if (
+                    e.response["Error"]["Code"]
+                    not in [
+                        "TransactionCanceledException",
+                        "ThrottlingException",
+                        "ProvisionedThroughputExceededException",
+                    ]
+                    or attempt == max_attempts - 1
+                ):
+                    raise
 
 
 def _serialize(item: dict) -> dict:
@@ -144,14 +339,23 @@ def query_dynamodb(
     :rtype: dict
     :raises: Exception
     """
-    ddb_client = boto3.client("dynamodb", region_name=region)
+    ddb_client = get_client("dynamodb", region)
 
     try:
         statement = partiql_statement
         response = ddb_client.execute_statement(
             Statement=statement, ConsistentRead=is_strong_consistency
         )
-        return response["Items"]
+        items = response["Items"]
+        # a statement reads at most 1 MB per call, the next pages follow NextToken
+        while response.get("NextToken"):
+            response = ddb_client.execute_statement(
+                Statement=statement,
+                ConsistentRead=is_strong_consistency,
+                NextToken=response["NextToken"],
+            )
+            items.extend(response["Items"])
+        return items
     except Exception as e:
         print("Incorrect partiQL statement")
         raise
@@ -159,7 +363,7 @@ def query_dynamodb(
 
 def get_dynamodb_table_key_dict(table: str, ddb_client: object, region: str):
 
-    ddb_client = boto3.client("dynamodb", region_name=region)
+    ddb_client = ddb_client or get_client("dynamodb", region)
     response = ddb_client.describe_table(TableName=table)
     result = {}
     for key_schema_record in response["Table"]["KeySchema"]:
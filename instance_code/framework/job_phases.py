@@ -0,0 +1,125 @@
+import os
+import time
+from contextlib import contextmanager
+
+# phases measured between two marks, in epoch milliseconds
+MARKED_PHASES = [
+    ("step_functions", "sfn_entered", "invoke_start"),
+    ("invoke_lambda", "invoke_start", "dispatched"),
+    ("dispatch_delivery", "dispatched", "trigger_start"),
+    ("trigger_setup", "trigger_start", "rsql_start"),
+    ("credentials", "creds_start", "creds_end"),
+    ("rsql", "rsql_start", "rsql_end"),
+    ("log_stream_flush", "rsql_end", "logs_flushed"),
+]
+
+# marks of the earliest known start of a job, in order of preference
+JOB_START_MARKS = ["sfn_entered", "invoke_start", "dispatched", "trigger_start"]
+
+#######################################################################################################################
+#################################################### Job Phases #######################################################
+#######################################################################################################################
+
+
+def now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def parse_phase_marks(phase_marks: str) -> dict:
+    """Parses marks written as name=epoch_ms, separated by commas or new lines
+
+    :param str phase_marks:
+    :return: mark name mapped to its epoch milliseconds
+    :rtype: dict
+    """
+
+    marks = {}
+
+    for mark in phase_marks.replace(",", "\n").splitlines():
+        name, _, value = mark.strip().partition("=")
+        try:
+            marks[name] = int(value)
+        except ValueError:
+            continue
+
+    return marks
+
+
+def format_phase_marks(marks: dict) -> str:
+    return ",".join(f"{name}={value}" for name, value in marks.items())
+
+
+class PhaseRecorder:
+    """Collects the phase marks of a job and times the steps of send_sfn_token.py"""
+
+    def __init__(self, marks: dict = None) -> None:
+        """
+        :param dict marks: marks already known, mark name mapped to epoch milliseconds
+        """
+        self.marks = dict(marks or {})
+        self.durations = {}
+
+    @classmethod
+    def from_environment(cls, marks: dict = None) -> "PhaseRecorder":
+        """Builds a recorder from the marks exported to the job by rsql_trigger.sh
+
+        :param dict marks: marks passed directly, e.g. by the resident agent
+        :return: the recorder
+        :rtype: PhaseRecorder
+        """
+
+        phase_recorder = cls(parse_phase_marks(os.environ.get("RSQL_PHASE_MARKS", "")))
+        phase_recorder.marks.update(marks or {})
+
+        phase_file = os.environ.get("RSQL_PHASE_FILE")
+        if phase_file and os.path.exists(phase_file):
+            with open(phase_file) as f:
+                phase_recorder.marks.update(parse_phase_marks(f.read()))
+            os.remove(phase_file)
+
+        return phase_recorder
+
+    def mark(self, name: str, epoch_ms: int = None) -> None:
+        self.marks[name] = epoch_ms or now_ms()
+
+    @contextmanager
+    def timed(self, phase: str):
+        """Adds the time spent in the block to a phase
+
+        :param str phase:
+        """
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.durations[phase] = self.durations.get(phase, 0) + (
+                time.monotonic() - start
+            ) * 1000
+
+    def breakdown(self) -> dict:
+        """Returns the duration of every known phase, plus the end to end overhead
+
+        :return: phase name mapped to milliseconds
+        :rtype: dict
+        """
+
+        phases = {}
+
+        for phase, start_mark, end_mark in MARKED_PHASES:
+            if start_mark in self.marks and end_mark in self.marks:
+                phases[phase] = self.marks[end_mark] - self.marks[start_mark]
+
+        if "rsql" in phases and "credentials" in phases:
+            phases["rsql"] -= phases["credentials"]
+
+        phases.update((phase, int(ms)) for phase, ms in self.durations.items())
+
+        job_start_ms = next(
+            (self.marks[mark] for mark in JOB_START_MARKS if mark in self.marks), None
+        )
+        if job_start_ms:
+            phases["end_to_end"] = now_ms() - job_start_ms
+            phases["overhead"] = phases["end_to_end"] - phases.get("rsql", 0)
+
+        return phases
@@ -0,0 +1,176 @@
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from typing import List
+
+from .aws_clients import get_client
+
+logger = logging.getLogger()
+
+#######################################################################################################################
+#################################################### Job Queues #######################################################
+#######################################################################################################################
+
+
+class SqsJobQueue:
+    """Job queue backed by the SQS agent queue the rsql invoke lambda sends jobs to"""
+
+    def __init__(self, queue_url: str, region: str) -> None:
+        self.queue_url = queue_url
+        self.sqs_client = get_client("sqs", region)
+
+    def receive_jobs(
+        self, max_jobs: int, wait_seconds: int, visibility_seconds: int
+    ) -> List[dict]:
+        """Receives up to max_jobs jobs, waiting at most wait_seconds for the first one
+
+        :param int max_jobs: maximum number of jobs to return, at most 10
+        :param int wait_seconds: long polling duration
+        :param int visibility_seconds: how long the jobs stay hidden from other agents
+        :return: the received jobs, with the receipt handle of their message
+        :rtype: list
+        """
+
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_jobs, 10),
+            WaitTimeSeconds=wait_seconds,
+            VisibilityTimeout=visibility_seconds,
+        )
+
+        return [
+            {**json.loads(message["Body"]), "receipt_handle": message["ReceiptHandle"]}
+            for message in response.get("Messages", [])
+        ]
+
+    def extend_jobs(self, jobs: List[dict], visibility_seconds: int) -> None:
+        """Keeps running jobs hidden from other agents for visibility_seconds more
+
+        :param list jobs: jobs returned by receive_jobs which are still running
+        :param int visibility_seconds: new visibility timeout of their messages
+        :return: None
+        :rtype: None
+        """
+
+        for i in range(0, len(jobs), 10):
+            response = self.sqs_client.change_message_visibility_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {
+                        "Id": str(j),
+                        "ReceiptHandle": job["receipt_handle"],
+                        "VisibilityTimeout": visibility_seconds,
+                    }
+                    for j, job in enumerate(jobs[i : i + 10])
+                ],
+            )
+            for failure in response.get("Failed", []):
+                logger.warning(f"Visibility of job message not extended : {failure}")
+
+    def complete_job(self, job: dict) -> None:
+        """Deletes the message of a job which has completed
+
+        :param dict job: job returned by receive_jobs
+        :return: None
+        :rtype: None
+        """
+
+        self.sqs_client.delete_message(
+            QueueUrl=self.queue_url, ReceiptHandle=job["receipt_handle"]
+        )
+
+
+class LocalJobQueue:
+    """In process stand-in for the SQS agent queue, used to run the agent without AWS"""
+
+    def __init__(self) -> None:
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._receipts = itertools.count()
+        # receipt handle mapped to the job and the time it becomes visible again
+        self.in_flight = {}
+
+    def put_job(self, job: dict) -> None:
+        """Adds a job to the queue
+
+        :param dict job: job as sent by the rsql invoke lambda
+        :return: None
+        :rtype: None
+        """
+
+        # round trip through json so that jobs look exactly like SQS messages
+        self._jobs.put(json.dumps(job))
+
+    def _requeue_expired_jobs(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for receipt_handle, (body, visible_at) in list(self.in_flight.items()):
+                if visible_at <= now:
+                    del self.in_flight[receipt_handle]
+                    self._jobs.put(body)
+
+    def receive_jobs(
+        self, max_jobs: int, wait_seconds: int, visibility_seconds: int
+    ) -> List[dict]:
+        """Receives up to max_jobs jobs, waiting at most wait_seconds for the first one
+
+        :param int max_jobs: maximum number of jobs to return
+        :param int wait_seconds: how long to wait for the first job
+        :param int visibility_seconds: how long the jobs stay in flight
+        :return: the received jobs, with their receipt handle
+        :rtype: list
+        """
+
+        self._requeue_expired_jobs()
+        bodies = []
+
+        try:
+            bodies.append(self._jobs.get(timeout=wait_seconds))
+            while len(bodies) < max_jobs:
+                bodies.append(self._jobs.get_nowait())
+        except queue.Empty:
+            pass
+
+        jobs = []
+        with self._lock:
+            for body in bodies:
+                receipt_handle = str(next(self._receipts))
+                self.in_flight[receipt_handle] = (
+                    body,
+                    time.monotonic() + visibility_seconds,
+                )
+                jobs.append({**json.loads(body), "receipt_handle": receipt_handle})
+
+        return jobs
+
+    def extend_jobs(self, jobs: List[dict], visibility_seconds: int) -> None:
+        """Keeps running jobs in flight for visibility_seconds more
+
+        :param list jobs: jobs returned by receive_jobs which are still running
+        :param int visibility_seconds: new visibility timeout of the jobs
+        :return: None
+        :rtype: None
+        """
+
+        with self._lock:
+            for job in jobs:
+                if job["receipt_handle"] in self.in_flight:
+                    body, _ = self.in_flight[job["receipt_handle"]]
+                    self.in_flight[job["receipt_handle"]] = (
+                        body,
+                        time.monotonic() + visibility_seconds,
+                    )
+
+    def complete_job(self, job: dict) -> None:
+        """Removes a job which has completed
+
+        :param dict job: job returned by receive_jobs
+        :return: None
+        :rtype: None
+        """
+
+        with self._lock:
+            self.in_flight.pop(job["receipt_handle"], None)
@@ -0,0 +1,118 @@
+import logging
+import math
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from .dynamodb_interfaces import get_item_from_dynamodb, put_item_into_dynamodb
+
+logger = logging.getLogger()
+
+# number of successful run durations kept on the statistics record
+DURATION_HISTORY_SIZE = 20
+
+# concurrent completions of the same job retry their conditional write
+MAX_WRITE_ATTEMPTS = 3
+
+#######################################################################################################################
+#################################################### Job Statistics ###################################################
+#######################################################################################################################
+
+
+def _percentile(sorted_values: list, percentile: float) -> float:
+    """Nearest rank percentile of an ascending list"""
+
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def compute_job_statistics(
+    job_name: str, previous_stats: Optional[dict], duration: float, succeeded: bool
+) -> dict:
+    """Folds one job run into the statistics record of the job
+
+    :param str job_name:
+    :param dict previous_stats: current statistics record, None for the first run
+    :param float duration: runtime of the job in seconds
+    :param bool succeeded: True if the job completed successfully
+    :return: the new statistics record
+    :rtype: dict
+    """
+
+    previous_stats = previous_stats or {}
+
+    run_count = int(previous_stats.get("run_count", 0)) + 1
+    failure_count = int(previous_stats.get("failure_count", 0)) + (0 if succeeded else 1)
+    last_durations = [float(d) for d in previous_stats.get("last_durations", [])]
+
+    # failed runs stop early, only successful runs describe the expected runtime
+    if succeeded:
+        last_durations = (last_durations + [duration])[-DURATION_HISTORY_SIZE:]
+
+    job_stats = {
+        "job_name": job_name,
+        "run_count": run_count,
+        "failure_count": failure_count,
+        "failure_rate": Decimal(str(round(failure_count / run_count, 4))),
+        "last_durations": [Decimal(str(round(d, 3))) for d in last_durations],
+        "last_status": "successful" if succeeded else "failed",
+        "last_updated_ts": datetime.utcnow().strftime("%m/%d/%Y %H:%M:%S"),
+        "version": int(previous_stats.get("version", 0)) + 1,
+    }
+
+    if last_durations:
+        sorted_durations = sorted(last_durations)
+        job_stats["p50_duration"] = Decimal(
+            str(round(_percentile(sorted_durations, 50), 3))
+        )
+        job_stats["p95_duration"] = Decimal(
+            str(round(_percentile(sorted_durations, 95), 3))
+        )
+
+    return job_stats
+
+
+def update_job_statistics(
+    job_name: str, duration: float, succeeded: bool, job_stats_tbl: str, region: str
+) -> dict:
+    """Updates the statistics record of a job with the outcome of one run
+
+    :param str job_name:
+    :param float duration: runtime of the job in seconds
+    :param bool succeeded: True if the job completed successfully
+    :param str job_stats_tbl: job statistics DynamoDB table
+    :param str region
+    :return: the statistics record written
+    :rtype: dict
+    :raises: ClientError
+    """
+
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        previous_stats = get_item_from_dynamodb(
+            job_stats_tbl, {"job_name": job_name}, region
+        )
+        job_stats = compute_job_statistics(
+            job_name, previous_stats, duration, succeeded
+        )
+
+        if previous_stats is None:
+            condition = "attribute_not_exists(job_name)"
+            condition_values = None
+        else:
+            condition = "version = :previous_version"
+            condition_values = {":previous_version": previous_stats["version"]}
+
+        try:
+            put_item_into_dynamodb(
+                job_stats_tbl, job_stats, region, condition, condition_values
+            )
+            return job_stats
+        except ClientError as e:
+            if (
+                e.response["Error"]["Code"] != "ConditionalCheckFailedException"
+                or attempt == MAX_WRITE_ATTEMPTS
+            ):
+                raise
+            logger.warning(f"Statistics of {job_name} changed concurrently, retrying")
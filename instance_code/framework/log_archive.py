@@ -0,0 +1,114 @@
+import gzip
+import os
+import shutil
+from urllib.parse import urlparse
+
+from .aws_clients import get_client
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# bytes copied at a time while compressing
+COPY_BUFFER_BYTES = 1024 * 1024
+
+#######################################################################################################################
+#################################################### Log Archive ######################################################
+#######################################################################################################################
+
+
+def compress_log(log_path: str, codec: str = "gzip") -> str:
+    """Compresses a log file next to the original, which is left untouched
+
+    :param str log_path: absolute path of the log file
+    :param str codec: gzip, or zstd when the zstandard package is installed
+    :return: path of the compressed file
+    :rtype: str
+    """
+
+    if codec == "zstd" and zstandard is None:
+        print("zstandard is not installed, the log is compressed with gzip")
+        codec = "gzip"
+
+    if codec == "zstd":
+        archive_path = log_path + ".zst"
+        with open(log_path, "rb") as src, open(archive_path, "wb") as dst:
+            zstandard.ZstdCompressor().copy_stream(src, dst)
+    else:
+        archive_path = log_path + ".gz"
+        with open(log_path, "rb") as src, gzip.open(archive_path, "wb") as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_BYTES)
+
+    return archive_path
+
+
+def upload_archive(archive_path: str, archive_uri: str, key: str, region: str) -> str:
+    """Uploads a compressed log to the archive store
+
+    :param str archive_path: compressed log file
+    :param str archive_uri: root of the archive
+    :param str key: path of the log under the root
+    :param str region
+    :return: URI of the archived log
+    :rtype: str
+    """
+
+    parsed_uri = urlparse(archive_uri)
+    prefix = parsed_uri.path.strip("/")
+    object_key = f"{prefix}/{key}" if prefix else key
+
+    if parsed_uri.scheme == "s3":
+        get_client("s3", region).upload_file(archive_path, parsed_uri.netloc, object_key)
+        return f"s3://{parsed_uri.netloc}/{object_key}"
+
+    if parsed_uri.scheme == "file":
+        target_path = os.path.join("/", parsed_uri.netloc, object_key)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        shutil.copyfile(archive_path, target_path)
+        return "file://" + target_path
+
+    raise ValueError(f"Unsupported log archive URI : {archive_uri}")
+
+
+def archive_log(
+    log_path: str,
+    workflow_execution_id: str,
+    region: str,
+    archive_uri: str = None,
+    codec: str = None,
+) -> dict:
+    """Compresses a log, uploads it under its workflow execution and removes the local copies
+
+    :param str log_path: absolute path of the log file
+    :param str workflow_execution_id:
+    :param str region
+    :param str archive_uri: root of the archive, RSQL_LOG_ARCHIVE_URI by default
+    :param str codec: gzip or zstd, RSQL_LOG_ARCHIVE_CODEC by default
+    :return: log_archive_uri, log_bytes and log_archive_bytes, empty when archiving is disabled
+    :rtype: dict
+    :raises: Exception
+    """
+
+    # both are exported to the environment of the job by the rsql invoke command
+    archive_uri = archive_uri or os.environ.get("RSQL_LOG_ARCHIVE_URI")
+    codec = codec or os.environ.get("RSQL_LOG_ARCHIVE_CODEC", "gzip")
+
+    if not archive_uri:
+        return {}
+
+    archive_path = compress_log(log_path, codec)
+
+    try:
+        key = f"{workflow_execution_id}/{os.path.basename(archive_path)}"
+        log_archive = {
+            "log_archive_uri": upload_archive(archive_path, archive_uri, key, region),
+            "log_bytes": os.path.getsize(log_path),
+            "log_archive_bytes": os.path.getsize(archive_path),
+        }
+    finally:
+        os.remove(archive_path)
+
+    os.remove(log_path)
+
+    return log_archive
@@ -0,0 +1,163 @@
+import json
+import socket
+import threading
+import time
+
+from .aws_clients import get_client
+
+# namespace of the metrics of the framework in CloudWatch
+METRICS_NAMESPACE = "RSQLOrchestration"
+
+# a metric holds at most 100 values in an EMF document
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+MAX_VALUES_PER_METRIC = 100
+
+# log events sent with this header are turned into metrics by CloudWatch Logs
+EMF_HEADER = ("x-amzn-logs-format", "json/emf")
+
+#######################################################################################################################
+################################################### Embedded Metrics ##################################################
+#######################################################################################################################
+
+
+def _add_emf_header(request, **kwargs) -> None:
+    request.headers.add_header(*EMF_HEADER)
+
+
+def put_metric_documents(documents: list, log_group: str, region: str) -> None:
+    """Sends EMF documents to the metrics log stream of the instance, in one PutLogEvents call
+
+    :param list documents: EMF documents, as JSON strings
+    :param str log_group: cloudwatch log group name
+    :param str region
+    :return: None
+    :rtype: None
+    """
+
+    cwlog_client = get_client("logs", region)
+    cwlog_client.meta.events.register(
+        "before-sign.logs.PutLogEvents", _add_emf_header, unique_id="rsql-emf-header"
+    )
+
+    log_stream = "rsql-metrics-" + socket.gethostname()
+    timestamp = int(time.time() * 1000)
+    log_events = [{"timestamp": timestamp, "message": document} for document in documents]
+
+    try:
+        cwlog_client.put_log_events(
+            logGroupName=log_group, logStreamName=log_stream, logEvents=log_events
+        )
+    except cwlog_client.exceptions.ResourceNotFoundException:
+        # first metrics sent by the instance
+        cwlog_client.create_log_stream(logGroupName=log_group, logStreamName=log_stream)
+        cwlog_client.put_log_events(
+            logGroupName=log_group, logStreamName=log_stream, logEvents=log_events
+        )
+
+
+class MetricsLogger:
+    """Aggregates metrics and sends them in CloudWatch Embedded Metric Format"""
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE) -> None:
+        """
+        :param str namespace: CloudWatch namespace of the metrics
+        """
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def put_metric(
+        self, name: str, value: float, unit: str = "Count", workflow_id: str = None
+    ) -> None:
+        """Adds a value of a metric, sent with the other values on the next flush
+
+        :param str name: metric name
+        :param float value:
+        :param str unit: CloudWatch unit, e.g. Count, Milliseconds or Bytes
+        :param str workflow_id: workflow the value belongs to
+        :return: None
+        :rtype: None
+        """
+
+        with self._lock:
+            metric = self._metrics.setdefault(
+                (workflow_id, name), {"unit": unit, "values": []}
+            )
+            metric["values"].append(value)
+
+    def documents(self) -> list:
+        """Returns the EMF documents of the buffered metrics and clears them
+
+        :return: one JSON document per workflow_id and per batch of values
+        :rtype: list
+        """
+
+        with self._lock:
+            buffered_metrics, self._metrics = self._metrics, {}
+
+        metrics_by_workflow = {}
+        for (workflow_id, name), metric in buffered_metrics.items():
+            metrics_by_workflow.setdefault(workflow_id, {})[name] = metric
+
+        documents = []
+        timestamp = int(time.time() * 1000)
+
+        for workflow_id, metrics in metrics_by_workflow.items():
+            dimensions = [["workflow_id"], []] if workflow_id else [[]]
+            batch_count = max(
+                (len(metric["values"]) - 1) // MAX_VALUES_PER_METRIC + 1
+                for metric in metrics.values()
+            )
+
+            for i in range(batch_count):
+                values = {
+                    name: metric["values"][
+                        i * MAX_VALUES_PER_METRIC : (i + 1) * MAX_VALUES_PER_METRIC
+                    ]
+                    for name, metric in metrics.items()
+                }
+                values = {name: value for name, value in values.items() if value}
+
+                document = {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": self.namespace,
+                                "Dimensions": dimensions,
+                                "Metrics": [
+                                    {"Name": name, "Unit": metrics[name]["unit"]}
+                                    for name in values
+                                ],
+                            }
+                        ],
+                    },
+                    **{
+                        name: value[0] if len(value) == 1 else value
+                        for name, value in values.items()
+                    },
+                }
+                if workflow_id:
+                    document["workflow_id"] = workflow_id
+
+                documents.append(json.dumps(document))
+
+        return documents
+
+    def flush(self, log_group: str, region: str) -> None:
+        """Sends the buffered metrics, metrics are best effort and never raise
+
+        :param str log_group: cloudwatch log group name
+        :param str region
+        :return: None
+        :rtype: None
+        """
+
+        documents = self.documents()
+        if not documents:
+            return
+
+        try:
+            put_metric_documents(documents, log_group, region)
+        except Exception as e:
+            print(f"{len(documents)} metric documents not sent : " + str(e))
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import shlex
+import sys
+import tempfile
+import time
+
+from .aws_clients import get_client
+
+# the secret keys differ between secrets created by Redshift and by hand
+SECRET_KEY_ALIASES = {
+    "USER": ["username", "db_user_name"],
+    "PASSWORD": ["password", "db_password"],
+    "DB": ["dbname", "db_dbname"],
+    "HOST": ["host", "db_host_name"],
+}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".rsql_creds_cache")
+DEFAULT_CACHE_TTL = 300
+
+#######################################################################################################################
+#################################################### Secret Cache #####################################################
+#######################################################################################################################
+
+
+def get_cache_file(secret_id: str, region: str, cache_dir: str) -> str:
+    """Returns the path of the cache file of a secret, also computed by get_redshift_creds.sh
+
+    :param str secret_id:
+    :param str region:
+    :param str cache_dir: directory holding the cache files
+    :return: absolute path of the cache file
+    :rtype: str
+    """
+
+    cache_key = hashlib.md5(f"{secret_id}-{region}".encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, cache_key + ".env")
+
+
+def parse_redshift_secret(secret_string: str) -> dict:
+    """Extracts the connection variables from the JSON secret string
+
+    :param str secret_string: SecretString of the Redshift secret
+    :return: USER, PASSWORD, DB and HOST values found in the secret
+    :rtype: dict
+    """
+
+    secret = json.loads(secret_string)
+    credentials = {}
+
+    for variable, keys in SECRET_KEY_ALIASES.items():
+        for key in keys:
+            if key in secret:
+                credentials[variable] = str(secret[key])
+                break
+
+    return credentials
+
+
+def _read_cached_version(cache_file: str) -> str:
+
+    try:
+        with open(cache_file) as f:
+            for line in f:
+                if line.startswith("# version_id="):
+                    return line.strip().split("=", 1)[1]
+    except FileNotFoundError:
+        pass
+
+    return None
+
+
+def _write_cache_file(cache_file: str, credentials: dict, version_id: str) -> None:
+
+    lines = [f"# version_id={version_id}"]
+    lines += [
+        f"export {variable}={shlex.quote(value)}"
+        for variable, value in credentials.items()
+    ]
+    # RSQL reads the password from RSPASSWORD
+    lines.append(f"export RSPASSWORD={shlex.quote(credentials.get('PASSWORD', ''))}")
+
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+
+    # written to a private temporary file and renamed, readers never see a partial file
+    fd, tmp_file = tempfile.mkstemp(dir=cache_dir)
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_file, cache_file)
+
+
+def refresh_secret_cache(
+    secret_id: str,
+    region: str,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    ttl: int = DEFAULT_CACHE_TTL,
+) -> str:
+    """Makes sure the cache file of a secret holds the current secret version
+
+    :param str secret_id:
+    :param str region:
+    :param str cache_dir: directory holding the cache files
+    :param int ttl: seconds a cache file is used without checking the secret version
+    :return: path of the cache file
+    :rtype: str
+    """
+
+    cache_file = get_cache_file(secret_id, region, cache_dir)
+
+    # another job may have refreshed the file while this one waited for the lock
+    if os.path.exists(cache_file) and time.time() - os.path.getmtime(cache_file) < ttl:
+        return cache_file
+
+    secretsmanager_client = get_client("secretsmanager", region)
+
+    cached_version_id = _read_cached_version(cache_file)
+    if cached_version_id:
+        versions = secretsmanager_client.describe_secret(SecretId=secret_id).get(
+            "VersionIdsToStages", {}
+        )
+        if "AWSCURRENT" in versions.get(cached_version_id, []):
+            os.utime(cache_file)
+            return cache_file
+
+    response = secretsmanager_client.get_secret_value(SecretId=secret_id)
+    _write_cache_file(
+        cache_file, parse_redshift_secret(response["SecretString"]), response["VersionId"]
+    )
+
+    return cache_file
+
+
+if __name__ == "__main__":
+    # python3 -m framework.secret_cache <secret_id> <region>, prints the cache file path
+    print(
+        refresh_secret_cache(
+            sys.argv[1],
+            sys.argv[2],
+            os.environ.get("RSQL_CREDS_CACHE_DIR", DEFAULT_CACHE_DIR),
+            int(os.environ.get("RSQL_CREDS_CACHE_TTL", DEFAULT_CACHE_TTL)),
+        )
+    )
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+from typing import List
+from urllib.request import Request, urlopen
+
+from botocore.exceptions import ClientError
+
+from .aws_clients import get_client
+from .dynamodb_interfaces import _serialize
+
+# instance metadata service, used when no instance id is given
+IMDS_URL = "http://169.254.169.254/latest"
+
+# processes which hold a fleet slot : a single job, or a whole sequence
+FLEET_JOB_COMMANDS = ("rsql_trigger.sh", "rsql_sequence.py")
+
+#######################################################################################################################
+#################################################### Worker Fleet #####################################################
+#######################################################################################################################
+
+
+def get_instance_id() -> str:
+    """Returns the id of the EC2 instance, read from the instance metadata service (IMDSv2)
+
+    :return: instance id
+    :rtype: str
+    """
+
+    token_request = Request(
+        IMDS_URL + "/api/token",
+        method="PUT",
+        headers={"X-aws-ec2-metadata-token-ttl-seconds": "60"},
+    )
+    with urlopen(token_request, timeout=2) as response:
+        token = response.read().decode()
+
+    id_request = Request(
+        IMDS_URL + "/meta-data/instance-id",
+        headers={"X-aws-ec2-metadata-token": token},
+    )
+    with urlopen(id_request, timeout=2) as response:
+        return response.read().decode()
+
+
+def register_instance(fleet_tbl: str, instance_id: str, max_slots: int, region: str) -> None:
+    """Adds an instance to the fleet, or makes it active again with a new slot count
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param int max_slots: jobs the instance runs at the same time
+    :param str region
+    :return: None
+    :rtype: None
+    """
+
+    get_client("dynamodb", region).update_item(
+        TableName=fleet_tbl,
+        Key=_serialize({"instance_id": instance_id}),
+        UpdateExpression=(
+            "SET max_slots = :max_slots, fleet_status = :active,"
+            " heartbeat_ts = :now,"
+            " used_slots = if_not_exists(used_slots, :zero),"
+            " reserved_runtime = if_not_exists(reserved_runtime, :zero)"
+        ),
+        ExpressionAttributeValues={
+            ":max_slots": {"N": str(max_slots)},
+            ":active": {"S": "active"},
+            ":now": {"N": str(int(time.time()))},
+            ":zero": {"N": "0"},
+        },
+    )
+
+
+def get_running_fleet_jobs(fleet_tbl: str) -> List[float]:
+    """Returns the expected runtimes of the fleet jobs running on this instance, read
+    from the environment of their processes
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :return: expected runtime of every running job, in seconds
+    :rtype: list
+    """
+
+    expected_runtimes = []
+
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                cmdline = f.read().decode(errors="replace")
+            if not any(command in cmdline for command in FLEET_JOB_COMMANDS):
+                continue
+            with open(f"/proc/{pid}/environ", "rb") as f:
+                environ = dict(
+                    variable.split("=", 1)
+                    for variable in f.read().decode(errors="replace").split("\0")
+                    if "=" in variable
+                )
+        except OSError:
+            # the process ended meanwhile
+            continue
+
+        if environ.get("RSQL_FLEET_TABLE") == fleet_tbl and environ.get(
+            "RSQL_EXPECTED_RUNTIME"
+        ):
+            expected_runtimes.append(float(environ["RSQL_EXPECTED_RUNTIME"]))
+
+    return expected_runtimes
+
+
+def send_fleet_heartbeat(fleet_tbl: str, instance_id: str, region: str) -> None:
+    """Marks the instance alive and resets its slot counts to the jobs actually running
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param str region
+    :return: None
+    :rtype: None
+    :raises: ClientError
+    """
+
+    expected_runtimes = get_running_fleet_jobs(fleet_tbl)
+
+    get_client("dynamodb", region).update_item(
+        TableName=fleet_tbl,
+        Key=_serialize({"instance_id": instance_id}),
+        UpdateExpression=(
+            "SET heartbeat_ts = :now, used_slots = :used_slots,"
+            " reserved_runtime = :reserved_runtime"
+        ),
+        ConditionExpression="attribute_exists(instance_id)",
+        ExpressionAttributeValues={
+            ":now": {"N": str(int(time.time()))},
+            ":used_slots": {"N": str(len(expected_runtimes))},
+            ":reserved_runtime": {"N": str(int(sum(expected_runtimes)))},
+        },
+    )
+    print(f"{instance_id} runs {len(expected_runtimes)} fleet jobs")
+
+
+def set_fleet_status(fleet_tbl: str, instance_id: str, fleet_status: str, region: str) -> None:
+    """Marks an instance active or draining, a draining instance gets no new job
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param str fleet_status: active or draining
+    :param str region
+    :return: None
+    :rtype: None
+    """
+
+    get_client("dynamodb", region).update_item(
+        TableName=fleet_tbl,
+        Key=_serialize({"instance_id": instance_id}),
+        UpdateExpression="SET fleet_status = :fleet_status",
+        ConditionExpression="attribute_exists(instance_id)",
+        ExpressionAttributeValues={":fleet_status": {"S": fleet_status}},
+    )
+
+
+def release_slot(
+    fleet_tbl: str, instance_id: str, expected_runtime: float, region: str
+) -> None:
+    """Gives back the slot the rsql invoke lambda took for a job
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param float expected_runtime: expected runtime the slot was reserved with
+    :param str region
+    :return: None
+    :rtype: None
+    :raises: ClientError
+    """
+
+    try:
+        get_client("dynamodb", region).update_item(
+            TableName=fleet_tbl,
+            Key=_serialize({"instance_id": instance_id}),
+            UpdateExpression="ADD used_slots :one, reserved_runtime :runtime",
+            ConditionExpression="used_slots > :zero",
+            ExpressionAttributeValues={
+                ":one": {"N": "-1"},
+                ":runtime": {"N": str(-int(float(expected_runtime)))},
+                ":zero": {"N": "0"},
+            },
+        )
+    except ClientError as e:
+        # the slot count was reset while the job ran
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+if __name__ == "__main__":
+    # python3 -m framework.worker_fleet register <fleet_table> <max_slots> <region> [instance_id]
+    # python3 -m framework.worker_fleet drain <fleet_table> <region> [instance_id]
+    # python3 -m framework.worker_fleet heartbeat <fleet_table> <region> [instance_id]
+    if sys.argv[1] == "register":
+        register_instance(
+            sys.argv[2],
+            sys.argv[5] if len(sys.argv) > 5 else get_instance_id(),
+            int(sys.argv[3]),
+            sys.argv[4],
+        )
+    elif sys.argv[1] == "drain":
+        set_fleet_status(
+            sys.argv[2],
+            sys.argv[4] if len(sys.argv) > 4 else get_instance_id(),
+            "draining",
+            sys.argv[3],
+        )
+    elif sys.argv[1] == "heartbeat":
+        send_fleet_heartbeat(
+            sys.argv[2],
+            sys.argv[4] if len(sys.argv) > 4 else get_instance_id(),
+            sys.argv[3],
+        )
+    else:
+        sys.exit(
+            f"Unknown command {sys.argv[1]}, expected register, drain or heartbeat"
+        )
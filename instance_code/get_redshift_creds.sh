@@ -10,19 +10,32 @@ fi
 # default region is us-east-1
 REGION=${2:-'us-east-1'}
 
-SECRET=$(echo $(aws secretsmanager get-secret-value --secret-id $1 --query 'SecretString' --output text --region $REGION)| awk '{print substr($0, 2, length($0) - 2)}')
-
-USER=$(echo $SECRET | awk -F'"username":|"db_user_name":' '{print $2}'| cut -d, -f 1 | awk '{gsub(/^[ \t]+| [ \t]+$/,""); print}' | awk '{print substr($0, 2, length($0) - 2)}')
-
-PASSWORD=$(echo $SECRET | awk -F'"password":|"db_password":' '{print $2}'| cut -d, -f 1 | awk '{gsub(/^[ \t]+| [ \t]+$/,""); print}'| awk '{print substr($0, 2, length($0) - 2)}')
+# The credentials are cached on the instance in a private file, as export statements.
+# A cache file younger than RSQL_CREDS_CACHE_TTL seconds is sourced without any AWS call,
+# an older one is refreshed by framework/secret_cache.py when the secret version changed.
+CREDS_CACHE_DIR=${RSQL_CREDS_CACHE_DIR:-~/.rsql_creds_cache}
+CREDS_CACHE_TTL=${RSQL_CREDS_CACHE_TTL:-300}
+CREDS_CACHE_FILE=$CREDS_CACHE_DIR/$(echo -n "$1-$REGION" | md5sum | cut -d' ' -f1).env
+
+# phase marks of the job, see rsql_trigger.sh
+[[ -n "$RSQL_PHASE_FILE" ]] && echo "creds_start=$(date +%s%3N)" >> $RSQL_PHASE_FILE
+
+if [[ ! -f $CREDS_CACHE_FILE || $(( $(date +%s) - $(stat -c %Y $CREDS_CACHE_FILE) )) -ge $CREDS_CACHE_TTL ]] ; then
+    INSTANCE_CODE_DIR=$(dirname "${BASH_SOURCE[0]}")
+    mkdir -p -m 700 $CREDS_CACHE_DIR
+
+    # concurrent jobs wait for a single refresh instead of all calling Secrets Manager
+    RSQL_CREDS_CACHE_DIR=$CREDS_CACHE_DIR RSQL_CREDS_CACHE_TTL=$CREDS_CACHE_TTL PYTHONPATH=$INSTANCE_CODE_DIR \
+        flock $CREDS_CACHE_FILE.lock python3 -m framework.secret_cache $1 $REGION > /dev/null
+fi
 
-DB=$(echo $SECRET | awk -F'"dbname":|"db_dbname":' '{print $2}'| cut -d, -f 1 | awk '{gsub(/^[ \t]+| [ \t]+$/,""); print}' | awk '{print substr($0, 2, length($0) - 2)}')
+# exports USER, PASSWORD, DB, HOST and RSPASSWORD
+source $CREDS_CACHE_FILE
 
-HOST=$(echo $SECRET |  awk -F'"host":|"db_host_name":' '{print $2}'| cut -d, -f 1 | awk '{gsub(/^[ \t]+| [ \t]+$/,""); print}' | awk '{print substr($0, 2, length($0) - 2)}')
+[[ -n "$RSQL_PHASE_FILE" ]] && echo "creds_end=$(date +%s%3N)" >> $RSQL_PHASE_FILE
 
 
 # Refer ::https://docs.aws.amazon.com/redshift/latest/mgmt/rsql-query-tool-getting-started.html
-export RSPASSWORD=$PASSWORD
 export ODBCINI=~/.odbc.ini
 export ODBCSYSINI=/opt/amazon/redshiftodbc/Setup
 export AMAZONREDSHIFTODBCINI=/opt/amazon/redshiftodbc/lib/64/amazon.redshiftodbc.ini
@@ -0,0 +1,397 @@
+import argparse
+import os
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from framework.audit_operations import AuditWriter
+from framework.aws_clients import get_client
+from framework.cloudwatch_interfaces import follow_logs
+from framework.job_phases import now_ms, parse_phase_marks
+from framework.job_queue import SqsJobQueue
+from framework.metrics import MetricsLogger
+from rsql_cancel import cancel_jobs, get_job_id
+from rsql_sequence import create_job_audit_details, run_sequence
+from send_heartbeat import AuditHeartbeatSender, HeartbeatSender
+from send_sfn_token import NO_TASK_TOKEN, send_token
+
+# seconds a receive call waits for jobs before checking for a shutdown request
+RECEIVE_WAIT_SECONDS = 20
+
+# seconds between two writes of the buffered job audit records
+AUDIT_FLUSH_INTERVAL_SECONDS = 2
+
+# seconds the message of a received job stays hidden, extended while the job runs
+JOB_VISIBILITY_SECONDS = 120
+
+# seconds a script which timed out gets to exit after its termination, as rsql_trigger.sh
+KILL_AFTER_SECONDS = 30
+
+
+class RsqlAgent:
+    """Resident worker which pulls rsql jobs from a queue and runs them in a pool"""
+
+    def __init__(
+        self, job_queue, instance_code_dir: str, region: str, max_workers: int
+    ) -> None:
+        self.job_queue = job_queue
+        self.instance_code_dir = instance_code_dir
+        self.region = region
+        self.max_workers = max_workers
+
+        self.sfn_client = get_client("stepfunctions", region)
+        self.audit_writer = AuditWriter(region)
+        self.metrics = MetricsLogger()
+        # log group the metrics are sent to, the one of the jobs
+        self.metrics_log_group = None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.free_slots = threading.BoundedSemaphore(max_workers)
+        self.stop_event = threading.Event()
+        # jobs whose queue message has to stay hidden until they complete
+        self.running_jobs = {}
+        self.running_jobs_lock = threading.Lock()
+        self.jobs_done = threading.Event()
+
+    def stop(self, *args) -> None:
+        print("Stopping the rsql agent, waiting for the running jobs")
+        self.stop_event.set()
+
+    def _flush_audit_records(self) -> None:
+        if not len(self.audit_writer):
+            return
+        audit_write_start = time.monotonic()
+        try:
+            self.audit_writer.flush()
+            self.metrics.put_metric(
+                "AuditWriteLatency",
+                (time.monotonic() - audit_write_start) * 1000,
+                "Milliseconds",
+            )
+        except Exception as e:
+            print("Job audit records not written, retrying at the next flush : " + str(e))
+
+    def _flush_metrics(self) -> None:
+        if self.metrics_log_group:
+            self.metrics.flush(self.metrics_log_group, self.region)
+
+    def _flush_audit_records_periodically(self) -> None:
+        while not self.stop_event.wait(AUDIT_FLUSH_INTERVAL_SECONDS):
+            self._flush_audit_records()
+            self._flush_metrics()
+
+    def _extend_running_jobs_periodically(self) -> None:
+        while not self.jobs_done.wait(JOB_VISIBILITY_SECONDS // 3):
+            with self.running_jobs_lock:
+                running_jobs = list(self.running_jobs.values())
+            if not running_jobs:
+                continue
+            try:
+                self.job_queue.extend_jobs(running_jobs, JOB_VISIBILITY_SECONDS)
+            except Exception as e:
+                print("Job messages not extended : " + str(e))
+
+    def run(self) -> None:
+
+        print(f"RSQL agent started with {self.max_workers} workers")
+
+        audit_flusher = threading.Thread(
+            target=self._flush_audit_records_periodically, daemon=True
+        )
+        audit_flusher.start()
+        visibility_extender = threading.Thread(
+            target=self._extend_running_jobs_periodically, daemon=True
+        )
+        visibility_extender.start()
+
+        while not self.stop_event.is_set():
+            # wait for one free worker, then take as many jobs as there are free workers
+            if not self.free_slots.acquire(timeout=1):
+                continue
+            reserved_slots = 1
+            while reserved_slots < self.max_workers and self.free_slots.acquire(
+                blocking=False
+            ):
+                reserved_slots += 1
+
+            try:
+                jobs = self.job_queue.receive_jobs(
+                    reserved_slots, RECEIVE_WAIT_SECONDS, JOB_VISIBILITY_SECONDS
+                )
+            except Exception as e:
+                print("Unable to receive jobs : " + str(e))
+                jobs = []
+                time.sleep(1)
+
+            for job in jobs:
+                with self.running_jobs_lock:
+                    self.running_jobs[id(job)] = job
+                self.executor.submit(self._run_job_in_slot, job)
+
+            for _ in range(reserved_slots - len(jobs)):
+                self.free_slots.release()
+
+        self.executor.shutdown(wait=True)
+        self.jobs_done.set()
+        visibility_extender.join()
+        audit_flusher.join()
+        self._flush_audit_records()
+        self._flush_metrics()
+        print("RSQL agent stopped")
+
+    def _run_job_in_slot(self, job: dict) -> None:
+        try:
+            if "jobs" in job:
+                self.run_sequence_job(job)
+            else:
+                self.run_job(job)
+        except Exception as e:
+            print(f"Job {job.get('script')} failed in the agent : {e}")
+        finally:
+            self._complete_job(job)
+            self.free_slots.release()
+
+    def _complete_job(self, job: dict) -> None:
+        with self.running_jobs_lock:
+            del self.running_jobs[id(job)]
+        try:
+            self.job_queue.complete_job(job)
+        except Exception as e:
+            # the message becomes visible again and the job runs a second time
+            print(f"Message of job {job.get('script')} not deleted : {e}")
+
+    def run_sequence_job(self, sequence_job: dict) -> list:
+        """Runs the scripts of a sequential stage in one worker and reports the stage once
+
+        :param dict sequence_job: sequence as sent by the rsql invoke lambda
+        :return: job name and exit code of every script which ran
+        :rtype: list
+        """
+
+        jobs = {job["script"]: job for job in sequence_job["jobs"]}
+        heartbeat_sender = self._start_heartbeats(sequence_job, list(jobs))
+
+        def run_sequence_script(position: int, job_name: str):
+            job = jobs[job_name]
+            self.audit_writer.add_record(
+                create_job_audit_details(
+                    job_name,
+                    job["workflow_id"],
+                    job["workflow_execution_id"],
+                    sequence_job["instance_id"],
+                ),
+                job["job_audit_table"],
+            )
+            return self.run_job(job, heartbeat_sender), job["log_file"]
+
+        try:
+            return run_sequence(
+                sequence_job["token"],
+                [job["script"] for job in sequence_job["jobs"]],
+                run_sequence_script,
+                self.sfn_client,
+                heartbeat_sender,
+            )
+        finally:
+            if heartbeat_sender:
+                heartbeat_sender.stop()
+
+    def _start_heartbeats(self, job: dict, job_names: list):
+        # the scripts of a sequence get the heartbeats of the sequence
+        if not job.get("heartbeat_seconds"):
+            return None
+
+        def on_expired():
+            cancel_jobs(job["workflow_execution_id"], job_names)
+
+        # the jobs of the dag workflows have no task
+        if job["token"] == NO_TASK_TOKEN:
+            return AuditHeartbeatSender(
+                job["job_audit_table"],
+                job_names,
+                job["workflow_execution_id"],
+                job["heartbeat_seconds"],
+                get_client("dynamodb", self.region),
+                on_expired=on_expired,
+            ).start()
+
+        return HeartbeatSender(
+            job["token"],
+            job["heartbeat_seconds"],
+            self.sfn_client,
+            on_expired=on_expired,
+        ).start()
+
+    def run_job(self, job: dict, sequence_heartbeat_sender=None) -> int:
+        """Runs one rsql script and reports its outcome
+
+        :param dict job: job as sent by the rsql invoke lambda
+        :param obj sequence_heartbeat_sender: HeartbeatSender of the sequence of the job
+        :return: exit code of the rsql script
+        :rtype: int
+        """
+
+        job_start_epoch = time.time()
+        print(f"Running {job['script']} for {job['workflow_execution_id']}")
+        self.metrics_log_group = job["log_group"]
+
+        phase_marks = dict(job.get("phase_marks", {}))
+        phase_marks["trigger_start"] = now_ms()
+
+        cmd = ["sh", "+x", job["script_path"], self.instance_code_dir, job["secret_id"]]
+        cmd.extend(job.get("script_args", []))
+
+        # get_redshift_creds.sh appends the marks of the credential fetch to this file
+        phase_file = job["log_file"] + ".phases"
+        script_env = dict(
+            os.environ,
+            RSQL_PHASE_FILE=phase_file,
+            # marks the processes of the script for rsql_cancel.py
+            RSQL_JOB_ID=get_job_id(job["workflow_execution_id"], job["script"]),
+        )
+
+        with open(job["log_file"], "w") as log_file:
+            log_follower = (
+                LogFollower(job, self.region, job_start_epoch)
+                if job.get("stream_logs")
+                else None
+            )
+            heartbeat_sender = self._start_heartbeats(job, [job["script"]])
+            phase_marks["rsql_start"] = now_ms()
+            rsqlexitcode, timed_out = self._run_script(
+                job, cmd, log_file, script_env
+            )
+            phase_marks["rsql_end"] = now_ms()
+
+        print(f"{job['script']} exited with {rsqlexitcode}")
+
+        # the heartbeats of a sequence go on with its next script
+        task_expired = (heartbeat_sender is not None and heartbeat_sender.stop()) or (
+            sequence_heartbeat_sender is not None and sequence_heartbeat_sender.expired
+        )
+        if task_expired:
+            print(f"The task of {job['script']} expired, the script was terminated")
+            timed_out = True
+
+        logs_streamed = log_follower.stop() if log_follower else False
+        if logs_streamed:
+            phase_marks["logs_flushed"] = now_ms()
+
+        if os.path.exists(phase_file):
+            with open(phase_file) as f:
+                phase_marks.update(parse_phase_marks(f.read()))
+            os.remove(phase_file)
+
+        send_token(
+            job["token"],
+            job["script"],
+            str(rsqlexitcode),
+            job["log_file"],
+            job["workflow_execution_id"],
+            job["job_audit_table"],
+            job["log_group"],
+            self.region,
+            job_stats_tbl=job.get("job_stats_table"),
+            job_start_epoch=job_start_epoch,
+            sfn_client=self.sfn_client,
+            audit_writer=self.audit_writer,
+            logs_streamed=logs_streamed,
+            log_archive_uri=job.get("log_archive_uri"),
+            phase_marks=phase_marks,
+            workflow_id=job["workflow_id"],
+            metrics_logger=self.metrics,
+            timed_out=timed_out,
+        )
+
+        return rsqlexitcode
+
+    def _run_script(self, job: dict, cmd: list, log_file, script_env: dict) -> tuple:
+
+        process = subprocess.Popen(
+            cmd, stdout=log_file, stderr=subprocess.STDOUT, env=script_env
+        )
+        try:
+            return process.wait(timeout=job.get("timeout_seconds") or None), False
+        except subprocess.TimeoutExpired:
+            print(f"{job['script']} timed out after {job['timeout_seconds']} seconds")
+
+        # the rsql processes of the script are terminated as for a cancelled job
+        cancel_jobs(job["workflow_execution_id"], [job["script"]])
+        try:
+            return process.wait(timeout=KILL_AFTER_SECONDS), True
+        except subprocess.TimeoutExpired:
+            process.kill()
+            return process.wait(), True
+
+
+class LogFollower:
+    """Streams the log of a running job to CloudWatch from a background thread"""
+
+    def __init__(self, job: dict, region: str, job_start_epoch: float) -> None:
+        self.stop_event = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(
+            target=self._follow, args=(job, region, job_start_epoch), daemon=True
+        )
+        self.thread.start()
+
+    def _follow(self, job: dict, region: str, job_start_epoch: float) -> None:
+        try:
+            follow_logs(
+                job["log_group"],
+                job["log_file"],
+                job["workflow_execution_id"],
+                region,
+                self.stop_event,
+                job_start_epoch,
+            )
+        except Exception as e:
+            self.error = e
+
+    def stop(self) -> bool:
+        """Ships the rest of the log
+
+        :return: True when the whole log was streamed
+        :rtype: bool
+        """
+
+        self.stop_event.set()
+        self.thread.join()
+
+        if self.error:
+            print(f"Log not streamed, it is uploaded at the end : {self.error}")
+
+        return self.error is None
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description="Resident RSQL worker agent")
+    parser.add_argument(
+        "--queue-url",
+        required=True,
+        help="SQS queue the rsql invoke lambda sends jobs to",
+    )
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument(
+        "--instance-code-dir", default=os.path.dirname(os.path.abspath(__file__))
+    )
+    args = parser.parse_args()
+
+    agent = RsqlAgent(
+        SqsJobQueue(args.queue_url, args.region),
+        args.instance_code_dir,
+        args.region,
+        args.max_workers,
+    )
+
+    signal.signal(signal.SIGTERM, agent.stop)
+    signal.signal(signal.SIGINT, agent.stop)
+
+    agent.run()
+
+
+if __name__ == "__main__":
+    main()
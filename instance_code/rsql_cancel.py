@@ -0,0 +1,88 @@
+import argparse
+import os
+import signal
+
+# set on the rsql script of every job, inherited by the rsql processes
+JOB_ID_ENV = "RSQL_JOB_ID"
+
+
+def get_job_id(workflow_execution_id, job_name) -> str:
+    return f"{workflow_execution_id}/{job_name}"
+
+
+def read_process_env(pid, proc_dir="/proc") -> dict:
+
+    with open(os.path.join(proc_dir, str(pid), "environ"), "rb") as f:
+        entries = f.read().split(b"\0")
+
+    return dict(
+        entry.decode(errors="replace").split("=", 1) for entry in entries if b"=" in entry
+    )
+
+
+def find_job_processes(job_ids, proc_dir="/proc") -> dict:
+    """Finds the running processes of the jobs
+
+    :param set job_ids: workflow_execution_id/job_name of the jobs
+    :param str proc_dir:
+    :return: pid mapped to the job id of its job
+    :rtype: dict
+    """
+
+    job_processes = {}
+
+    for entry in os.listdir(proc_dir):
+        if not entry.isdigit():
+            continue
+        try:
+            job_id = read_process_env(entry, proc_dir).get(JOB_ID_ENV)
+        except OSError:
+            # the process ended or belongs to another user
+            continue
+        if job_id in job_ids:
+            job_processes[int(entry)] = job_id
+
+    return job_processes
+
+
+def cancel_jobs(workflow_execution_id, job_names, proc_dir="/proc") -> dict:
+    """Terminates the rsql processes of running jobs
+
+    :param str workflow_execution_id:
+    :param list job_names:
+    :param str proc_dir:
+    :return: job name mapped to the pids terminated
+    :rtype: dict
+    """
+
+    job_ids = {get_job_id(workflow_execution_id, job_name): job_name for job_name in job_names}
+    cancelled = {job_name: [] for job_name in job_names}
+
+    for pid, job_id in find_job_processes(set(job_ids), proc_dir).items():
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            continue
+        cancelled[job_ids[job_id]].append(pid)
+
+    return cancelled
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(
+        description="Terminates the rsql processes of the running jobs of a workflow execution"
+    )
+    parser.add_argument("--workflow-execution-id", required=True)
+    parser.add_argument("scripts", nargs="+")
+    args = parser.parse_args()
+
+    for job_name, pids in cancel_jobs(args.workflow_execution_id, args.scripts).items():
+        if pids:
+            print(f"{job_name} cancelled, terminated processes : {pids}")
+        else:
+            print(f"{job_name} not running")
+
+
+if __name__ == "__main__":
+    main()
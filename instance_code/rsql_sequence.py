@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import subprocess
+from datetime import datetime
+
+from framework.audit_operations import (
+    JOB_AUDIT_TABLE_KEY,
+    add_record_in_file_audit_tbl,
+    update_records_in_file_audit_tbl,
+)
+from framework.aws_clients import get_client
+from framework.worker_fleet import release_slot
+from rsql_cancel import cancel_jobs
+from send_heartbeat import HeartbeatSender
+from send_sfn_token import NO_TASK_TOKEN, get_error_message
+
+# the phase marks of the rsql invoke lambda belong to the first script of the sequence
+FIRST_SCRIPT_ENV = ["RSQL_PHASE_MARKS"]
+
+# the sequence holds one fleet slot, given back once, when its last script ended
+SEQUENCE_FLEET_ENV = ["RSQL_FLEET_TABLE", "RSQL_EXPECTED_RUNTIME"]
+
+# the sequence sends the heartbeats of the stage, its scripts run without task token
+SEQUENCE_HEARTBEAT_ENV = "RSQL_HEARTBEAT_SECONDS"
+
+# a task failure cause holds at most 32768 characters
+MAX_CAUSE_CHARS = 32768
+
+
+def create_job_audit_details(
+    job_name, workflow_id, workflow_execution_id, instance_id
+) -> dict:
+
+    # the record the rsql invoke lambda adds when it starts a single script
+    return {
+        "job_name": job_name,
+        "workflow_id": workflow_id,
+        "workflow_execution_id": workflow_execution_id,
+        "execution_status": "triggered",
+        "execution_start_ts": datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S"),
+        "instance_id": instance_id,
+        "ssm_command_id": "NA",
+    }
+
+
+def run_sequence(
+    token, job_names, run_script, sfn_client, heartbeat_sender=None
+) -> list:
+    """Runs the scripts of a sequential stage one after the other and reports the stage once
+
+    :param str token: step function callback token of the stage
+    :param list job_names: scripts of the stage, in execution order
+    :param run_script: runs a script, returns its exit code and log file name
+    :param obj sfn_client:
+    :param obj heartbeat_sender: HeartbeatSender of the task of the stage
+    :return: job name and exit code of every script which ran
+    :rtype: list
+    """
+
+    results = []
+
+    for position, job_name in enumerate(job_names):
+        try:
+            exit_code, log_file_name = run_script(position, job_name)
+        except Exception as e:
+            # the stage is reported in any case, the state machine would wait until its timeout
+            sfn_client.send_task_failure(
+                taskToken=token,
+                error="SequenceError",
+                cause=f"{job_name} not run : {e}"[:MAX_CAUSE_CHARS],
+            )
+            raise
+
+        results.append({"job_name": job_name, "exit_code": exit_code})
+        print(f"{job_name} exited with {exit_code}")
+
+        if heartbeat_sender and heartbeat_sender.expired:
+            # the state machine has stopped waiting for the stage, there is no callback
+            print(f"The task of the sequence expired while {job_name} ran")
+            return results
+
+        if exit_code != 0:
+            not_run = job_names[position + 1 :]
+            try:
+                error_msg = get_error_message(log_file_name)
+            except Exception:
+                error_msg = ""
+
+            sfn_client.send_task_failure(
+                taskToken=token,
+                error=str(exit_code),
+                cause=(
+                    f"{job_name} failed, {len(not_run)} scripts of the sequence not run\n"
+                    + error_msg
+                )[:MAX_CAUSE_CHARS],
+            )
+            return results
+
+    sfn_client.send_task_success(
+        taskToken=token,
+        output=json.dumps(
+            {"job_name": job_names[-1], "status": "completed", "scripts": results}
+        ),
+    )
+
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+
+    parser = argparse.ArgumentParser(
+        description="Runs the scripts of a sequential stage with rsql_trigger.sh"
+    )
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--workflow-id", required=True)
+    parser.add_argument("--workflow-execution-id", required=True)
+    parser.add_argument("--instance-id", required=True)
+    parser.add_argument("--secret-id", required=True)
+    parser.add_argument("--rsql-path", required=True)
+    parser.add_argument("--log-path", required=True)
+    parser.add_argument("--audit-table", required=True)
+    parser.add_argument("--log-group", required=True)
+    parser.add_argument("--region", required=True)
+    parser.add_argument(
+        "--instance-code-dir", default=os.path.dirname(os.path.abspath(__file__))
+    )
+    parser.add_argument(
+        "--script-timeouts",
+        type=json.loads,
+        default={},
+        help="JSON object of the scripts with a hard timeout, in seconds",
+    )
+    parser.add_argument("scripts", nargs="+")
+
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+
+    args = parse_args()
+
+    script_env = dict(os.environ)
+    fleet_env = {name: script_env.pop(name, "") for name in SEQUENCE_FLEET_ENV}
+    heartbeat_seconds = script_env.pop(SEQUENCE_HEARTBEAT_ENV, "")
+
+    sfn_client = get_client("stepfunctions", args.region)
+    heartbeat_sender = (
+        HeartbeatSender(
+            args.token,
+            int(heartbeat_seconds),
+            sfn_client,
+            on_expired=lambda: cancel_jobs(args.workflow_execution_id, args.scripts),
+        ).start()
+        if heartbeat_seconds
+        else None
+    )
+
+    def run_trigger(position, job_name):
+        add_record_in_file_audit_tbl(
+            create_job_audit_details(
+                job_name, args.workflow_id, args.workflow_execution_id, args.instance_id
+            ),
+            args.audit_table,
+            args.region,
+        )
+
+        current_time = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+        log_file_name = args.log_path + job_name + "-" + current_time + ".log"
+        env = (
+            script_env
+            if position == 0
+            else {k: v for k, v in script_env.items() if k not in FIRST_SCRIPT_ENV}
+        )
+        env = dict(
+            env, RSQL_TIMEOUT_SECONDS=str(args.script_timeouts.get(job_name, ""))
+        )
+
+        # the same 11 arguments the rsql invoke lambda passes for a single script
+        cmd = [
+            "sh",
+            "+x",
+            os.path.join(args.instance_code_dir, "rsql_trigger.sh"),
+            NO_TASK_TOKEN,
+            args.workflow_id,
+            args.workflow_execution_id,
+            args.rsql_path + job_name,
+            args.instance_id,
+            args.secret_id,
+            log_file_name,
+            args.audit_table,
+            args.log_group,
+            args.instance_code_dir,
+            args.region,
+        ]
+
+        with open(log_file_name, "w") as log_file:
+            exit_code = subprocess.run(
+                cmd, stdout=log_file, stderr=subprocess.STDOUT, env=env
+            ).returncode
+
+        if heartbeat_sender and heartbeat_sender.expired:
+            # rsql_trigger.sh reported the terminated script as failed
+            update_records_in_file_audit_tbl(
+                {
+                    "job_name": job_name,
+                    "workflow_execution_id": args.workflow_execution_id,
+                    "execution_status": "timed_out",
+                },
+                args.audit_table,
+                args.region,
+                JOB_AUDIT_TABLE_KEY,
+            )
+
+        return exit_code, log_file_name
+
+    try:
+        run_sequence(
+            args.token, args.scripts, run_trigger, sfn_client, heartbeat_sender
+        )
+    finally:
+        if heartbeat_sender:
+            heartbeat_sender.stop()
+        if fleet_env["RSQL_FLEET_TABLE"] and fleet_env["RSQL_EXPECTED_RUNTIME"]:
+            try:
+                release_slot(
+                    fleet_env["RSQL_FLEET_TABLE"],
+                    args.instance_id,
+                    fleet_env["RSQL_EXPECTED_RUNTIME"],
+                    args.region,
+                )
+            except Exception as e:
+                print("Fleet slot not released : " + str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,10 @@ fi
 # $11 : aws_region
 
 
+# wall clock start of the job, used for the job statistics
+export RSQL_JOB_START_EPOCH=$(date +%s)
+trigger_start_ms=$(date +%s%3N)
+
 secret_id=$6
 
 # absolute path
@@ -33,14 +37,49 @@ instance_code_dir=${10}
 # source /home/ec2-user/blog_test/instance_code/get_redshift_creds.sh $6
 source $instance_code_dir/get_orch_params.sh $1 $2 $3 $script_name_arg $5 $7 $8 $9 ${11} 
 
+# phase marks of the job in epoch milliseconds, read back by send_sfn_token.py
+export RSQL_PHASE_FILE=$log_file_name.phases
+echo "trigger_start=$trigger_start_ms" > $RSQL_PHASE_FILE
+
+# dimension of the metrics sent by send_sfn_token.py
+export RSQL_WORKFLOW_ID=$workflow_id
+
+# instance whose fleet slot send_sfn_token.py gives back
+export RSQL_INSTANCE_ID=$instance_id
+
+# streams the log to CloudWatch while the script runs, instead of uploading it at the end
+if [[ "$RSQL_STREAM_LOGS" == "true" ]] ; then
+    python3 $instance_code_dir/stream_logs.py "$log_group" $log_file_name $workflow_execution_id $region &
+    log_streamer_pid=$!
+fi
+
+
+# marks the processes of the rsql script, rsql_cancel.py terminates them when the stage fails
+job_id="$workflow_execution_id/$script_name"
+
+# heartbeats of the task while the script runs, the state machine stops waiting for the
+# job when they stop. The script is terminated if the task has expired meanwhile. The
+# jobs without task token record theirs in the job audit table for the dag scheduler.
+if [[ -n "$RSQL_HEARTBEAT_SECONDS" ]] ; then
+    python3 $instance_code_dir/send_heartbeat.py --token "$token" --interval $RSQL_HEARTBEAT_SECONDS --region $region --workflow-execution-id $workflow_execution_id --job-audit-table $audit_ddb_table $script_name &
+    heartbeat_pid=$!
+fi
+
+# hard timeout of the script from the config table, timeout signals the whole process
+# group of the script and kills what is left 30 seconds later
+if [[ "${RSQL_TIMEOUT_SECONDS:-0}" -gt 0 ]] ; then
+    run_with_timeout="timeout --kill-after=30 $RSQL_TIMEOUT_SECONDS"
+fi
 
 passed_args=$#
 echo "Number of args passed to the wrapper script : $passed_args"
 
+echo "rsql_start=$(date +%s%3N)" >> $RSQL_PHASE_FILE
+
 if [[ $# -eq 11 ]] ; then
     echo "No input parameters to be passed to the RSQL Script"
 
-    sh +x "$rsql_script" $instance_code_dir $secret_id
+    RSQL_JOB_ID=$job_id $run_with_timeout sh +x "$rsql_script" $instance_code_dir $secret_id
 
     rsqlexitcode=$?
     echo "$rsql_script exited with $rsqlexitcode"
@@ -62,13 +101,37 @@ else
     done
 
     echo "Arguments to be passed : $args"
-    sh +x "rsql_script" $args
+    RSQL_JOB_ID=$job_id $run_with_timeout sh +x "rsql_script" $args
 
     rsqlexitcode=$?
     echo "$rsql_script exited with $rsqlexitcode"
 
 fi
 
+echo "rsql_end=$(date +%s%3N)" >> $RSQL_PHASE_FILE
+
+# send_sfn_token.py reports the job as timed out instead of failed
+if [[ -n "$run_with_timeout" ]] && [[ $rsqlexitcode -eq 124 || $rsqlexitcode -eq 137 ]] ; then
+    echo "$rsql_script timed out after $RSQL_TIMEOUT_SECONDS seconds"
+    export RSQL_TIMED_OUT=1
+fi
+
+if [[ -n "$heartbeat_pid" ]] ; then
+    kill -TERM $heartbeat_pid 2> /dev/null
+    wait $heartbeat_pid
+    if [[ $? -eq 3 ]] ; then
+        echo "The task of $rsql_script expired, the script was terminated"
+        export RSQL_TIMED_OUT=1
+    fi
+fi
+
+if [[ -n "$log_streamer_pid" ]] ; then
+    # final flush of the streamed log, send_sfn_token.py uploads the whole log if it failed
+    kill -TERM $log_streamer_pid
+    wait $log_streamer_pid && export RSQL_LOGS_STREAMED=1
+    echo "logs_flushed=$(date +%s%3N)" >> $RSQL_PHASE_FILE
+fi
+
 unset $RSPASSWORD
 python3 $instance_code_dir/send_sfn_token.py $token $script_name $rsqlexitcode $log_file_name $workflow_execution_id $audit_ddb_table $log_group $region
 exit $rsqlexitcode
@@ -0,0 +1,170 @@
+import argparse
+import sys
+import threading
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from framework.aws_clients import get_client
+from framework.dynamodb_interfaces import _serialize
+from rsql_cancel import cancel_jobs
+from send_sfn_token import NO_TASK_TOKEN
+
+# exit code of the heartbeat process when the task of the job has expired
+EXIT_TASK_EXPIRED = 3
+
+
+class HeartbeatSender:
+    """Sends the heartbeats of a step function task while its job runs, on_expired is
+    called once the task has expired"""
+
+    def __init__(self, token: str, interval: int, sfn_client, on_expired=None) -> None:
+        self.token = token
+        self.interval = interval
+        self.sfn_client = sfn_client
+        self.on_expired = on_expired
+        self.expired = False
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def send_heartbeat(self) -> bool:
+        """Sends one heartbeat
+
+        :return: False when the task has expired
+        :rtype: bool
+        """
+
+        try:
+            self.sfn_client.send_task_heartbeat(taskToken=self.token)
+        except (
+            self.sfn_client.exceptions.TaskTimedOut,
+            self.sfn_client.exceptions.InvalidToken,
+        ) as e:
+            print("The task of the job has expired : " + str(e))
+            return False
+
+        return True
+
+    def run(self) -> None:
+
+        while not self.stop_event.wait(self.interval):
+            try:
+                task_alive = self.send_heartbeat()
+            except Exception as e:
+                print("Heartbeat not sent : " + str(e))
+                continue
+
+            if not task_alive:
+                self.expired = True
+                if self.on_expired:
+                    self.on_expired()
+                return
+
+    def start(self) -> "HeartbeatSender":
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> bool:
+        """Stops the heartbeats once the job ended
+
+        :return: True when the task expired while the job ran
+        :rtype: bool
+        """
+
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+        return self.expired
+
+
+class AuditHeartbeatSender(HeartbeatSender):
+    """Records the heartbeats of jobs without task token in their job audit records,
+    on_expired is called once a record is no longer triggered"""
+
+    def __init__(
+        self,
+        job_audit_tbl: str,
+        job_names: list,
+        workflow_execution_id: str,
+        interval: int,
+        ddb_client,
+        on_expired=None,
+    ) -> None:
+        super().__init__(None, interval, None, on_expired)
+        self.job_audit_tbl = job_audit_tbl
+        self.job_names = job_names
+        self.workflow_execution_id = workflow_execution_id
+        self.ddb_client = ddb_client
+
+    def send_heartbeat(self) -> bool:
+
+        heartbeat_ts = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+        for job_name in self.job_names:
+            try:
+                self.ddb_client.update_item(
+                    TableName=self.job_audit_tbl,
+                    Key=_serialize(
+                        {
+                            "job_name": job_name,
+                            "workflow_execution_id": self.workflow_execution_id,
+                        }
+                    ),
+                    UpdateExpression="SET last_heartbeat_ts = :heartbeat_ts",
+                    ConditionExpression="attribute_not_exists(execution_status) "
+                    "OR execution_status = :triggered",
+                    ExpressionAttributeValues={
+                        ":heartbeat_ts": {"S": heartbeat_ts},
+                        ":triggered": {"S": "triggered"},
+                    },
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                print(f"{job_name} is no longer triggered, it was given up")
+                return False
+
+        return True
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(
+        description="Sends the heartbeats of the task of a job until it is terminated"
+    )
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--interval", type=int, required=True)
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--workflow-execution-id", required=True)
+    parser.add_argument("--job-audit-table")
+    parser.add_argument("scripts", nargs="+")
+    args = parser.parse_args()
+
+    def on_expired():
+        cancel_jobs(args.workflow_execution_id, args.scripts)
+
+    # jobs without task token report their heartbeats in the job audit table
+    if args.token == NO_TASK_TOKEN:
+        heartbeat_sender = AuditHeartbeatSender(
+            args.job_audit_table,
+            args.scripts,
+            args.workflow_execution_id,
+            args.interval,
+            get_client("dynamodb", args.region),
+            on_expired=on_expired,
+        )
+    else:
+        heartbeat_sender = HeartbeatSender(
+            args.token,
+            args.interval,
+            get_client("stepfunctions", args.region),
+            on_expired=on_expired,
+        )
+    heartbeat_sender.run()
+
+    sys.exit(EXIT_TASK_EXPIRED if heartbeat_sender.expired else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 import json
-import re
+import os
 import sys
 import time
 from datetime import datetime
 from pathlib import Path
 
-import boto3
-from framework.audit_operations import update_records_in_file_audit_tbl
+from framework.aws_clients import get_client
+from framework.audit_operations import (
+    JOB_AUDIT_TABLE_KEY,
+    update_records_in_file_audit_tbl,
+)
 from framework.cloudwatch_interfaces import send_logs
+from framework.job_phases import PhaseRecorder
+from framework.job_statistics import update_job_statistics
+from framework.log_archive import archive_log
+from framework.metrics import MetricsLogger
+from framework.worker_fleet import release_slot
+
+# jobs dispatched by the dag scheduler carry no step function callback token
+NO_TASK_TOKEN = "NA"
+
+# error of the task of a job killed after its hard timeout or once its task expired
+TIMED_OUT_ERROR = "RsqlJobTimedOut"
 
 
 def create_job_audit_details(
@@ -34,9 +48,37 @@ def create_job_audit_details(
     return job_audit_map
 
 
+# an error block is the "Error Code" line, the code and the message
+ERROR_PATTERN = "Error Code"
+ERROR_BLOCK_LINES = 2
+
+# longer log lines are truncated while scanning
+MAX_ERROR_LINE_CHARS = 4096
+
+
+def _read_bounded_lines(f, max_line_chars: int):
+    while True:
+        line = f.readline(max_line_chars)
+        if not line:
+            return
+        if not line.endswith("\n"):
+            while True:
+                tail = f.readline(max_line_chars)
+                if not tail or tail.endswith("\n"):
+                    break
+        yield line
+
+
+def _format_error_block(block: list) -> str:
+
+    error_lines = block[1:] + [""] * (ERROR_BLOCK_LINES + 1 - len(block))
+
+    return "Error Code : " + error_lines[0] + "\n" + "Error Message : " + error_lines[1]
+
+
 def get_error_message(log_file_path: str) -> str:
     """
-    Parses the log file and returns the error message
+    Scans the log file and returns the first and the last error messages
 
     :param str log file name including the absolute path
     :return: error log Messages within the log file
@@ -44,34 +86,38 @@ def get_error_message(log_file_path: str) -> str:
 
     """
 
-    error_pattern = "Error Code"
-    log_file_lines = []
+    first_block = None
+    last_block = None
+    error_count = 0
+    current_block = None
 
     try:
         print("Parsing the log file for errors : " + log_file_path)
 
-        with open(Path(log_file_path)) as f:
-            for line in f:
-                log_file_lines.append(line)
-
-        i = 0
-        for i in range(0, len(log_file_lines) - 1):
-            match = re.match(error_pattern, log_file_lines[i])
-            if match:
-                sql_error_code = log_file_lines[i + 1]
-                sql_error_message = log_file_lines[i + 2]
-
-                error_msg = (
-                    "Error Code : "
-                    + sql_error_code
-                    + "\n"
-                    + "Error Message : "
-                    + sql_error_message
-                )
-
-                break
-            else:
-                error_msg = ""
+        with open(Path(log_file_path), errors="replace") as f:
+            for line in _read_bounded_lines(f, MAX_ERROR_LINE_CHARS):
+                if current_block is not None and len(current_block) <= ERROR_BLOCK_LINES:
+                    current_block.append(line)
+                    continue
+
+                if line.startswith(ERROR_PATTERN):
+                    current_block = [line]
+                    error_count += 1
+                    if first_block is None:
+                        first_block = current_block
+                    last_block = current_block
+
+        if first_block is None:
+            return ""
+
+        error_msg = _format_error_block(first_block)
+        if error_count > 1:
+            error_msg += (
+                "\n"
+                + f"Last of {error_count} errors :"
+                + "\n"
+                + _format_error_block(last_block)
+            )
 
         return error_msg
 
@@ -80,6 +126,60 @@ def get_error_message(log_file_path: str) -> str:
         raise
 
 
+def record_job_statistics(
+    job_name, succeeded, region, job_stats_tbl=None, job_start_epoch=None
+) -> None:
+
+    job_stats_tbl = job_stats_tbl or os.environ.get("RSQL_JOB_STATS_TABLE")
+    job_start_epoch = job_start_epoch or os.environ.get("RSQL_JOB_START_EPOCH")
+
+    if not job_stats_tbl or not job_start_epoch:
+        print("Job statistics table not configured, skipping statistics update")
+        return
+
+    duration = time.time() - float(job_start_epoch)
+
+    try:
+        update_job_statistics(job_name, duration, succeeded, job_stats_tbl, region)
+    except Exception as e:
+        print("Job statistics not updated : " + str(e))
+
+
+def release_fleet_slot(region) -> None:
+
+    # set when the job was placed on the worker fleet
+    fleet_tbl = os.environ.get("RSQL_FLEET_TABLE")
+    instance_id = os.environ.get("RSQL_INSTANCE_ID")
+    expected_runtime = os.environ.get("RSQL_EXPECTED_RUNTIME")
+
+    if not fleet_tbl or not instance_id or not expected_runtime:
+        return
+
+    try:
+        release_slot(fleet_tbl, instance_id, expected_runtime, region)
+    except Exception as e:
+        print("Fleet slot not released : " + str(e))
+
+
+def archive_job_log(
+    log_file_name, workflow_execution_id, region, log_archive_uri=None
+) -> dict:
+
+    try:
+        log_archive = archive_log(
+            log_file_name, workflow_execution_id, region, log_archive_uri
+        )
+    except Exception as e:
+        # the log stays on the instance
+        print("Log not archived : " + str(e))
+        return {}
+
+    if log_archive:
+        print(f"Log archived to {log_archive['log_archive_uri']}")
+
+    return log_archive
+
+
 def send_token(
     token,
     job_name,
@@ -89,8 +189,66 @@ def send_token(
     audit_ddb_tbl,
     log_group,
     region,
+    job_stats_tbl=None,
+    job_start_epoch=None,
+    sfn_client=None,
+    audit_writer=None,
+    logs_streamed=False,
+    log_archive_uri=None,
+    phase_marks=None,
+    workflow_id=None,
+    metrics_logger=None,
+    timed_out=False,
 ):
 
+    phases = PhaseRecorder.from_environment(phase_marks)
+
+    release_fleet_slot(region)
+
+    metrics = metrics_logger or MetricsLogger()
+    workflow_id = workflow_id or os.environ.get("RSQL_WORKFLOW_ID")
+
+    sfn_client = sfn_client or get_client("stepfunctions", region)
+
+    # set by rsql_trigger.sh once the log was streamed while the script ran
+    logs_streamed = logs_streamed or os.environ.get("RSQL_LOGS_STREAMED") == "1"
+
+    # set by rsql_trigger.sh once the script was killed after its timeout
+    timed_out = timed_out or os.environ.get("RSQL_TIMED_OUT") == "1"
+
+    def update_job_audit_record(job_audit_map):
+        with phases.timed("audit_write"):
+            if audit_writer:
+                audit_writer.update_record(job_audit_map, audit_ddb_tbl)
+                return
+            audit_write_start = time.monotonic()
+            update_records_in_file_audit_tbl(
+                job_audit_map, audit_ddb_tbl, region, JOB_AUDIT_TABLE_KEY
+            )
+            metrics.put_metric(
+                "AuditWriteLatency",
+                (time.monotonic() - audit_write_start) * 1000,
+                "Milliseconds",
+            )
+
+    def ship_logs():
+        with phases.timed("log_shipping"):
+            log_bytes = send_logs(
+                log_group, log_file_name, workflow_execution_id, region, job_start_epoch
+            )
+        metrics.put_metric("LogShipBytes", log_bytes, "Bytes", workflow_id)
+
+    def send_callback(send_task_result, **kwargs):
+        # the map iteration of a job cancelled with its failed stage has ended already
+        try:
+            return send_task_result(taskToken=token, **kwargs)
+        except (
+            sfn_client.exceptions.TaskTimedOut,
+            sfn_client.exceptions.InvalidToken,
+        ) as e:
+            print("The task of the job has ended : " + str(e))
+            return None
+
     # print(error_code)
     # print(type(error_code))
 
@@ -104,68 +262,125 @@ def send_token(
         job_audit_map = create_job_audit_details(
             job_name, workflow_execution_id, "successful"
         )
-        update_records_in_file_audit_tbl(job_audit_map, audit_ddb_tbl, region)
-
-        send_logs(log_group, log_file_name, workflow_execution_id, region)
-
-        response = sfn_client.send_task_success(
-            taskToken=token,
-            output=json.dumps(
-                {"job_name": job_name, "status": "completed", "message": msg}
-            ),
-        )
+        update_job_audit_record(job_audit_map)
+        with phases.timed("job_statistics"):
+            record_job_statistics(
+                job_name, True, region, job_stats_tbl, job_start_epoch
+            )
+
+        if not logs_streamed:
+            ship_logs()
+
+        if token != NO_TASK_TOKEN:
+            with phases.timed("task_callback"):
+                response = send_callback(
+                    sfn_client.send_task_success,
+                    output=json.dumps(
+                        {"job_name": job_name, "status": "completed", "message": msg}
+                    ),
+                )
 
     # failure task token
     else:
         print(f"sending failure response using token which is {token}")
 
-        error_msg = get_error_message(log_file_name)
+        with phases.timed("error_scan"):
+            error_msg = get_error_message(log_file_name)
+
+        if timed_out:
+            error_msg = "The job timed out and was killed\n" + error_msg
 
         job_audit_map = create_job_audit_details(
-            job_name, workflow_execution_id, "failed", error_msg
+            job_name,
+            workflow_execution_id,
+            "timed_out" if timed_out else "failed",
+            error_msg,
         )
-        update_records_in_file_audit_tbl(job_audit_map, audit_ddb_tbl)
-
-        send_logs(log_group, log_file_name, workflow_execution_id)
+        update_job_audit_record(job_audit_map)
+        with phases.timed("job_statistics"):
+            record_job_statistics(
+                job_name, False, region, job_stats_tbl, job_start_epoch
+            )
+
+        if not logs_streamed:
+            ship_logs()
+
+        if token != NO_TASK_TOKEN:
+            with phases.timed("task_callback"):
+                response = send_callback(
+                    sfn_client.send_task_failure,
+                    error=TIMED_OUT_ERROR if timed_out else str(error_code),
+                    cause=error_msg,
+                )
 
-        response = sfn_client.send_task_failure(
-            taskToken=token, error=str(error_code), cause=error_msg
+    if token == NO_TASK_TOKEN:
+        print("No task token, job status is only recorded in the audit table")
+    else:
+        print(f"send token response is {response}")
+        print(f"token return completed")
+
+    job_details = archive_job_log(
+        log_file_name, workflow_execution_id, region, log_archive_uri
+    )
+    job_details["phase_breakdown_ms"] = phases.breakdown()
+    print(f"Job phases : {job_details['phase_breakdown_ms']}")
+
+    metrics.put_metric(
+        "JobsCompleted" if error_code == "0" else "JobsFailed", 1, workflow_id=workflow_id
+    )
+    if timed_out:
+        metrics.put_metric("JobsTimedOut", 1, workflow_id=workflow_id)
+    if "rsql" in job_details["phase_breakdown_ms"]:
+        metrics.put_metric(
+            "Runtime",
+            job_details["phase_breakdown_ms"]["rsql"],
+            "Milliseconds",
+            workflow_id,
         )
 
-    print(f"send token response is {response}")
-    print(f"token return completed")
-
-
-print(f"entering python script")
-n = len(sys.argv)
-for i in range(1, n):
-    print(sys.argv[i], end=" ")
-
-token = sys.argv[1]
-
-job_name = sys.argv[2]
-error_code = sys.argv[3]
-log_file_name = sys.argv[4]
-# workflow_id = sys.argv[5]
-workflow_execution_id = sys.argv[5]
-audit_ddb_table = sys.argv[6]
-log_group = sys.argv[7]
-region = sys.argv[8]
-
-print(f"received the token {token}")
-print(f"sub token return")
-
-sfn_client = boto3.client("stepfunctions", region_name=region)
-ssm_client = boto3.client("ssm", region_name=region)
-
-send_token(
-    token,
-    job_name,
-    error_code,
-    log_file_name,
-    workflow_execution_id,
-    audit_ddb_table,
-    log_group,
-    region,
-)
-print(f"sub token return done")
+    try:
+        update_job_audit_record(
+            {
+                "job_name": job_name,
+                "workflow_execution_id": workflow_execution_id,
+                **job_details,
+            }
+        )
+    except Exception as e:
+        print("Job phases and log archive not recorded : " + str(e))
+
+    if not metrics_logger:
+        metrics.flush(log_group, region)
+
+
+if __name__ == "__main__":
+    print(f"entering python script")
+    n = len(sys.argv)
+    for i in range(1, n):
+        print(sys.argv[i], end=" ")
+
+    token = sys.argv[1]
+
+    job_name = sys.argv[2]
+    error_code = sys.argv[3]
+    log_file_name = sys.argv[4]
+    # workflow_id = sys.argv[5]
+    workflow_execution_id = sys.argv[5]
+    audit_ddb_table = sys.argv[6]
+    log_group = sys.argv[7]
+    region = sys.argv[8]
+
+    print(f"received the token {token}")
+    print(f"sub token return")
+
+    send_token(
+        token,
+        job_name,
+        error_code,
+        log_file_name,
+        workflow_execution_id,
+        audit_ddb_table,
+        log_group,
+        region,
+    )
+    print(f"sub token return done")
@@ -0,0 +1,28 @@
+import signal
+import sys
+import threading
+
+from framework.cloudwatch_interfaces import follow_logs
+
+# started by rsql_trigger.sh, stopped with SIGTERM once the rsql script exits
+
+
+if __name__ == "__main__":
+    log_group = sys.argv[1]
+    log_file_name = sys.argv[2]
+    workflow_execution_id = sys.argv[3]
+    region = sys.argv[4]
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *args: stop_event.set())
+
+    try:
+        sent_events = follow_logs(
+            log_group, log_file_name, workflow_execution_id, region, stop_event
+        )
+    except Exception as e:
+        print("RSQL Logs not streamed: ", e)
+        sys.exit(1)
+
+    print(f"RSQL Logs Streamed Successfully to CloudWatch, {sent_events} events")
@@ -88,6 +88,28 @@ def add_iam_permissions(
                             "arn:aws:logs:{aws_region}:{aws_account_id}:log-group:*:log-stream:*"
                             ]
                             }}]}} """,
+        "SQSAgentQueueRead": f"""{{
+                        "Version": "2012-10-17",
+                        "Statement": [{{
+                            "Action": [
+                            "sqs:ReceiveMessage",
+                            "sqs:DeleteMessage",
+                            "sqs:ChangeMessageVisibility",
+                            "sqs:GetQueueAttributes"
+                            ],
+                            "Effect": "Allow",
+                            "Resource": "arn:aws:sqs:{aws_region}:{aws_account_id}:rsql*"
+                            }}]}}""",
+        "S3LogArchiveWrite": f"""{{
+                        "Version": "2012-10-17",
+                        "Statement": [{{
+                            "Action": [
+                            "s3:PutObject",
+                            "s3:AbortMultipartUpload"
+                            ],
+                            "Effect": "Allow",
+                            "Resource": "arn:aws:s3:::rsql-blog-log-archive-{aws_account_id}-{aws_region}/*"
+                            }}]}}""",
         "SSMInstancePolicy": f"""{{
                         "Version": "2012-10-17",
                         "Statement": [
@@ -0,0 +1,453 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from admission_control import create_admission_controller
+from audit_operations import update_records_in_file_audit_tbl
+from aws_clients import get_client
+from concurrency_control import update_concurrency_window
+from dynamodb_interfaces import _deserialize, query_dynamodb
+from job_statistics import get_job_runtimes
+from metrics import metrics
+from workflow_dag import get_critical_path_lengths, get_ready_scripts
+
+lambda_client = get_client("lambda")
+ssm_client = get_client("ssm")
+
+# None when admission control is disabled
+admission_controller = create_admission_controller()
+
+# DynamoDB PartiQL accepts at most 50 values in an IN condition on the partition key
+PARTIQL_IN_LIMIT = 50
+
+# scripts not reported as ended this long after their dispatch are given up
+DEFAULT_JOB_DEADLINE_SECONDS = 21600
+
+# the lambdas and the instances write the audit timestamps in different formats
+AUDIT_TS_FORMATS = ["%m-%d-%y-%H-%M-%S", "%m/%d/%Y %H:%M:%S", "%m-%d-%y %H:%M:%S"]
+
+# statuses of an SSM command which never started rsql_trigger.sh on its instance
+FAILED_COMMAND_STATUSES = ["Cancelled", "Cancelling", "Failed", "TimedOut"]
+
+
+def get_job_audit_records(
+    job_names: list, workflow_execution_id: str, job_audit_tbl: str
+) -> dict:
+
+    job_audit_records = {}
+
+    for i in range(0, len(job_names), PARTIQL_IN_LIMIT):
+        job_name_values = ", ".join(
+            f"'{job_name}'" for job_name in job_names[i : i + PARTIQL_IN_LIMIT]
+        )
+        partiql_statement = (
+            "SELECT job_name, execution_status, execution_start_ts, execution_end_ts, "
+            "instance_id, ssm_command_id, last_heartbeat_ts "
+            f'FROM "{job_audit_tbl}" '
+            f"WHERE job_name IN [{job_name_values}] "
+            f"AND workflow_execution_id = '{workflow_execution_id}'"
+        )
+
+        for item in query_dynamodb(partiql_statement):
+            job_audit_record = _deserialize(item)
+            job_audit_records[job_audit_record["job_name"]] = job_audit_record
+
+    return job_audit_records
+
+
+def parse_audit_ts(audit_ts: str) -> Optional[datetime]:
+
+    for ts_format in AUDIT_TS_FORMATS:
+        try:
+            return datetime.strptime(audit_ts, ts_format)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+def get_job_durations(job_audit_records: list) -> Dict[str, List[float]]:
+
+    job_durations = {}
+
+    for record in job_audit_records:
+        if record.get("execution_status") != "successful":
+            continue
+
+        start_ts = parse_audit_ts(record.get("execution_start_ts"))
+        end_ts = parse_audit_ts(record.get("execution_end_ts"))
+        if start_ts is None or end_ts is None or end_ts < start_ts:
+            continue
+
+        job_durations.setdefault(record["job_name"], []).append(
+            (end_ts - start_ts).total_seconds()
+        )
+
+    return job_durations
+
+
+def get_script_runtimes(dag: dict) -> dict:
+
+    try:
+        return get_job_runtimes(list(dag), os.environ["job_stats_table"])
+    except Exception as e:
+        print("Unable to read the job runtimes : " + str(e))
+        return {}
+
+
+def get_command_status(job_audit_record: dict) -> str:
+
+    # the command only starts rsql_trigger.sh, it does not follow the job
+    try:
+        response = ssm_client.get_command_invocation(
+            CommandId=job_audit_record["ssm_command_id"],
+            InstanceId=job_audit_record["instance_id"],
+        )
+    except ssm_client.exceptions.InvocationDoesNotExist:
+        # not registered yet right after the dispatch
+        return "Pending"
+    except Exception as e:
+        print(f"Command of {job_audit_record['job_name']} not checked : " + str(e))
+        return "Pending"
+
+    return response["Status"]
+
+
+def find_lost_jobs(
+    running: list, job_audit_records: dict, dispatches: dict, job_deadline: int
+) -> dict:
+
+    lost_jobs = {}
+    now = int(time.time())
+
+    for script in running:
+        job_audit_record = job_audit_records.get(script, {})
+        if job_audit_record.get("execution_status", "triggered") != "triggered":
+            continue
+
+        dispatched_at = dispatches["dispatched_at"].setdefault(script, now)
+
+        ssm_command_id = job_audit_record.get("ssm_command_id", "NA")
+        if ssm_command_id != "NA" and script not in dispatches["confirmed"]:
+            command_status = get_command_status(job_audit_record)
+            if command_status == "Success":
+                dispatches["confirmed"].append(script)
+            elif command_status in FAILED_COMMAND_STATUSES:
+                lost_jobs[script] = (
+                    f"The SSM command {ssm_command_id} of the job "
+                    f"ended {command_status}"
+                )
+                continue
+
+        if now - dispatched_at > job_deadline:
+            lost_jobs[script] = (
+                f"The job did not end within {job_deadline} seconds of its dispatch"
+            )
+
+    return lost_jobs
+
+
+def find_hung_jobs(
+    running: list, job_audit_records: dict, dispatches: dict, script_timeouts: dict
+) -> dict:
+
+    hung_jobs = {}
+    now = int(time.time())
+
+    for script in running:
+        job_audit_record = job_audit_records.get(script, {})
+        heartbeat_timeout = script_timeouts.get(script, {}).get(
+            "heartbeat_timeout_seconds"
+        )
+        if (
+            not heartbeat_timeout
+            or job_audit_record.get("execution_status", "triggered") != "triggered"
+        ):
+            continue
+
+        # the job has the heartbeat timeout from its dispatch to send its first one
+        last_heartbeat = dispatches["dispatched_at"].get(script, now)
+        last_heartbeat_ts = parse_audit_ts(job_audit_record.get("last_heartbeat_ts"))
+        if last_heartbeat_ts:
+            last_heartbeat = max(
+                last_heartbeat,
+                int(last_heartbeat_ts.replace(tzinfo=timezone.utc).timestamp()),
+            )
+
+        if now - last_heartbeat > heartbeat_timeout:
+            hung_jobs[script] = (
+                f"No heartbeat received from the job for {heartbeat_timeout} seconds"
+            )
+
+    return hung_jobs
+
+
+def cancel_jobs(scripts: list, workflow_id: str, workflow_execution_id: str) -> None:
+
+    if not scripts or not os.environ.get("rsql_cancel_function"):
+        return
+
+    try:
+        lambda_client.invoke(
+            FunctionName=os.environ["rsql_cancel_function"],
+            InvocationType="RequestResponse",
+            Payload=json.dumps(
+                {
+                    "workflow_id": workflow_id,
+                    "workflow_execution_id": workflow_execution_id,
+                    "Payload": {
+                        "parallel_details": [{"script": script} for script in scripts]
+                    },
+                }
+            ),
+        )
+    except Exception as e:
+        print(f"Jobs {scripts} not cancelled : " + str(e))
+
+
+def fail_lost_jobs(
+    lost_jobs: dict,
+    workflow_id: str,
+    workflow_execution_id: str,
+    job_audit_tbl: str,
+    execution_status: str = "failed",
+) -> None:
+
+    cancel_jobs(list(lost_jobs), workflow_id, workflow_execution_id)
+    record_failed_jobs(
+        lost_jobs, workflow_execution_id, job_audit_tbl, execution_status
+    )
+
+
+def record_failed_jobs(
+    failed_jobs: dict,
+    workflow_execution_id: str,
+    job_audit_tbl: str,
+    execution_status: str = "failed",
+) -> None:
+
+    failed_ts = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+    for script, error_message in failed_jobs.items():
+        print(f"{script} given up : {error_message}")
+        update_records_in_file_audit_tbl(
+            {
+                "job_name": script,
+                "workflow_execution_id": workflow_execution_id,
+                "execution_status": execution_status,
+                "execution_end_ts": failed_ts,
+                "error_message": error_message,
+            },
+            job_audit_tbl,
+        )
+
+
+def dispatch_script(
+    script_name: str, workflow_id: str, workflow_execution_id: str, timeouts: dict
+) -> None:
+
+    # scripts of a dag workflow report through the job audit table, not a task token
+    payload = {
+        "token": "NA",
+        "workflow_id": workflow_id,
+        "script": script_name,
+        "workflow_execution_id": workflow_execution_id,
+        "timeouts": timeouts,
+    }
+
+    # a synchronous invoke reports the scripts whose dispatch failed
+    response = lambda_client.invoke(
+        FunctionName=os.environ["rsql_invoke_function"],
+        InvocationType="RequestResponse",
+        Payload=json.dumps(payload),
+    )
+    if "FunctionError" in response:
+        error = response["Payload"].read().decode()
+        raise Exception(f"Dispatch of {script_name} failed : {error}")
+
+    print(f"Dispatched {script_name}")
+
+
+@metrics.flush_after_invocation
+def lambda_handler(event, context):
+
+    print(event)
+
+    dag = event["dag"]
+    workflow_id = event["workflow_id"]
+    workflow_execution_id = event["workflow_execution_id"]
+    max_concurrency = event["max_concurrency"]
+    running = list(event["running"])
+    completed = list(event["completed"])
+    failed = list(event["failed"])
+    script_timeouts = event.get("script_timeouts", {})
+    # set for the adaptive stages only
+    failure_policy = event.get("failure_policy")
+    tolerated_failures = int(event.get("tolerated_failures", 0))
+
+    job_audit_tbl = os.environ["job_audit_table"]
+    job_deadline = int(
+        os.environ.get("job_deadline_seconds", DEFAULT_JOB_DEADLINE_SECONDS)
+    )
+
+    # dispatch times and confirmed SSM commands of the running scripts
+    dispatches = event.setdefault("dispatches", {"dispatched_at": {}, "confirmed": []})
+
+    # computed on the first run of the execution and carried in the state
+    if "priorities" not in event:
+        job_runtimes = get_script_runtimes(dag)
+        event["priorities"] = get_critical_path_lengths(dag, job_runtimes)
+        if "concurrency" in event:
+            event["concurrency"]["baselines"] = job_runtimes
+    priorities = event["priorities"]
+
+    # adaptive concurrency replaces the fixed max_concurrency with a window
+    concurrency_state = event.get("concurrency")
+    window = concurrency_state["window"] if concurrency_state else max_concurrency
+    window_full = len(running) >= window
+
+    finished_records = []
+    newly_failed = 0
+
+    if running:
+        job_audit_records = get_job_audit_records(
+            running, workflow_execution_id, job_audit_tbl
+        )
+
+        for script in list(running):
+            job_audit_record = job_audit_records.get(script, {})
+            status = job_audit_record.get("execution_status")
+            if status == "successful":
+                running.remove(script)
+                completed.append(script)
+                finished_records.append(job_audit_record)
+            elif status in ["failed", "timed_out"]:
+                running.remove(script)
+                failed.append(script)
+                newly_failed += 1
+
+        lost_jobs = find_lost_jobs(running, job_audit_records, dispatches, job_deadline)
+        if lost_jobs:
+            fail_lost_jobs(lost_jobs, workflow_id, workflow_execution_id, job_audit_tbl)
+            for script in lost_jobs:
+                running.remove(script)
+                failed.append(script)
+                newly_failed += 1
+
+        hung_jobs = find_hung_jobs(
+            running, job_audit_records, dispatches, script_timeouts
+        )
+        if hung_jobs:
+            fail_lost_jobs(
+                hung_jobs,
+                workflow_id,
+                workflow_execution_id,
+                job_audit_tbl,
+                execution_status="timed_out",
+            )
+            for script in hung_jobs:
+                running.remove(script)
+                failed.append(script)
+                newly_failed += 1
+
+        dispatches["dispatched_at"] = {
+            script: dispatched_at
+            for script, dispatched_at in dispatches["dispatched_at"].items()
+            if script in running
+        }
+        dispatches["confirmed"] = [
+            script for script in dispatches["confirmed"] if script in running
+        ]
+
+    held_back = 0
+    throttled = 0
+
+    # nothing new starts after a failure, unless the policy lets every script run
+    if not failed or failure_policy in ["wait_all", "tolerate"]:
+        free_slots = max(window - len(running), 0)
+        # scripts heading the longest remaining chains start first
+        ready_scripts = sorted(
+            get_ready_scripts(dag, completed, running, failed),
+            key=lambda script: priorities.get(script, 0),
+            reverse=True,
+        )[:free_slots]
+
+        admitted = (
+            admission_controller.admit(len(ready_scripts))
+            if admission_controller and ready_scripts
+            else len(ready_scripts)
+        )
+        held_back = len(ready_scripts) - admitted
+        failed_dispatches = {}
+
+        for script in ready_scripts[:admitted]:
+            try:
+                dispatch_script(
+                    script,
+                    workflow_id,
+                    workflow_execution_id,
+                    script_timeouts.get(script, {}),
+                )
+            except lambda_client.exceptions.TooManyRequestsException:
+                # left ready, started on a later pass
+                throttled += 1
+                continue
+            except Exception as e:
+                failed_dispatches[script] = str(e)
+                continue
+            running.append(script)
+            dispatches["dispatched_at"][script] = int(time.time())
+
+        if failed_dispatches:
+            record_failed_jobs(failed_dispatches, workflow_execution_id, job_audit_tbl)
+            failed.extend(failed_dispatches)
+            newly_failed += len(failed_dispatches)
+
+    if concurrency_state:
+        runtimes = {
+            job_name: durations[-1]
+            for job_name, durations in get_job_durations(finished_records).items()
+        }
+        event["concurrency"] = update_concurrency_window(
+            concurrency_state,
+            runtimes,
+            newly_failed,
+            held_back + throttled,
+            window_full,
+        )
+        metrics.put_metric(
+            "ConcurrencyWindow", event["concurrency"]["window"], workflow_id=workflow_id
+        )
+
+    if failure_policy == "fail_fast" and failed:
+        cancel_jobs(running, workflow_id, workflow_execution_id)
+        dag_status = "failed"
+    elif failure_policy and len(completed) + len(failed) == len(dag):
+        dag_status = "failed" if len(failed) > tolerated_failures else "successful"
+    elif failed and not running and not failure_policy:
+        dag_status = "failed"
+    elif len(completed) == len(dag):
+        dag_status = "successful"
+    elif not running and not held_back and not throttled:
+        # nothing is running and nothing can start, the graph is blocked
+        dag_status = "failed"
+    else:
+        dag_status = "running"
+
+    print(
+        f"DAG status : {dag_status}, running : {len(running)}, "
+        f"completed : {len(completed)}, failed : {len(failed)}, "
+        f"held back : {held_back}, throttled : {throttled}"
+    )
+
+    return {
+        **event,
+        "running": running,
+        "completed": completed,
+        "failed": failed,
+        "dag_status": dag_status,
+    }
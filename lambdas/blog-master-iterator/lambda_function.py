@@ -4,6 +4,9 @@
 import json
 
 
+# reference of the rsql_master_iterator_pass state, see infra/cdk/state_logic.py
+
+
 def lambda_handler(event, context):
 
     workflow_stage_list = event["stage_details"]
@@ -17,6 +20,19 @@ def lambda_handler(event, context):
         "scripts": workflow_stage_list[index + 1]["scripts"],
     }
 
+    # optional concurrency, failure and timeout settings of the stage
+    for setting in [
+        "concurrency_control",
+        "max_concurrency",
+        "failure_policy",
+        "tolerated_failures",
+        "timeout_seconds",
+        "heartbeat_seconds",
+        "script_timeouts",
+    ]:
+        if setting in workflow_stage_list[index + 1]:
+            execution_details[setting] = workflow_stage_list[index + 1][setting]
+
     return {
         "count": count,
         "index": index + 1,
@@ -7,19 +7,25 @@ import json
 def lambda_handler(event, context):
 
     parallel_execution_details = event["parallel_output"]
+    tolerated_failures = int(event.get("tolerated_failures", 0))
 
-    parallel_load_status = ""
     parallel_script_list = []
+    failed_script_list = []
 
+    # reference of the rsql_parallel_load_check_pass state, see infra/cdk/state_logic.py
     for script_detail in parallel_execution_details:
         parallel_script_list.append(script_detail["job_name"])
         if script_detail["status"] != "completed":
-            parallel_load_status = "failed"
-        else:
-            parallel_load_status = "successful"
+            failed_script_list.append(script_detail["job_name"])
+
+    if len(failed_script_list) <= tolerated_failures:
+        parallel_load_status = "successful"
+    else:
+        parallel_load_status = "failed"
 
     return {
         "statusCode": 200,
         "parallel_load_status": parallel_load_status,
         "parallel_script_list": parallel_script_list,
+        "failed_script_list": failed_script_list,
     }
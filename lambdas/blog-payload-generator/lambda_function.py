@@ -2,6 +2,108 @@
 # SPDX-License-Identifier: MIT-0
 
 import json
+import os
+import uuid
+
+from aws_clients import get_client
+from concurrency_control import new_concurrency_state
+from job_statistics import (
+    get_express_jobs,
+    get_job_statistics,
+    get_median_runtimes,
+    order_by_runtime,
+)
+from script_timeouts import get_stage_script_timeouts
+
+# scripts of a parallel stage running at the same time
+DEFAULT_MAX_CONCURRENCY = 40
+
+# stages with more scripts run on the distributed map task
+DEFAULT_LARGE_STAGE_THRESHOLD = 500
+
+# scripts per child execution of the distributed map task
+DEFAULT_LARGE_STAGE_BATCH_SIZE = 10
+
+
+def get_job_stats(scripts: list) -> dict:
+
+    job_stats_tbl = os.environ.get("job_stats_table")
+    if not job_stats_tbl:
+        return {}
+
+    try:
+        return get_job_statistics(scripts, job_stats_tbl)
+    except Exception as e:
+        print("Unable to read the job statistics : " + str(e))
+        return {}
+
+
+def get_prioritized_scripts(scripts: list, job_stats: dict) -> list:
+
+    job_runtimes = get_median_runtimes(job_stats)
+
+    print(f"Historical job runtimes : {job_runtimes}")
+
+    return order_by_runtime(scripts, job_runtimes)
+
+
+def get_express_scripts(scripts: list, job_stats: dict = None) -> set:
+
+    # 0 when express workflows are disabled
+    max_runtime = float(os.environ.get("express_max_runtime_seconds", 0))
+    if not max_runtime:
+        return set()
+
+    if job_stats is None:
+        job_stats = get_job_stats(scripts)
+    express_scripts = set(get_express_jobs(job_stats, max_runtime))
+
+    print(f"Scripts run in express child executions : {sorted(express_scripts)}")
+
+    return express_scripts
+
+
+def write_stage_items(parallel_details: list, workflow_execution_id: str) -> dict:
+
+    bucket = os.environ["stage_payload_bucket"]
+    key = f"stage-payloads/{workflow_execution_id}/{uuid.uuid4()}.json"
+
+    get_client("s3").put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(parallel_details),
+        ContentType="application/json",
+    )
+
+    print(f"{len(parallel_details)} parallel scripts written to s3://{bucket}/{key}")
+
+    return {"bucket": bucket, "key": key, "count": len(parallel_details)}
+
+
+def get_stage_batches(max_concurrency: int) -> dict:
+
+    # the child executions run all the scripts of their batch at once
+    batch_size = min(
+        int(os.environ.get("large_stage_batch_size", DEFAULT_LARGE_STAGE_BATCH_SIZE)),
+        max_concurrency,
+    )
+
+    return {
+        "batch_size": batch_size,
+        "max_batches": max(max_concurrency // batch_size, 1),
+    }
+
+
+def is_large_stage(parallel_details: list) -> bool:
+
+    if not os.environ.get("stage_payload_bucket"):
+        return False
+
+    large_stage_threshold = int(
+        os.environ.get("large_stage_threshold", DEFAULT_LARGE_STAGE_THRESHOLD)
+    )
+
+    return 0 < large_stage_threshold < len(parallel_details)
 
 
 def lambda_handler(event, context):
@@ -18,33 +120,89 @@ def lambda_handler(event, context):
     if execution_mode == "parallel":
         # generate payload for parallel load
 
+        job_stats = get_job_stats(execution_details["scripts"])
+        express_scripts = get_express_scripts(execution_details["scripts"], job_stats)
+        script_timeouts = get_stage_script_timeouts(execution_details)
+
         parallel_details = []
-        for script in execution_details["scripts"]:
+        for script in get_prioritized_scripts(execution_details["scripts"], job_stats):
             parallel_map = {
                 "workflow_id": workflow_id,
                 "script": script,
                 "workflow_execution_id": workflow_execution_id,
+                # read by the choice between the express and the standard invoke task
+                "express": script in express_scripts,
+                "timeouts": script_timeouts[script],
             }
 
             parallel_details.append(parallel_map)
 
+        max_concurrency = int(
+            execution_details.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        )
+
         response = {
             "statusCode": 200,
             "workflow_id": workflow_id,
             "parallel_details": parallel_details,
+            "max_concurrency": max_concurrency,
+            "failure_policy": execution_details.get("failure_policy", "fail_fast"),
+            "tolerated_failures": int(execution_details.get("tolerated_failures", 0)),
         }
 
+        if execution_details.get("concurrency_control", "fixed").lower() == "adaptive":
+            # the stage runs through the dag scheduler loop, as a graph without edges
+            response["adaptive_dispatch"] = {
+                "workflow_id": workflow_id,
+                "workflow_execution_id": workflow_execution_id,
+                "dag": {item["script"]: [] for item in parallel_details},
+                "script_timeouts": script_timeouts,
+                "max_concurrency": max_concurrency,
+                "failure_policy": response["failure_policy"],
+                "tolerated_failures": response["tolerated_failures"],
+                "running": [],
+                "completed": [],
+                "failed": [],
+                "concurrency": new_concurrency_state(max_concurrency),
+            }
+
+        elif is_large_stage(parallel_details):
+            response["parallel_items"] = {
+                **write_stage_items(parallel_details, workflow_execution_id),
+                **get_stage_batches(max_concurrency),
+            }
+            del response["parallel_details"]
+
     elif execution_mode == "sequential":
         # generate payload for sequential load
 
+        express_scripts = get_express_scripts(execution_details["scripts"])
+        script_timeouts = get_stage_script_timeouts(execution_details)
+
         response = {
             "statusCode": 200,
             "workflow_id": workflow_id,
             "sequential": execution_details["scripts"],
+            # same positions as the scripts, read by the sequential state machine
+            "sequential_express": [
+                script in express_scripts for script in execution_details["scripts"]
+            ],
+            "sequential_timeouts": [
+                script_timeouts[script] for script in execution_details["scripts"]
+            ],
             "workflow_execution_id": workflow_execution_id,
             "index": -1,
         }
 
+        # heartbeats of the sequential runner
+        heartbeat_timeouts = [
+            timeouts["heartbeat_timeout_seconds"]
+            for timeouts in script_timeouts.values()
+            if "heartbeat_timeout_seconds" in timeouts
+        ]
+        if heartbeat_timeouts:
+            response["heartbeat_timeout_seconds"] = min(heartbeat_timeouts)
+
     else:
 
         response = {"statusCode": 500, "errorMessage": "Invalid execution"}
@@ -0,0 +1,172 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+import os
+import shlex
+from datetime import datetime
+
+from audit_operations import update_records_in_file_audit_tbl
+from aws_clients import get_client
+from dynamodb_interfaces import batch_get_items_from_dynamodb
+
+ssm_client = get_client("ssm")
+s3_client = get_client("s3")
+
+
+def get_stage_scripts(stage_payload: dict) -> list:
+
+    # the large stages keep their items in S3
+    if "parallel_items" in stage_payload:
+        parallel_items = stage_payload["parallel_items"]
+        response = s3_client.get_object(
+            Bucket=parallel_items["bucket"], Key=parallel_items["key"]
+        )
+        parallel_details = json.loads(response["Body"].read())
+    else:
+        parallel_details = stage_payload.get("parallel_details", [])
+
+    return [item["script"] for item in parallel_details]
+
+
+def get_running_jobs(
+    scripts: list, workflow_execution_id: str, job_audit_tbl: str
+) -> list:
+
+    job_audit_records = batch_get_items_from_dynamodb(
+        job_audit_tbl,
+        [
+            {"job_name": script, "workflow_execution_id": workflow_execution_id}
+            for script in scripts
+        ],
+    )
+
+    # the jobs not dispatched yet have no record
+    return [
+        job_audit_record
+        for job_audit_record in job_audit_records
+        if job_audit_record.get("execution_status") == "triggered"
+    ]
+
+
+def build_cancel_command(workflow_execution_id: str, job_names: list) -> str:
+
+    instance_code_dir = os.path.dirname(os.environ["rsql_trigger"])
+
+    return (
+        f"python3 {instance_code_dir}/rsql_cancel.py "
+        f"--workflow-execution-id {shlex.quote(workflow_execution_id)} "
+        + " ".join(shlex.quote(job_name) for job_name in job_names)
+    )
+
+
+def cancel_running_jobs(running_jobs: list, workflow_execution_id: str) -> dict:
+
+    jobs_per_instance = {}
+    for job_audit_record in running_jobs:
+        jobs_per_instance.setdefault(job_audit_record["instance_id"], []).append(
+            job_audit_record["job_name"]
+        )
+
+    cancel_command_ids = {}
+    for instance_id, job_names in jobs_per_instance.items():
+        print(f"Cancelling {job_names} on {instance_id}")
+        try:
+            response = ssm_client.send_command(
+                InstanceIds=[instance_id],
+                DocumentName="AWS-RunShellScript",
+                CloudWatchOutputConfig={
+                    "CloudWatchLogGroupName": "/aws/ssm/AWS-RunShellScript",
+                    "CloudWatchOutputEnabled": True,
+                },
+                Parameters={
+                    "commands": [build_cancel_command(workflow_execution_id, job_names)]
+                },
+            )
+        except Exception as e:
+            print(f"Jobs of {instance_id} not cancelled : {e}")
+            continue
+
+        for job_name in job_names:
+            cancel_command_ids[job_name] = response["Command"]["CommandId"]
+
+    return cancel_command_ids
+
+
+def mark_timed_out_jobs(
+    timed_out_jobs: list,
+    workflow_execution_id: str,
+    job_audit_tbl: str,
+    reason: str = "No heartbeat received from the job",
+) -> list:
+
+    # an instance still running one of them terminates it at its next heartbeat
+    timed_out_ts = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+
+    for job_audit_record in timed_out_jobs:
+        update_records_in_file_audit_tbl(
+            {
+                "job_name": job_audit_record["job_name"],
+                "workflow_execution_id": workflow_execution_id,
+                "execution_status": "timed_out",
+                "execution_end_ts": timed_out_ts,
+                "error_message": f"{reason} on "
+                + job_audit_record.get("instance_id", "its instance"),
+            },
+            job_audit_tbl,
+        )
+
+    return sorted(job_audit_record["job_name"] for job_audit_record in timed_out_jobs)
+
+
+def lambda_handler(event, context):
+
+    print(event)
+
+    workflow_execution_id = event["workflow_execution_id"]
+    job_audit_tbl = os.environ["job_audit_table"]
+
+    # heartbeat timeout of a task, or end of an express child execution
+    if "timed_out_scripts" in event:
+        scripts = event["timed_out_scripts"]
+        timed_out_jobs = get_running_jobs(
+            [scripts] if isinstance(scripts, str) else scripts,
+            workflow_execution_id,
+            job_audit_tbl,
+        )
+        # the jobs of the express child executions send no heartbeat
+        if event.get("cancel_jobs", False):
+            cancel_running_jobs(timed_out_jobs, workflow_execution_id)
+            reason = "Express child execution ended before the job"
+        else:
+            reason = "No heartbeat received from the job"
+        return {
+            "statusCode": 200,
+            "workflow_id": event["workflow_id"],
+            "timed_out_scripts": mark_timed_out_jobs(
+                timed_out_jobs, workflow_execution_id, job_audit_tbl, reason
+            ),
+        }
+
+    scripts = get_stage_scripts(event["Payload"])
+    running_jobs = get_running_jobs(scripts, workflow_execution_id, job_audit_tbl)
+    cancel_command_ids = cancel_running_jobs(running_jobs, workflow_execution_id)
+
+    # the instance reports the jobs failed once their rsql processes ended
+    cancel_ts = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+    for job_name, cancel_command_id in cancel_command_ids.items():
+        update_records_in_file_audit_tbl(
+            {
+                "job_name": job_name,
+                "workflow_execution_id": workflow_execution_id,
+                "cancel_requested_ts": cancel_ts,
+                "cancel_command_id": cancel_command_id,
+            },
+            job_audit_tbl,
+        )
+
+    return {
+        "statusCode": 200,
+        "workflow_id": event["workflow_id"],
+        "cancelled_scripts": sorted(cancel_command_ids),
+    }
@@ -6,9 +6,28 @@ import os
 from datetime import datetime
 from json import dumps
 
-import boto3
 from audit_operations import add_record_to_workflow_audit_tbl
+from aws_clients import get_client
+from concurrency_control import new_concurrency_state
 from dynamodb_interfaces import _deserialize, query_dynamodb
+from script_timeouts import get_stage_script_timeouts, parse_timeout_settings
+from workflow_dag import build_workflow_dag
+
+DEFAULT_MAX_CONCURRENCY = 40
+
+# what a parallel stage does when one of its scripts fails
+FAILURE_POLICIES = ["fail_fast", "wait_all", "tolerate"]
+
+# the Pass state of the master state machine has no optional fields
+REQUIRED_STAGE_SETTINGS = [
+    "concurrency_control",
+    "max_concurrency",
+    "failure_policy",
+    "tolerated_failures",
+    "timeout_seconds",
+    "heartbeat_seconds",
+    "script_timeouts",
+]
 
 
 def read_config_from_tbl(config_table: str, workflow_id: str) -> list:
@@ -36,11 +55,77 @@ def get_workflow_stages(config_data: list) -> list:
 
     for workflow_detail in workflow_stages_info:
         if workflow_detail["execution_flag"].lower() == "y":
+            # nested numbers are deserialized as Decimal, not JSON serializable
+            workflow_detail["max_concurrency"] = int(
+                workflow_detail.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+            )
+            workflow_detail.setdefault("concurrency_control", "fixed")
+            workflow_detail.update(get_failure_policy(workflow_detail))
+            workflow_detail.update(get_timeout_settings(workflow_detail))
+            check_stage_settings(workflow_detail)
             workflow_stages_list.append(workflow_detail)
 
     return workflow_stages_list
 
 
+def check_stage_settings(workflow_detail: dict) -> None:
+
+    missing_settings = [
+        setting
+        for setting in REQUIRED_STAGE_SETTINGS
+        if workflow_detail.get(setting) is None
+    ]
+    if missing_settings:
+        raise ValueError(
+            f"Stage {workflow_detail.get('stage_name')} has no {missing_settings}"
+        )
+
+
+def get_timeout_settings(workflow_detail: dict) -> dict:
+
+    # 0 for no timeout and no heartbeat
+    timeout_settings = {"timeout_seconds": 0, "heartbeat_seconds": 0}
+    timeout_settings.update(parse_timeout_settings(workflow_detail))
+    timeout_settings["script_timeouts"] = {
+        script: parse_timeout_settings(settings)
+        for script, settings in workflow_detail.get("script_timeouts", {}).items()
+    }
+
+    return timeout_settings
+
+
+def get_failure_policy(workflow_detail: dict) -> dict:
+
+    failure_policy = workflow_detail.get("failure_policy", "fail_fast").lower()
+    if failure_policy not in FAILURE_POLICIES:
+        raise ValueError(
+            f"Invalid failure_policy {failure_policy}, expected one of {FAILURE_POLICIES}"
+        )
+
+    tolerated_failures = (
+        int(workflow_detail.get("tolerated_failures", 0))
+        if failure_policy == "tolerate"
+        else 0
+    )
+
+    return {"failure_policy": failure_policy, "tolerated_failures": tolerated_failures}
+
+
+def get_workflow_settings(config_data: list) -> dict:
+
+    config_data_dict = _deserialize(config_data[0])
+
+    return {
+        "workflow_mode": config_data_dict.get("workflow_mode", "stage").lower(),
+        "max_concurrency": int(
+            config_data_dict.get("max_concurrency", DEFAULT_MAX_CONCURRENCY)
+        ),
+        "concurrency_control": config_data_dict.get(
+            "concurrency_control", "fixed"
+        ).lower(),
+    }
+
+
 def get_parallel_script_details(config_data: list) -> list:
 
     parallel_script_list = []
@@ -96,7 +181,7 @@ def trigger_step_function(
     workflow_execution_id: str,
 ) -> object:
 
-    sfn_client = boto3.client("stepfunctions")
+    sfn_client = get_client("stepfunctions")
 
     sfn_response = sfn_client.start_execution(
         stateMachineArn=master_step_function_arn,
@@ -123,6 +208,7 @@ def lambda_handler(event, context):
     config_tbl = os.environ["config_table"]
     config_data = read_config_from_tbl(config_tbl, workflow_id)
     workflow_stage_list = get_workflow_stages(config_data)
+    workflow_settings = get_workflow_settings(config_data)
 
     workflow_audit_tbl = os.environ["workflow_audit_table"]
     workflow_audit_detail = create_workflow_audit_details(
@@ -138,8 +224,30 @@ def lambda_handler(event, context):
         "stage_details": workflow_stage_list,
         "index": -1,
         "count": len(workflow_stage_list) - 1,
+        "workflow_mode": workflow_settings["workflow_mode"],
     }
 
+    if workflow_settings["workflow_mode"] == "dag":
+        # stages are kept in the payload, the dag scheduler only reads the graph
+        input_payload.update(
+            {
+                "dag": build_workflow_dag(workflow_stage_list),
+                "script_timeouts": {
+                    script: timeouts
+                    for stage in workflow_stage_list
+                    for script, timeouts in get_stage_script_timeouts(stage).items()
+                },
+                "max_concurrency": workflow_settings["max_concurrency"],
+                "running": [],
+                "completed": [],
+                "failed": [],
+            }
+        )
+        if workflow_settings["concurrency_control"] == "adaptive":
+            input_payload["concurrency"] = new_concurrency_state(
+                workflow_settings["max_concurrency"]
+            )
+
     print("Triggering RSQL Master Step Function")
 
     execution_arn = trigger_step_function(
@@ -4,16 +4,251 @@
 import datetime
 import json
 import os
+import random
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 
-import boto3
-from audit_operations import add_record_in_file_audit_tbl
+from admission_control import WlmCapacityExceeded, create_admission_controller
+from audit_operations import AuditWriter, add_record_in_file_audit_tbl
+from aws_clients import get_client
+from job_statistics import get_job_statistics
+from metrics import metrics
+from worker_fleet import DEFAULT_EXPECTED_RUNTIME, get_fleet, place_job, release_slot
 
-ssm_client = boto3.client("ssm")
+ssm_client = get_client("ssm")
+sqs_client = get_client("sqs")
 
+admission_controller = create_admission_controller()
 
-def run_shellscript(
+# keeps a batch well under the size limit of the AWS-RunShellScript parameters
+MAX_COMMANDS_PER_BATCH = 40
+MAX_BATCH_COMMAND_BYTES = 48 * 1024
+
+# backoff of the held back messages, doubled at every receive
+DISPATCH_RETRY_BASE_SECONDS = 5
+DISPATCH_RETRY_MAX_SECONDS = 60
+
+# SendMessageBatch accepts at most 10 messages
+MAX_AGENT_JOBS_PER_BATCH = 10
+
+# $$.State.EnteredTime of the map iteration, e.g. 2022-10-18T10:15:30.123Z
+STATE_ENTERED_TIME_FORMATS = ["%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"]
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def build_phase_marks(script_request):
+
+    # epoch milliseconds of the orchestration phases of the job
+    phase_marks = {}
+
+    for time_format in STATE_ENTERED_TIME_FORMATS:
+        try:
+            state_entered_time = datetime.strptime(
+                script_request.get("state_entered_time", ""), time_format
+            )
+        except ValueError:
+            continue
+        phase_marks["sfn_entered"] = int(
+            state_entered_time.replace(tzinfo=timezone.utc).timestamp() * 1000
+        )
+        break
+
+    if "invoke_start_ms" in script_request:
+        phase_marks["invoke_start"] = script_request["invoke_start_ms"]
+    phase_marks["dispatched"] = now_ms()
+
+    return phase_marks
+
+
+def put_job_started_metrics(script_request):
+
+    phase_marks = build_phase_marks(script_request)
+    workflow_id = script_request["workflow_id"]
+
+    metrics.put_metric(
+        "JobsStarted", len(get_request_scripts(script_request)), workflow_id=workflow_id
+    )
+    if "sfn_entered" in phase_marks:
+        metrics.put_metric(
+            "QueueWait",
+            phase_marks["dispatched"] - phase_marks["sfn_entered"],
+            "Milliseconds",
+            workflow_id,
+        )
+
+
+def get_request_scripts(script_request):
+
+    # a sequential runner request carries the scripts of a whole stage
+    return script_request.get("scripts") or [script_request["script"]]
+
+
+def get_script_timeouts(script_request, script=None):
+
+    if script is None:
+        return script_request.get("timeouts") or {}
+
+    return dict(
+        zip(script_request["scripts"], script_request.get("script_timeouts") or [])
+    ).get(script, {})
+
+
+def place_scripts(script_requests):
+
+    fleet_tbl = os.environ.get("fleet_table")
+    if not fleet_tbl:
+        for script_request in script_requests:
+            script_request["instance_id"] = os.environ["instance_id"]
+        return
+
+    fleet = get_fleet(fleet_tbl)
+
+    job_stats_tbl = os.environ.get("job_stats_table")
+    job_statistics = (
+        get_job_statistics(
+            [
+                script
+                for script_request in script_requests
+                for script in get_request_scripts(script_request)
+            ],
+            job_stats_tbl,
+        )
+        if job_stats_tbl
+        else {}
+    )
+
+    for script_request in script_requests:
+        # a sequential stage holds one slot for the sum of its scripts
+        expected_runtime = sum(
+            float(
+                job_statistics.get(script, {}).get(
+                    "p50_duration", DEFAULT_EXPECTED_RUNTIME
+                )
+            )
+            for script in get_request_scripts(script_request)
+        )
+        instance_id = place_job(
+            fleet_tbl,
+            expected_runtime,
+            os.environ.get("placement_policy", "least_loaded"),
+            fleet,
+        )
+        if instance_id:
+            script_request["expected_runtime"] = int(expected_runtime)
+        else:
+            print("No active instance in the fleet, using the default instance")
+        script_request["instance_id"] = instance_id or os.environ["instance_id"]
+
+    print(
+        "Scripts placed : "
+        + ", ".join(
+            f"{r.get('script', 'sequence')} -> {r['instance_id']}" for r in script_requests
+        )
+    )
+
+
+def release_script_slots(script_requests):
+
+    # scripts placed on the fleet which were not started
+    for script_request in script_requests:
+        if "expected_runtime" not in script_request:
+            continue
+        try:
+            release_slot(
+                os.environ["fleet_table"],
+                script_request["instance_id"],
+                script_request["expected_runtime"],
+            )
+        except Exception as e:
+            print(
+                f"Slot of {get_request_scripts(script_request)[0]} not released : "
+                + str(e)
+            )
+
+
+def build_job_env_prefix(phase_marks=None, expected_runtime=None, script_timeouts=None):
+
+    # exported to the environment of the job, read by send_sfn_token.py
+    job_env = {
+        "RSQL_JOB_STATS_TABLE": os.environ.get("job_stats_table", ""),
+        "RSQL_STREAM_LOGS": os.environ.get("stream_logs", "false"),
+        "RSQL_LOG_ARCHIVE_URI": os.environ.get("log_archive_uri", ""),
+        "RSQL_PHASE_MARKS": ",".join(
+            f"{name}={value}" for name, value in (phase_marks or {}).items()
+        ),
+        "RSQL_FLEET_TABLE": os.environ.get("fleet_table", ""),
+        "RSQL_EXPECTED_RUNTIME": "" if expected_runtime is None else str(expected_runtime),
+        "RSQL_TIMEOUT_SECONDS": (script_timeouts or {}).get("timeout_seconds", ""),
+        "RSQL_HEARTBEAT_SECONDS": (script_timeouts or {}).get("heartbeat_seconds", ""),
+    }
+
+    return "".join(f"{name}='{value}' " for name, value in job_env.items())
+
+
+def build_sequence_command(
+    script_request,
+    secret_id,
+    rsql_path,
+    log_path,
+    job_audit_tbl,
+    rsql_log_group,
+    rsql_trigger,
+):
+
+    current_time = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+    log_file_name = (
+        script_request["workflow_id"] + "-sequence-" + current_time + ".log"
+    )
+
+    instance_code_dir = os.path.dirname(rsql_trigger)
+
+    # the sequence sends the heartbeats of the stage, each script has its own timeout
+    script_timeouts = {
+        script: get_script_timeouts(script_request, script)
+        for script in script_request["scripts"]
+    }
+    heartbeats = [
+        timeouts["heartbeat_seconds"]
+        for timeouts in script_timeouts.values()
+        if "heartbeat_seconds" in timeouts
+    ]
+    hard_timeouts = {
+        script: timeouts["timeout_seconds"]
+        for script, timeouts in script_timeouts.items()
+        if timeouts.get("timeout_seconds")
+    }
+
+    cmd = (
+        build_job_env_prefix(
+            build_phase_marks(script_request),
+            script_request.get("expected_runtime"),
+            {"heartbeat_seconds": min(heartbeats)} if heartbeats else None,
+        )
+        + f"nohup python3 {instance_code_dir}/rsql_sequence.py"
+        + f" --token '{script_request['token']}'"
+        + f" --workflow-id {script_request['workflow_id']}"
+        + f" --workflow-execution-id {script_request['workflow_execution_id']}"
+        + f" --instance-id {script_request['instance_id']}"
+        + f" --secret-id {secret_id}"
+        + f" --rsql-path {rsql_path}"
+        + f" --log-path {log_path}"
+        + f" --audit-table {job_audit_tbl}"
+        + f" --log-group '{rsql_log_group}'"
+        + f" --region {os.environ['AWS_REGION']}"
+        + f" --instance-code-dir {instance_code_dir}"
+        + f" --script-timeouts '{json.dumps(hard_timeouts)}' "
+        + " ".join(script_request["scripts"])
+        + f" > {log_path}{log_file_name} 2>&1 &"
+    )
+    print(f"rsql sequence command is {cmd}")
+
+    return cmd
+
+
+def build_rsql_command(
     script_name,
     instance_id,
     token,
@@ -25,6 +260,9 @@ def run_shellscript(
     job_audit_tbl,
     rsql_log_group,
     rsql_trigger,
+    phase_marks=None,
+    expected_runtime=None,
+    script_timeouts=None,
 ):
 
     current_time = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
@@ -32,10 +270,12 @@ def run_shellscript(
 
     instance_code_dir = os.path.dirname(rsql_trigger)
     aws_region = os.environ["AWS_REGION"]
+    job_env_prefix = build_job_env_prefix(phase_marks, expected_runtime, script_timeouts)
 
     # cmd = "sh +x "+rsql_path+script_name+ " '" + token + "' " +" " + workflow_id + " " + " " + workflow_execution_id + " " + script_name + " " + instance_id + " " + secret_id + " " + log_path+log_file_name + " " + job_audit_tbl + " '" + rsql_log_group + "' " + " > " + log_path+log_file_name + " 2>&1 "
     cmd = (
-        "nohup sh +x "
+        job_env_prefix
+        + "nohup sh +x "
         + rsql_trigger
         + " '"
         + token
@@ -72,6 +312,11 @@ def run_shellscript(
     )
     print(f"rsql script invoke command is {cmd}")
 
+    return cmd
+
+
+def send_rsql_commands(instance_id, cmds):
+
     response = ssm_client.send_command(
         InstanceIds=[instance_id],
         DocumentName="AWS-RunShellScript",
@@ -79,7 +324,7 @@ def run_shellscript(
             "CloudWatchLogGroupName": "/aws/ssm/AWS-RunShellScript",
             "CloudWatchOutputEnabled": True,
         },
-        Parameters={"commands": [cmd]},
+        Parameters={"commands": cmds},
     )
     command_id = response["Command"]["CommandId"]
 
@@ -89,6 +334,373 @@ def run_shellscript(
     return command_id
 
 
+def run_shellscript(
+    script_name,
+    instance_id,
+    token,
+    workflow_id,
+    secret_id,
+    rsql_path,
+    log_path,
+    workflow_execution_id,
+    job_audit_tbl,
+    rsql_log_group,
+    rsql_trigger,
+    phase_marks=None,
+    expected_runtime=None,
+    script_timeouts=None,
+):
+
+    cmd = build_rsql_command(
+        script_name,
+        instance_id,
+        token,
+        workflow_id,
+        secret_id,
+        rsql_path,
+        log_path,
+        workflow_execution_id,
+        job_audit_tbl,
+        rsql_log_group,
+        rsql_trigger,
+        phase_marks,
+        expected_runtime,
+        script_timeouts,
+    )
+
+    return send_rsql_commands(instance_id, [cmd])
+
+
+def split_into_batches(script_cmds):
+
+    batches = []
+    batch = []
+    batch_size = 0
+
+    for script_cmd in script_cmds:
+        cmd_size = len(script_cmd[1].encode("utf-8"))
+        if batch and (
+            len(batch) == MAX_COMMANDS_PER_BATCH
+            or batch_size + cmd_size > MAX_BATCH_COMMAND_BYTES
+        ):
+            batches.append(batch)
+            batch = []
+            batch_size = 0
+        batch.append(script_cmd)
+        batch_size += cmd_size
+
+    if batch:
+        batches.append(batch)
+
+    return batches
+
+
+def run_shellscript_batch(
+    script_requests,
+    instance_id,
+    secret_id,
+    rsql_path,
+    log_path,
+    job_audit_tbl,
+    rsql_log_group,
+    rsql_trigger,
+):
+
+    # scripts placed on the fleet carry their instance, the others use instance_id
+    script_cmds_by_instance = {}
+    for script_request in script_requests:
+        script_instance_id = script_request.get("instance_id", instance_id)
+        script_cmds_by_instance.setdefault(script_instance_id, []).append(
+            (
+                script_request,
+                build_rsql_command(
+                    script_request["script"],
+                    script_instance_id,
+                    script_request["token"],
+                    script_request["workflow_id"],
+                    secret_id,
+                    rsql_path,
+                    log_path,
+                    script_request["workflow_execution_id"],
+                    job_audit_tbl,
+                    rsql_log_group,
+                    rsql_trigger,
+                    build_phase_marks(script_request),
+                    script_request.get("expected_runtime"),
+                    get_script_timeouts(script_request),
+                ),
+            )
+        )
+
+    failed_requests = []
+    audit_writer = AuditWriter()
+
+    for script_instance_id, script_cmds in script_cmds_by_instance.items():
+        for batch in split_into_batches(script_cmds):
+            try:
+                ssm_command_id = send_rsql_commands(
+                    script_instance_id, [script_cmd for _, script_cmd in batch]
+                )
+            except Exception as e:
+                print("Batch of scripts not triggered : " + str(e))
+                failed_requests.extend(script_request for script_request, _ in batch)
+                continue
+
+            for script_request, _ in batch:
+                job_audit_map = create_job_audit_details(
+                    script_request["script"],
+                    script_request["workflow_id"],
+                    script_request["workflow_execution_id"],
+                    script_instance_id,
+                    ssm_command_id,
+                )
+                job_audit_map["ssm_batch_size"] = len(batch)
+                audit_writer.add_record(job_audit_map, job_audit_tbl)
+                put_job_started_metrics(script_request)
+
+            flush_job_audit_records(audit_writer)
+
+    release_script_slots(failed_requests)
+
+    return failed_requests
+
+
+def flush_job_audit_records(audit_writer):
+
+    audit_write_start = time.monotonic()
+    try:
+        audit_writer.flush()
+        metrics.put_metric(
+            "AuditWriteLatency",
+            (time.monotonic() - audit_write_start) * 1000,
+            "Milliseconds",
+        )
+    except Exception as e:
+        print(f"{len(audit_writer)} job audit records not added : " + str(e))
+
+
+def build_agent_job(
+    script_request,
+    secret_id,
+    rsql_path,
+    log_path,
+    job_audit_tbl,
+    rsql_log_group,
+):
+
+    current_time = datetime.utcnow().strftime("%m-%d-%y-%H-%M-%S")
+    log_file_name = script_request["script"] + "-" + current_time + ".log"
+
+    return {
+        "token": script_request["token"],
+        "workflow_id": script_request["workflow_id"],
+        "workflow_execution_id": script_request["workflow_execution_id"],
+        "script": script_request["script"],
+        "script_path": rsql_path + script_request["script"],
+        "secret_id": secret_id,
+        "log_file": log_path + log_file_name,
+        "job_audit_table": job_audit_tbl,
+        "job_stats_table": os.environ.get("job_stats_table", ""),
+        "log_group": rsql_log_group,
+        "stream_logs": os.environ.get("stream_logs", "false") == "true",
+        "log_archive_uri": os.environ.get("log_archive_uri", ""),
+        "phase_marks": build_phase_marks(script_request),
+        **get_script_timeouts(script_request),
+    }
+
+
+def enqueue_agent_jobs(
+    script_requests,
+    instance_id,
+    secret_id,
+    rsql_path,
+    log_path,
+    job_audit_tbl,
+    rsql_log_group,
+):
+
+    agent_queue_url = os.environ["agent_queue_url"]
+    failed_requests = []
+    audit_writer = AuditWriter()
+
+    for i in range(0, len(script_requests), MAX_AGENT_JOBS_PER_BATCH):
+        batch = script_requests[i : i + MAX_AGENT_JOBS_PER_BATCH]
+        entries = [
+            {
+                "Id": str(j),
+                "MessageBody": json.dumps(
+                    build_agent_job(
+                        script_request,
+                        secret_id,
+                        rsql_path,
+                        log_path,
+                        job_audit_tbl,
+                        rsql_log_group,
+                    )
+                ),
+            }
+            for j, script_request in enumerate(batch)
+        ]
+
+        try:
+            response = sqs_client.send_message_batch(
+                QueueUrl=agent_queue_url, Entries=entries
+            )
+        except Exception as e:
+            print("Batch of agent jobs not queued : " + str(e))
+            failed_requests.extend(batch)
+            continue
+
+        for failure in response.get("Failed", []):
+            print(f"Agent job not queued : {failure}")
+            failed_requests.append(batch[int(failure["Id"])])
+
+        for success in response.get("Successful", []):
+            script_request = batch[int(success["Id"])]
+            job_audit_map = create_job_audit_details(
+                script_request["script"],
+                script_request["workflow_id"],
+                script_request["workflow_execution_id"],
+                instance_id,
+                "NA",
+            )
+            job_audit_map["agent_message_id"] = success["MessageId"]
+            audit_writer.add_record(job_audit_map, job_audit_tbl)
+            put_job_started_metrics(script_request)
+
+        flush_job_audit_records(audit_writer)
+
+    return failed_requests
+
+
+def build_agent_sequence_job(
+    script_request,
+    instance_id,
+    secret_id,
+    rsql_path,
+    log_path,
+    job_audit_tbl,
+    rsql_log_group,
+):
+
+    # the scripts run as jobs without task token, the agent reports the stage once
+    jobs = [
+        build_agent_job(
+            {**script_request, "script": script, "token": "NA"},
+            secret_id,
+            rsql_path,
+            log_path,
+            job_audit_tbl,
+            rsql_log_group,
+        )
+        for script in script_request["scripts"]
+    ]
+    # the phase marks of the lambda belong to the first script
+    for job in jobs[1:]:
+        job["phase_marks"] = {}
+
+    # the agent sends the heartbeats of the stage, not those of its scripts
+    heartbeats = [
+        job.pop("heartbeat_seconds") for job in jobs if "heartbeat_seconds" in job
+    ]
+
+    return {
+        "token": script_request["token"],
+        "workflow_id": script_request["workflow_id"],
+        "workflow_execution_id": script_request["workflow_execution_id"],
+        "instance_id": instance_id,
+        "job_audit_table": job_audit_tbl,
+        "jobs": jobs,
+        **({"heartbeat_seconds": min(heartbeats)} if heartbeats else {}),
+    }
+
+
+def run_script_sequence(script_request):
+
+    secret_id = os.environ["secret_id"]
+    rsql_path = os.environ["rsql_path"]
+    log_path = os.environ["log_path"]
+    job_audit_tbl = os.environ["job_audit_table"]
+    rsql_log_group = os.environ["rsql_log_group"]
+
+    print(f"Triggering a sequence of {len(script_request['scripts'])} scripts")
+
+    if os.environ.get("dispatch_mode") == "agent":
+        sqs_client.send_message(
+            QueueUrl=os.environ["agent_queue_url"],
+            MessageBody=json.dumps(
+                build_agent_sequence_job(
+                    script_request,
+                    os.environ["instance_id"],
+                    secret_id,
+                    rsql_path,
+                    log_path,
+                    job_audit_tbl,
+                    rsql_log_group,
+                )
+            ),
+        )
+        put_job_started_metrics(script_request)
+        return {
+            "statusCode": 200,
+            "body": json.dumps("Agent Sequence Queued"),
+        }
+
+    place_scripts([script_request])
+
+    try:
+        ssm_command_id = send_rsql_commands(
+            script_request["instance_id"],
+            [
+                build_sequence_command(
+                    script_request,
+                    secret_id,
+                    rsql_path,
+                    log_path,
+                    job_audit_tbl,
+                    rsql_log_group,
+                    os.environ["rsql_trigger"],
+                )
+            ],
+        )
+    except Exception:
+        release_script_slots([script_request])
+        raise
+
+    put_job_started_metrics(script_request)
+
+    return {
+        "statusCode": 200,
+        "body": json.dumps("Sequence Triggered"),
+        "ssm_command_id": json.dumps(ssm_command_id),
+    }
+
+
+def dispatch_scripts(script_requests):
+
+    dispatch_params = (
+        os.environ["secret_id"],
+        os.environ["rsql_path"],
+        os.environ["log_path"],
+        os.environ["job_audit_table"],
+        os.environ["rsql_log_group"],
+    )
+
+    if os.environ.get("dispatch_mode") == "agent":
+        return enqueue_agent_jobs(
+            script_requests, os.environ["instance_id"], *dispatch_params
+        )
+
+    place_scripts(script_requests)
+
+    return run_shellscript_batch(
+        script_requests,
+        os.environ["instance_id"],
+        *dispatch_params,
+        os.environ["rsql_trigger"],
+    )
+
+
 def create_job_audit_details(
     script_name,
     workflow_id,
@@ -110,8 +722,121 @@ def create_job_audit_details(
     return job_audit_map
 
 
+def delay_dispatch_retries(script_requests: list) -> None:
+    """Makes the messages of scripts which were not dispatched visible again soon
+
+    :param list script_requests: script requests of the messages returned as failures
+    :return: None
+    :rtype: None
+    """
+
+    dispatch_queue_url = os.environ.get("dispatch_queue_url")
+    script_requests = [
+        script_request
+        for script_request in script_requests
+        if script_request.get("receipt_handle")
+    ]
+    if not dispatch_queue_url or not script_requests:
+        return
+
+    def retry_delay(receive_count: int) -> int:
+        delay = min(
+            DISPATCH_RETRY_BASE_SECONDS * 2 ** (receive_count - 1),
+            DISPATCH_RETRY_MAX_SECONDS,
+        )
+        return random.randint(delay // 2, delay)
+
+    # ChangeMessageVisibilityBatch accepts at most 10 messages
+    for i in range(0, len(script_requests), 10):
+        try:
+            response = sqs_client.change_message_visibility_batch(
+                QueueUrl=dispatch_queue_url,
+                Entries=[
+                    {
+                        "Id": str(j),
+                        "ReceiptHandle": script_request["receipt_handle"],
+                        "VisibilityTimeout": retry_delay(
+                            script_request["receive_count"]
+                        ),
+                    }
+                    for j, script_request in enumerate(script_requests[i : i + 10])
+                ],
+            )
+            failed = response.get("Failed", [])
+        except Exception as e:
+            print("Dispatch retries not delayed : " + str(e))
+            continue
+        if failed:
+            print(f"Dispatch retries not delayed for {len(failed)} messages : {failed}")
+
+
+def batch_handler(event, context):
+
+    invoke_start_ms = now_ms()
+
+    # messages sent by the step function map iterations, delivered in batches by SQS
+    script_requests = []
+    for record in event["Records"]:
+        script_request = json.loads(record["body"])
+        script_request["message_id"] = record["messageId"]
+        script_request["receipt_handle"] = record.get("receiptHandle")
+        script_request["receive_count"] = int(
+            record.get("attributes", {}).get("ApproximateReceiveCount", 1)
+        )
+        script_request["invoke_start_ms"] = invoke_start_ms
+        script_requests.append(script_request)
+
+    print(f"Triggering a batch of {len(script_requests)} scripts")
+
+    admitted = (
+        admission_controller.admit(len(script_requests))
+        if admission_controller
+        else len(script_requests)
+    )
+
+    failed_requests = dispatch_scripts(script_requests[:admitted])
+    failed_requests.extend(script_requests[admitted:])
+
+    # retried by SQS after a short backoff
+    delay_dispatch_retries(failed_requests)
+    return {
+        "batchItemFailures": [
+            {"itemIdentifier": script_request["message_id"]}
+            for script_request in failed_requests
+        ]
+    }
+
+
+@metrics.flush_after_invocation
 def lambda_handler(event, context):
 
+    if "Records" in event:
+        return batch_handler(event, context)
+
+    event["invoke_start_ms"] = now_ms()
+
+    # scripts of dag workflows ("NA" token) are admitted by the dag scheduler
+    if (
+        admission_controller
+        and (event["token"] != "NA" or event.get("poll_completion", False))
+        and not admission_controller.admit(1)
+    ):
+        raise WlmCapacityExceeded(
+            f"{get_request_scripts(event)[0]} held back, the WLM queues of the cluster are saturated"
+        )
+
+    if "scripts" in event:
+        return run_script_sequence(event)
+
+    if os.environ.get("dispatch_mode") == "agent":
+        # the resident agent on the instance pulls the job, no SSM command is sent
+        if dispatch_scripts([event]):
+            raise Exception(f"Agent job for {event['script']} not queued")
+        return {
+            "statusCode": 200,
+            "body": json.dumps("Agent Job Queued"),
+        }
+
     print(f"printing event -- {event}")
     print(f'printing event -- {event["token"]}')
     print(f'printing script name -- {event["script"]}')
@@ -124,26 +849,35 @@ def lambda_handler(event, context):
     secret_id = os.environ["secret_id"]
     rsql_path = os.environ["rsql_path"]
     log_path = os.environ["log_path"]
-    instance_id = os.environ["instance_id"]
     job_audit_tbl = os.environ["job_audit_table"]
     rsql_log_group = os.environ["rsql_log_group"]
     rsql_trigger = os.environ["rsql_trigger"]
 
+    place_scripts([event])
+    instance_id = event["instance_id"]
+
     print(f"running shell script")
 
-    ssm_command_id = run_shellscript(
-        script_name,
-        instance_id,
-        sfn_token,
-        workflow_id,
-        secret_id,
-        rsql_path,
-        log_path,
-        workflow_execution_id,
-        job_audit_tbl,
-        rsql_log_group,
-        rsql_trigger,
-    )
+    try:
+        ssm_command_id = run_shellscript(
+            script_name,
+            instance_id,
+            sfn_token,
+            workflow_id,
+            secret_id,
+            rsql_path,
+            log_path,
+            workflow_execution_id,
+            job_audit_tbl,
+            rsql_log_group,
+            rsql_trigger,
+            build_phase_marks(event),
+            event.get("expected_runtime"),
+            get_script_timeouts(event),
+        )
+    except Exception:
+        release_script_slots([event])
+        raise
 
     job_audit_map = create_job_audit_details(
         script_name,
@@ -153,7 +887,14 @@ def lambda_handler(event, context):
         ssm_command_id,
     )
 
+    audit_write_start = time.monotonic()
     add_record_in_file_audit_tbl(job_audit_map, job_audit_tbl)
+    metrics.put_metric(
+        "AuditWriteLatency",
+        (time.monotonic() - audit_write_start) * 1000,
+        "Milliseconds",
+    )
+    put_job_started_metrics(event)
 
     return {
         "statusCode": 200,
@@ -4,9 +4,14 @@
 import json
 
 
+# reference of the rsql_sequential_iterator_pass state, see infra/cdk/state_logic.py
+
+
 def lambda_handler(event, context):
 
     sequential_rsql_list = event["sequential"]
+    sequential_express = event["sequential_express"]
+    sequential_timeouts = event["sequential_timeouts"]
     count = len(sequential_rsql_list)
     index = event["index"]
     workflow_id = (event["workflow_id"],)
@@ -14,18 +19,26 @@ def lambda_handler(event, context):
 
     if index + 1 == count:
         script = "NA"
+        express = False
+        timeouts = {}
 
     else:
         script = sequential_rsql_list[index + 1]
+        express = sequential_express[index + 1]
+        timeouts = sequential_timeouts[index + 1]
 
     execution_details = {
         "script": script,
+        "express": express,
+        "timeouts": timeouts,
         "workflow_id": workflow_id[0],
         "workflow_execution_id": workflow_execution_id,
     }
 
     return {
         "sequential": sequential_rsql_list,
+        "sequential_express": sequential_express,
+        "sequential_timeouts": sequential_timeouts,
         "count": count,
         "index": index + 1,
         "execution_details": execution_details,
@@ -3,9 +3,11 @@
 
 import json
 import os
+import time
 from datetime import datetime
 
 from audit_operations import update_records_in_workflow_audit_tbl
+from metrics import metrics
 
 
 def create_workflow_audit_record(
@@ -22,6 +24,7 @@ def create_workflow_audit_record(
     return workflow_audit_record
 
 
+@metrics.flush_after_invocation
 def lambda_handler(event, context):
 
     print(event)
@@ -35,7 +38,20 @@ def lambda_handler(event, context):
     workflow_audit_record = create_workflow_audit_record(
         workflow_id, workflow_execution_id, execution_status
     )
+    audit_write_start = time.monotonic()
     update_records_in_workflow_audit_tbl(workflow_audit_record, workflow_audit_tbl)
+    metrics.put_metric(
+        "AuditWriteLatency",
+        (time.monotonic() - audit_write_start) * 1000,
+        "Milliseconds",
+    )
+
+    metrics.put_metric(
+        "WorkflowsCompleted" if execution_status == "successful" else "WorkflowsFailed",
+        1,
+        workflow_id=workflow_id,
+    )
+
     return {
         "statusCode": 200,
         "body": json.dumps("workflow audit table updated"),
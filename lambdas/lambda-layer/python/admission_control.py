@@ -0,0 +1,309 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client
+
+logger = logging.getLogger()
+
+# seconds the WLM state read from the cluster is reused
+WLM_STATE_TTL_SECONDS = 5
+
+# conditional updates of the shared admission count before a pass gives up
+ADMISSION_UPDATE_ATTEMPTS = 5
+
+# Redshift Data API statements are polled until they finish
+STATEMENT_POLL_SECONDS = 0.1
+STATEMENT_TIMEOUT_SECONDS = 10
+
+# slots, running and queued queries of the manual (6-13) and automatic (100+) WLM queues
+WLM_STATE_QUERY = """
+SELECT NVL(SUM(CASE WHEN c.num_query_tasks > 0 THEN c.num_query_tasks ELSE 0 END), 0) AS slots,
+       NVL(SUM(s.num_executing_queries), 0) AS running,
+       NVL(SUM(s.num_queued_queries), 0) AS queued
+FROM stv_wlm_service_class_config c
+JOIN stv_wlm_service_class_state s ON c.service_class = s.service_class
+WHERE c.service_class BETWEEN 6 AND 13 OR c.service_class >= 100
+"""
+
+#######################################################################################################################
+################################################# Admission Control ###################################################
+#######################################################################################################################
+
+
+class WlmCapacityExceeded(Exception):
+    """Raised by the rsql invoke lambda when a script is held back, the state machine retries it"""
+
+
+class RedshiftDataWlmSource:
+    """Reads the WLM queue state of a provisioned cluster through the Redshift Data API"""
+
+    def __init__(
+        self,
+        cluster_identifier: str,
+        database: str,
+        secret_id: str = None,
+        db_user: str = None,
+    ) -> None:
+        """
+        :param str cluster_identifier:
+        :param str database:
+        :param str secret_id: name or ARN of the secret holding the credentials of the cluster
+        :param str db_user: database user with temporary credentials, used without secret
+        """
+        self.cluster_identifier = cluster_identifier
+        self.database = database
+        self.secret_id = secret_id
+        self.db_user = db_user
+        self._secret_arn = None
+
+    def _get_credentials_params(self) -> dict:
+        if not self.secret_id:
+            return {"DbUser": self.db_user}
+
+        # the Data API only accepts the full ARN of the secret
+        if self._secret_arn is None:
+            self._secret_arn = get_client("secretsmanager").describe_secret(
+                SecretId=self.secret_id
+            )["ARN"]
+
+        return {"SecretArn": self._secret_arn}
+
+    def get_wlm_state(self) -> dict:
+        """Runs the WLM state query and waits for its result
+
+        :return: slots, running and queued of the user queues
+        :rtype: dict
+        :raises: Exception
+        """
+
+        redshift_data_client = get_client("redshift-data")
+
+        statement_id = redshift_data_client.execute_statement(
+            ClusterIdentifier=self.cluster_identifier,
+            Database=self.database,
+            Sql=WLM_STATE_QUERY,
+            **self._get_credentials_params(),
+        )["Id"]
+
+        deadline = time.monotonic() + STATEMENT_TIMEOUT_SECONDS
+        while True:
+            statement = redshift_data_client.describe_statement(Id=statement_id)
+            if statement["Status"] == "FINISHED":
+                break
+            if statement["Status"] in ("FAILED", "ABORTED"):
+                raise Exception(f"WLM state query {statement['Status']} : {statement.get('Error')}")
+            if time.monotonic() > deadline:
+                redshift_data_client.cancel_statement(Id=statement_id)
+                raise Exception("WLM state query timed out")
+            time.sleep(STATEMENT_POLL_SECONDS)
+
+        record = redshift_data_client.get_statement_result(Id=statement_id)["Records"][0]
+
+        return {
+            name: int(field.get("longValue", 0))
+            for name, field in zip(["slots", "running", "queued"], record)
+        }
+
+
+class StaticWlmSource:
+    """WLM state set by the caller, stands in for the cluster in tests and benchmarks"""
+
+    def __init__(self, slots: int, running: int = 0, queued: int = 0) -> None:
+        self.slots = slots
+        self.running = running
+        self.queued = queued
+
+    def get_wlm_state(self) -> dict:
+        return {"slots": self.slots, "running": self.running, "queued": self.queued}
+
+
+class AdmissionController:
+    """Holds scripts back while the WLM queues of the cluster are saturated"""
+
+    def __init__(
+        self,
+        wlm_source,
+        target_concurrency: int = None,
+        max_queued: int = 0,
+        state_ttl: float = WLM_STATE_TTL_SECONDS,
+        admission_tbl: str = None,
+        ddb_client: object = None,
+    ) -> None:
+        """
+        :param wlm_source: object with a get_wlm_state method, see RedshiftDataWlmSource
+        :param int target_concurrency: queries the cluster should run at the same time
+        :param int max_queued: queries allowed to wait in the WLM queues
+        :param float state_ttl: seconds the WLM state is reused
+        :param str admission_tbl: DynamoDB table of the shared admission counts
+        :param obj ddb_client:
+        """
+        self.wlm_source = wlm_source
+        self.target_concurrency = target_concurrency
+        self.max_queued = max_queued
+        self.state_ttl = state_ttl
+        self.admission_tbl = admission_tbl
+        self.ddb_client = ddb_client
+
+        self._lock = threading.Lock()
+        self._wlm_state = None
+        self._state_window = None
+        self._admitted = 0
+
+    def _get_window(self) -> int:
+        # windows start at the same time in every container
+        return int(time.time() // self.state_ttl) if self.state_ttl else None
+
+    def _refresh_wlm_state(self) -> None:
+        window = self._get_window()
+        if window is not None and window == self._state_window:
+            return
+        self._wlm_state = self.wlm_source.get_wlm_state()
+        self._state_window = window
+        self._admitted = 0
+        print(f"WLM state : {self._wlm_state}")
+
+    def _get_wlm_capacity(self) -> Optional[int]:
+
+        with self._lock:
+            try:
+                self._refresh_wlm_state()
+            except Exception as e:
+                # an unreadable cluster state never blocks the workflows
+                print("WLM state not read, scripts are admitted : " + str(e))
+                return None
+
+            target_concurrency = self.target_concurrency or self._wlm_state["slots"]
+            if not target_concurrency:
+                print("No WLM slot count nor target concurrency, scripts are admitted")
+                return None
+
+            return (
+                target_concurrency
+                + self.max_queued
+                - self._wlm_state["running"]
+                - self._wlm_state["queued"]
+            )
+
+    def _get_admission_key(self) -> dict:
+        window = self._state_window if self._state_window is not None else time.time()
+        return {"admission_window": {"N": str(int(window))}}
+
+    def _get_shared_admitted(self) -> int:
+        ddb_client = self.ddb_client or get_client("dynamodb")
+        response = ddb_client.get_item(
+            TableName=self.admission_tbl,
+            Key=self._get_admission_key(),
+            ConsistentRead=True,
+        )
+        return int(response.get("Item", {}).get("admitted", {}).get("N", 0))
+
+    def _admit_shared(self, requested: int, wlm_capacity: int) -> int:
+        ddb_client = self.ddb_client or get_client("dynamodb")
+        expires_at = int(time.time() + max(self.state_ttl, 1) * 10)
+
+        admitted_before = 0
+        for _ in range(ADMISSION_UPDATE_ATTEMPTS):
+            admitted = min(requested, wlm_capacity - admitted_before)
+            if admitted <= 0:
+                return 0
+            try:
+                ddb_client.update_item(
+                    TableName=self.admission_tbl,
+                    Key=self._get_admission_key(),
+                    UpdateExpression="SET expires_at = :expires_at "
+                    "ADD admitted :admitted",
+                    ConditionExpression="attribute_not_exists(admitted) "
+                    "OR admitted <= :max_admitted_before",
+                    ExpressionAttributeValues={
+                        ":admitted": {"N": str(admitted)},
+                        ":max_admitted_before": {"N": str(wlm_capacity - admitted)},
+                        ":expires_at": {"N": str(expires_at)},
+                    },
+                )
+                return admitted
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+            # another container admitted scripts in the meantime
+            admitted_before = self._get_shared_admitted()
+
+        return 0
+
+    def capacity(self) -> Optional[int]:
+        """Returns the number of scripts which can start now
+
+        :return: free capacity, None when the WLM state is unknown
+        :rtype: int
+        """
+
+        wlm_capacity = self._get_wlm_capacity()
+        if wlm_capacity is None:
+            return None
+
+        admitted = self._admitted
+        if self.admission_tbl:
+            try:
+                admitted = self._get_shared_admitted()
+            except Exception as e:
+                print("Shared admission count not read : " + str(e))
+
+        return max(wlm_capacity - admitted, 0)
+
+    def admit(self, requested: int) -> int:
+        """Admits up to requested scripts
+
+        :param int requested: scripts ready to start
+        :return: number of scripts which can start, the first ones of the request
+        :rtype: int
+        """
+
+        wlm_capacity = self._get_wlm_capacity()
+        if wlm_capacity is None:
+            return requested
+
+        admitted = None
+        if self.admission_tbl:
+            try:
+                admitted = self._admit_shared(requested, wlm_capacity)
+            except Exception as e:
+                print("Shared admission count not updated, counted locally : " + str(e))
+
+        with self._lock:
+            if admitted is None:
+                admitted = min(requested, max(wlm_capacity - self._admitted, 0))
+            self._admitted += admitted
+
+        if admitted < requested:
+            print(f"{requested - admitted} of {requested} scripts held back by WLM admission")
+
+        return admitted
+
+
+def create_admission_controller() -> Optional[AdmissionController]:
+    """Builds the admission controller configured in the environment of the lambda
+
+    :return: the controller, None when admission control is disabled
+    :rtype: AdmissionController
+    """
+
+    if os.environ.get("admission_control", "false") != "true":
+        return None
+
+    wlm_source = RedshiftDataWlmSource(
+        os.environ["redshift_cluster_id"],
+        os.environ["redshift_database"],
+        secret_id=os.environ.get("redshift_secret_id") or None,
+        db_user=os.environ.get("redshift_db_user") or None,
+    )
+
+    return AdmissionController(
+        wlm_source,
+        target_concurrency=int(os.environ.get("wlm_target_concurrency", 0)) or None,
+        max_queued=int(os.environ.get("wlm_max_queued", 0)),
+        admission_tbl=os.environ.get("admission_table") or None,
+    )
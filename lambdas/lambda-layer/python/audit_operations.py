@@ -1,11 +1,17 @@
 import logging
 import os
+import threading
 import time
 from datetime import datetime
 from decimal import Decimal
 from typing import List
 
-from dynamodb_interfaces import put_item_into_dynamodb, update_dynamodb_items
+from dynamodb_interfaces import (
+    batch_put_items_into_dynamodb,
+    put_item_into_dynamodb,
+    transact_update_dynamodb_items,
+    update_dynamodb_items,
+)
 
 logger = logging.getLogger()
 
@@ -79,7 +85,8 @@ def update_records_in_workflow_audit_tbl(
 
 
 def add_record_in_file_audit_tbl(file_audit_item: dict, file_ddb_tbl: str) -> None:
-    """Puts item into File Audit DynamoDB table
+    """Adds item to File Audit DynamoDB table, the attributes already written by a
+    job which ended before its record was added are kept
 
     :param dict workflow_audit_item:
     :param str ddb_tbl:
@@ -90,7 +97,7 @@ def add_record_in_file_audit_tbl(file_audit_item: dict, file_ddb_tbl: str) -> No
     try:
 
         # file_audit_item['execution_start_ts'] = datetime.utcnow().strftime("%m/%d/%Y %H:%M:%S")
-        put_item_into_dynamodb(file_ddb_tbl, file_audit_item)
+        update_dynamodb_items(file_ddb_tbl, [file_audit_item], keep_existing=True)
     except Exception as e:
         logger.error("Error while adding record to the File Audit Table : " + str(e))
         raise
@@ -111,3 +118,109 @@ def update_records_in_file_audit_tbl(file_audit_item: dict, file_ddb_tbl: str) -
     except Exception as e:
         logger.error("Error while updating record to the File Audit Table : " + str(e))
         raise
+
+
+class AuditWriter:
+    """Buffers audit records and writes them with a few batched DynamoDB calls"""
+
+    def __init__(self, max_records: int = 100) -> None:
+        """
+        :param int max_records: buffered records which trigger a flush
+        """
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        # flushes run one at a time, a later update never overtakes an earlier put
+        self._flush_lock = threading.Lock()
+        self._puts = {}
+        self._updates = {}
+
+    def __enter__(self) -> "AuditWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._buffered_records()
+
+    def _buffered_records(self) -> int:
+        return sum(len(items) for items in self._puts.values()) + sum(
+            len(items) for items in self._updates.values()
+        )
+
+    def add_record(self, audit_item: dict, ddb_tbl: str) -> None:
+        """Buffers a new record, written as a whole item
+
+        :param dict audit_item:
+        :param str ddb_tbl:
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self._puts.setdefault(ddb_tbl, []).append(dict(audit_item))
+            is_full = self._buffered_records() >= self.max_records
+        if is_full:
+            self._flush_when_full()
+
+    def update_record(self, audit_item: dict, ddb_tbl: str) -> None:
+        """Buffers an update, only the attributes of the item are set on the record
+
+        :param dict audit_item:
+        :param str ddb_tbl:
+        :return: None
+        :rtype: None
+        """
+        with self._lock:
+            self._updates.setdefault(ddb_tbl, []).append(dict(audit_item))
+            is_full = self._buffered_records() >= self.max_records
+        if is_full:
+            self._flush_when_full()
+
+    def _flush_when_full(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            # the records stay buffered, the caller's next flush retries them
+            pass
+
+    def flush(self) -> None:
+        """Writes the buffered records
+
+        :return: None
+        :rtype: None
+        :raises: Exception
+        """
+        with self._flush_lock:
+            with self._lock:
+                puts, self._puts = self._puts, {}
+                updates, self._updates = self._updates, {}
+
+            self._write(puts, updates)
+
+    def _write(self, puts: dict, updates: dict) -> None:
+
+        for ddb_tbl in list(puts):
+            try:
+                batch_put_items_into_dynamodb(ddb_tbl, puts[ddb_tbl])
+                del puts[ddb_tbl]
+            except Exception as e:
+                logger.error("Error while writing records to the audit table : " + str(e))
+                self._requeue(puts, updates)
+                raise
+
+        for ddb_tbl in list(updates):
+            try:
+                transact_update_dynamodb_items(ddb_tbl, updates[ddb_tbl])
+                del updates[ddb_tbl]
+            except Exception as e:
+                logger.error("Error while updating records in the audit table : " + str(e))
+                self._requeue(puts, updates)
+                raise
+
+    def _requeue(self, puts: dict, updates: dict) -> None:
+        with self._lock:
+            for ddb_tbl, items in puts.items():
+                self._puts[ddb_tbl] = items + self._puts.get(ddb_tbl, [])
+            for ddb_tbl, items in updates.items():
+                self._updates[ddb_tbl] = items + self._updates.get(ddb_tbl, [])
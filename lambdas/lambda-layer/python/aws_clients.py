@@ -0,0 +1,95 @@
+import logging
+import threading
+
+import boto3
+
+logger = logging.getLogger()
+
+# one session for the whole process, boto3 clients are thread safe once created
+_session = None
+_clients = {}
+_lock = threading.Lock()
+
+# boto3 resources are not thread safe, every thread gets its own
+_thread_local = threading.local()
+
+# replaces boto3 when set, e.g. by the in process fake of benchmarks/fake_aws.py
+_backend = None
+
+#######################################################################################################################
+#################################################### AWS Clients ######################################################
+#######################################################################################################################
+
+
+def _get_session() -> boto3.session.Session:
+
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def set_backend(backend: object) -> None:
+    """Routes the clients and resources returned by this module to another backend
+
+    :param obj backend: None to go back to boto3
+    :return: None
+    :rtype: None
+    """
+
+    global _backend
+    with _lock:
+        _backend = backend
+        _clients.clear()
+
+
+def get_client(service_name: str, region: str = None) -> object:
+    """Returns the shared boto3 client of a service in a region, created on first use
+
+    :param str service_name:
+    :param str region:
+    :return: boto3 client
+    :rtype: obj
+    """
+
+    key = (service_name, region)
+    client = _clients.get(key)
+
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                if _backend is not None:
+                    client = _backend.client(service_name, region)
+                else:
+                    client = _get_session().client(service_name, region_name=region)
+                _clients[key] = client
+
+    return client
+
+
+def get_resource(service_name: str, region: str = None) -> object:
+    """Returns the boto3 resource of a service in a region for the calling thread
+
+    :param str service_name:
+    :param str region:
+    :return: boto3 service resource
+    :rtype: obj
+    """
+
+    if not hasattr(_thread_local, "resources"):
+        _thread_local.resources = {}
+
+    key = (service_name, region, id(_backend))
+    resource = _thread_local.resources.get(key)
+
+    if resource is None:
+        # the shared session is not thread safe, resources are created under the lock
+        with _lock:
+            if _backend is not None:
+                resource = _backend.resource(service_name, region)
+            else:
+                resource = _get_session().resource(service_name, region_name=region)
+        _thread_local.resources[key] = resource
+
+    return resource
@@ -0,0 +1,114 @@
+import logging
+from statistics import median
+from typing import Dict, Optional
+
+logger = logging.getLogger()
+
+# scripts a stage starts with before the window is widened
+INITIAL_WINDOW = 4
+
+# scripts added to the window after a pass without congestion
+ADDITIVE_INCREASE = 2
+
+# share of the window kept after a pass with congestion
+MULTIPLICATIVE_DECREASE = 0.5
+
+# runtime / median runtime of the finished scripts above which a pass is congested
+LATENCY_TOLERANCE = 1.5
+
+# shorter scripts are not compared, the audit timestamps are in seconds
+MIN_BASELINE_SECONDS = 5
+
+#######################################################################################################################
+################################################# Concurrency Control #################################################
+#######################################################################################################################
+
+
+def new_concurrency_state(
+    max_concurrency: int,
+    baselines: Dict[str, float] = None,
+    initial_window: int = INITIAL_WINDOW,
+) -> dict:
+    """Returns the concurrency state of a stage or workflow which has not started yet
+
+    :param int max_concurrency:
+    :param dict baselines: job name mapped to its median runtime
+    :param int initial_window:
+    :return: concurrency state
+    :rtype: dict
+    """
+
+    return {
+        "window": max(min(initial_window, max_concurrency), 1),
+        "max_window": max_concurrency,
+        "baselines": baselines or {},
+        "latency_ratio": None,
+        "throttles": 0,
+    }
+
+
+def get_latency_ratio(
+    runtimes: Dict[str, float], baselines: Dict[str, float]
+) -> Optional[float]:
+    """Compares the runtimes of the finished scripts to their history
+
+    :param dict runtimes: job name mapped to its last runtime
+    :param dict baselines: job name mapped to its median runtime
+    :return: median of the runtime / baseline ratios, None without comparable script
+    :rtype: float
+    """
+
+    ratios = [
+        runtime / baselines[job_name]
+        for job_name, runtime in runtimes.items()
+        if baselines.get(job_name, 0) >= MIN_BASELINE_SECONDS
+    ]
+
+    return median(ratios) if ratios else None
+
+
+def update_concurrency_window(
+    concurrency_state: dict,
+    runtimes: Dict[str, float],
+    failures: int,
+    throttles: int,
+    window_full: bool,
+) -> dict:
+    """Widens a full window after a pass without congestion, narrows it after a
+    throttle, a failure or a slowdown of the finished scripts
+
+    :param dict concurrency_state: state returned by the previous pass
+    :param dict runtimes: job name mapped to its runtime, for the scripts finished
+    :param int failures:
+    :param int throttles: dispatches held back or throttled
+    :param bool window_full:
+    :return: new concurrency state
+    :rtype: dict
+    """
+
+    latency_ratio = get_latency_ratio(runtimes, concurrency_state["baselines"])
+    window = concurrency_state["window"]
+
+    congested = (
+        throttles > 0
+        or failures > 0
+        or (latency_ratio is not None and latency_ratio > LATENCY_TOLERANCE)
+    )
+
+    if congested:
+        window = max(int(window * MULTIPLICATIVE_DECREASE), 1)
+    elif window_full:
+        window = min(window + ADDITIVE_INCREASE, concurrency_state["max_window"])
+
+    if window != concurrency_state["window"]:
+        print(
+            f"Concurrency window {concurrency_state['window']} -> {window}, "
+            f"latency ratio : {latency_ratio}, failures : {failures}, throttles : {throttles}"
+        )
+
+    return {
+        **concurrency_state,
+        "window": window,
+        "latency_ratio": latency_ratio,
+        "throttles": throttles,
+    }
@@ -1,5 +1,6 @@
 import logging
 import os
+import random
 import time
 from datetime import datetime
 from decimal import Decimal
@@ -10,6 +11,8 @@ from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore import client
 from botocore.exceptions import ClientError
 
+from aws_clients import get_client, get_resource
+
 logger = logging.getLogger()
 serializer = TypeSerializer()
 deserializer = TypeDeserializer()
@@ -18,6 +21,43 @@ deserializer = TypeDeserializer()
 #################################################### DynamoDB Interfaces ##############################################
 #######################################################################################################################
 
+# existence and key schema of the tables, described once per TABLE_METADATA_TTL seconds
+TABLE_METADATA_TTL = 300
+_table_metadata = {}
+
+
+def get_table_metadata(table: str, ddb_client: object = None) -> dict:
+    """Returns the key schema of a table, from the cache when it is fresh
+
+    :param str table:
+    :param obj ddb_client:
+    :return: attribute name mapped to key type for the keys of the table
+    :rtype: dict
+    :raises: ClientError
+    """
+    cached_metadata = _table_metadata.get(table)
+    if cached_metadata and cached_metadata[0] > time.monotonic():
+        return cached_metadata[1]
+
+    table_key = get_dynamodb_table_key_dict(table, ddb_client)
+    _table_metadata[table] = (time.monotonic() + TABLE_METADATA_TTL, table_key)
+
+    return table_key
+
+
+def invalidate_table_metadata(table: str) -> None:
+    """Drops the cached metadata of a table, the next write describes it again
+
+    :param str table:
+    :return: None
+    :rtype: None
+    """
+    _table_metadata.pop(table, None)
+
+
+def _is_table_not_found(error: ClientError) -> bool:
+    return error.response["Error"]["Code"] == "ResourceNotFoundException"
+
 
 def check_if_tbl_exists_dynamodb(ddb_tbl: str, ddb_client: object) -> bool:
     """Checks for the existence of a Dynamodb table
@@ -40,8 +80,8 @@ def check_if_tbl_exists_dynamodb(ddb_tbl: str, ddb_client: object) -> bool:
 def put_item_into_dynamodb(
     ddb_tbl: str,
     item: dict,
-    ddb_client: object = boto3.client("dynamodb"),
-    ddb_resource: object = boto3.resource("dynamodb"),
+    ddb_client: object = None,
+    ddb_resource: object = None,
 ) -> None:
     """Puts item into DynamoDB table
 
@@ -51,69 +91,202 @@ def put_item_into_dynamodb(
     :param obj ddb_resource:
     :return: None
     :rtype: None
-    :raises: AssertionError
+    :raises: ClientError
     """
+    ddb_client = ddb_client or get_client("dynamodb")
+    ddb_resource = ddb_resource or get_resource("dynamodb")
+
     try:
-        assert check_if_tbl_exists_dynamodb(ddb_tbl, ddb_client) is True
+        get_table_metadata(ddb_tbl, ddb_client)
         table = ddb_resource.Table(ddb_tbl)
         table.put_item(Item=item)
     except ClientError as e:
         logger.error(e.response["Error"]["Message"])
+        if _is_table_not_found(e):
+            invalidate_table_metadata(ddb_tbl)
         raise
-    except AssertionError as a:
-        logger.error("Table doesn't exist")
-        raise
+
+
+def _build_update_params(
+    table: str, item: dict, table_key: dict, keep_existing: bool = False
+) -> dict:
+    """Builds the UpdateItem parameters setting every non key attribute of the item
+
+    :param str table:
+    :param dict item:
+    :param dict table_key: attribute name mapped to key type for the keys of the table
+    :param bool keep_existing: only sets the attributes the stored item does not have
+    :return: TableName, Key, UpdateExpression and ExpressionAttributeValues of the update
+    :rtype: dict
+    """
+    ddb_item = _serialize(item)
+    key = _serialize({k: item[k] for k in table_key.keys()})
+    expression_attribute_values = {}
+    for k, v in ddb_item.items():
+        if k not in table_key:
+            expression_attribute_values[":" + k] = v
+    more_params = {}
+    expression_attribute_names = {}
+    attributes = []
+    for k in item.keys():
+        if k in table_key:
+            continue
+        # if k in reserved_words:
+        #     p = ('#'+k, k)
+        #     expression_attribute_names[p[0]] = p[1]
+        else:
+            p = (k, k)
+        attributes.append(p)
+    if len(expression_attribute_names) > 0:
+        more_params["ExpressionAttributeNames"] = expression_attribute_names
+    if keep_existing:
+        update_expression = "set " + ",".join(
+            map(lambda x: f"{x[0]} = if_not_exists({x[0]}, :{x[1]})", attributes)
+        )
+    else:
+        update_expression = "set " + ",".join(
+            map(lambda x: f"{x[0]} = :{x[1]}", attributes)
+        )
+
+    return {
+        "TableName": table,
+        "Key": key,
+        "UpdateExpression": update_expression,
+        "ExpressionAttributeValues": expression_attribute_values,
+        **more_params,
+    }
+
+
+def _merge_items_by_key(items: list, table_key: dict) -> list:
+    """Merges the items sharing a primary key, later attributes win"""
+    merged_items = {}
+    for item in items:
+        key = tuple(item[k] for k in table_key.keys())
+        merged_items.setdefault(key, {}).update(item)
+    return list(merged_items.values())
+
+
+def _backoff(attempt: int) -> None:
+    # exponential backoff with full jitter, capped at two seconds
+    time.sleep(random.uniform(0, min(0.05 * 2**attempt, 2)))
 
 
 def update_dynamodb_items(
     table: str,
     items: list,
     table_key: dict = None,
-    ddb_client: object = boto3.client("dynamodb"),
+    ddb_client: object = None,
+    keep_existing: bool = False,
 ):
+    ddb_client = ddb_client or get_client("dynamodb")
+
     if table_key is None:
-        table_key = get_dynamodb_table_key_dict(table, ddb_client)
+        table_key = get_table_metadata(table, ddb_client)
     item: dict
     for item in items:
-        ddb_item = _serialize(item)
-        key = _serialize({k: item[k] for k in table_key.keys()})
-        expression_attribute_values = {}
-        for k, v in ddb_item.items():
-            if k not in table_key:
-                expression_attribute_values[":" + k] = v
-        more_params = {}
-        expression_attribute_names = {}
-        attributes = []
-        for k in item.keys():
-            if k in table_key:
-                continue
-            # if k in reserved_words:
-            #     p = ('#'+k, k)
-            #     expression_attribute_names[p[0]] = p[1]
-            else:
-                p = (k, k)
-            attributes.append(p)
-        if len(expression_attribute_names) > 0:
-            more_params["ExpressionAttributeNames"] = expression_attribute_names
-        update_expression = "set " + ",".join(
-            map(lambda x: f"{x[0]} = :{x[1]}", attributes)
-        )
-        print(
-            f"""update_item(
-            TableName={table},
-            Key={key},
-            UpdateExpression={update_expression},
-            ExpressionAttributeValues={expression_attribute_values},
-            {more_params}
-        )"""
-        )
-        response = ddb_client.update_item(
-            TableName=table,
-            Key=key,
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_attribute_values,
-            **more_params,
-        )
+        update_params = _build_update_params(table, item, table_key, keep_existing)
+        print(f"update_item({update_params})")
+        try:
+            response = ddb_client.update_item(**update_params)
+        except ClientError as e:
+            if _is_table_not_found(e):
+                invalidate_table_metadata(table)
+            raise
+
+
+def batch_put_items_into_dynamodb(
+    table: str,
+    items: list,
+    ddb_client: object = None,
+    max_attempts: int = 8,
+) -> None:
+    """Puts items into a DynamoDB table with BatchWriteItem, 25 items per call
+
+    :param str table:
+    :param list items:
+    :param obj ddb_client:
+    :param int max_attempts: calls made for a chunk before giving up
+    :return: None
+    :rtype: None
+    :raises: ClientError, RuntimeError
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+
+    table_key = get_table_metadata(table, ddb_client)
+    items = _merge_items_by_key(items, table_key)
+
+    for i in range(0, len(items), 25):
+        request_items = {
+            table: [
+                {"PutRequest": {"Item": _serialize(item)}}
+                for item in items[i : i + 25]
+            ]
+        }
+
+        for attempt in range(max_attempts):
+            if attempt:
+                _backoff(attempt)
+            try:
+                response = ddb_client.batch_write_item(RequestItems=request_items)
+            except ClientError as e:
+                if _is_table_not_found(e):
+                    invalidate_table_metadata(table)
+                raise
+            request_items = response.get("UnprocessedItems")
+            if not request_items:
+                break
+        else:
+            raise RuntimeError(
+                f"{len(request_items[table])} items not written to {table}"
+            )
+
+
+def transact_update_dynamodb_items(
+    table: str,
+    items: list,
+    ddb_client: object = None,
+    max_attempts: int = 8,
+) -> None:
+    """Updates items of a DynamoDB table with TransactWriteItems, 100 items per call
+
+    :param str table:
+    :param list items:
+    :param obj ddb_client:
+    :param int max_attempts: calls made for a chunk before giving up
+    :return: None
+    :rtype: None
+    :raises: ClientError
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+
+    table_key = get_table_metadata(table, ddb_client)
+    items = _merge_items_by_key(items, table_key)
+
+    for i in range(0, len(items), 100):
+        transact_items = [
+            {"Update": _build_update_params(table, item, table_key)}
+            for item in items[i : i + 100]
+        ]
+
+        for attempt in range(max_attempts):
+            if attempt:
+                _backoff(attempt)
+            try:
+                ddb_client.transact_write_items(TransactItems=transact_items)
+                break
+            except ClientError as e:
+                if _is_table_not_found(e):
+                    invalidate_table_metadata(table)
+                if (
+                    e.response["Error"]["Code"]
+                    not in [
+                        "TransactionCanceledException",
+                        "ThrottlingException",
+                        "ProvisionedThroughputExceededException",
+                    ]
+                    or attempt == max_attempts - 1
+                ):
+                    raise
 
 
 def _serialize(item: dict) -> dict:
@@ -134,7 +307,7 @@ def _deserialize(ddb_item: dict) -> dict:
 def query_dynamodb(
     partiql_statement: str,
     is_strong_consistency: bool = False,
-    ddb_client: object = boto3.client("dynamodb"),
+    ddb_client: object = None,
 ) -> list:
     """Allows to perform reads and singleton writes on data stored in DynamoDB, using PartiQL
 
@@ -144,20 +317,72 @@ def query_dynamodb(
     :rtype: dict
     :raises: Exception
     """
+    ddb_client = ddb_client or get_client("dynamodb")
+
     try:
         statement = partiql_statement
         response = ddb_client.execute_statement(
             Statement=statement, ConsistentRead=is_strong_consistency
         )
-        return response["Items"]
+        items = response["Items"]
+        # a statement reads at most 1 MB per call, the next pages follow NextToken
+        while response.get("NextToken"):
+            response = ddb_client.execute_statement(
+                Statement=statement,
+                ConsistentRead=is_strong_consistency,
+                NextToken=response["NextToken"],
+            )
+            items.extend(response["Items"])
+        return items
     except Exception as e:
         print("Incorrect partiQL statement")
         raise
 
 
+def batch_get_items_from_dynamodb(
+    ddb_tbl: str,
+    keys: list,
+    ddb_client: object = None,
+    max_attempts: int = 8,
+) -> list:
+    """Gets items from a DynamoDB table by primary key, 100 keys per call
+
+    :param str ddb_tbl:
+    :param list keys: primary keys of the items
+    :param obj ddb_client:
+    :param int max_attempts: calls made for a chunk before giving up
+    :return: the deserialized items which exist
+    :rtype: list
+    :raises: ClientError, RuntimeError
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+    items = []
+
+    for i in range(0, len(keys), 100):
+        request_items = {ddb_tbl: {"Keys": [_serialize(key) for key in keys[i : i + 100]]}}
+
+        for attempt in range(max_attempts):
+            if attempt:
+                _backoff(attempt)
+            response = ddb_client.batch_get_item(RequestItems=request_items)
+            items.extend(
+                _deserialize(item) for item in response["Responses"].get(ddb_tbl, [])
+            )
+            request_items = response.get("UnprocessedKeys")
+            if not request_items:
+                break
+        else:
+            raise RuntimeError(
+                f"{len(request_items[ddb_tbl]['Keys'])} items not read from {ddb_tbl}"
+            )
+
+    return items
+
+
 def get_dynamodb_table_key_dict(
-    table: str, ddb_client: object = boto3.client("dynamodb")
+    table: str, ddb_client: object = None
 ):
+    ddb_client = ddb_client or get_client("dynamodb")
     response = ddb_client.describe_table(TableName=table)
     result = {}
     for key_schema_record in response["Table"]["KeySchema"]:
@@ -0,0 +1,88 @@
+import logging
+from typing import Dict, List
+
+from dynamodb_interfaces import batch_get_items_from_dynamodb
+
+logger = logging.getLogger()
+
+#######################################################################################################################
+#################################################### Job Statistics ###################################################
+#######################################################################################################################
+
+
+def get_job_statistics(job_names: list, job_stats_tbl: str) -> Dict[str, dict]:
+    """Returns the statistics records maintained by the instance for the given jobs
+
+    :param list job_names: jobs to look up
+    :param str job_stats_tbl: job statistics DynamoDB table
+    :return: job name mapped to its statistics record
+    :rtype: dict
+    """
+
+    keys = [{"job_name": job_name} for job_name in dict.fromkeys(job_names)]
+
+    return {
+        job_stats["job_name"]: job_stats
+        for job_stats in batch_get_items_from_dynamodb(job_stats_tbl, keys)
+    }
+
+
+def get_job_runtimes(job_names: list, job_stats_tbl: str) -> Dict[str, float]:
+    """Returns the median runtime in seconds of every job with a successful run
+
+    :param list job_names: jobs to look up
+    :param str job_stats_tbl: job statistics DynamoDB table
+    :return: job name mapped to its median runtime, jobs without history are left out
+    :rtype: dict
+    """
+
+    return get_median_runtimes(get_job_statistics(job_names, job_stats_tbl))
+
+
+def get_median_runtimes(job_stats: Dict[str, dict]) -> Dict[str, float]:
+    """Returns the median runtime in seconds kept on the statistics records
+
+    :param dict job_stats: job name mapped to its statistics record
+    :return: job name mapped to its median runtime, jobs without history are left out
+    :rtype: dict
+    """
+
+    return {
+        job_name: float(stats["p50_duration"])
+        for job_name, stats in job_stats.items()
+        if "p50_duration" in stats
+    }
+
+
+def get_express_jobs(job_stats: Dict[str, dict], max_runtime: float) -> List[str]:
+    """Returns the jobs short enough to run in an Express child execution
+
+    :param dict job_stats: job name mapped to its statistics record
+    :param float max_runtime: longest p95 runtime in seconds of an express job
+    :return: names of the express jobs
+    :rtype: list
+    """
+
+    return [
+        job_name
+        for job_name, stats in job_stats.items()
+        if "p95_duration" in stats and float(stats["p95_duration"]) <= max_runtime
+    ]
+
+
+def order_by_runtime(job_names: list, job_runtimes: Dict[str, float]) -> list:
+    """Orders jobs longest first so that the longest jobs never start last
+
+    :param list job_names: jobs to order
+    :param dict job_runtimes: job name mapped to its expected runtime
+    :return: job names, longest first, configuration order kept for ties
+    :rtype: list
+    """
+
+    default_runtime = max(job_runtimes.values(), default=0)
+
+    return sorted(
+        job_names,
+        key=lambda job_name: job_runtimes.get(job_name, default_runtime),
+        reverse=True,
+    )
@@ -0,0 +1,130 @@
+import functools
+import json
+import threading
+import time
+
+# namespace of the metrics of the framework in CloudWatch
+METRICS_NAMESPACE = "RSQLOrchestration"
+
+# a metric holds at most 100 values in an EMF document
+# https://docs.aws.amazon.com/AmazonCloudWatch/latest/monitoring/CloudWatch_Embedded_Metric_Format_Specification.html
+MAX_VALUES_PER_METRIC = 100
+
+#######################################################################################################################
+################################################### Embedded Metrics ##################################################
+#######################################################################################################################
+
+
+class MetricsLogger:
+    """Aggregates metrics and prints them in CloudWatch Embedded Metric Format"""
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE) -> None:
+        """
+        :param str namespace: CloudWatch namespace of the metrics
+        """
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def put_metric(
+        self, name: str, value: float, unit: str = "Count", workflow_id: str = None
+    ) -> None:
+        """Adds a value of a metric, flushed with the other values of the invocation
+
+        :param str name: metric name
+        :param float value:
+        :param str unit: CloudWatch unit, e.g. Count, Milliseconds or Bytes
+        :param str workflow_id: workflow the value belongs to
+        :return: None
+        :rtype: None
+        """
+
+        with self._lock:
+            metric = self._metrics.setdefault(
+                (workflow_id, name), {"unit": unit, "values": []}
+            )
+            metric["values"].append(value)
+
+    def documents(self) -> list:
+        """Returns the EMF documents of the buffered metrics and clears them
+
+        :return: one JSON document per workflow_id and per batch of values
+        :rtype: list
+        """
+
+        with self._lock:
+            buffered_metrics, self._metrics = self._metrics, {}
+
+        metrics_by_workflow = {}
+        for (workflow_id, name), metric in buffered_metrics.items():
+            metrics_by_workflow.setdefault(workflow_id, {})[name] = metric
+
+        documents = []
+        timestamp = int(time.time() * 1000)
+
+        for workflow_id, metrics in metrics_by_workflow.items():
+            dimensions = [["workflow_id"], []] if workflow_id else [[]]
+            batch_count = max(
+                (len(metric["values"]) - 1) // MAX_VALUES_PER_METRIC + 1
+                for metric in metrics.values()
+            )
+
+            for i in range(batch_count):
+                values = {
+                    name: metric["values"][
+                        i * MAX_VALUES_PER_METRIC : (i + 1) * MAX_VALUES_PER_METRIC
+                    ]
+                    for name, metric in metrics.items()
+                }
+                values = {name: value for name, value in values.items() if value}
+
+                document = {
+                    "_aws": {
+                        "Timestamp": timestamp,
+                        "CloudWatchMetrics": [
+                            {
+                                "Namespace": self.namespace,
+                                "Dimensions": dimensions,
+                                "Metrics": [
+                                    {"Name": name, "Unit": metrics[name]["unit"]}
+                                    for name in values
+                                ],
+                            }
+                        ],
+                    },
+                    **{
+                        name: value[0] if len(value) == 1 else value
+                        for name, value in values.items()
+                    },
+                }
+                if workflow_id:
+                    document["workflow_id"] = workflow_id
+
+                documents.append(json.dumps(document))
+
+        return documents
+
+    def flush(self) -> None:
+        """Prints the buffered metrics to the lambda log
+
+        :return: None
+        :rtype: None
+        """
+
+        for document in self.documents():
+            print(document)
+
+    def flush_after_invocation(self, handler):
+        """Decorates a lambda handler to flush the metrics once per invocation"""
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            try:
+                return handler(event, context)
+            finally:
+                self.flush()
+
+        return wrapper
+
+
+metrics = MetricsLogger()
@@ -0,0 +1,76 @@
+import logging
+from typing import Dict
+
+logger = logging.getLogger()
+
+# heartbeat intervals a task waits before it times out
+HEARTBEATS_PER_TIMEOUT = 3
+
+TIMEOUT_SETTINGS = ["timeout_seconds", "heartbeat_seconds"]
+
+#######################################################################################################################
+################################################### Script Timeouts ###################################################
+#######################################################################################################################
+
+
+def parse_timeout_settings(settings: dict) -> dict:
+    """Returns the timeout settings of a stage or a script as integers
+
+    :param dict settings: stage or script_timeouts entry
+    :return: timeout_seconds and heartbeat_seconds present in the settings
+    :rtype: dict
+    :raises: ValueError
+    """
+
+    parsed = {}
+    for setting in TIMEOUT_SETTINGS:
+        if setting not in settings:
+            continue
+        value = int(settings[setting])
+        if value < 0:
+            raise ValueError(f"Invalid {setting} {value}, expected a positive number")
+        parsed[setting] = value
+
+    return parsed
+
+
+def get_script_timeouts(workflow_stages: list, script: str) -> dict:
+    """Resolves the timeouts of a script, its own settings win over those of its stage
+
+    :param list workflow_stages:
+    :param str script:
+    :return: timeout settings of the script
+    :rtype: dict
+    """
+
+    timeouts = {"timeout_seconds": 0}
+
+    for stage in workflow_stages:
+        if script not in stage.get("scripts", []):
+            continue
+        timeouts.update(parse_timeout_settings(stage))
+        timeouts.update(
+            parse_timeout_settings(stage.get("script_timeouts", {}).get(script, {}))
+        )
+        break
+
+    # 0 or missing heartbeat_seconds, no heartbeat
+    if timeouts.get("heartbeat_seconds"):
+        timeouts["heartbeat_timeout_seconds"] = (
+            timeouts["heartbeat_seconds"] * HEARTBEATS_PER_TIMEOUT
+        )
+    else:
+        timeouts.pop("heartbeat_seconds", None)
+
+    return timeouts
+
+
+def get_stage_script_timeouts(stage: dict) -> Dict[str, dict]:
+    """Resolves the timeouts of every script of a stage
+
+    :param dict stage:
+    :return: script mapped to its timeouts
+    :rtype: dict
+    """
+
+    return {script: get_script_timeouts([stage], script) for script in stage["scripts"]}
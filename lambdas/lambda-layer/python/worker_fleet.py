@@ -0,0 +1,228 @@
+import logging
+import time
+from typing import List, Optional
+
+from botocore.exceptions import ClientError
+
+from aws_clients import get_client
+from dynamodb_interfaces import _deserialize, _serialize
+
+logger = logging.getLogger()
+
+# placement policies of the rsql invoke lambda
+LEAST_LOADED = "least_loaded"
+BIN_PACKING = "bin_packing"
+
+# expected runtime of a job without history, in seconds
+DEFAULT_EXPECTED_RUNTIME = 60
+
+# seconds without heartbeat after which an instance is considered lost
+FLEET_HEARTBEAT_TTL = 180
+
+#######################################################################################################################
+#################################################### Worker Fleet #####################################################
+#######################################################################################################################
+
+
+def get_fleet(fleet_tbl: str, ddb_client: object = None) -> List[dict]:
+    """Returns the active instances of the fleet which sent a recent heartbeat
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param obj ddb_client:
+    :return: deserialized fleet items of the instances accepting jobs
+    :rtype: list
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+
+    instances = []
+    scan_params = {"TableName": fleet_tbl, "ConsistentRead": True}
+
+    while True:
+        response = ddb_client.scan(**scan_params)
+        instances.extend(_deserialize(item) for item in response["Items"])
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_params["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    heartbeat_deadline = time.time() - FLEET_HEARTBEAT_TTL
+
+    return [
+        instance
+        for instance in instances
+        if instance.get("fleet_status", "active") == "active"
+        and instance.get("heartbeat_ts", 0) >= heartbeat_deadline
+    ]
+
+
+def rank_instances(instances: List[dict], policy: str = LEAST_LOADED) -> List[dict]:
+    """Orders the instances with a free slot, least_loaded spreads the jobs and
+    bin_packing fills the instances one after the other
+
+    :param list instances: fleet items
+    :param str policy: least_loaded or bin_packing
+    :return: instances with a free slot, the preferred one first
+    :rtype: list
+    :raises: ValueError
+    """
+
+    def work_per_slot(instance: dict) -> float:
+        return float(instance.get("reserved_runtime", 0)) / instance["max_slots"]
+
+    free_instances = [
+        instance
+        for instance in instances
+        if instance.get("used_slots", 0) < instance.get("max_slots", 0)
+    ]
+
+    if policy == LEAST_LOADED:
+        return sorted(
+            free_instances,
+            key=lambda instance: (
+                instance.get("used_slots", 0) / instance["max_slots"],
+                work_per_slot(instance),
+            ),
+        )
+
+    if policy == BIN_PACKING:
+        return sorted(
+            free_instances,
+            key=lambda instance: (
+                instance["max_slots"] - instance.get("used_slots", 0),
+                work_per_slot(instance),
+            ),
+        )
+
+    raise ValueError(f"Unknown placement policy : {policy}")
+
+
+def reserve_slot(
+    fleet_tbl: str,
+    instance_id: str,
+    expected_runtime: float,
+    force: bool = False,
+    ddb_client: object = None,
+) -> bool:
+    """Takes a slot of an instance, only if one is still free unless forced
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param float expected_runtime: expected runtime of the job in seconds
+    :param bool force: take the slot even when the instance is full
+    :param obj ddb_client:
+    :return: True if the slot was taken
+    :rtype: bool
+    :raises: ClientError
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+
+    update_params = {
+        "TableName": fleet_tbl,
+        "Key": _serialize({"instance_id": instance_id}),
+        "UpdateExpression": "ADD used_slots :one, reserved_runtime :runtime",
+        "ExpressionAttributeValues": {
+            ":one": {"N": "1"},
+            ":runtime": {"N": str(int(expected_runtime))},
+        },
+    }
+
+    if not force:
+        update_params["ConditionExpression"] = (
+            "attribute_exists(instance_id) AND used_slots < max_slots"
+        )
+
+    try:
+        ddb_client.update_item(**update_params)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+
+    return True
+
+
+def release_slot(
+    fleet_tbl: str, instance_id: str, expected_runtime: float, ddb_client: object = None
+) -> None:
+    """Gives back a slot taken by reserve_slot
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param str instance_id:
+    :param float expected_runtime: expected runtime the slot was reserved with
+    :param obj ddb_client:
+    :return: None
+    :rtype: None
+    :raises: ClientError
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+
+    try:
+        ddb_client.update_item(
+            TableName=fleet_tbl,
+            Key=_serialize({"instance_id": instance_id}),
+            UpdateExpression="ADD used_slots :one, reserved_runtime :runtime",
+            ConditionExpression="used_slots > :zero",
+            ExpressionAttributeValues={
+                ":one": {"N": "-1"},
+                ":runtime": {"N": str(-int(expected_runtime))},
+                ":zero": {"N": "0"},
+            },
+        )
+    except ClientError as e:
+        # the slot count was reset while the job ran
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def place_job(
+    fleet_tbl: str,
+    expected_runtime: float,
+    policy: str = LEAST_LOADED,
+    fleet: List[dict] = None,
+    ddb_client: object = None,
+) -> Optional[str]:
+    """Chooses an instance for a job and takes one of its slots, the least loaded
+    instance is oversubscribed when the whole fleet is busy
+
+    :param str fleet_tbl: fleet DynamoDB table
+    :param float expected_runtime: expected runtime of the job in seconds
+    :param str policy: least_loaded or bin_packing
+    :param list fleet: fleet items already read, updated with the placement
+    :param obj ddb_client:
+    :return: id of the chosen instance, None if the fleet has no active instance
+    :rtype: str
+    """
+    ddb_client = ddb_client or get_client("dynamodb")
+    fleet = get_fleet(fleet_tbl, ddb_client) if fleet is None else fleet
+
+    if not fleet:
+        return None
+
+    for instance in rank_instances(fleet, policy):
+        if reserve_slot(
+            fleet_tbl, instance["instance_id"], expected_runtime, ddb_client=ddb_client
+        ):
+            chosen_instance = instance
+            break
+        # full in the meantime
+        instance["used_slots"] = instance["max_slots"]
+    else:
+        chosen_instance = min(
+            fleet,
+            key=lambda instance: instance.get("used_slots", 0)
+            / max(instance.get("max_slots", 0), 1),
+        )
+        print(f"No free slot in the fleet, {chosen_instance['instance_id']} is oversubscribed")
+        reserve_slot(
+            fleet_tbl,
+            chosen_instance["instance_id"],
+            expected_runtime,
+            force=True,
+            ddb_client=ddb_client,
+        )
+
+    chosen_instance["used_slots"] = chosen_instance.get("used_slots", 0) + 1
+    chosen_instance["reserved_runtime"] = chosen_instance.get("reserved_runtime", 0) + int(
+        expected_runtime
+    )
+
+    return chosen_instance["instance_id"]
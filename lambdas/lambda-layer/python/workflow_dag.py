@@ -0,0 +1,179 @@
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger()
+
+#######################################################################################################################
+#################################################### Workflow DAG #####################################################
+#######################################################################################################################
+
+
+def _stage_terminal_scripts(stage_scripts: list, stage_edges: Dict[str, list]) -> list:
+    """Returns the scripts of a stage which no other script of the same stage depends on
+
+    :param list stage_scripts: scripts of the stage
+    :param dict stage_edges: dependencies of every script in the stage
+    :return: scripts which close the stage
+    :rtype: list
+    """
+
+    depended_upon = set()
+    for script in stage_scripts:
+        depended_upon.update(
+            dep for dep in stage_edges.get(script, []) if dep in stage_scripts
+        )
+
+    return [script for script in stage_scripts if script not in depended_upon]
+
+
+def build_workflow_dag(workflow_stages_list: list) -> Dict[str, List[str]]:
+    """Builds the dependency graph of a workflow from its enabled stages
+
+    :param list workflow_stages_list: enabled workflow stages, in execution order
+    :return: script name mapped to the scripts it depends on
+    :rtype: dict
+    :raises: ValueError
+    """
+
+    dag = {}
+    previous_stage_terminals = []
+
+    for stage in workflow_stages_list:
+        explicit_edges = stage.get("depends_on", {})
+        stage_scripts = stage["scripts"]
+        stage_edges = {}
+
+        for position, script in enumerate(stage_scripts):
+            if script in dag or script in stage_edges:
+                raise ValueError(f"Script {script} is configured more than once")
+
+            if script in explicit_edges:
+                stage_edges[script] = list(explicit_edges[script])
+            elif stage["execution_type"] == "sequential" and position > 0:
+                stage_edges[script] = [stage_scripts[position - 1]]
+            else:
+                stage_edges[script] = list(previous_stage_terminals)
+
+        dag.update(stage_edges)
+        previous_stage_terminals = _stage_terminal_scripts(stage_scripts, stage_edges)
+
+    for script, dependencies in dag.items():
+        unknown = [dep for dep in dependencies if dep not in dag]
+        if unknown:
+            # dependencies on disabled stages are treated as already satisfied
+            print(f"Ignoring dependencies of {script} outside the workflow : {unknown}")
+            dag[script] = [dep for dep in dependencies if dep in dag]
+
+    validate_workflow_dag(dag)
+
+    return dag
+
+
+def validate_workflow_dag(dag: Dict[str, List[str]]) -> None:
+    """Checks that the workflow dependency graph has no cycle
+
+    :param dict dag: script name mapped to the scripts it depends on
+    :return: None
+    :rtype: None
+    :raises: ValueError
+    """
+
+    pending_dependencies = {script: len(deps) for script, deps in dag.items()}
+    dependents = {script: [] for script in dag}
+    for script, dependencies in dag.items():
+        for dep in dependencies:
+            dependents[dep].append(script)
+
+    ready = [script for script, count in pending_dependencies.items() if count == 0]
+    visited = 0
+    while ready:
+        script = ready.pop()
+        visited += 1
+        for dependent in dependents[script]:
+            pending_dependencies[dependent] -= 1
+            if pending_dependencies[dependent] == 0:
+                ready.append(dependent)
+
+    if visited != len(dag):
+        cyclic = [script for script, count in pending_dependencies.items() if count]
+        raise ValueError(f"Workflow dependencies contain a cycle : {cyclic}")
+
+
+def get_ready_scripts(
+    dag: Dict[str, List[str]], completed: list, running: list, failed: list
+) -> list:
+    """Returns the scripts whose dependencies have all completed successfully
+
+    :param dict dag: script name mapped to the scripts it depends on
+    :param list completed: scripts which finished successfully
+    :param list running: scripts which are dispatched and not finished yet
+    :param list failed: scripts which finished with an error
+    :return: scripts which can be dispatched now, in configuration order
+    :rtype: list
+    """
+
+    completed_set = set(completed)
+    started = completed_set.union(running, failed)
+
+    return [
+        script
+        for script, dependencies in dag.items()
+        if script not in started and completed_set.issuperset(dependencies)
+    ]
+
+
+def get_critical_path_lengths(
+    dag: Dict[str, List[str]], job_runtimes: Dict[str, float]
+) -> Dict[str, float]:
+    """Returns for every script the expected runtime of the longest chain it starts
+
+    :param dict dag: script name mapped to the scripts it depends on
+    :param dict job_runtimes: script name mapped to its expected runtime
+    :return: script name mapped to its runtime plus the longest chain of its dependents
+    :rtype: dict
+    """
+
+    default_runtime = max(job_runtimes.values(), default=0)
+    dependents = {script: [] for script in dag}
+    for script, dependencies in dag.items():
+        for dep in dependencies:
+            dependents[dep].append(script)
+
+    critical_path_lengths = {}
+
+    def _critical_path_length(script: str) -> float:
+        if script not in critical_path_lengths:
+            critical_path_lengths[script] = job_runtimes.get(
+                script, default_runtime
+            ) + max(
+                (_critical_path_length(dependent) for dependent in dependents[script]),
+                default=0,
+            )
+        return critical_path_lengths[script]
+
+    # walking the scripts in reverse topological order keeps the recursion shallow
+    for script in reversed(_topological_order(dag)):
+        _critical_path_length(script)
+
+    return critical_path_lengths
+
+
+def _topological_order(dag: Dict[str, List[str]]) -> list:
+
+    order = []
+    visited = set()
+
+    for root in dag:
+        stack = [(root, False)]
+        while stack:
+            script, expanded = stack.pop()
+            if expanded:
+                order.append(script)
+                continue
+            if script in visited:
+                continue
+            visited.add(script)
+            stack.append((script, True))
+            stack.extend((dep, False) for dep in dag[script] if dep not in visited)
+
+    return order
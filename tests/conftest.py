@@ -0,0 +1,34 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [
+    os.path.join(ROOT_DIR, "lambdas", "lambda-layer", "python"),
+    os.path.join(ROOT_DIR, "instance_code"),
+    os.path.join(ROOT_DIR, "infra"),
+    os.path.join(ROOT_DIR, "benchmarks"),
+]
+
+# the modules create their boto3 clients on import
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+_lambdas = {}
+
+
+@pytest.fixture(scope="session")
+def load_lambda():
+    """Loads the lambda_function module of a lambda directory, every lambda has the
+    same module name"""
+
+    def load(name: str):
+        if name not in _lambdas:
+            path = os.path.join(ROOT_DIR, "lambdas", name, "lambda_function.py")
+            spec = importlib.util.spec_from_file_location(name.replace("-", "_"), path)
+            _lambdas[name] = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(_lambdas[name])
+        return _lambdas[name]
+
+    return load
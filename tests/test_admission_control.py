@@ -0,0 +1,102 @@
+from admission_control import AdmissionController, StaticWlmSource
+from fake_aws import FakeAws
+
+ADMISSION_TBL = "rsql-blog-rsql-admission-table"
+
+# one window for the whole test
+STATE_TTL = 10**9
+
+
+class FailingWlmSource:
+    def get_wlm_state(self) -> dict:
+        raise Exception("cluster unavailable")
+
+
+def make_shared_controllers(wlm_source, count: int, **kwargs) -> list:
+    fake = FakeAws()
+    fake.create_table(ADMISSION_TBL, "admission_window")
+    return [
+        AdmissionController(
+            wlm_source,
+            state_ttl=STATE_TTL,
+            admission_tbl=ADMISSION_TBL,
+            ddb_client=fake.client("dynamodb"),
+            **kwargs,
+        )
+        for _ in range(count)
+    ]
+
+
+def test_capacity_of_the_target_concurrency():
+    controller = AdmissionController(
+        StaticWlmSource(slots=10, running=6, queued=1),
+        target_concurrency=8,
+        max_queued=2,
+        state_ttl=STATE_TTL,
+    )
+
+    assert controller.capacity() == 8 + 2 - 6 - 1
+
+
+def test_capacity_of_the_wlm_slots():
+    controller = AdmissionController(
+        StaticWlmSource(slots=10, running=4), state_ttl=STATE_TTL
+    )
+
+    assert controller.capacity() == 6
+
+
+def test_saturated_queues_have_no_capacity():
+    controller = AdmissionController(
+        StaticWlmSource(slots=4, running=4, queued=3), state_ttl=STATE_TTL
+    )
+
+    assert controller.capacity() == 0
+    assert controller.admit(2) == 0
+
+
+def test_unknown_capacity_admits_every_script():
+    for wlm_source in [StaticWlmSource(slots=0, running=20), FailingWlmSource()]:
+        controller = AdmissionController(wlm_source, state_ttl=STATE_TTL)
+
+        assert controller.capacity() is None
+        assert controller.admit(50) == 50
+
+
+def test_admitted_scripts_are_counted_until_the_next_state():
+    wlm_source = StaticWlmSource(slots=5)
+    controller = AdmissionController(wlm_source, state_ttl=STATE_TTL)
+
+    assert controller.admit(3) == 3
+    assert controller.capacity() == 2
+    assert controller.admit(5) == 2
+    assert controller.capacity() == 0
+
+    # a new state, read at every call, counts the admitted scripts itself
+    controller.state_ttl = 0
+    wlm_source.running = 4
+    assert controller.capacity() == 1
+    assert controller.admit(3) == 1
+
+
+def test_admission_is_shared_by_the_containers():
+    first, second = make_shared_controllers(StaticWlmSource(slots=5), 2)
+
+    assert first.admit(3) == 3
+    assert second.capacity() == 2
+    assert second.admit(5) == 2
+    assert first.capacity() == 0
+    assert first.admit(1) == 0
+
+
+def test_shared_admission_falls_back_to_local_counts():
+    controller = AdmissionController(
+        StaticWlmSource(slots=5),
+        state_ttl=STATE_TTL,
+        admission_tbl="missing-table",
+        ddb_client=FakeAws().client("dynamodb"),
+    )
+
+    assert controller.admit(3) == 3
+    assert controller.capacity() == 2
+    assert controller.admit(3) == 2
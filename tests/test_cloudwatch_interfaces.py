@@ -0,0 +1,60 @@
+import calendar
+
+from framework.cloudwatch_interfaces import parse_log_timestamp, split_message
+
+
+def epoch_ms(*fields) -> int:
+    return 1000 * calendar.timegm(fields)
+
+
+def test_date_command_timestamps():
+    line = "Job started at Tue Mar  5 14:07:09 UTC 2024"
+
+    assert parse_log_timestamp(line, None) == epoch_ms(2024, 3, 5, 14, 7, 9)
+
+
+def test_iso_timestamps_keep_their_milliseconds():
+    assert parse_log_timestamp("2024-03-05 14:07:09.123456 INFO", None) == (
+        epoch_ms(2024, 3, 5, 14, 7, 9) + 123
+    )
+    assert parse_log_timestamp("at 2024-03-05T14:07:09", None) == epoch_ms(
+        2024, 3, 5, 14, 7, 9
+    )
+
+
+def test_times_take_the_date_of_the_previous_timestamp():
+    previous_ts = epoch_ms(2024, 3, 5, 9, 0, 0) + 500
+    line = "Start Time - 14:07:09.250000000"
+
+    assert parse_log_timestamp(line, previous_ts) == (
+        epoch_ms(2024, 3, 5, 14, 7, 9) + 250
+    )
+    # without a previous timestamp the date is unknown
+    assert parse_log_timestamp(line, None) is None
+
+
+def test_lines_without_timestamp():
+    assert parse_log_timestamp("INSERT 0 100", epoch_ms(2024, 3, 5, 9, 0, 0)) is None
+    # out of range fields
+    assert parse_log_timestamp("2024-13-45 10:00:00", None) is None
+
+
+def test_short_messages_are_not_split():
+    assert split_message("select 1;", max_bytes=20) == ["select 1;"]
+    assert split_message("", max_bytes=20) == [""]
+
+
+def test_long_messages_are_split_at_max_bytes():
+    parts = split_message("a" * 25, max_bytes=10)
+
+    assert parts == ["a" * 10, "a" * 10, "a" * 5]
+
+
+def test_multi_byte_characters_are_never_cut():
+    # "é" takes 2 bytes, "€" 3 bytes
+    message = "ab" + "é" * 5 + "€" * 3
+    parts = split_message(message, max_bytes=5)
+
+    assert "".join(parts) == message
+    assert all(len(part.encode("utf-8")) <= 5 for part in parts)
+    assert parts[:2] == ["abé", "éé"]
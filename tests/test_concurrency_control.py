@@ -0,0 +1,68 @@
+from concurrency_control import (
+    ADDITIVE_INCREASE,
+    INITIAL_WINDOW,
+    get_latency_ratio,
+    new_concurrency_state,
+    update_concurrency_window,
+)
+
+
+def test_initial_window_within_max_concurrency():
+    assert new_concurrency_state(40)["window"] == INITIAL_WINDOW
+    assert new_concurrency_state(2)["window"] == 2
+    assert new_concurrency_state(0)["window"] == 1
+
+
+def test_latency_ratio_of_the_scripts_with_history():
+    baselines = {"a.sql": 10, "b.sql": 20, "c.sql": 40, "short.sql": 1}
+    runtimes = {"a.sql": 10, "b.sql": 30, "c.sql": 80, "short.sql": 60, "new.sql": 5}
+
+    # the scripts without history or too short to compare are left out
+    assert get_latency_ratio(runtimes, baselines) == 1.5
+    assert get_latency_ratio({"new.sql": 5}, baselines) is None
+
+
+def test_full_windows_increase_additively():
+    state = new_concurrency_state(10)
+
+    state = update_concurrency_window(state, {}, 0, 0, window_full=True)
+    assert state["window"] == INITIAL_WINDOW + ADDITIVE_INCREASE
+
+    for _ in range(5):
+        state = update_concurrency_window(state, {}, 0, 0, window_full=True)
+    assert state["window"] == 10
+
+
+def test_unused_windows_are_kept():
+    state = new_concurrency_state(10)
+
+    assert update_concurrency_window(state, {}, 0, 0, window_full=False) == state
+
+
+def test_congestion_decreases_multiplicatively():
+    state = {**new_concurrency_state(40), "window": 20}
+
+    state = update_concurrency_window(state, {}, 0, 3, window_full=True)
+    assert state["window"] == 10
+    assert state["throttles"] == 3
+
+    state = update_concurrency_window(state, {}, 1, 0, window_full=True)
+    assert state["window"] == 5
+
+    state = update_concurrency_window(
+        {**state, "baselines": {"a.sql": 10}}, {"a.sql": 16}, 0, 0, window_full=True
+    )
+    assert state["window"] == 2
+    assert state["latency_ratio"] == 1.6
+
+    for _ in range(3):
+        state = update_concurrency_window(state, {}, 1, 0, window_full=True)
+    assert state["window"] == 1
+
+
+def test_latency_within_tolerance_is_not_congestion():
+    state = {**new_concurrency_state(40, {"a.sql": 10}), "window": 20}
+
+    state = update_concurrency_window(state, {"a.sql": 15}, 0, 0, window_full=True)
+
+    assert state["window"] == 20 + ADDITIVE_INCREASE
@@ -0,0 +1,130 @@
+import pytest
+
+
+@pytest.fixture
+def scheduler(load_lambda, monkeypatch):
+    """DAG scheduler lambda whose job audit records, dispatches and cancellations are
+    recorded on the module"""
+
+    dag_scheduler = load_lambda("blog-dag-scheduler")
+    monkeypatch.setenv("job_audit_table", "rsql-blog-rsql-job-audit-table")
+    monkeypatch.setattr(dag_scheduler, "admission_controller", None)
+    monkeypatch.setattr(dag_scheduler, "get_script_runtimes", lambda dag: {})
+
+    dag_scheduler.statuses = {}
+    dag_scheduler.dispatched = []
+    dag_scheduler.cancelled = []
+
+    monkeypatch.setattr(
+        dag_scheduler,
+        "get_job_audit_records",
+        lambda job_names, *args: {
+            job_name: {"job_name": job_name, "execution_status": status}
+            for job_name, status in dag_scheduler.statuses.items()
+            if job_name in job_names
+        },
+    )
+    monkeypatch.setattr(
+        dag_scheduler,
+        "dispatch_script",
+        lambda script, *args: dag_scheduler.dispatched.append(script),
+    )
+    monkeypatch.setattr(
+        dag_scheduler,
+        "cancel_jobs",
+        lambda scripts, *args: dag_scheduler.cancelled.extend(scripts),
+    )
+
+    return dag_scheduler
+
+
+def adaptive_stage_state(scripts: list, **policy) -> dict:
+    """State of an adaptive stage, its scripts have no dependencies"""
+
+    return {
+        "dag": {script: [] for script in scripts},
+        "workflow_id": "dag-test",
+        "workflow_execution_id": "dag-test-1",
+        "max_concurrency": 2,
+        "running": [],
+        "completed": [],
+        "failed": [],
+        **policy,
+    }
+
+
+def run_scheduler(scheduler, state: dict, statuses: dict) -> dict:
+    scheduler.statuses.update(statuses)
+    return scheduler.lambda_handler(state, None)
+
+
+def test_fail_fast_cancels_the_running_scripts(scheduler):
+    state = adaptive_stage_state(
+        ["a.sql", "b.sql", "c.sql"], failure_policy="fail_fast"
+    )
+
+    state = run_scheduler(scheduler, state, {})
+    assert state["running"] == ["a.sql", "b.sql"]
+
+    state = run_scheduler(scheduler, state, {"a.sql": "failed"})
+
+    assert state["dag_status"] == "failed"
+    assert scheduler.cancelled == ["b.sql"]
+    assert "c.sql" not in scheduler.dispatched
+
+
+def test_wait_all_runs_every_script_then_fails(scheduler):
+    state = adaptive_stage_state(
+        ["a.sql", "b.sql", "c.sql"], failure_policy="wait_all"
+    )
+
+    state = run_scheduler(scheduler, state, {})
+    state = run_scheduler(scheduler, state, {"a.sql": "failed"})
+
+    assert state["dag_status"] == "running"
+    assert state["running"] == ["b.sql", "c.sql"]
+
+    state = run_scheduler(
+        scheduler, state, {"b.sql": "successful", "c.sql": "successful"}
+    )
+
+    assert state["dag_status"] == "failed"
+    assert scheduler.cancelled == []
+
+
+@pytest.mark.parametrize(
+    "tolerated_failures, dag_status", [(1, "successful"), (0, "failed")]
+)
+def test_tolerate_counts_the_failed_scripts(scheduler, tolerated_failures, dag_status):
+    state = adaptive_stage_state(
+        ["a.sql", "b.sql", "c.sql"],
+        failure_policy="tolerate",
+        tolerated_failures=tolerated_failures,
+    )
+
+    state = run_scheduler(scheduler, state, {})
+    state = run_scheduler(scheduler, state, {"a.sql": "timed_out"})
+    assert state["dag_status"] == "running"
+
+    state = run_scheduler(
+        scheduler, state, {"b.sql": "successful", "c.sql": "successful"}
+    )
+
+    assert state["dag_status"] == dag_status
+    assert state["failed"] == ["a.sql"]
+
+
+def test_dag_workflows_drain_the_running_scripts(scheduler):
+    state = adaptive_stage_state(["a.sql", "b.sql", "c.sql"])
+
+    state = run_scheduler(scheduler, state, {})
+    state = run_scheduler(scheduler, state, {"a.sql": "failed"})
+
+    assert state["dag_status"] == "running"
+    assert state["running"] == ["b.sql"]
+
+    state = run_scheduler(scheduler, state, {"b.sql": "successful"})
+
+    assert state["dag_status"] == "failed"
+    assert scheduler.dispatched == ["a.sql", "b.sql"]
+    assert scheduler.cancelled == []
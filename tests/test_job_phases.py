@@ -0,0 +1,66 @@
+from framework import job_phases
+from framework.job_phases import PhaseRecorder, format_phase_marks, parse_phase_marks
+
+
+def test_phase_marks_are_parsed_from_commas_and_lines():
+    marks = parse_phase_marks("sfn_entered=1000,invoke_start=1200\ndispatched=1300\n")
+
+    assert marks == {"sfn_entered": 1000, "invoke_start": 1200, "dispatched": 1300}
+    assert parse_phase_marks(format_phase_marks(marks)) == marks
+
+
+def test_invalid_phase_marks_are_skipped():
+    assert parse_phase_marks("") == {}
+    assert parse_phase_marks("rsql_start=,creds_end=12,garbage") == {"creds_end": 12}
+
+
+def test_breakdown_of_the_marked_phases(monkeypatch):
+    monkeypatch.setattr(job_phases, "now_ms", lambda: 10000)
+    phase_recorder = PhaseRecorder(
+        {
+            "invoke_start": 1000,
+            "dispatched": 1500,
+            "trigger_start": 2000,
+            "rsql_start": 2100,
+            "creds_start": 2200,
+            "creds_end": 2400,
+            "rsql_end": 9000,
+        }
+    )
+    phase_recorder.durations["report"] = 12.7
+
+    assert phase_recorder.breakdown() == {
+        "invoke_lambda": 500,
+        "dispatch_delivery": 500,
+        "trigger_setup": 100,
+        "credentials": 200,
+        # without the credential fetch
+        "rsql": 6700,
+        "report": 12,
+        "end_to_end": 9000,
+        "overhead": 2300,
+    }
+
+
+def test_breakdown_without_job_start():
+    phase_recorder = PhaseRecorder({"rsql_start": 100, "rsql_end": 400})
+
+    assert phase_recorder.breakdown() == {"rsql": 300}
+
+
+def test_marks_of_the_environment(tmp_path, monkeypatch):
+    phase_file = tmp_path / "phases"
+    phase_file.write_text("trigger_start=2000\nrsql_start=2100\n")
+    monkeypatch.setenv("RSQL_PHASE_MARKS", "invoke_start=1000,dispatched=1500")
+    monkeypatch.setenv("RSQL_PHASE_FILE", str(phase_file))
+
+    phase_recorder = PhaseRecorder.from_environment({"sfn_entered": 900})
+
+    assert phase_recorder.marks == {
+        "invoke_start": 1000,
+        "dispatched": 1500,
+        "sfn_entered": 900,
+        "trigger_start": 2000,
+        "rsql_start": 2100,
+    }
+    assert not phase_file.exists()
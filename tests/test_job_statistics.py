@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from framework.job_statistics import (
+    DURATION_HISTORY_SIZE,
+    _percentile,
+    compute_job_statistics,
+)
+from job_statistics import get_express_jobs, order_by_runtime
+
+
+def test_longest_jobs_are_ordered_first():
+    runtimes = {"short.sql": 5, "long.sql": 300, "medium.sql": 60}
+
+    assert order_by_runtime(["short.sql", "long.sql", "medium.sql"], runtimes) == [
+        "long.sql",
+        "medium.sql",
+        "short.sql",
+    ]
+
+
+def test_jobs_without_history_are_ordered_with_the_longest():
+    runtimes = {"short.sql": 5, "long.sql": 300}
+
+    # configuration order kept for ties
+    assert order_by_runtime(["short.sql", "new.sql", "long.sql"], runtimes) == [
+        "new.sql",
+        "long.sql",
+        "short.sql",
+    ]
+    assert order_by_runtime(["b.sql", "a.sql"], {}) == ["b.sql", "a.sql"]
+
+
+def test_nearest_rank_percentiles():
+    durations = [float(d) for d in range(1, 21)]
+
+    assert _percentile(durations, 50) == 10
+    assert _percentile(durations, 95) == 19
+    assert _percentile(durations, 100) == 20
+    assert _percentile([7.0], 95) == _percentile([7.0], 0) == 7
+
+
+def test_first_run_starts_the_statistics():
+    job_stats = compute_job_statistics("a.sql", None, 12.3456, succeeded=True)
+
+    assert job_stats["run_count"] == 1
+    assert job_stats["failure_count"] == 0
+    assert job_stats["last_durations"] == [Decimal("12.346")]
+    assert job_stats["p50_duration"] == job_stats["p95_duration"] == Decimal("12.346")
+    assert job_stats["version"] == 1
+
+
+def test_failed_runs_are_counted_without_their_duration():
+    job_stats = compute_job_statistics("a.sql", None, 10, succeeded=True)
+    job_stats = compute_job_statistics("a.sql", job_stats, 1, succeeded=False)
+
+    assert job_stats["run_count"] == 2
+    assert job_stats["failure_rate"] == Decimal("0.5")
+    assert job_stats["last_status"] == "failed"
+    assert job_stats["last_durations"] == [Decimal("10")]
+    assert job_stats["p95_duration"] == Decimal("10")
+
+
+def test_only_the_last_durations_are_kept():
+    job_stats = None
+    for duration in range(1, DURATION_HISTORY_SIZE + 11):
+        job_stats = compute_job_statistics("a.sql", job_stats, duration, True)
+
+    assert len(job_stats["last_durations"]) == DURATION_HISTORY_SIZE
+    assert job_stats["last_durations"][0] == 11
+    assert job_stats["p50_duration"] == 20
+    assert job_stats["p95_duration"] == 29
+
+
+def test_express_jobs_run_within_the_max_runtime():
+    job_stats = {
+        "short.sql": {"p50_duration": Decimal("20"), "p95_duration": Decimal("60")},
+        "spiky.sql": {"p50_duration": Decimal("20"), "p95_duration": Decimal("200")},
+        "edge.sql": {"p50_duration": Decimal("90"), "p95_duration": Decimal("120")},
+        "new.sql": {"run_count": 1, "failure_count": 1},
+    }
+
+    # the jobs without successful run wait for their callback
+    assert get_express_jobs(job_stats, 120) == ["short.sql", "edge.sql"]
+    assert get_express_jobs(job_stats, 0) == []
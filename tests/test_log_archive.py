@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+
+from framework.log_archive import archive_log, compress_log, upload_archive
+
+
+def write_log(tmp_path, content: bytes = b"select 1;\n" * 1000) -> str:
+    log_path = tmp_path / "rsql_blog_script_1.log"
+    log_path.write_bytes(content)
+    return str(log_path)
+
+
+def test_compressed_logs_keep_the_original(tmp_path):
+    log_path = write_log(tmp_path)
+
+    archive_path = compress_log(log_path)
+
+    assert archive_path == log_path + ".gz"
+    with gzip.open(archive_path) as archive:
+        assert archive.read() == b"select 1;\n" * 1000
+    assert open(log_path, "rb").read() == b"select 1;\n" * 1000
+
+
+def test_archived_logs_are_removed_locally(tmp_path):
+    log_path = write_log(tmp_path)
+    archive_root = tmp_path / "archive"
+
+    log_archive = archive_log(
+        log_path, "demo_test_26", "us-east-1", archive_uri=f"file://{archive_root}"
+    )
+
+    archived_path = archive_root / "demo_test_26" / "rsql_blog_script_1.log.gz"
+    assert log_archive == {
+        "log_archive_uri": f"file://{archived_path}",
+        "log_bytes": 10000,
+        "log_archive_bytes": archived_path.stat().st_size,
+    }
+    assert gzip.decompress(archived_path.read_bytes()) == b"select 1;\n" * 1000
+    assert list(tmp_path.iterdir()) == [archive_root]
+
+
+def test_logs_stay_without_archive_uri(tmp_path, monkeypatch):
+    monkeypatch.delenv("RSQL_LOG_ARCHIVE_URI", raising=False)
+    log_path = write_log(tmp_path)
+
+    assert archive_log(log_path, "demo_test_26", "us-east-1") == {}
+    assert open(log_path, "rb").read() == b"select 1;\n" * 1000
+
+
+def test_unsupported_archive_uri(tmp_path):
+    log_path = write_log(tmp_path)
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        archive_log(log_path, "demo_test_26", "us-east-1", archive_uri="ftp://logs")
+
+    # the log is kept when the upload failed
+    assert [path.name for path in tmp_path.iterdir()] == ["rsql_blog_script_1.log"]
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        upload_archive(log_path, "logs", "key", "us-east-1")
@@ -0,0 +1,70 @@
+import json
+
+from metrics import MAX_VALUES_PER_METRIC, MetricsLogger
+
+
+def get_documents(metrics_logger: MetricsLogger) -> list:
+    return [json.loads(document) for document in metrics_logger.documents()]
+
+
+def test_metrics_of_a_workflow_in_one_document():
+    metrics_logger = MetricsLogger()
+    metrics_logger.put_metric("JobsDispatched", 1, workflow_id="demo")
+    metrics_logger.put_metric("JobsDispatched", 2, workflow_id="demo")
+    metrics_logger.put_metric("DispatchLatency", 120, "Milliseconds", "demo")
+
+    [document] = get_documents(metrics_logger)
+
+    [directive] = document["_aws"]["CloudWatchMetrics"]
+    assert directive["Namespace"] == "RSQLOrchestration"
+    # per workflow_id and in total
+    assert directive["Dimensions"] == [["workflow_id"], []]
+    assert directive["Metrics"] == [
+        {"Name": "JobsDispatched", "Unit": "Count"},
+        {"Name": "DispatchLatency", "Unit": "Milliseconds"},
+    ]
+    assert document["JobsDispatched"] == [1, 2]
+    assert document["DispatchLatency"] == 120
+    assert document["workflow_id"] == "demo"
+
+
+def test_metrics_without_workflow():
+    metrics_logger = MetricsLogger()
+    metrics_logger.put_metric("JobsDispatched", 1)
+    metrics_logger.put_metric("JobsDispatched", 1, workflow_id="demo")
+
+    documents = get_documents(metrics_logger)
+
+    assert len(documents) == 2
+    assert documents[0]["_aws"]["CloudWatchMetrics"][0]["Dimensions"] == [[]]
+    assert "workflow_id" not in documents[0]
+
+
+def test_values_are_split_across_documents():
+    metrics_logger = MetricsLogger()
+    for value in range(MAX_VALUES_PER_METRIC + 5):
+        metrics_logger.put_metric("ScriptRuntime", value, "Seconds", "demo")
+    metrics_logger.put_metric("JobsDispatched", 3, workflow_id="demo")
+
+    first, second = get_documents(metrics_logger)
+
+    assert first["ScriptRuntime"] == list(range(MAX_VALUES_PER_METRIC))
+    assert first["JobsDispatched"] == 3
+    # the metrics without values left are not declared again
+    assert second["ScriptRuntime"] == list(range(MAX_VALUES_PER_METRIC, 105))
+    assert [
+        metric["Name"] for metric in second["_aws"]["CloudWatchMetrics"][0]["Metrics"]
+    ] == ["ScriptRuntime"]
+
+
+def test_flushed_metrics_are_cleared(capsys):
+    metrics_logger = MetricsLogger()
+
+    @metrics_logger.flush_after_invocation
+    def lambda_handler(event, context):
+        metrics_logger.put_metric("JobsDispatched", 1)
+        return "done"
+
+    assert lambda_handler({}, None) == "done"
+    assert json.loads(capsys.readouterr().out)["JobsDispatched"] == 1
+    assert metrics_logger.documents() == []
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+import rsql_agent
+from framework.job_queue import LocalJobQueue
+from rsql_agent import RsqlAgent
+
+
+def make_job(script: str) -> dict:
+    return {
+        "token": "NA",
+        "script": script,
+        "workflow_id": "agent-test",
+        "workflow_execution_id": "agent-test-1",
+    }
+
+
+@pytest.fixture
+def job_queue(monkeypatch):
+    monkeypatch.setattr(rsql_agent, "RECEIVE_WAIT_SECONDS", 0.1)
+    # the running jobs are extended every second
+    monkeypatch.setattr(rsql_agent, "JOB_VISIBILITY_SECONDS", 3)
+    return LocalJobQueue()
+
+
+def run_agent(job_queue, run_job, ran_jobs: int, max_workers: int = 2) -> RsqlAgent:
+    """Runs the agent until ran_jobs jobs went through run_job, then stops it"""
+
+    agent = RsqlAgent(job_queue, "/tmp", "us-east-1", max_workers)
+    started_jobs = []
+    ended_jobs = []
+    all_ended = threading.Event()
+
+    def record_job(job: dict) -> int:
+        started_jobs.append(job["script"])
+        try:
+            return run_job(job)
+        finally:
+            ended_jobs.append(job["script"])
+            if len(ended_jobs) == ran_jobs:
+                all_ended.set()
+
+    agent.run_job = record_job
+    agent.started_jobs = started_jobs
+
+    agent_thread = threading.Thread(target=agent.run)
+    agent_thread.start()
+    assert all_ended.wait(10)
+    agent.stop()
+    agent_thread.join(10)
+    assert not agent_thread.is_alive()
+
+    return agent
+
+
+def test_agent_runs_and_completes_jobs(job_queue):
+    for script in ["first.sql", "second.sql", "third.sql"]:
+        job_queue.put_job(make_job(script))
+
+    agent = run_agent(job_queue, lambda job: 0, ran_jobs=3)
+
+    assert sorted(agent.started_jobs) == ["first.sql", "second.sql", "third.sql"]
+    # the messages are deleted once their job completed
+    assert job_queue.in_flight == {}
+
+
+def test_agent_completes_failed_jobs(job_queue):
+    job_queue.put_job(make_job("failing.sql"))
+
+    def fail(job: dict) -> int:
+        raise RuntimeError("rsql not found")
+
+    agent = run_agent(job_queue, fail, ran_jobs=1)
+
+    assert agent.started_jobs == ["failing.sql"]
+    assert job_queue.in_flight == {}
+
+
+def test_agent_extends_running_jobs(job_queue):
+    job_queue.put_job(make_job("long.sql"))
+    extended_jobs = []
+    extend_jobs = job_queue.extend_jobs
+
+    def record_extension(jobs: list, visibility_seconds: int) -> None:
+        extended_jobs.extend(job["script"] for job in jobs)
+        extend_jobs(jobs, visibility_seconds)
+
+    job_queue.extend_jobs = record_extension
+
+    # runs past the visibility timeout, a free worker would receive it again if
+    # its message was not extended
+    agent = run_agent(job_queue, lambda job: time.sleep(4.5) or 0, ran_jobs=1)
+
+    assert agent.started_jobs == ["long.sql"]
+    assert "long.sql" in extended_jobs
+    assert job_queue.in_flight == {}
+
+
+def test_local_job_queue_receives_expired_jobs_again():
+    job_queue = LocalJobQueue()
+    job_queue.put_job(make_job("lost.sql"))
+
+    [job] = job_queue.receive_jobs(10, 0, visibility_seconds=0)
+    [job_again] = job_queue.receive_jobs(10, 0, visibility_seconds=60)
+
+    assert job_again["script"] == job["script"] == "lost.sql"
+    assert job_again["receipt_handle"] != job["receipt_handle"]
+    assert job_queue.receive_jobs(10, 0, visibility_seconds=60) == []
+
+    job_queue.complete_job(job_again)
+    assert job_queue.in_flight == {}
@@ -0,0 +1,54 @@
+import signal
+
+import rsql_cancel
+from rsql_cancel import cancel_jobs, find_job_processes
+
+
+def add_process(proc_dir, pid: int, **environ) -> None:
+    process_dir = proc_dir / str(pid)
+    process_dir.mkdir()
+    (process_dir / "environ").write_bytes(
+        b"\0".join(f"{name}={value}".encode() for name, value in environ.items())
+        + b"\0"
+    )
+
+
+def test_the_processes_of_the_jobs_are_found(tmp_path):
+    add_process(tmp_path, 101, RSQL_JOB_ID="run-1/a.sql", PATH="/usr/bin")
+    add_process(tmp_path, 102, RSQL_JOB_ID="run-1/a.sql")
+    add_process(tmp_path, 103, RSQL_JOB_ID="run-1/b.sql")
+    add_process(tmp_path, 104, RSQL_JOB_ID="run-2/a.sql")
+    add_process(tmp_path, 105, HOME="/root")
+    (tmp_path / "self").mkdir()
+
+    assert find_job_processes({"run-1/a.sql", "run-1/b.sql"}, str(tmp_path)) == {
+        101: "run-1/a.sql",
+        102: "run-1/a.sql",
+        103: "run-1/b.sql",
+    }
+
+
+def test_ended_processes_are_skipped(tmp_path):
+    # no environ file left
+    (tmp_path / "106").mkdir()
+
+    assert find_job_processes({"run-1/a.sql"}, str(tmp_path)) == {}
+
+
+def test_the_jobs_are_terminated(tmp_path, monkeypatch):
+    add_process(tmp_path, 101, RSQL_JOB_ID="run-1/a.sql")
+    add_process(tmp_path, 102, RSQL_JOB_ID="run-1/b.sql")
+    add_process(tmp_path, 103, RSQL_JOB_ID="run-1/c.sql")
+    signals = []
+
+    def kill(pid: int, sig: int) -> None:
+        if pid == 102:
+            raise ProcessLookupError()
+        signals.append((pid, sig))
+
+    monkeypatch.setattr(rsql_cancel.os, "kill", kill)
+
+    cancelled = cancel_jobs("run-1", ["a.sql", "b.sql", "d.sql"], str(tmp_path))
+
+    assert cancelled == {"a.sql": [101], "b.sql": [], "d.sql": []}
+    assert signals == [(101, signal.SIGTERM)]
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from rsql_sequence import run_sequence
+
+SCRIPTS = ["first.sql", "second.sql", "third.sql"]
+
+
+class RecordingSfnClient:
+    def __init__(self) -> None:
+        self.callbacks = []
+
+    def send_task_success(self, taskToken: str, output: str) -> None:
+        self.callbacks.append(("success", json.loads(output)))
+
+    def send_task_failure(self, taskToken: str, error: str, cause: str) -> None:
+        self.callbacks.append(("failure", error, cause))
+
+
+class ExpiredHeartbeatSender:
+    expired = True
+
+
+def run_scripts(exit_codes: dict):
+    ran_scripts = []
+
+    def run_script(position: int, job_name: str) -> tuple:
+        ran_scripts.append(job_name)
+        return exit_codes.get(job_name, 0), f"/tmp/missing/{job_name}.log"
+
+    return run_script, ran_scripts
+
+
+def test_the_stage_is_reported_once_completed():
+    sfn_client = RecordingSfnClient()
+    run_script, ran_scripts = run_scripts({})
+
+    results = run_sequence("token", SCRIPTS, run_script, sfn_client)
+
+    assert ran_scripts == SCRIPTS
+    assert results == [{"job_name": script, "exit_code": 0} for script in SCRIPTS]
+    assert sfn_client.callbacks == [
+        (
+            "success",
+            {"job_name": "third.sql", "status": "completed", "scripts": results},
+        )
+    ]
+
+
+def test_the_first_failed_script_ends_the_sequence():
+    sfn_client = RecordingSfnClient()
+    run_script, ran_scripts = run_scripts({"second.sql": 2})
+
+    results = run_sequence("token", SCRIPTS, run_script, sfn_client)
+
+    assert ran_scripts == ["first.sql", "second.sql"]
+    assert results[-1] == {"job_name": "second.sql", "exit_code": 2}
+    [(callback, error, cause)] = sfn_client.callbacks
+    assert (callback, error) == ("failure", "2")
+    assert cause.startswith("second.sql failed, 1 scripts of the sequence not run")
+
+
+def test_scripts_not_run_fail_the_stage():
+    sfn_client = RecordingSfnClient()
+
+    def run_script(position: int, job_name: str) -> tuple:
+        raise OSError("rsql_trigger.sh not found")
+
+    with pytest.raises(OSError):
+        run_sequence("token", SCRIPTS, run_script, sfn_client)
+
+    assert sfn_client.callbacks == [
+        ("failure", "SequenceError", "first.sql not run : rsql_trigger.sh not found")
+    ]
+
+
+def test_expired_stages_get_no_callback():
+    sfn_client = RecordingSfnClient()
+    run_script, ran_scripts = run_scripts({"first.sql": 143})
+
+    results = run_sequence(
+        "token", SCRIPTS, run_script, sfn_client, ExpiredHeartbeatSender()
+    )
+
+    assert ran_scripts == ["first.sql"]
+    assert results == [{"job_name": "first.sql", "exit_code": 143}]
+    assert sfn_client.callbacks == []
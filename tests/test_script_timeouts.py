@@ -0,0 +1,59 @@
+import pytest
+
+from script_timeouts import (
+    HEARTBEATS_PER_TIMEOUT,
+    get_script_timeouts,
+    get_stage_script_timeouts,
+)
+
+STAGES = [
+    {"scripts": ["a.sql"]},
+    {
+        "scripts": ["b.sql", "c.sql", "d.sql"],
+        "timeout_seconds": "3600",
+        "heartbeat_seconds": 60,
+        "script_timeouts": {
+            "c.sql": {"timeout_seconds": 600},
+            "d.sql": {"heartbeat_seconds": 0},
+        },
+    },
+]
+
+
+def test_scripts_without_settings_have_no_timeout():
+    assert get_script_timeouts(STAGES, "a.sql") == {"timeout_seconds": 0}
+    assert get_script_timeouts(STAGES, "unknown.sql") == {"timeout_seconds": 0}
+
+
+def test_scripts_get_the_settings_of_their_stage():
+    assert get_script_timeouts(STAGES, "b.sql") == {
+        "timeout_seconds": 3600,
+        "heartbeat_seconds": 60,
+        "heartbeat_timeout_seconds": 60 * HEARTBEATS_PER_TIMEOUT,
+    }
+
+
+def test_script_settings_win_over_the_stage():
+    assert get_script_timeouts(STAGES, "c.sql") == {
+        "timeout_seconds": 600,
+        "heartbeat_seconds": 60,
+        "heartbeat_timeout_seconds": 60 * HEARTBEATS_PER_TIMEOUT,
+    }
+    # 0 disables the heartbeats of the stage
+    assert get_script_timeouts(STAGES, "d.sql") == {"timeout_seconds": 3600}
+
+
+def test_timeouts_of_every_script_of_a_stage():
+    assert get_stage_script_timeouts(STAGES[1]) == {
+        script: get_script_timeouts(STAGES, script)
+        for script in ["b.sql", "c.sql", "d.sql"]
+    }
+    assert get_stage_script_timeouts({"scripts": []}) == {}
+
+
+@pytest.mark.parametrize("timeout_seconds", [-1, "ten"])
+def test_invalid_settings(timeout_seconds):
+    stage = {"scripts": ["a.sql"], "timeout_seconds": timeout_seconds}
+
+    with pytest.raises(ValueError):
+        get_script_timeouts([stage], "a.sql")
@@ -0,0 +1,35 @@
+from fake_aws import FakeAws
+from send_heartbeat import AuditHeartbeatSender
+
+JOB_AUDIT_TBL = "rsql-blog-rsql-job-audit-table"
+
+
+def test_audit_heartbeats_stop_once_a_job_is_given_up():
+    fake = FakeAws()
+    fake.create_table(JOB_AUDIT_TBL, "job_name", "workflow_execution_id")
+    ddb_client = fake.client("dynamodb")
+    for job_name in ["a.sql", "b.sql"]:
+        ddb_client.put_item(
+            TableName=JOB_AUDIT_TBL,
+            Item={
+                "job_name": {"S": job_name},
+                "workflow_execution_id": {"S": "run-1"},
+                "execution_status": {"S": "triggered"},
+            },
+        )
+    heartbeat_sender = AuditHeartbeatSender(
+        JOB_AUDIT_TBL, ["a.sql", "b.sql"], "run-1", 60, ddb_client
+    )
+
+    assert heartbeat_sender.send_heartbeat()
+    assert all("last_heartbeat_ts" in item for item in fake.scan_table(JOB_AUDIT_TBL))
+
+    # marked timed out by the dag scheduler
+    ddb_client.update_item(
+        TableName=JOB_AUDIT_TBL,
+        Key={"job_name": {"S": "b.sql"}, "workflow_execution_id": {"S": "run-1"}},
+        UpdateExpression="SET execution_status = :timed_out",
+        ExpressionAttributeValues={":timed_out": {"S": "timed_out"}},
+    )
+
+    assert not heartbeat_sender.send_heartbeat()
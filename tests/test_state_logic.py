@@ -0,0 +1,289 @@
+import random
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from cdk import state_logic
+from intrinsic_functions import run_pass
+
+SEEDS = range(100)
+
+
+@pytest.fixture(scope="module")
+def lambdas(load_lambda):
+    return {
+        name: load_lambda(f"blog-{name}")
+        for name in [
+            "rsql-config-parser",
+            "master-iterator",
+            "sequential-iterator",
+            "parallel-load-check",
+        ]
+    }
+
+
+def random_scripts(rng: random.Random, minimum: int = 1) -> list:
+    return [
+        f"script_{rng.randrange(10000)}.sql" for _ in range(rng.randint(minimum, 6))
+    ]
+
+
+def random_workflow_stages(rng: random.Random, config_parser) -> list:
+    """Stages as the config parser reads them from the config table"""
+
+    stages = []
+    for position in range(rng.randint(1, 6)):
+        stage = {
+            "stage_name": f"stage_{position}",
+            "execution_type": rng.choice(["parallel", "sequential"]),
+            "execution_flag": rng.choice(["y", "Y", "n"]),
+            "scripts": random_scripts(rng),
+        }
+        if rng.random() < 0.3:
+            stage["concurrency_control"] = rng.choice(["fixed", "adaptive"])
+        if rng.random() < 0.3:
+            stage["max_concurrency"] = rng.randint(1, 100)
+        if rng.random() < 0.3:
+            stage["failure_policy"] = rng.choice(["fail_fast", "wait_all", "tolerate"])
+            stage["tolerated_failures"] = rng.randint(0, 3)
+        if rng.random() < 0.3:
+            stage["timeout_seconds"] = rng.randint(0, 3600)
+            stage["heartbeat_seconds"] = rng.randint(0, 120)
+        if rng.random() < 0.3:
+            stage["script_timeouts"] = {
+                stage["scripts"][0]: {"timeout_seconds": rng.randint(0, 3600)}
+            }
+        stages.append(stage)
+
+    item = TypeSerializer().serialize({"workflow_stages": stages})["M"]
+
+    return config_parser.get_workflow_stages([item])
+
+
+def master_state(stage_details: list, index: int = -1) -> dict:
+    return {
+        "statusCode": 200,
+        "workflow_id": "equivalence",
+        "workflow_execution_id": "equivalence-1",
+        "stage_details": stage_details,
+        "index": index,
+        "count": len(stage_details) - 1,
+    }
+
+
+def run_master_iterator(state: dict) -> dict:
+    output = run_pass(
+        state_logic.MASTER_STAGE_SELECTOR, state, "$.current_stage_details"
+    )
+    output = run_pass(state_logic.MASTER_ITERATOR, output, "$.current_stage_details")
+    return output["current_stage_details"]["Payload"]
+
+
+def sequential_state(scripts: list, index: int = -1) -> dict:
+    return {
+        "sequential": scripts,
+        "sequential_express": [position % 2 == 0 for position in range(len(scripts))],
+        "sequential_timeouts": [
+            {"timeout_seconds": 600 * (position % 2)}
+            for position in range(len(scripts))
+        ],
+        "workflow_id": "equivalence",
+        "workflow_execution_id": "equivalence-1",
+        "index": index,
+    }
+
+
+def run_sequential_iterator(state: dict) -> dict:
+    output = run_pass(state_logic.SEQUENTIAL_ITERATOR, state)
+    # the choice state on index < count
+    if output["index"] < output["count"]:
+        return run_pass(state_logic.SEQUENTIAL_SCRIPT, output)
+    return run_pass(state_logic.SEQUENTIAL_COMPLETED, output)
+
+
+def run_parallel_load_check(parallel_output: list, tolerated_failures: int) -> tuple:
+    state = {
+        "workflow_id": "equivalence",
+        "Payload": {"tolerated_failures": tolerated_failures},
+        "parallel_output": parallel_output,
+    }
+    output = run_pass(state_logic.PARALLEL_LOAD_CHECK, state, "$.parallel_check")
+    output = run_pass(
+        state_logic.PARALLEL_LOAD_FAILURES, output, "$.parallel_check.failures"
+    )
+    parallel_check = output["parallel_check"]
+
+    # the choice state compares the failure count with the tolerated failures
+    return (
+        parallel_check["Payload"],
+        parallel_check["failures"]["count"] <= tolerated_failures,
+    )
+
+
+def run_distributed_load_check(
+    parallel_output: list, tolerated_failures: int, batch_size: int
+) -> tuple:
+    batch_failures = [
+        run_pass(
+            state_logic.DISTRIBUTED_BATCH_FAILURES,
+            parallel_output[i : i + batch_size],
+        )
+        for i in range(0, len(parallel_output), batch_size)
+    ]
+    output = {
+        "parallel_check": run_pass(state_logic.DISTRIBUTED_LOAD_CHECK, batch_failures)
+    }
+    output = run_pass(
+        state_logic.PARALLEL_LOAD_FAILURES, output, "$.parallel_check.failures"
+    )
+    parallel_check = output["parallel_check"]
+
+    return (
+        parallel_check["Payload"],
+        parallel_check["failures"]["count"] <= tolerated_failures,
+    )
+
+
+#######################################################################################################################
+################################################ Master State Machine #################################################
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_master_iterator_matches_lambda(seed, lambdas):
+    rng = random.Random(seed)
+    state = master_state(random_workflow_stages(rng, lambdas["rsql-config-parser"]))
+
+    while state["index"] < state["count"]:
+        expected = lambdas["master-iterator"].lambda_handler(state, None)
+        actual = run_master_iterator(state)
+
+        assert actual == expected
+        state = {**state, "index": actual["index"]}
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_config_parser_gives_the_stage_fields_read(seed, lambdas):
+    rng = random.Random(seed)
+    stage_details = random_workflow_stages(rng, lambdas["rsql-config-parser"])
+
+    # a Pass state has no optional fields
+    stage_fields = [
+        path.rsplit(".", 1)[1]
+        for path in state_logic.MASTER_ITERATOR["Payload"]["execution_details"].values()
+        if path.startswith("$.current_stage_details.stage.")
+    ]
+    for stage in stage_details:
+        assert [field for field in stage_fields if stage.get(field) is None] == []
+
+
+def test_master_iterator_last_stage(lambdas):
+    stage_details = random_workflow_stages(
+        random.Random(0), lambdas["rsql-config-parser"]
+    )
+    # index + 1 == count : the last stage is selected
+    state = master_state(stage_details, index=len(stage_details) - 2)
+
+    expected = lambdas["master-iterator"].lambda_handler(state, None)
+    actual = run_master_iterator(state)
+
+    assert actual == expected
+    assert actual["index"] == actual["count"]
+    assert actual["execution_details"]["scripts"] == stage_details[-1]["scripts"]
+
+
+#######################################################################################################################
+############################################## Sequential State Machine ###############################################
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_sequential_iterator_matches_lambda(seed, lambdas):
+    rng = random.Random(seed)
+    state = sequential_state(random_scripts(rng, minimum=0))
+
+    while True:
+        expected = lambdas["sequential-iterator"].lambda_handler(state, None)
+        actual = run_sequential_iterator(state)
+
+        assert actual == expected
+        if actual["index"] >= actual["count"]:
+            break
+        # result of the invoke task, dropped by the next iteration
+        script = actual["execution_details"]["script"]
+        state = {**actual, "result": {"job_name": script}}
+
+
+def test_sequential_iterator_last_script(lambdas):
+    scripts = ["first.sql", "second.sql", "third.sql"]
+    # index + 1 == count : the sequence is completed
+    state = sequential_state(scripts, index=len(scripts) - 1)
+
+    expected = lambdas["sequential-iterator"].lambda_handler(state, None)
+    actual = run_sequential_iterator(state)
+
+    assert actual == expected
+    assert actual["execution_details"]["script"] == "NA"
+    assert actual["execution_details"]["timeouts"] == {}
+
+
+def test_sequential_iterator_empty_stage(lambdas):
+    state = sequential_state([])
+
+    expected = lambdas["sequential-iterator"].lambda_handler(state, None)
+    actual = run_sequential_iterator(state)
+
+    assert actual == expected
+    assert actual["count"] == 0
+    assert actual["execution_details"]["script"] == "NA"
+
+
+#######################################################################################################################
+############################################### Parallel State Machine ################################################
+#######################################################################################################################
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parallel_load_check_matches_lambda(seed, lambdas):
+    rng = random.Random(seed)
+    parallel_output = [
+        {
+            "job_name": script,
+            "status": rng.choices(["completed", "failed", "timed_out"], [8, 1, 1])[0],
+        }
+        for script in random_scripts(rng, minimum=0)
+    ]
+    tolerated_failures = rng.choice([0, 0, 1, 2])
+
+    expected = lambdas["parallel-load-check"].lambda_handler(
+        {"parallel_output": parallel_output, "tolerated_failures": tolerated_failures},
+        None,
+    )
+    is_successful = expected["parallel_load_status"] == "successful"
+
+    payload, successful = run_parallel_load_check(parallel_output, tolerated_failures)
+    assert payload["parallel_script_list"] == expected["parallel_script_list"]
+    assert payload["failed_script_list"] == expected["failed_script_list"]
+    assert successful == is_successful
+
+    # the distributed map task gathers the failed scripts of its batches instead
+    payload, successful = run_distributed_load_check(
+        parallel_output, tolerated_failures, rng.randint(1, 5)
+    )
+    assert payload["failed_script_list"] == expected["failed_script_list"]
+    assert successful == is_successful
+
+
+def test_parallel_load_check_empty_stage(lambdas):
+    expected = lambdas["parallel-load-check"].lambda_handler(
+        {"parallel_output": [], "tolerated_failures": 0}, None
+    )
+
+    payload, successful = run_parallel_load_check([], 0)
+    assert payload["parallel_script_list"] == expected["parallel_script_list"] == []
+    assert payload["failed_script_list"] == expected["failed_script_list"] == []
+    assert successful and expected["parallel_load_status"] == "successful"
+
+    payload, successful = run_distributed_load_check([], 0, 5)
+    assert payload["failed_script_list"] == []
+    assert successful
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from fake_aws import FakeAws
+from worker_fleet import BIN_PACKING, LEAST_LOADED, place_job, rank_instances
+
+FLEET_TBL = "rsql-blog-rsql-fleet-table"
+
+
+def instance(instance_id: str, used_slots: int, max_slots: int = 4, **fields) -> dict:
+    return {
+        "instance_id": instance_id,
+        "used_slots": used_slots,
+        "max_slots": max_slots,
+        "reserved_runtime": 0,
+        "fleet_status": "active",
+        "heartbeat_ts": int(time.time()),
+        **fields,
+    }
+
+
+def instance_ids(instances: list) -> list:
+    return [instance["instance_id"] for instance in instances]
+
+
+@pytest.fixture
+def fleet_client():
+    fake = FakeAws()
+    fake.create_table(FLEET_TBL, "instance_id")
+    return fake.client("dynamodb")
+
+
+def add_instances(ddb_client, instances: list) -> None:
+    for instance in instances:
+        ddb_client.put_item(
+            TableName=FLEET_TBL,
+            Item={
+                name: {"S": value} if isinstance(value, str) else {"N": str(value)}
+                for name, value in instance.items()
+            },
+        )
+
+
+def test_least_loaded_spreads_the_jobs():
+    instances = [
+        instance("i-busy", 3),
+        instance("i-full", 4),
+        instance("i-idle", 0, max_slots=2),
+        instance("i-half", 2, reserved_runtime=600),
+        instance("i-half-short", 2, reserved_runtime=60),
+    ]
+
+    assert instance_ids(rank_instances(instances, LEAST_LOADED)) == [
+        "i-idle",
+        "i-half-short",
+        "i-half",
+        "i-busy",
+    ]
+
+
+def test_bin_packing_fills_the_busiest_instances():
+    instances = [
+        instance("i-idle", 0),
+        instance("i-busy", 3),
+        instance("i-full", 4),
+        instance("i-half", 2),
+    ]
+
+    assert instance_ids(rank_instances(instances, BIN_PACKING)) == [
+        "i-busy",
+        "i-half",
+        "i-idle",
+    ]
+
+
+def test_unknown_placement_policy():
+    with pytest.raises(ValueError, match="Unknown placement policy"):
+        rank_instances([instance("i-idle", 0)], "random")
+
+
+def test_jobs_are_placed_on_free_slots(fleet_client):
+    add_instances(fleet_client, [instance("i-one", 1, 2), instance("i-two", 0, 2)])
+
+    placed = [place_job(FLEET_TBL, 60, ddb_client=fleet_client) for _ in range(3)]
+
+    assert sorted(placed) == ["i-one", "i-two", "i-two"]
+
+
+def test_a_full_fleet_oversubscribes_the_least_loaded_instance(fleet_client):
+    add_instances(fleet_client, [instance("i-one", 2, 2), instance("i-two", 4, 4)])
+    fleet = [instance("i-one", 2, 2), instance("i-two", 3, 4)]
+
+    # the fleet read is stale, i-two is full in the table
+    assert place_job(FLEET_TBL, 60, fleet=fleet, ddb_client=fleet_client) == "i-one"
+    assert fleet[0]["used_slots"] == 3
+    assert fleet[1]["used_slots"] == 4
+
+
+def test_lost_and_draining_instances_get_no_job(fleet_client):
+    add_instances(
+        fleet_client,
+        [
+            instance("i-lost", 0, heartbeat_ts=int(time.time()) - 3600),
+            instance("i-draining", 0, fleet_status="draining"),
+        ],
+    )
+
+    assert place_job(FLEET_TBL, 60, ddb_client=fleet_client) is None
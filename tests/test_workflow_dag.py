@@ -0,0 +1,112 @@
+import pytest
+
+from workflow_dag import (
+    build_workflow_dag,
+    get_critical_path_lengths,
+    get_ready_scripts,
+    validate_workflow_dag,
+)
+
+
+def test_stages_keep_their_semantics_without_depends_on():
+    dag = build_workflow_dag(
+        [
+            {"execution_type": "parallel", "scripts": ["a.sql", "b.sql"]},
+            {"execution_type": "sequential", "scripts": ["c.sql", "d.sql"]},
+            {"execution_type": "parallel", "scripts": ["e.sql"]},
+        ]
+    )
+
+    assert dag == {
+        "a.sql": [],
+        "b.sql": [],
+        "c.sql": ["a.sql", "b.sql"],
+        "d.sql": ["c.sql"],
+        "e.sql": ["d.sql"],
+    }
+
+
+def test_depends_on_replaces_the_stage_dependencies():
+    dag = build_workflow_dag(
+        [
+            {"execution_type": "parallel", "scripts": ["a.sql", "b.sql"]},
+            {
+                "execution_type": "parallel",
+                "scripts": ["c.sql", "d.sql"],
+                "depends_on": {"c.sql": ["a.sql"], "d.sql": ["c.sql", "disabled.sql"]},
+            },
+        ]
+    )
+
+    # dependencies on scripts outside the workflow are satisfied
+    assert dag == {"a.sql": [], "b.sql": [], "c.sql": ["a.sql"], "d.sql": ["c.sql"]}
+
+
+def test_scripts_are_configured_once():
+    with pytest.raises(ValueError, match="more than once"):
+        build_workflow_dag(
+            [
+                {"execution_type": "parallel", "scripts": ["a.sql"]},
+                {"execution_type": "parallel", "scripts": ["a.sql"]},
+            ]
+        )
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError, match="cycle"):
+        build_workflow_dag(
+            [
+                {
+                    "execution_type": "parallel",
+                    "scripts": ["a.sql", "b.sql", "c.sql"],
+                    "depends_on": {"a.sql": ["c.sql"], "c.sql": ["a.sql"]},
+                }
+            ]
+        )
+
+    with pytest.raises(ValueError, match=r"cycle : \['a.sql', 'b.sql'\]"):
+        validate_workflow_dag({"a.sql": ["b.sql"], "b.sql": ["a.sql"], "c.sql": []})
+
+
+def test_a_self_dependency_is_a_cycle():
+    with pytest.raises(ValueError, match="cycle"):
+        validate_workflow_dag({"a.sql": ["a.sql"]})
+
+
+def test_ready_scripts_wait_for_completed_dependencies():
+    dag = {"a.sql": [], "b.sql": [], "c.sql": ["a.sql", "b.sql"], "d.sql": ["c.sql"]}
+
+    assert get_ready_scripts(dag, [], [], []) == ["a.sql", "b.sql"]
+    assert get_ready_scripts(dag, ["a.sql"], ["b.sql"], []) == []
+    assert get_ready_scripts(dag, ["a.sql", "b.sql"], [], []) == ["c.sql"]
+    assert get_ready_scripts(dag, ["a.sql", "b.sql", "c.sql", "d.sql"], [], []) == []
+
+
+def test_failed_scripts_block_their_dependents():
+    dag = {"a.sql": [], "b.sql": [], "c.sql": ["a.sql"]}
+
+    assert get_ready_scripts(dag, [], [], ["a.sql"]) == ["b.sql"]
+    assert get_ready_scripts(dag, ["b.sql"], [], ["a.sql"]) == []
+
+
+def test_critical_path_lengths_sum_the_longest_chain():
+    dag = {"a.sql": [], "b.sql": ["a.sql"], "c.sql": ["a.sql"], "d.sql": ["c.sql"]}
+    runtimes = {"a.sql": 10, "b.sql": 100, "c.sql": 20, "d.sql": 30}
+
+    assert get_critical_path_lengths(dag, runtimes) == {
+        "a.sql": 110,
+        "b.sql": 100,
+        "c.sql": 50,
+        "d.sql": 30,
+    }
+
+
+def test_scripts_without_history_are_the_longest_known():
+    dag = {"a.sql": [], "b.sql": ["a.sql"], "c.sql": []}
+
+    assert get_critical_path_lengths(dag, {"a.sql": 5, "c.sql": 40}) == {
+        "a.sql": 45,
+        "b.sql": 40,
+        "c.sql": 40,
+    }
+    assert get_critical_path_lengths(dag, {}) == {"a.sql": 0, "b.sql": 0, "c.sql": 0}